@@ -898,6 +898,15 @@ def populate_factory_descript(work_dir, glidein_dict,
         glidein_dict.add('RestartAttempts', conf[u'restart_attempts'])
         glidein_dict.add('RestartInterval', conf[u'restart_interval'])
         glidein_dict.add('EntryParallelWorkers', conf[u'entry_parallel_workers'])
+        glidein_dict.add('EntryWorkerPool', conf[u'entry_worker_pool'])
+        glidein_dict.add('SharedQueueSnapshot', conf[u'shared_queue_snapshot'])
+        glidein_dict.add('SubmitScheduler', conf[u'submit_scheduler'])
+        glidein_dict.add('SubmitSchedulerWorkers', conf[u'submit_scheduler_workers'])
+        glidein_dict.add('SubmitSchedulerRate', conf[u'submit_scheduler_rate'])
+        glidein_dict.add('SubmitSchedulerBurst', conf[u'submit_scheduler_burst'])
+        glidein_dict.add('WorkBroker', conf[u'work_broker'])
+        glidein_dict.add('EntryGroupProcesses', conf[u'entry_group_processes'])
+        glidein_dict.add('BalanceEntryGroups', conf[u'balance_entry_groups'])
 
         glidein_dict.add('RecoverableExitcodes', conf[u'recoverable_exitcodes'])
         glidein_dict.add('LogDir', conf.get_log_dir())
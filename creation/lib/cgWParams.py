@@ -181,6 +181,15 @@ class GlideinParams(cWParams.CommonParams):
         self.defaults['restart_attempts'] = ('3', 'NR', 'Max allowed NR restarts every restart_interval before shutting down', None)
         self.defaults['restart_interval'] = ('1800', 'NR', 'Time interval NR sec which allow max restart attempts', None)
         self.defaults['entry_parallel_workers'] = ('0', 'NR', 'Number of entries that will perform the work in parallel', None)
+        self.defaults['entry_worker_pool'] = ('False', 'Bool', 'Should the entries be kept in long lived worker processes (entry_parallel_workers per group) instead of forking a process per entry at every iteration?', None)
+        self.defaults['shared_queue_snapshot'] = ('False', 'Bool', 'Should each entry group query the factory schedds once for all its entries, instead of once per entry?', None)
+        self.defaults['submit_scheduler'] = ('False', 'Bool', 'Should each entry group submit the glideins of all its entries concurrently, rate limited per schedd, instead of each entry submitting its own?', None)
+        self.defaults['submit_scheduler_workers'] = ('5', 'NR', 'Max number of condor_submit running at the same time in an entry group, with submit_scheduler', None)
+        self.defaults['submit_scheduler_rate'] = ('1.0', 'NR', 'Max number of condor_submit per second to each schedd, with submit_scheduler (0 means no limit)', None)
+        self.defaults['submit_scheduler_burst'] = ('5', 'NR', 'Max number of condor_submit started at once to each schedd, with submit_scheduler', None)
+        self.defaults['work_broker'] = ('False', 'Bool', 'Should the factory query the collector once per cycle for the requests of all the entry groups, instead of each group querying it?', None)
+        self.defaults['entry_group_processes'] = ('1', 'NR', 'Number of entry group processes serving the entries', None)
+        self.defaults['balance_entry_groups'] = ('False', 'Bool', 'Should the entries be split in the entry group processes by their recorded work time, instead of alphabetically?', None)
 
         stage_defaults = cWParams.commentedOrderedDict()
         stage_defaults["base_dir"] = ("/var/www/html/glidefactory/stage", "base_dir", "Stage base dir", None)
@@ -550,6 +550,10 @@ def populate_group_descript(work_dir, group_descript_dict,        # will be modi
     group_descript_dict.add('MaxRunningTotal', sub_params.config.running_glideins_total.max)
     group_descript_dict.add('CurbRunningTotal', sub_params.config.running_glideins_total.curb)
     group_descript_dict.add('MaxMatchmakers', sub_params.config.processing_workers.matchmakers)
+    group_descript_dict.add('MatchEngine', sub_params.config.processing_workers.match_engine)
+    group_descript_dict.add('ColumnarStorage', sub_params.config.processing_workers.columnar_storage)
+    group_descript_dict.add('CondorQCacheFullRefresh', sub_params.config.processing_workers.condorq_cache_full_refresh)
+    group_descript_dict.add('MatchCache', sub_params.config.processing_workers.match_cache)
     group_descript_dict.add('RemovalType', sub_params.config.glideins_removal.type)
     group_descript_dict.add('RemovalWait', sub_params.config.glideins_removal.wait)
     group_descript_dict.add('RemovalRequestsTracking', sub_params.config.glideins_removal.requests_tracking)
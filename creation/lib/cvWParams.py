@@ -88,6 +88,10 @@ class VOFrontendParams(cWParams.CommonParams):
 
         group_config_proc_work_defaults = cWParams.commentedOrderedDict()
         group_config_proc_work_defaults["matchmakers"] = ['3', "NR", "Max number of worker processes that will be doing the matchmaking", None]
+        group_config_proc_work_defaults["match_engine"] = ['classic', "classic|vectorized", "Algorithm used by the workers doing the matchmaking. vectorized evaluates each entry against a table of the job clusters, same results as classic", None]
+        group_config_proc_work_defaults["columnar_storage"] = ['False', "Bool", "Store the jobs and the glideins of the group by attribute (columns) instead of one dictionary per classad. Uses less memory, the subqueries are views instead of copies", None]
+        group_config_proc_work_defaults["condorq_cache_full_refresh"] = ['0', "seconds", "If greater than 0, the jobs of each schedd are cached between iterations and only the jobs that changed status are queried again. All the jobs are queried at least every this many seconds. 0 disables the cache", None]
+        group_config_proc_work_defaults["match_cache"] = ['False', "Bool", "Keep the results of the matchmaking of each entry and job cluster across iterations and evaluate only the new or changed pairs. The cache is cleared when the match expression, the match attributes or the match policy files change", None]
         group_config_defaults['processing_workers'] = group_config_proc_work_defaults
 
         group_config_removal_defaults = cWParams.commentedOrderedDict()
@@ -46,6 +46,7 @@ from glideinwms.factory import glideFactoryMonitoring
 from glideinwms.factory import glideFactoryDowntimeLib
 from glideinwms.factory import glideFactoryCredentials
 from glideinwms.factory import glideFactoryEntryGroup
+from glideinwms.factory import glideFactoryEntryCosts
 from glideinwms.lib import condorMonitor
 # from sets import Set
 
@@ -330,7 +331,9 @@ def spawn(sleep_time, advertize_rate, startup_dir, glideinDescript,
     #   - Sort the entries alphabetically. Already done
     #   - Divide the list into equal chunks as possible
     #   - Last chunk may get fewer entries
-    entry_process_count = 1
+    # or, with BalanceEntryGroups, in groups with similar cost recorded by
+    # the entry groups (see glideFactoryEntryCosts)
+    entry_process_count = max(1, int(glideinDescript.data.get('EntryGroupProcesses', 1)))
 
 
     starttime = time.time()
@@ -343,8 +346,16 @@ def spawn(sleep_time, advertize_rate, startup_dir, glideinDescript,
 
     logSupport.log.info("Available Entries: %s" % entries)
 
-    group_size = long(math.ceil(float(len(entries))/entry_process_count))
-    entry_groups = entry_grouper(group_size, entries)
+    if glideinDescript.data.get('BalanceEntryGroups', 'False') in ('True', '1'):  # data attributes are strings
+        entry_costs = glideFactoryEntryCosts.loadEntryCosts(startup_dir)
+        entry_groups = glideFactoryEntryCosts.groupEntriesByCost(entries, entry_process_count, entry_costs)
+        for group in range(len(entry_groups)):
+            logSupport.log.info("EntryGroup %s expected work time: %.1f seconds" %
+                                (group, sum([entry_costs[e]['WorkTime'] for e in entry_groups[group]
+                                             if e in entry_costs])))
+    else:
+        group_size = long(math.ceil(float(len(entries))/entry_process_count))
+        entry_groups = entry_grouper(group_size, entries)
 
     def _set_rlimit(soft_l=None, hard_l=None):
         #set new hard and soft open file limits
@@ -511,6 +522,21 @@ def spawn(sleep_time, advertize_rate, startup_dir, glideinDescript,
                     logSupport.log.exception("Error occurred processing the globals classads: ")
 
 
+            # Query the collector once for all the entry groups
+            if glideinDescript.data.get('WorkBroker', 'False') in ('True', '1'):  # data attributes are strings
+                try:
+                    version = glideFactoryInterface.publishWorkSnapshot(
+                        glideinDescript.data['FactoryName'],
+                        glideinDescript.data['GlideinName'],
+                        entries,
+                        glideFactoryLib.factoryConfig.supported_signtypes,
+                        os.path.join(glideFactoryInterface.factoryConfig.lock_dir,
+                                     glideFactoryInterface.WORK_SNAPSHOT_FNAME))
+                    logSupport.log.info("Published the work snapshot version %i" % version)
+                except:
+                    # The entry groups will query the collector
+                    logSupport.log.exception("Error publishing the work snapshot: ")
+
             logSupport.log.info("Checking EntryGroups %s" % childs.keys())
             for group in childs:
                 entry_names = string.join(entry_groups[group], ':')
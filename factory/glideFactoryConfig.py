@@ -48,9 +48,12 @@ factoryConfig=FactoryConfig()
 #   self.data[NAME]=VAL
 # It also defines:
 #   self.config_file="name of file"
+#
+# self.files is the list of files loaded (used by the ConfigCache)
 class ConfigFile:
     def __init__(self,config_file,convert_function=repr):
         self.config_file=config_file
+        self.files=[config_file]
         self.load(config_file, convert_function)
 
     def load(self, fname, convert_function):
@@ -96,10 +99,88 @@ class JoinConfigFile(ConfigFile):
         ConfigFile.__init__(self, config_file, convert_function)
         self.entry_name=entry_name
         entry_obj=EntryConfigFile(entry_name, config_file, convert_function)
+        self.files.append(entry_obj.config_file)
         #merge by overriding whatever is found in the subdir
         for k in entry_obj.data.keys():
             self.data[k]=entry_obj.data[k]
 
+############################################################
+#
+# Process wide cache of the config objects
+#
+############################################################
+
+# Signature of a file, changes when the file is modified or replaced
+# None if the file does not exist
+def getFileSignature(fname):
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+class ConfigCache:
+    """
+    Cache of the config objects (e.g. JobDescript), to avoid reading and parsing
+    the same files many times in the same cycle (e.g. at every submission)
+    An object is reused as long as the files it loaded did not change (mtime, size, inode)
+    The cached objects are shared, the users must not modify them
+    The cache lives in the entry group processes, that are terminated and started again
+    on reconfig (HUP), so it does not need to be invalidated then
+    """
+    def __init__(self):
+        # (config class, args, working dir) -> (file signatures, object)
+        self.objs = {}
+        self.stats = {'Hits': 0, 'Misses': 0}
+
+    def get(self, config_class, *args):
+        """
+        Return a config object, same as config_class(*args), loading it only if needed
+
+        @type config_class: class
+        @param config_class: ConfigFile child, e.g. JobDescript
+        @param args: arguments of the constructor, e.g. the entry name
+        """
+        # the file names are relative to the working dir (the factory dir)
+        key = (config_class, args, os.getcwd())
+        signatures = None
+        if key in self.objs:
+            old_signatures, obj = self.objs[key]
+            signatures = [getFileSignature(fname) for fname in obj.files]
+            if signatures == old_signatures:
+                self.stats['Hits'] += 1
+                return obj
+        obj = config_class(*args)
+        if signatures is None:
+            # first load, the files are known only now
+            signatures = [getFileSignature(fname) for fname in obj.files]
+        # else use the signatures taken before loading, a change while loading will be caught next time
+        self.objs[key] = (signatures, obj)
+        self.stats['Misses'] += 1
+        return obj
+
+    def invalidate(self):
+        """
+        Drop all the cached objects
+        """
+        self.objs = {}
+
+# global cache of the module
+configCache = ConfigCache()
+
+def getCachedConfig(config_class, *args):
+    """
+    Return a config object from the process wide cache, e.g. getCachedConfig(JobDescript, entry_name)
+    The object must not be modified
+    """
+    return configCache.get(config_class, *args)
+
+def getConfigCacheStats():
+    """
+    @return: dictionary with the number of objects reused ('Hits', parses saved) and loaded ('Misses')
+    """
+    return configCache.stats
+
 ############################################################
 #
 # Configuration
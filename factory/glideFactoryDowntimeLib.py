@@ -13,8 +13,11 @@ from __future__ import print_function
 #   Igor Sfiligoi (July 7th 2008)
 #
 
+import os
 import time
 import fcntl
+import bisect
+import heapq
 import os.path
 from glideinwms.lib import timeConversion
 
@@ -178,35 +181,136 @@ def printDowntime(fname,entry="Any",check_time=None):
 
 
 
+#
+# Index of the downtime periods
+# The periods are grouped by (entry, frontend, security_class) and sorted by start time,
+# so a check looks at only the groups matching the request (including the "All" ones)
+# and finds if a period is active with a binary search.
+# The file is parsed only when it changes (inode, mtime or size), not at every check
+#
+class DowntimeIndex:
+    def __init__(self, time_list):
+        # (entry, frontend, security_class) -> sorted list of (time, side), the boundaries where the
+        # active periods change, and the first period in the file active from each boundary to the next one
+        # side 0: from time included, side 1: after time (the end times are included in the periods)
+        self.bounds = {}
+        self.active = {}
+        periods = {}
+        for lnr in range(len(time_list)):
+            time_tuple = time_list[lnr]
+            comment = ' '.join(time_tuple[5][1:])
+            periods.setdefault(time_tuple[2:5], []).append((time_tuple[0], time_tuple[1], lnr, comment))
+        for key, key_periods in periods.items():
+            self.bounds[key], self.active[key] = self.sweep(key_periods)
+
+    @staticmethod
+    def sweep(periods):
+        """Split the time in intervals with the same active periods
+
+        @param periods: list of (start_time, end_time, line_nr, comment), end_time None means forever
+        @return: (bounds, active), the sorted boundaries (time, side) and, for each one, the first period
+            in the file active until the next boundary (None if none)
+        """
+        events = []
+        for period in periods:
+            events.append((period[0], 0, period))
+            if period[1] is not None:
+                events.append((period[1], 1, period))
+        events.sort(key=lambda x: (x[0], x[1]))
+        bounds = []
+        active = []
+        # heap of the started periods by line number, the ended ones are dropped when on top
+        started = []
+        ended = set()
+        i = 0
+        while i < len(events):
+            bound = events[i][:2]
+            while (i < len(events)) and (events[i][:2] == bound):
+                period = events[i][2]
+                if events[i][1] == 0:
+                    heapq.heappush(started, (period[2], period))
+                else:
+                    ended.add(period[2])
+                i += 1
+            while started and (started[0][0] in ended):
+                heapq.heappop(started)
+            bounds.append(bound)
+            active.append(started and started[0][1] or None)
+        return bounds, active
+
+    def findPeriod(self, key, check_time):
+        """Return the first period in the file, with this key, active at check_time. None if none
+        O(log n), a bisect of the boundaries of the periods
+        """
+        if key not in self.bounds:
+            return None
+        # (check_time, 0.5) sorts after (check_time, 0) and before (check_time, 1)
+        idx = bisect.bisect_right(self.bounds[key], (check_time, 0.5))
+        if idx == 0:
+            return None  # check_time before all starts
+        return self.active[key][idx - 1]
+
+    def check(self, entry="Any", frontend="Any", security_class="Any", check_time=None):
+        """Same as checkDowntime
+
+        @return: (comment, True) if in downtime, ("", False) otherwise
+        """
+        if check_time is None:
+            check_time = long(time.time())
+        entries = [entry]
+        if (entry != "factory") and (entry != "All"):
+            entries.append("All")
+        frontends = [frontend]
+        if frontend != "All":
+            frontends.append("All")
+        security_classes = [security_class]
+        if security_class != "All":
+            security_classes.append("All")
+
+        found = None
+        for e in entries:
+            for f in frontends:
+                for sc in security_classes:
+                    period = self.findPeriod((e, f, sc), check_time)
+                    if (period is not None) and ((found is None) or (period[2] < found[2])):
+                        found = period
+        if found is None:
+            return ("", False)  # not found a downtime window
+        return (found[3], True)
+
+
+# fname -> (file signature, DowntimeIndex)
+downtimeIndexes = {}
+
+
+def getDowntimeIndex(fname):
+    """Return the index of the downtime file, parsing it only if changed since the last call
+    """
+    try:
+        st = os.stat(fname)
+        signature = (st.st_ino, st.st_mtime, st.st_size)
+    except OSError:
+        signature = None  # no file -> no downtimes
+    if (fname in downtimeIndexes) and (downtimeIndexes[fname][0] == signature):
+        return downtimeIndexes[fname][1]
+    index = DowntimeIndex(read(fname))
+    downtimeIndexes[fname] = (signature, index)
+    return index
+
+
+def invalidateDowntimeIndex(fname):
+    """Drop the index of the file, to be used after changing it
+    A change in the same clock tick may not change the file signature
+    """
+    if fname in downtimeIndexes:
+        del downtimeIndexes[fname]
+
+
 # if check_time==None, use current time
 def checkDowntime(fname,entry="Any",frontend="Any",security_class="Any",check_time=None):
-        if check_time is None:
-            check_time=long(time.time())
-        time_list=read(fname)
-        for time_tuple in time_list:
-            #make sure this is for the right entry
-            if ((time_tuple[2]!="All")and(entry!=time_tuple[2])):
-                continue
-            if ((time_tuple[2]=="All")and(entry=="factory")):
-                continue
-            #make sure that this time tuple applies to this security_class
-            #If the security class does not match the downtime entry, 
-            #   this is not a relevant downtime
-            #   UNLESS the downtime says All
-            if ((time_tuple[3]!="All") and (frontend!=time_tuple[3])):
-                continue
-            if ((time_tuple[4]!="All") and (security_class!=time_tuple[4])):
-                continue
-            if check_time<time_tuple[0]:
-                continue # check_time before start
-            comment= ' '.join(time_tuple[5][1:])
-            if time_tuple[1] is None:
-                return (comment, True) # downtime valid until the end of times, so here we go
-            if check_time<=time_tuple[1]:
-                return (comment, True) # within limit
-
-        return ("", False) # not found a downtime window
-        
+        return getDowntimeIndex(fname).check(entry, frontend, security_class, check_time)
+
+
 def addPeriod(fname,start_time,end_time,entry="All",frontend="All",security_class="All",comment="",create_if_empty=True):
         exists=os.path.isfile(fname)
         if (not exists) and (not create_if_empty):
@@ -222,6 +326,7 @@ def addPeriod(fname,start_time,end_time,entry="All",frontend="All",security_clas
                 fd.write("%-30s %-20s %-20s %-30s %-20s # %-20s\n"%(timeConversion.getISO8601_Local(start_time), timeConversion.getISO8601_Local(end_time), entry, frontend, security_class, comment))
             else:
                 fd.write("%-30s %-30s %-20s %-30s %-20s # %s\n"%(timeConversion.getISO8601_Local(start_time), "None", entry, frontend, security_class, comment))
+        invalidateDowntimeIndex(fname)
         return 0
 
 
@@ -294,6 +399,7 @@ def purgeOldPeriods(fname,cut_time=None, raise_on_error=False):
             fd.writelines(outlines)
             fd.truncate()
 
+        invalidateDowntimeIndex(fname)
         return cut_nr
 
 
@@ -378,4 +484,5 @@ def endDowntime(fname, end_time=None, entry="All", frontend="All", security_clas
             fd.writelines(outlines)
             fd.truncate()
 
+        invalidateDowntimeIndex(fname)
         return closed_nr
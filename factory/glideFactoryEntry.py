@@ -178,6 +178,9 @@ class Entry:
             cleanupSupport.cleaners.add_cleaner(cleaner)
 
         self.glideinTotals = None
+        # Glideins of this entry from the snapshot of the schedd taken by the entry group,
+        # None to query the schedd (see queryQueuedGlideins)
+        self.queuedGlideinsSnapshot = None
 
         # Load intial context for whitelist and downtimes
         self.loadWhitelist()
@@ -366,6 +369,11 @@ class Entry:
         self.gflFactoryConfig.qc_stats = glideFactoryMonitoring.condorQStats(log=self.log,
                                                                              cores=self.getGlideinExpectedCores())
         self.gflFactoryConfig.client_internals = {}
+        # With the submit scheduler the entry group submits the glideins of all the entries
+        if self.glideinDescript.data.get('SubmitScheduler', 'False') in ('True', '1'):
+            self.gflFactoryConfig.submit_queue = []
+        else:
+            self.gflFactoryConfig.submit_queue = None
         self.log.info("Iteration initialized")
 
 
@@ -384,10 +392,15 @@ class Entry:
         Consists of a fetched dictionary w/ jobs (keyed by job cluster, ID) in .stored_data,
         some query attributes and the ability to reload (load/fetch)
 
+        If the entry group already queried the schedd for all its entries
+        (setQueuedGlideinsSnapshot), the snapshot is returned without querying again.
+
         @rtype: condorMonitor.CondorQ already loaded
         @return: Information about the jobs in condor_schedd
         """
 
+        if self.queuedGlideinsSnapshot is not None:
+            return self.queuedGlideinsSnapshot
         try:
             return glideFactoryLib.getCondorQData(
                        self.name, None, self.scheddName,
@@ -399,6 +412,17 @@ class Entry:
             self.log.warning("getCondorQData failed, traceback: %s"%string.join(tb, ''))
             raise e
 
+    def setQueuedGlideinsSnapshot(self, condorQ):
+        """
+        Set the glideins of this entry from the snapshot of the schedd taken by the entry group
+
+        @type condorQ: condorMonitor.CondorQ
+        @param condorQ: glideins of this entry (see glideFactoryLib.getCondorQSnapshot),
+            None to query the schedd in queryQueuedGlideins
+        """
+
+        self.queuedGlideinsSnapshot = condorQ
+
     def glideinsWithinLimits(self, condorQ):
         """
         Check the condorQ info and see we are within limits & init entry limits
@@ -1104,6 +1128,9 @@ def check_and_perform_work(factory_in_downtime, entry, work):
         done_something += work_performed['work_done']
         all_security_names = all_security_names.union(work_performed['security_names'])
 
+    entry.log.debug("Config cache: %(Hits)i parses saved, %(Misses)i config files loaded" %
+                    glideFactoryConfig.getConfigCacheStats())
+
     # sanitize glideins (if there was no work done, otherwise it is done in glidein submission)
     if done_something == 0:
         entry.log.info("Sanitizing glideins for entry %s" % entry.name)
@@ -1614,10 +1641,16 @@ def perform_work_v3(entry, condorQ, client_name, client_int_name,
     except Exception as e:
         entry.log.exception(e)
 
+    # Classify the glideins once, for the statistics and the submission/removal
+    glidein_classes = glideFactoryLib.classifyGlideins(
+                          condorQ, entry.gflFactoryConfig.credential_id_schedd_attribute,
+                          factoryConfig=entry.gflFactoryConfig)
+
     glideFactoryLib.logStats(condorQ, client_int_name,
                              client_security_name,
                              submit_credentials.security_class, log=entry.log,
-                             factoryConfig=entry.gflFactoryConfig)
+                             factoryConfig=entry.gflFactoryConfig,
+                             glidein_classes=glidein_classes)
 
     client_log_name = glideFactoryLib.secClass2Name(
                           client_security_name,
@@ -1629,7 +1662,8 @@ def perform_work_v3(entry, condorQ, client_name, client_int_name,
                        condorQ, client_int_name, idle_glideins,
                        max_glideins, idle_lifetime, remove_excess, submit_credentials,
                        glidein_totals, frontend_name, client_web, params,
-                       log=entry.log, factoryConfig=entry.gflFactoryConfig)
+                       log=entry.log, factoryConfig=entry.gflFactoryConfig,
+                       client_classes=glidein_classes)
 
     if nr_submitted>0:
         entry.log.info("Submitted %s glideins" % nr_submitted)
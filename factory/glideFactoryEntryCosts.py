@@ -0,0 +1,143 @@
+#
+# Project:
+#   glideinWMS
+#
+# File Version:
+#
+# Description:
+#   Load aware grouping of the entries in the entry group processes
+#   Each entry group records the cost of its entries, the time spent doing their
+#   work and the number of requests (moving averages), in its own file
+#   in the factory directory (EntryCosts).
+#   At startup, also after a reconfig (HUP), the factory reads the costs
+#   of all the entries (loadEntryCosts) and splits them in groups with similar
+#   expected cost (groupEntriesByCost) instead of slicing the sorted list.
+#
+
+import os
+import glob
+import json
+import time
+import heapq
+
+from glideinwms.lib import logSupport
+
+# Cost files, one per entry group, in the factory directory
+COSTS_FNAME_PREFIX = "entry_costs."
+COSTS_FNAME_SUFFIX = ".json"
+
+# Weight of the last iteration in the moving averages
+DEFAULT_ALPHA = 0.2
+
+
+def getCostsFile(startup_dir, group_name):
+    return os.path.join(startup_dir, "%s%s%s" % (COSTS_FNAME_PREFIX, group_name, COSTS_FNAME_SUFFIX))
+
+
+class EntryCosts:
+    """Costs of the entries of an entry group
+
+    Each entry has the moving averages of the work time in seconds ('WorkTime')
+    and of the number of requests ('Requests') per iteration, and the time of
+    the last update ('Time')
+    """
+
+    def __init__(self, fname, alpha=DEFAULT_ALPHA):
+        """
+        :param fname: file where the costs are saved (see getCostsFile)
+        :param alpha: weight of the last iteration in the moving averages
+        """
+        self.fname = fname
+        self.alpha = alpha
+        self.costs = {}
+
+    def load(self):
+        """Load the costs saved by a previous run of the group, if any
+        """
+        try:
+            with open(self.fname) as fd:
+                self.costs = json.load(fd)
+        except (IOError, OSError, ValueError):
+            self.costs = {}
+
+    def save(self):
+        """Save the costs, replacing the file atomically
+        """
+        tmp_fname = "%s.tmp" % self.fname
+        try:
+            with open(tmp_fname, "w") as fd:
+                json.dump(self.costs, fd)
+            os.rename(tmp_fname, self.fname)
+        except (IOError, OSError):
+            logSupport.log.exception("Unable to save the entry costs in %s: " % self.fname)
+
+    def update(self, entry_name, work_time, requests, now=None):
+        """Add the work time and number of requests of an iteration of an entry
+        """
+        if now is None:
+            now = time.time()
+        if entry_name not in self.costs:
+            self.costs[entry_name] = {'WorkTime': float(work_time), 'Requests': float(requests), 'Time': now}
+            return
+        cost = self.costs[entry_name]
+        cost['WorkTime'] += self.alpha * (work_time - cost['WorkTime'])
+        cost['Requests'] += self.alpha * (requests - cost['Requests'])
+        cost['Time'] = now
+
+
+def loadEntryCosts(startup_dir):
+    """Read the costs recorded by all the entry groups
+
+    An entry may be in the files of more groups after a reconfig, the most recent value is used
+
+    :param startup_dir: factory directory
+    :return: dictionary entry_name -> {'WorkTime', 'Requests', 'Time'}
+    """
+    out = {}
+    for fname in glob.glob(os.path.join(startup_dir, "%s*%s" % (COSTS_FNAME_PREFIX, COSTS_FNAME_SUFFIX))):
+        entry_costs = EntryCosts(fname)
+        entry_costs.load()
+        for entry_name, cost in entry_costs.costs.items():
+            if entry_name not in out or out[entry_name]['Time'] < cost['Time']:
+                out[entry_name] = cost
+    return out
+
+
+def groupEntriesByCost(entries, nr_groups, costs):
+    """Split the entries in nr_groups groups with similar total expected cost
+
+    Longest processing time first: the most expensive entries are added first,
+    each one to the group with the lowest total.
+    The expected cost of an entry is its average work time. The entries without
+    recorded costs (e.g. new entries) get the average cost of the others.
+
+    :param entries: list of entry names
+    :param nr_groups: number of groups, capped at the number of entries
+    :param costs: dictionary entry_name -> {'WorkTime', ...} (see loadEntryCosts)
+    :return: list of groups, each one a sorted list of entry names
+    """
+    nr_groups = min(nr_groups, len(entries))
+    if nr_groups <= 0:
+        return []
+
+    known = [costs[e]['WorkTime'] for e in entries if e in costs]
+    default_cost = 1.0
+    if known:
+        default_cost = sum(known) / len(known)
+    entry_costs = []
+    for entry_name in entries:
+        if entry_name in costs:
+            entry_costs.append((costs[entry_name]['WorkTime'], entry_name))
+        else:
+            entry_costs.append((default_cost, entry_name))
+    # most expensive first, by name if the same cost
+    entry_costs.sort(key=lambda x: (-x[0], x[1]))
+
+    groups = [[] for i in range(nr_groups)]
+    # (total cost, number of entries, group index)
+    loads = [(0.0, 0, i) for i in range(nr_groups)]
+    for cost, entry_name in entry_costs:
+        total, nr_entries, idx = heapq.heappop(loads)
+        groups[idx].append(entry_name)
+        heapq.heappush(loads, (total + cost, nr_entries + 1, idx))
+    return [sorted(group) for group in groups]
@@ -20,6 +20,7 @@
 #
 
 import signal
+import errno
 import os
 import os.path
 import sys
@@ -32,6 +33,7 @@ import copy
 import random
 import cPickle
 import select
+import struct
 import logging
 
 from glideinwms.lib import logSupport
@@ -40,6 +42,7 @@ from glideinwms.lib import cleanupSupport
 from glideinwms.lib import glideinWMSVersion
 from glideinwms.lib.fork import fetch_fork_result_list
 from glideinwms.lib.fork import ForkManager
+from glideinwms.lib.fork import ForkResultError
 from glideinwms.lib.pidSupport import register_sighandler
 from glideinwms.lib.pidSupport import unregister_sighandler
 from glideinwms.factory import glideFactoryEntry
@@ -49,6 +52,8 @@ from glideinwms.factory import glideFactoryInterface as gfi
 from glideinwms.factory import glideFactoryPidLib
 from glideinwms.factory import glideFactoryMonitoring
 from glideinwms.factory import glideFactoryDowntimeLib
+from glideinwms.factory import glideFactorySubmitScheduler
+from glideinwms.factory import glideFactoryEntryCosts
 
 ############################################################
 # Memory foot print of a entry process when forked for check_and_perform_work
@@ -56,6 +61,14 @@ from glideinwms.factory import glideFactoryDowntimeLib
 #   plus a safety factor of 2
 
 ENTRY_MEM_REQ_BYTES = 500000000 * 2
+
+# Header of the messages exchanged with the entry workers: length of the pickle
+MSG_HEADER_FORMAT = "!I"
+MSG_HEADER_SIZE = struct.calcsize(MSG_HEADER_FORMAT)
+
+# Entry workers not returning their results within this many loop delays
+# are considered hung, killed and restarted at the next iteration
+ENTRY_WORKER_TIMEOUT_LOOPS = 10
 ############################################################
 
 
@@ -140,13 +153,21 @@ def find_work(factory_in_downtime, glideinDescript,
 
     pub_key_obj = glideinDescript.data['PubKeyObj']
     old_pub_key_obj = glideinDescript.data['OldPubKeyObj']
+    # Work snapshot published by the factory, None to query the collector (see gfi.publishWorkSnapshot)
+    work_snapshot_fname = glideinDescript.data.get('WorkSnapshotFile')
+    # The factory publishes it every LoopDelay seconds
+    work_snapshot_max_age = 2 * int(glideinDescript.data['LoopDelay'])
 
     logSupport.log.info("Finding work")
+    # Once per cycle, also when looking for work with the old key
+    gfi.decryptCache.newCycle()
     work = gfi.findGroupWork(gfl.factoryConfig.factory_name,
                              gfl.factoryConfig.glidein_name,
                              my_entries.keys(),
                              gfl.factoryConfig.supported_signtypes,
-                             pub_key_obj)
+                             pub_key_obj,
+                             work_snapshot_fname=work_snapshot_fname,
+                             work_snapshot_max_age=work_snapshot_max_age)
     log_work_info(work, key='existing')
 
     # If old key is valid, find the work using old key as well and append it
@@ -159,7 +180,9 @@ def find_work(factory_in_downtime, glideinDescript,
                                         gfl.factoryConfig.glidein_name,
                                         my_entries.keys(),
                                         gfl.factoryConfig.supported_signtypes,
-                                        old_pub_key_obj)
+                                        old_pub_key_obj,
+                                        work_snapshot_fname=work_snapshot_fname,
+                                        work_snapshot_max_age=work_snapshot_max_age)
         log_work_info(work, key='old')
 
         # Merge the work_oldkey with work
@@ -215,16 +238,19 @@ def forked_check_and_perform_work(factory_in_downtime, entry, work):
     @param factory_in_downtime: flag, True if the Factory is in downtime
     @param entry: entry object (glideFactoryEntry.Entry)
     @param work: work requests for the entry
-    @return: dictionary with entry state + work_done
+    @return: dictionary with entry state + work_done + work_time
     """
+    t_begin = time.time()
     work_done = glideFactoryEntry.check_and_perform_work(factory_in_downtime, entry, work)
-    
+    work_time = time.time() - t_begin
+
     # entry object now has updated info in the child process
     # This info is required for monitoring and advertising
     # Compile the return info from the updated entry object
     # Can't dumps the entry object directly, so need to extract
     # the info required.
     return_dict = compile_pickle_data(entry, work_done)
+    return_dict['work_time'] = work_time
     return return_dict
 
 
@@ -249,11 +275,437 @@ def forked_update_entries_stats(factory_in_downtime, entries_list):
     return return_dict
 
 
+##############################################
+# Persistent entry workers
+#
+# With EntryWorkerPool the entries are partitioned among long lived worker
+# processes, forked once, instead of forking one child per entry at every
+# iteration.
+# The entries, including the cumulative log_stats, qc_stats and rrd_stats,
+# stay resident in the workers. At every iteration the group sends each worker
+# only the work for its entries. The worker performs the work, writes the
+# stats and sends back the work done and the state of all its entries
+# (Entry.getState()). The group keeps its copy of the entries up to date,
+# so a failed or hung worker is restarted from the state of the last
+# iteration it completed.
+# Messages are pickles prefixed by their length (MSG_HEADER_FORMAT)
+
+def write_message(fd, obj):
+    """
+    Write a length prefixed pickled message to a file descriptor
+
+    @param fd: file descriptor (write end of a pipe)
+    @param obj: object to send
+    """
+
+    data = cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL)
+    data = struct.pack(MSG_HEADER_FORMAT, len(data)) + data
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        offset += os.write(fd, view[offset:])
+
+
+def read_exactly(fd, size):
+    """
+    Read exactly size bytes from a file descriptor
+
+    @raise EOFError: if the file descriptor is closed before
+    """
+
+    chunks = []
+    while size > 0:
+        chunk = os.read(fd, size)
+        if not chunk:
+            raise EOFError("Pipe closed with %i bytes still to read" % size)
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def read_message(fd):
+    """
+    Read a message written by write_message
+
+    @param fd: file descriptor (read end of a pipe)
+    @return: the unpickled object
+    @raise EOFError: if the other end closed the pipe
+    """
+
+    size = struct.unpack(MSG_HEADER_FORMAT, read_exactly(fd, MSG_HEADER_SIZE))[0]
+    return cPickle.loads(read_exactly(fd, size))
+
+
+def worker_perform_work(factory_in_downtime, do_advertize, entries, work):
+    """
+    One iteration of an entry worker: do the work for the entries that
+    received requests, update the stats of the others if advertising,
+    and write the stats of all entries
+
+    @param factory_in_downtime: flag, True if the Factory is in downtime
+    @param do_advertize: True if the stats of entries w/o work must be updated
+    @param entries: list of entry objects (glideFactoryEntry.Entry) resident in the worker
+    @param work: work requests keyed on entry name, only for the entries with work
+    @return: dictionary keyed on entry name with the state of all the entries and,
+        for the entries with work, the work done and the work time
+    """
+
+    for entry in entries:
+        entry.initIteration(factory_in_downtime)
+
+    work_done = {}
+    work_time = {}
+    entries_without_work = []
+    for entry in entries:
+        if work.get(entry.name):
+            try:
+                t_begin = time.time()
+                work_done[entry.name] = glideFactoryEntry.check_and_perform_work(factory_in_downtime, entry,
+                                                                                 work[entry.name])
+                work_time[entry.name] = time.time() - t_begin
+            except:
+                entry.log.exception("Error performing work for entry '%s': " % entry.name)
+        else:
+            entries_without_work.append(entry)
+
+    if do_advertize and len(entries_without_work) > 0:
+        try:
+            glideFactoryEntry.update_entries_stats(factory_in_downtime, entries_without_work)
+        except:
+            logSupport.log.exception("Error updating the stats of the entries without work: ")
+
+    for entry in entries:
+        try:
+            # The client stats are finalized also in writeClassadsToFile, in the group
+            entry.gflFactoryConfig.client_stats.finalizeClientMonitor()
+            entry.writeStats()
+        except:
+            entry.log.warning("Error writing stats for entry '%s'" % entry.name)
+            entry.log.exception("Error writing stats for entry '%s': " % entry.name)
+        entry.unsetInDowntime()
+
+    results = {}
+    for entry in entries:
+        results[entry.name] = entry.getState()
+        if entry.name in work_done:
+            results[entry.name]['work_done'] = work_done[entry.name]
+            results[entry.name]['work_time'] = work_time[entry.name]
+            if entry.gflFactoryConfig.submit_queue:
+                results[entry.name]['submit_requests'] = entry.gflFactoryConfig.submit_queue
+    return results
+
+
+def entry_worker_loop(r, w, entries):
+    """
+    Main loop of an entry worker: wait for the work from the group, perform it
+    and send back the results. Returns when the group closes the pipe
+
+    @param r: read end of the pipe from the group
+    @param w: write end of the pipe to the group
+    @param entries: list of entry objects (glideFactoryEntry.Entry) resident in the worker
+    """
+
+    while True:
+        try:
+            factory_in_downtime, do_advertize, work, queue_snapshots = read_message(r)
+        except EOFError:
+            # The group is done with this worker
+            return
+        for entry in entries:
+            entry.setQueuedGlideinsSnapshot(queue_snapshots.get(entry.name))
+        results = worker_perform_work(factory_in_downtime, do_advertize, entries, work)
+        write_message(w, results)
+        for entry in entries:
+            # getState removed the loggers to pickle the stats
+            entry.setState(results[entry.name])
+
+
+class EntryWorkerPool:
+    """
+    Pool of long lived processes performing the work of the entries.
+    Each worker owns a fixed partition of the entries and keeps them in memory
+    across iterations. Failed or hung workers are killed and restarted at the
+    next iteration from the entry objects in the group, updated with the
+    state returned at every iteration
+    """
+
+    def __init__(self, my_entries, nr_workers, timeout):
+        """
+        @type my_entries: dict
+        @param my_entries: Dictionary of entry objects (glideFactoryEntry.Entry) keyed on entry name
+
+        @type nr_workers: int
+        @param nr_workers: Number of workers, at most one per entry
+
+        @type timeout: int
+        @param timeout: Seconds to wait for the results of the workers at each iteration
+        """
+
+        self.my_entries = my_entries
+        self.timeout = timeout
+        entry_names = sorted(my_entries.keys())
+        nr_workers = max(1, min(nr_workers, len(entry_names)))
+        self.partitions = [entry_names[i::nr_workers] for i in range(nr_workers)]
+        # {'pid': pid, 'r': fd, 'w': fd} for the running workers, None otherwise
+        self.workers = [None] * nr_workers
+
+    def start_worker(self, idx):
+        """
+        Fork the worker for the partition idx
+        """
+
+        r, child_w = os.pipe()
+        child_r, w = os.pipe()
+        unregister_sighandler()
+        pid = os.fork()
+        if pid == 0:
+            # I am the worker
+            logSupport.disable_rotate = True
+            os.close(r)
+            os.close(w)
+            for worker in self.workers:
+                if worker is not None:
+                    os.close(worker['r'])
+                    os.close(worker['w'])
+            try:
+                entry_worker_loop(child_r, child_w, [self.my_entries[e] for e in self.partitions[idx]])
+            except:
+                logSupport.log.exception("Entry worker %i failed: " % idx)
+            # Exit without triggering SystemExit exception
+            os._exit(0)
+
+        register_sighandler()
+        os.close(child_r)
+        os.close(child_w)
+        self.workers[idx] = {'pid': pid, 'r': r, 'w': w}
+        logSupport.log.info("Started entry worker %i (pid %i) for entries: %s" %
+                            (idx, pid, string.join(self.partitions[idx], ', ')))
+
+    def stop_worker(self, idx, sig=signal.SIGTERM):
+        """
+        Stop the worker for the partition idx, if running
+
+        @param sig: signal sent to the worker, SIGKILL for the hung ones
+        """
+
+        worker = self.workers[idx]
+        if worker is None:
+            return
+        self.workers[idx] = None
+        os.close(worker['r'])
+        os.close(worker['w'])
+        try:
+            os.kill(worker['pid'], sig)
+        except OSError:
+            pass  # already dead
+        try:
+            os.waitpid(worker['pid'], 0)
+        except OSError:
+            pass
+
+    def stop(self):
+        """
+        Stop all the workers
+        """
+
+        for idx in range(len(self.workers)):
+            self.stop_worker(idx)
+
+    def perform_work(self, factory_in_downtime, do_advertize, work):
+        """
+        Send the work to all the workers, starting the ones not running,
+        and collect the results
+
+        @type factory_in_downtime: boolean
+        @param factory_in_downtime: True if factory is in downtime
+
+        @type do_advertize: boolean
+        @param do_advertize: True if the stats of entries w/o work must be updated
+
+        @type work: dict
+        @param work: Dictionary of work to do keyed on entry name
+
+        @rtype: dict
+        @return: dictionary keyed on entry name with the entry state and,
+            for the entries with work, the work done
+
+        @raise ForkResultError: if some worker failed or did not complete in time,
+            contains the results of the others
+        """
+
+        nr_errors = 0
+        sent = []
+        for idx in range(len(self.workers)):
+            if self.workers[idx] is None:
+                self.start_worker(idx)
+            worker_work = {}
+            # glideins of the entries if the group queried the schedds (get_queue_snapshots)
+            worker_queue_snapshots = {}
+            for entry_name in self.partitions[idx]:
+                if work.get(entry_name):
+                    worker_work[entry_name] = work[entry_name]
+                if self.my_entries[entry_name].queuedGlideinsSnapshot is not None:
+                    worker_queue_snapshots[entry_name] = self.my_entries[entry_name].queuedGlideinsSnapshot
+            try:
+                write_message(self.workers[idx]['w'], (factory_in_downtime, do_advertize, worker_work,
+                                                       worker_queue_snapshots))
+                sent.append(idx)
+            except OSError:
+                logSupport.log.exception("Failed sending work to entry worker %i: " % idx)
+                self.stop_worker(idx)
+                nr_errors += 1
+
+        results = {}
+        deadline = time.time() + self.timeout
+        pending = dict([(self.workers[idx]['r'], idx) for idx in sent])
+        while pending:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                readable = select.select(pending.keys(), [], [], timeout)[0]
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            for fd in readable:
+                # The worker writes the whole message once done, so it
+                # is read without waiting on the worker anymore
+                idx = pending.pop(fd)
+                try:
+                    results.update(read_message(fd))
+                except (EOFError, OSError, cPickle.UnpicklingError, struct.error):
+                    logSupport.log.exception("Failed receiving results from entry worker %i, will be restarted: " % idx)
+                    self.stop_worker(idx)
+                    nr_errors += 1
+
+        for idx in pending.values():
+            logSupport.log.error("Entry worker %i (pid %i) did not complete in %i seconds, killing it. "
+                                 "Will be restarted: entries %s" %
+                                 (idx, self.workers[idx]['pid'], self.timeout, string.join(self.partitions[idx], ', ')))
+            self.stop_worker(idx, signal.SIGKILL)
+            nr_errors += 1
+
+        if nr_errors > 0:
+            raise ForkResultError(nr_errors, results)
+        return results
+
+
 ##############################################
 # Functions managing the Entries life-cycle
 
+def get_queue_snapshots(my_entries):
+    """
+    Query each factory schedd once for the glideins of all the entries of the group
+    (see glideFactoryLib.getCondorQSnapshot)
+
+    @type my_entries: dict
+    @param my_entries: Dictionary of entry objects (glideFactoryEntry.Entry) keyed on entry name
+
+    @rtype: dict
+    @return: loaded condorMonitor.CondorQ keyed on entry name, the entries of the schedds
+        that could not be queried are missing
+    """
+
+    schedd_entries = {}
+    for entry in my_entries.values():
+        schedd_entries.setdefault(entry.scheddName, []).append(entry.name)
+
+    snapshots = {}
+    for schedd_name in schedd_entries:
+        entry_names = schedd_entries[schedd_name]
+        try:
+            snapshots.update(gfl.getCondorQSnapshot(entry_names, schedd_name,
+                                                    factoryConfig=my_entries[entry_names[0]].gflFactoryConfig))
+        except Exception:
+            # The entries will query the schedd themselves and handle the failure
+            logSupport.log.warning("Schedd %s not responding, the entries will query it one by one" % schedd_name)
+            logSupport.log.exception("getCondorQSnapshot failed for schedd %s: " % schedd_name)
+    return snapshots
+
+
+def get_parallel_workers(glideinDescript):
+    """
+    Return the max number of entries performing the work in parallel,
+    from EntryParallelWorkers or based on the available free memory
+
+    @type glideinDescript: dict
+    @param glideinDescript: Factory glidein config values
+
+    @rtype: int
+    @return: number of parallel workers, at least 1
+    """
+
+    # Max number of children to fork at a time
+    # Each child currently takes ~50 MB
+    # Leaving 3GB for system, max number of children to fork is
+    # (Memory - 3000)/50 = 100 (RAM: 8GB) & 250 (RAM: 16GB)
+    parallel_workers = 0
+    try:
+        parallel_workers = int(glideinDescript.data['EntryParallelWorkers'])
+    except KeyError:
+        logSupport.log.debug("EntryParallelWorkers not set -- factory probably needs a reconfig; setting to 0 for dynamic limits.")
+
+    if parallel_workers <= 0:
+        logSupport.log.debug("Setting parallel_workers limit dynamically based on the available free memory")
+        free_mem = os.sysconf('SC_AVPHYS_PAGES')*os.sysconf('SC_PAGE_SIZE')
+        parallel_workers = int(free_mem / float(ENTRY_MEM_REQ_BYTES))
+        if parallel_workers < 1: parallel_workers = 1
+
+    logSupport.log.debug("Setting parallel_workers limit of %s" % parallel_workers)
+    return parallel_workers
+
+
+def submit_queued_glideins(glideinDescript, my_entries, post_work_info):
+    """
+    Submit the glideins queued by the entries while performing the work,
+    concurrently and rate limited per schedd (see glideFactorySubmitScheduler)
+
+    @type glideinDescript: dict
+    @param glideinDescript: Factory glidein config values
+
+    @type my_entries: dict
+    @param my_entries: Dictionary of entry objects (glideFactoryEntry.Entry) keyed on entry name
+
+    @type post_work_info: dict
+    @param post_work_info: results of the entries keyed on entry name, with the queued submissions in 'submit_requests'
+
+    @rtype: int
+    @return: number of glideins submitted
+    """
+
+    scheduler = glideFactorySubmitScheduler.SubmitScheduler(
+        int(glideinDescript.data.get('SubmitSchedulerWorkers', 5)),
+        float(glideinDescript.data.get('SubmitSchedulerRate', 1.0)),
+        int(glideinDescript.data.get('SubmitSchedulerBurst', 5)))
+    for entry_name in post_work_info:
+        requests = post_work_info[entry_name].get('submit_requests')
+        if requests:
+            scheduler.addRequests(requests, my_entries[entry_name].log)
+    if not scheduler.requests:
+        return 0
+
+    t_begin = time.time()
+    nr_submitted = 0
+    for request, result in scheduler.run():
+        log = my_entries[request['entry_name']].log
+        nr_submitted += len(result['jids'])
+        if result['error'] is None:
+            log.info("Submitted %i glideins to %s: %s" % (len(result['jids']), request['schedd'], result['jids']))
+        else:
+            log.warning("Failed to submit %i glideins for %s to %s: %s" % (request['count'], request['client_name'],
+                                                                          request['schedd'], result['error']))
+    for schedd, stats in sorted(scheduler.getStats().items()):
+        logSupport.log.info("Schedd %s: submitted %i glideins with %i condor_submit (%i failed), %.2f glideins/s, "
+                            "condor_submit latency avg %.2fs max %.2fs" %
+                            (schedd, stats['Glideins'], stats['Submits'], stats['Failed'], stats['Throughput'],
+                             stats['AvgLatency'], stats['MaxLatency']))
+    logSupport.log.info("Submitted %i queued glideins - took %s seconds" % (nr_submitted, time.time() - t_begin))
+    return nr_submitted
+
+
 def find_and_perform_work(do_advertize, factory_in_downtime, glideinDescript,
-                          frontendDescript, group_name, my_entries):
+                          frontendDescript, group_name, my_entries, worker_pool=None):
     """
     For all entries in this group, find work requests from the WMS collector,
     validate credentials, and requests glideins. If an entry is in downtime,
@@ -274,6 +726,9 @@ def find_and_perform_work(do_advertize, factory_in_downtime, glideinDescript,
     @type my_entries: dict
     @param my_entries: Dictionary of entry objects (glideFactoryEntry.Entry) keyed on entry name
 
+    @type worker_pool: EntryWorkerPool
+    @param worker_pool: Persistent entry workers performing the work, None to fork a child per entry
+
     @return: Dictionary of work to do keyed on entry name
     @rtype: dict
     """
@@ -297,31 +752,54 @@ def find_and_perform_work(do_advertize, factory_in_downtime, glideinDescript,
         logSupport.log.info("No work found")
         if do_advertize:
             logSupport.log.info("Continuing to update monitoring info")
+        elif worker_pool is not None:
+            # The entry workers write also the stats, they run anyway
+            logSupport.log.info("Continuing to write the stats in the entry workers")
         else:
             return groupwork_done
 
     logSupport.log.info("Found %s total tasks to work on" % work_count)
 
-    # Max number of children to fork at a time
-    # Each child currently takes ~50 MB
-    # Leaving 3GB for system, max number of children to fork is
-    # (Memory - 3000)/50 = 100 (RAM: 8GB) & 250 (RAM: 16GB)
-    parallel_workers = 0
-    try:
-        parallel_workers = int(glideinDescript.data['EntryParallelWorkers'])
-    except KeyError:
-        logSupport.log.debug("EntryParallelWorkers not set -- factory probably needs a reconfig; setting to 0 for dynamic limits.")
+    if glideinDescript is not None and glideinDescript.data.get('SharedQueueSnapshot', 'False') in ('True', '1'):
+        # One query per schedd instead of one per entry
+        t_begin = time.time()
+        queue_snapshots = get_queue_snapshots(my_entries)
+        logSupport.log.info("Queried the glideins of %i entries - took %s seconds" %
+                            (len(queue_snapshots), time.time() - t_begin))
+        for ent in my_entries:
+            my_entries[ent].setQueuedGlideinsSnapshot(queue_snapshots.get(ent))
 
     post_work_info = {}
     work_info_read_err = False
 
-    if parallel_workers <= 0:
-        logSupport.log.debug("Setting parallel_workers limit dynamically based on the available free memory")
-        free_mem = os.sysconf('SC_AVPHYS_PAGES')*os.sysconf('SC_PAGE_SIZE')
-        parallel_workers = int(free_mem / float(ENTRY_MEM_REQ_BYTES))
-        if parallel_workers < 1: parallel_workers = 1
+    if worker_pool is not None:
+        t_begin = time.time()
+        try:
+            post_work_info = worker_pool.perform_work(factory_in_downtime, do_advertize, work)
+        except ForkResultError as e:
+            # Expect all errors logged already
+            work_info_read_err = True
+            post_work_info = e.good_results
+        t_end = time.time() - t_begin
 
-    logSupport.log.debug("Setting parallel_workers limit of %s" % parallel_workers)
+        logSupport.roll_all_logs()
+        logSupport.log.info("All entry workers performed glideFactoryEntry.check_and_perform_work - took %s seconds. Loading post work state for the entries." % t_end)
+
+        for entry in post_work_info:
+            if 'work_done' in post_work_info[entry]:
+                groupwork_done[entry] = {'work_done': post_work_info[entry]['work_done'],
+                                         'work_time': post_work_info[entry].get('work_time', 0),
+                                         'requests': len(work.get(entry, {}))}
+            (my_entries[entry]).setState(post_work_info[entry])
+
+        if work_info_read_err:
+            logSupport.log.warning("Unable to process response from one or more entry workers. Their entries may not have client_stats updated")
+
+        if glideinDescript is not None and glideinDescript.data.get('SubmitScheduler', 'False') in ('True', '1'):
+            submit_queued_glideins(glideinDescript, my_entries, post_work_info)
+        return groupwork_done
+
+    parallel_workers = get_parallel_workers(glideinDescript)
 
     forkm_obj = ForkManager()
     # Only fork of child processes for entries that have corresponding
@@ -364,7 +842,9 @@ def find_and_perform_work(do_advertize, factory_in_downtime, glideinDescript,
     for entry in my_entries:
         # Update the entry object from the post_work_info
         if ((entry in post_work_info) and (len(post_work_info[entry]) > 0)):
-            groupwork_done[entry] = {'work_done': post_work_info[entry]['work_done']}
+            groupwork_done[entry] = {'work_done': post_work_info[entry]['work_done'],
+                                     'work_time': post_work_info[entry].get('work_time', 0),
+                                     'requests': len(work.get(entry, {}))}
             (my_entries[entry]).setState(post_work_info[entry])
         else:
             logSupport.log.debug("No work found for entry %s from any frontends" % entry)
@@ -377,11 +857,14 @@ def find_and_perform_work(do_advertize, factory_in_downtime, glideinDescript,
         logSupport.log.debug("Unable to process response from one or more children for check_and_perform_work. One or more forked processes may have failed and may not have client_stats updated")
         logSupport.log.warning("Unable to process response from one or more children for check_and_perform_work. One or more forked processes may have failed and may not have client_stats updated")
 
+    if glideinDescript is not None and glideinDescript.data.get('SubmitScheduler', 'False') in ('True', '1'):
+        submit_queued_glideins(glideinDescript, my_entries, post_work_info)
     return groupwork_done
 
 
 def iterate_one(do_advertize, factory_in_downtime, glideinDescript,
-                frontendDescript, group_name, my_entries):
+                frontendDescript, group_name, my_entries, worker_pool=None,
+                entry_costs=None):
     """
     One iteration of the entry group
 
@@ -402,6 +885,12 @@ def iterate_one(do_advertize, factory_in_downtime, glideinDescript,
 
     @type my_entries: dict
     @param my_entries: Dictionary of entry objects (glideFactoryEntry.Entry) keyed on entry name
+
+    @type worker_pool: EntryWorkerPool
+    @param worker_pool: Persistent entry workers performing the work, None to fork a child per entry
+
+    @type entry_costs: glideFactoryEntryCosts.EntryCosts
+    @param entry_costs: Costs of the entries to update with the work done, None not to record them
     """
 
     groupwork_done = {}
@@ -414,7 +903,14 @@ def iterate_one(do_advertize, factory_in_downtime, glideinDescript,
         groupwork_done = find_and_perform_work(do_advertize, factory_in_downtime,
                                                glideinDescript,
                                                frontendDescript,
-                                               group_name, my_entries)
+                                               group_name, my_entries,
+                                               worker_pool)
+        if entry_costs is not None:
+            # The entries without work cost (almost) nothing this iteration
+            for entry_name in my_entries:
+                entry_work = groupwork_done.get(entry_name, {})
+                entry_costs.update(entry_name, entry_work.get('work_time', 0), entry_work.get('requests', 0))
+            entry_costs.save()
     except:
         logSupport.log.warning("Error occurred while trying to find and do work.")
         logSupport.log.exception("Exception: ")
@@ -463,7 +959,8 @@ def iterate_one(do_advertize, factory_in_downtime, glideinDescript,
 
 ############################################################
 def iterate(parent_pid, sleep_time, advertize_rate, glideinDescript,
-            frontendDescript, group_name, my_entries):
+            frontendDescript, group_name, my_entries, worker_pool=None,
+            entry_costs=None):
     """
     Iterate over set of tasks until its time to quit or die. The main "worker"
     function for the Factory Entry Group.
@@ -489,6 +986,13 @@ def iterate(parent_pid, sleep_time, advertize_rate, glideinDescript,
 
     @type my_entries: dict
     @param my_entries: Dictionary of entry objects keyed on entry name
+
+    @type worker_pool: EntryWorkerPool
+    @param worker_pool: Persistent entry workers performing the work and
+        writing the stats, None to fork children at every iteration
+
+    @type entry_costs: glideFactoryEntryCosts.EntryCosts
+    @param entry_costs: Costs of the entries to record, None not to record them
     """
 
     is_first = True  # In first iteration
@@ -539,74 +1043,78 @@ def iterate(parent_pid, sleep_time, advertize_rate, glideinDescript,
         try:
             done_something = iterate_one(count==0, factory_in_downtime,
                                          glideinDescript, frontendDescript,
-                                         group_name, my_entries)
+                                         group_name, my_entries, worker_pool,
+                                         entry_costs)
 
-            logSupport.log.info("Writing stats for all entries")
+            if worker_pool is not None:
+                logSupport.log.info("Stats for all entries written by the entry workers")
+            else:
+                logSupport.log.info("Writing stats for all entries")
+
+                try:
+                    pids = []
+                    # generate a list of entries for each CPU
+                    cpuCount = int(glideinDescript.data['MonitorUpdateThreadCount'])
+                    logSupport.log.info("Number of parallel writes for stats: %i" % cpuCount)
+
+                    entrylists = [my_entries.values()[cpu::cpuCount] for cpu in xrange(cpuCount)]
+
+                    # Fork's keyed by cpu number. Actual key is irrelevant
+                    pipe_ids = {}
+
+                    post_writestats_info = {}
+
+                    for cpu in xrange(cpuCount):
+                        r, w = os.pipe()
+                        unregister_sighandler()
+                        pid = os.fork()
+                        if pid:
+                            # I am the parent
+                            register_sighandler()
+                            pids.append(pid)
+                            os.close(w)
+                            pipe_ids[cpu] = {'r': r, 'pid': pid}
+                        else:
+                            # I am the child
+                            os.close(r)
+                            logSupport.disable_rotate = True
+                            # Return the pickled entry object in form of dict
+                            # return_dict[entry.name][entry.getState()]
+                            return_dict = {}
+                            for entry in entrylists[cpu]:
+                                try:
+                                    entry.writeStats()
+                                    return_dict[entry.name] = entry.getState()
+                                except:
+                                    entry.log.warning("Error writing stats for entry '%s'" % (entry.name))
+                                    entry.log.exception("Error writing stats for entry '%s': " % (entry.name))
 
-            try:
-                pids = []
-                # generate a list of entries for each CPU
-                cpuCount = int(glideinDescript.data['MonitorUpdateThreadCount'])
-                logSupport.log.info("Number of parallel writes for stats: %i" % cpuCount)
-
-                entrylists = [my_entries.values()[cpu::cpuCount] for cpu in xrange(cpuCount)]
-
-                # Fork's keyed by cpu number. Actual key is irrelevant
-                pipe_ids = {}
-
-                post_writestats_info = {}
-
-                for cpu in xrange(cpuCount):
-                    r, w = os.pipe()
-                    unregister_sighandler()
-                    pid = os.fork()
-                    if pid:
-                        # I am the parent
-                        register_sighandler()
-                        pids.append(pid)
-                        os.close(w)
-                        pipe_ids[cpu] = {'r': r, 'pid': pid}
-                    else:
-                        # I am the child
-                        os.close(r)
-                        logSupport.disable_rotate = True
-                        # Return the pickled entry object in form of dict
-                        # return_dict[entry.name][entry.getState()]
-                        return_dict = {}
-                        for entry in entrylists[cpu]:
                             try:
-                                entry.writeStats()
-                                return_dict[entry.name] = entry.getState()
+                                os.write(w, cPickle.dumps(return_dict))
                             except:
-                                entry.log.warning("Error writing stats for entry '%s'" % (entry.name))
-                                entry.log.exception("Error writing stats for entry '%s': " % (entry.name))
-
-                        try:
-                            os.write(w, cPickle.dumps(return_dict))
-                        except:
-                            # Catch and log exceptions if any to avoid
-                            # runaway processes.
-                            entry.log.exception("Error writing pickled state for entry '%s': " % (entry.name))
-                        os.close(w)
-                        # Exit without triggering SystemExit exception
-                        os._exit(0)
-
-                try:
-                    logSupport.log.info("Processing response from children after write stats")
-                    post_writestats_info = fetch_fork_result_list(pipe_ids)
+                                # Catch and log exceptions if any to avoid
+                                # runaway processes.
+                                entry.log.exception("Error writing pickled state for entry '%s': " % (entry.name))
+                            os.close(w)
+                            # Exit without triggering SystemExit exception
+                            os._exit(0)
+
+                    try:
+                        logSupport.log.info("Processing response from children after write stats")
+                        post_writestats_info = fetch_fork_result_list(pipe_ids)
+                    except:
+                        logSupport.log.exception("Error processing response from one or more children after write stats")
+
+                    logSupport.roll_all_logs()
+
+                    for i in post_writestats_info:
+                        for ent in post_writestats_info[i]:
+                            (my_entries[ent]).setState(post_writestats_info[i][ent])
+                except KeyboardInterrupt:
+                    raise  # this is an exit signal, pass through
                 except:
-                    logSupport.log.exception("Error processing response from one or more children after write stats")
-
-                logSupport.roll_all_logs()
-
-                for i in post_writestats_info:
-                    for ent in post_writestats_info[i]:
-                        (my_entries[ent]).setState(post_writestats_info[i][ent])
-            except KeyboardInterrupt:
-                raise  # this is an exit signal, pass through
-            except:
-                # never fail for stats reasons!
-                logSupport.log.exception("Error writing stats: ")
+                    # never fail for stats reasons!
+                    logSupport.log.exception("Error writing stats: ")
         except KeyboardInterrupt:
             raise  # this is an exit signal, pass through
         except:
@@ -698,6 +1206,11 @@ def main(parent_pid, sleep_time, advertize_rate,
     glideinDescript.load_pub_key()
     glideinDescript.load_old_rsa_key()
 
+    # Read the requests published by the factory, instead of querying the collector
+    if glideinDescript.data.get('WorkBroker', 'False') in ('True', '1'):  # data attributes are strings
+        glideinDescript.data['WorkSnapshotFile'] = os.path.join(gfi.factoryConfig.lock_dir,
+                                                                gfi.WORK_SNAPSHOT_FNAME)
+
     # Dictionary of Entry objects this group will process
     my_entries = {}
     glidein_entries = glideinDescript.data['Entries']
@@ -726,12 +1239,25 @@ def main(parent_pid, sleep_time, advertize_rate,
     pid_obj = glideFactoryPidLib.EntryGroupPidSupport(startup_dir, group_name)
     pid_obj.register(parent_pid)
 
+    # Long lived workers keeping the entries in memory, if enabled
+    worker_pool = None
+    if glideinDescript.data.get('EntryWorkerPool', 'False') in ('True', '1'):  # data attributes are strings
+        worker_pool = EntryWorkerPool(my_entries, get_parallel_workers(glideinDescript),
+                                      ENTRY_WORKER_TIMEOUT_LOOPS * sleep_time)
+        logSupport.log.info("Using %i persistent entry workers" % len(worker_pool.workers))
+
+    # Record the cost of the entries, used by the factory to group them
+    entry_costs = None
+    if glideinDescript.data.get('BalanceEntryGroups', 'False') in ('True', '1'):  # data attributes are strings
+        entry_costs = glideFactoryEntryCosts.EntryCosts(glideFactoryEntryCosts.getCostsFile(startup_dir, group_name))
+        entry_costs.load()
+
     try:
         try:
             try:
                 iterate(parent_pid, sleep_time, advertize_rate,
                         glideinDescript, frontendDescript,
-                        group_name, my_entries)
+                        group_name, my_entries, worker_pool, entry_costs)
             except KeyboardInterrupt:
                 logSupport.log.info("Received signal...exit")
             except:
@@ -739,6 +1265,8 @@ def main(parent_pid, sleep_time, advertize_rate,
                 raise
         finally:
             # No need to cleanup. The parent should be doing it
+            if worker_pool is not None:
+                worker_pool.stop()
             logSupport.log.info("Dying")
     finally:
         pid_obj.relinquish()
@@ -761,6 +1289,9 @@ def compile_pickle_data(entry, work_done):
 
     return_dict = entry.getState()
     return_dict['work_done'] = work_done
+    if entry.gflFactoryConfig.submit_queue:
+        # submissions for the group (see submit_queued_glideins)
+        return_dict['submit_requests'] = entry.gflFactoryConfig.submit_queue
 
     return return_dict
 
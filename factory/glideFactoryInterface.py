@@ -16,6 +16,8 @@ import os
 import time
 import string
 import fcntl
+import cPickle
+import tempfile
 from glideinwms.lib import condorExe
 from glideinwms.lib import condorMonitor
 from glideinwms.lib import condorManager
@@ -123,6 +125,97 @@ factoryConfig = FactoryConfig()
 DEFAULT_VAL = "default"
 
 
+############################################################
+#
+# Cache of the decrypted request data
+#
+# Extracting the symmetric key of a request (ReqEncKeyCode) is an RSA decryption
+# with the factory private key. The frontends keep the same symmetric key across
+# cycles, so the keys, and the parameters decrypted with them, are cached keyed on
+# (ReqPubKeyID, ReqEncKeyCode). The cache lives in the entry group process, is used
+# across iterations and inherited by the forked children.
+# The eviction is generational: at the beginning of each cycle (newCycle) the items
+# used in the previous cycle become the old generation, and the items not used again
+# in the new cycle are dropped at the following one. The requests are decoded in the
+# same order every cycle, so a size bound with LRU eviction would evict each item
+# right before it is needed when the requests do not fit.
+#
+############################################################
+
+class DecryptCache:
+    def __init__(self):
+        # (pub_key_id, enc_key_code) -> symmetric key object, used in this cycle and in the previous one
+        self.sym_keys = {}
+        self.old_sym_keys = {}
+        # (pub_key_id, enc_key_code, ciphertext) -> decrypted value, same generations
+        self.values = {}
+        self.old_values = {}
+        self.resetStats()
+
+    def resetStats(self):
+        self.stats = {'KeyHits': 0, 'KeyMisses': 0, 'ValueHits': 0, 'ValueMisses': 0}
+
+    def newCycle(self):
+        """Start a new cycle, dropping the items not used in the previous one
+        """
+        self.old_sym_keys = self.sym_keys
+        self.sym_keys = {}
+        self.old_values = self.values
+        self.values = {}
+
+    def lookup(self, table, old_table, key, stat_prefix):
+        """Return the cached value of key, moving it to the current generation, None if not cached
+        """
+        # None is never cached (extract_sym_key and decrypt_hex raise on failure)
+        value = table.get(key)
+        if value is None:
+            value = old_table.get(key)
+            if value is None:
+                self.stats[stat_prefix + 'Misses'] += 1
+                return None
+            table[key] = value
+        self.stats[stat_prefix + 'Hits'] += 1
+        return value
+
+    def getSymKey(self, pub_key_obj, enc_key_code):
+        """
+        Return the symmetric key of a request, extracting it with the factory key only if not cached
+
+        @param pub_key_obj: factory key object (glideFactoryConfig.GlideinKey)
+        @param enc_key_code: ReqEncKeyCode of the request
+        @return: symmetric key object
+        @raise: the exceptions of pub_key_obj.extract_sym_key, failures are not cached
+        """
+        key = (pub_key_obj.get_pub_key_id(), enc_key_code)
+        sym_key_obj = self.lookup(self.sym_keys, self.old_sym_keys, key, 'Key')
+        if sym_key_obj is None:
+            sym_key_obj = pub_key_obj.extract_sym_key(enc_key_code)
+            self.sym_keys[key] = sym_key_obj
+        return sym_key_obj
+
+    def decryptHex(self, pub_key_obj, enc_key_code, sym_key_obj, ciphertext):
+        """
+        Return the value decrypted with sym_key_obj (decrypt_hex), decrypting only if not cached
+
+        @param pub_key_obj: factory key object used to extract sym_key_obj
+        @param enc_key_code: ReqEncKeyCode sym_key_obj was extracted from
+        @param sym_key_obj: symmetric key object
+        @param ciphertext: hex encoded encrypted value
+        @return: decrypted value
+        @raise: the exceptions of sym_key_obj.decrypt_hex, failures are not cached
+        """
+        key = (pub_key_obj.get_pub_key_id(), enc_key_code, ciphertext)
+        value = self.lookup(self.values, self.old_values, key, 'Value')
+        if value is None:
+            value = sym_key_obj.decrypt_hex(ciphertext)
+            self.values[key] = value
+        return value
+
+
+# global cache of the module, used by findGroupWork
+decryptCache = DecryptCache()
+
+
 #####################################################
 # Exception thrown when multiple executions are used
 # Helps handle partial failures
@@ -151,7 +244,8 @@ class MultiExeError(condorExe.ExeError):
 
 def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
                   pub_key_obj=None, additional_constraints=None,
-                  factory_collector=DEFAULT_VAL):
+                  factory_collector=DEFAULT_VAL, work_snapshot_fname=None,
+                  work_snapshot_max_age=120):
     """
     Find request classAds that have my (factory, glidein name, entries) and
     create the dictionary of dictionary of work request information.
@@ -178,6 +272,11 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
     @type factory_collector: string or None
     @param factory_collector: the collector to query, special value 'default' will get it from the global config
 
+    @type work_snapshot_fname: string
+    @param work_snapshot_fname: work snapshot published by the factory (see publishWorkSnapshot),
+        used instead of querying the collector if covering all the entries and not older than
+        work_snapshot_max_age seconds. None to always query the collector
+
     @rtype: dict
     @return: Dictionary of work to perform. Return format is work[entry_name][frontend] = {'params':'value', 'requests':'value}
     """
@@ -187,14 +286,48 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
     if factory_collector==DEFAULT_VAL:
         factory_collector=factoryConfig.factory_collector
 
-    req_glideins = ''
-    for entry in entry_names:
-        req_glideins = '%s@%s@%s,%s' % (entry, glidein_name,
-                                        factory_name, req_glideins)
-    # Strip off leading & trailing comma
-    req_glideins = req_glideins.strip(',')
+    req_glideins = ['%s@%s@%s' % (entry, glidein_name, factory_name) for entry in entry_names]
+
+    data = None
+    if (work_snapshot_fname is not None) and (additional_constraints is None):
+        snapshot = loadWorkSnapshot(work_snapshot_fname, work_snapshot_max_age)
+        if (snapshot is not None) and snapshot['req_glideins'].issuperset(req_glideins):
+            # No collector query and no lock, the factory queried for all the groups
+            data = filterWorkSnapshot(snapshot['data'], req_glideins, supported_signtypes, pub_key_obj)
+            logSupport.log.debug("Using the work snapshot version %i (%i seconds old): %i requests" %
+                                 (snapshot['version'], time.time() - snapshot['time'], len(data)))
+        else:
+            logSupport.log.info("No valid work snapshot in %s, querying the collector" % work_snapshot_fname)
+
+    if data is None:
+        status_constraint = getWorkConstraint(req_glideins, supported_signtypes, pub_key_obj,
+                                              additional_constraints)
+        data = queryWork(status_constraint, glidein_name, factory_collector)
+
+    # Output is now in the format of
+    # out[entry_name][frontend]
+    return workGroupByEntries(decodeRequestClassads(data, pub_key_obj))
 
-    status_constraint='(GlideinMyType=?="%s") && (stringListMember(ReqGlidein,"%s")=?=True)' % (factoryConfig.client_id, req_glideins)
+
+def getWorkConstraint(req_glideins, supported_signtypes, pub_key_obj=None, additional_constraints=None):
+    """
+    Build the constraint of the request classads for some entries
+
+    @type req_glideins: list
+    @param req_glideins: list of entry_name@glidein_name@factory_name
+    @type supported_signtypes: list
+    @param supported_signtypes: supported signtypes, None to accept all
+    @param pub_key_obj: factory key object, only the requests encrypted with it or not encrypted are selected.
+        None to select all
+    @type additional_constraints: string
+    @param additional_constraints: any additional constraints to include, default is None
+
+    @rtype: string
+    @return: the constraint
+    """
+
+    status_constraint = '(GlideinMyType=?="%s") && (stringListMember(ReqGlidein,"%s")=?=True)' % \
+        (factoryConfig.client_id, string.join(req_glideins, ","))
 
     if (supported_signtypes is not None):
         status_constraint += ' && stringListMember(%s%s,"%s")' % \
@@ -210,6 +343,23 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
     if (additional_constraints is not None):
         status_constraint = "(%s)&&(%s)" % (status_constraint,
                                             additional_constraints)
+    return status_constraint
+
+
+def queryWork(status_constraint, glidein_name, factory_collector):
+    """
+    Query the collector for the request classads
+
+    @type status_constraint: string
+    @param status_constraint: constraint of the query (see getWorkConstraint)
+    @type glidein_name: string
+    @param glidein_name: name of the glidein instance
+    @type factory_collector: string or None
+    @param factory_collector: the collector to query
+
+    @rtype: dict
+    @return: request classads keyed by name
+    """
 
     status = condorMonitor.CondorStatus(subsystem_name="any", pool_name=factory_collector)
     # Important, this dictates what gets submitted
@@ -235,34 +385,219 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
         finally:
             fcntl.flock(fd, fcntl.LOCK_UN)
 
-    data = status.fetchStored()
+    return status.fetchStored()
 
-    reserved_names = ("ReqName", "ReqGlidein", "ClientName", "FrontendName",
-                      "GroupName", "ReqPubKeyID", "ReqEncKeyCode",
-                      "ReqEncIdentity", "AuthenticatedIdentity")
 
-    # Output is now in the format of
-    # out[entry_name][frontend]
-    out = {}
+############################################################
+#
+# Work snapshot
+#
+# With the work broker the factory queries the collector once per cycle for the
+# requests of all its entries and publishes them in a file (publishWorkSnapshot).
+# The file is replaced atomically, so the entry groups read it without locking
+# (loadWorkSnapshot) and select the requests of their entries (filterWorkSnapshot),
+# instead of querying the collector one after the other.
+#
+############################################################
+
+# Name of the work snapshot file, in the lock directory
+WORK_SNAPSHOT_FNAME = "gfi_work.snapshot"
+
+# Version of the last work snapshot published by this process
+workSnapshotVersion = 0
+
+
+def publishWorkSnapshot(factory_name, glidein_name, entry_names, supported_signtypes, fname,
+                        factory_collector=DEFAULT_VAL):
+    """
+    Query the collector for the requests of all the entries and publish them in fname
+
+    @type entry_names: list
+    @param entry_names: list of all the factory entry names
+    @type supported_signtypes: list
+    @param supported_signtypes: supported signtypes, None to accept all
+    @type fname: string
+    @param fname: snapshot file name
+
+    @rtype: int
+    @return: version of the snapshot
+    """
+
+    global workSnapshotVersion
+
+    if factory_collector == DEFAULT_VAL:
+        factory_collector = factoryConfig.factory_collector
+
+    req_glideins = ['%s@%s@%s' % (entry, glidein_name, factory_name) for entry in entry_names]
+    # The requests for all the factory keys, filtered by the groups
+    data = queryWork(getWorkConstraint(req_glideins, supported_signtypes), glidein_name, factory_collector)
+
+    workSnapshotVersion += 1
+    snapshot = {'version': workSnapshotVersion, 'time': time.time(),
+                'req_glideins': frozenset(req_glideins), 'data': dict(data)}
+    fd, tmp_fname = tempfile.mkstemp(prefix=os.path.basename(fname) + ".", dir=os.path.dirname(fname) or ".")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            cPickle.dump(snapshot, f, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_fname, fname)
+    except:
+        os.unlink(tmp_fname)
+        raise
+    return workSnapshotVersion
+
+
+def loadWorkSnapshot(fname, max_age):
+    """
+    Load the work snapshot published by the factory
 
-    # Copy over requests and parameters
+    @type fname: string
+    @param fname: snapshot file name
+    @type max_age: int
+    @param max_age: max age of the snapshot in seconds
 
+    @rtype: dict
+    @return: the snapshot (version, time, req_glideins, data), None if missing, not readable or too old
+    """
+
+    try:
+        with open(fname, 'rb') as f:
+            snapshot = cPickle.load(f)
+    except (IOError, OSError, EOFError, cPickle.UnpicklingError, AttributeError, ValueError) as e:
+        logSupport.log.debug("Unable to load the work snapshot %s: %s" % (fname, e))
+        return None
+    if time.time() - snapshot['time'] > max_age:
+        return None
+    return snapshot
+
+
+def filterWorkSnapshot(data, req_glideins, supported_signtypes, pub_key_obj=None):
+    """
+    Select the requests matching the constraint of getWorkConstraint
+
+    @type data: dict
+    @param data: request classads of the snapshot keyed by name
+    @type req_glideins: list
+    @param req_glideins: list of entry_name@glidein_name@factory_name
+    @type supported_signtypes: list
+    @param supported_signtypes: supported signtypes, None to accept all
+    @param pub_key_obj: factory key object, None to accept all
+
+    @rtype: dict
+    @return: the selected request classads keyed by name
+    """
+
+    req_glideins = frozenset(req_glideins)
+    signtype_attr = factoryConfig.client_web_prefix + factoryConfig.client_web_signtype_suffix
+    pub_key_id = None
+    if pub_key_obj is not None:
+        pub_key_id = pub_key_obj.get_pub_key_id()
+
+    out = {}
     for k in data:
         kel = data[k]
-        el = {"requests":{}, "web":{}, "params":{},
-              "params_decrypted":{}, "monitor":{}, "internals":{}}
+        if kel.get('GlideinMyType') != factoryConfig.client_id or kel.get('ReqGlidein') not in req_glideins:
+            continue
+        if (supported_signtypes is not None) and (kel.get(signtype_attr) not in supported_signtypes):
+            continue
+        if (pub_key_id is not None) and ('ReqPubKeyID' in kel):
+            if (kel['ReqPubKeyID'] != pub_key_id) or ('ReqEncKeyCode' not in kel) or ('ReqEncIdentity' not in kel):
+                continue
+        out[k] = kel
+    return out
 
-        for (key, prefix) in (("requests", factoryConfig.client_req_prefix),
-                             ("web", factoryConfig.client_web_prefix),
-                             ("params", factoryConfig.glidein_param_prefix),
-                             ("monitor", factoryConfig.glidein_monitor_prefix)):
-            plen = len(prefix)
-            for attr in kel:
-                if attr in reserved_names:
-                    # Skip reserved names
-                    continue
+
+# Attributes of the request classads not copied in the requests, web, params and monitor dictionaries
+REQUEST_RESERVED_NAMES = frozenset(("ReqName", "ReqGlidein", "ClientName", "FrontendName",
+                                    "GroupName", "ReqPubKeyID", "ReqEncKeyCode",
+                                    "ReqEncIdentity", "AuthenticatedIdentity"))
+# Attributes of the request classads copied in the internals dictionary
+REQUEST_INTERNAL_NAMES = frozenset(("ClientName", "FrontendName", "GroupName", "ReqName",
+                                    "LastHeardFrom", "ReqPubKeyID", "AuthenticatedIdentity"))
+
+
+def compileRequestPrefixTable(prefixes):
+    """
+    Build the table used to dispatch the attributes of the request classads on their prefix.
+    The prefixes are indexed by their first characters (as many as the shortest prefix),
+    so most attributes are dispatched, or discarded, with one dictionary lookup
+
+    @type prefixes: list
+    @param prefixes: list of (key, prefix), the attributes starting with prefix go in the dictionary key
+
+    @rtype: tuple
+    @return: (head length, {head: [(prefix, prefix length, [keys])]})
+    """
+
+    head_len = min([len(prefix) for key, prefix in prefixes])
+    prefix_keys = {}
+    for key, prefix in prefixes:
+        prefix_keys.setdefault(prefix, []).append(key)
+    heads = {}
+    for prefix in sorted(prefix_keys):
+        heads.setdefault(prefix[:head_len], []).append((prefix, len(prefix), prefix_keys[prefix]))
+    return head_len, heads
+
+
+def getRequestPrefixTable():
+    """
+    Return the prefix table of the request classads from the module configuration (see compileRequestPrefixTable)
+    """
+
+    return compileRequestPrefixTable((("requests", factoryConfig.client_req_prefix),
+                                      ("web", factoryConfig.client_web_prefix),
+                                      ("params", factoryConfig.glidein_param_prefix),
+                                      ("monitor", factoryConfig.glidein_monitor_prefix),
+                                      ("params_decrypted", factoryConfig.encrypted_param_prefix)))
+
+
+def splitRequestClassad(kel, prefix_table):
+    """
+    Split the attributes of a request classad in one pass
+
+    @type kel: dict
+    @param kel: request classad
+    @param prefix_table: output of compileRequestPrefixTable
+
+    @rtype: dict
+    @return: dictionary with requests, web, params, params_decrypted (still encrypted), monitor and internals
+    """
+
+    el = {"requests": {}, "web": {}, "params": {},
+          "params_decrypted": {}, "monitor": {}, "internals": {}}
+    head_len, heads = prefix_table
+    for attr in kel:
+        candidates = heads.get(attr[:head_len])
+        # Skip reserved names
+        if candidates is not None and attr not in REQUEST_RESERVED_NAMES:
+            for prefix, plen, keys in candidates:
                 if attr[:plen] == prefix:
-                    el[key][attr[plen:]] = kel[attr]
+                    for key in keys:
+                        el[key][attr[plen:]] = kel[attr]
+        if attr in REQUEST_INTERNAL_NAMES:
+            el["internals"][attr] = kel[attr]
+    return el
+
+
+def decodeRequestClassads(data, pub_key_obj=None):
+    """
+    Decode the request classads: split the attributes by prefix, verify the identity
+    of the client and decrypt the encrypted parameters
+
+    @type data: dict
+    @param data: request classads keyed by name, as returned by the collector query
+    @param pub_key_obj: factory key object, None if the requests cannot be decrypted
+
+    @rtype: dict
+    @return: dictionary keyed by classad name with the decoded requests, the classads
+        that cannot be decrypted or verified are skipped
+    """
+
+    prefix_table = getRequestPrefixTable()
+    decryptCache.resetStats()
+
+    out = {}
+    for k in data:
+        kel = data[k]
 
         # sym_key_obj will stay None if
         # 1) extract_sym_key throws exception
@@ -271,7 +606,7 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
         sym_key_obj = None
         if (pub_key_obj is not None) and ('ReqPubKeyID' in kel):
             try:
-                sym_key_obj = pub_key_obj.extract_sym_key(kel['ReqEncKeyCode'])
+                sym_key_obj = decryptCache.getSymKey(pub_key_obj, kel['ReqEncKeyCode'])
             except:
                 continue
 
@@ -279,7 +614,8 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
             # Verify that the identity the client claims to be is the
             # identity that Condor thinks it is
             try:
-                enc_identity = sym_key_obj.decrypt_hex(kel['ReqEncIdentity'])
+                enc_identity = decryptCache.decryptHex(pub_key_obj, kel['ReqEncKeyCode'], sym_key_obj,
+                                                       kel['ReqEncIdentity'])
             except:
                 logSupport.log.warning("Client %s provided invalid ReqEncIdentity, could not decode. Skipping for security reasons." % k)
                 continue # Corrupted classad
@@ -289,39 +625,33 @@ def findGroupWork(factory_name, glidein_name, entry_names, supported_signtypes,
                 # Either the client is misconfigured or someone is cheating
                 continue
 
-        invalid_classad = False
+        el = splitRequestClassad(kel, prefix_table)
 
-        for (key, prefix) in (("params_decrypted", factoryConfig.encrypted_param_prefix),):
-            # TODO: useless for, only one element
-            plen = len(prefix)
-            for attr in kel:
-                if attr in reserved_names:
-                    # Skip reserved names
-                    continue
-                if attr[:plen] == prefix:
-                    # Define it even if I don't understand the content
-                    el[key][attr[plen:]] = None
-                    if sym_key_obj is not None :
-                        try:
-                            el[key][attr[plen:]] = sym_key_obj.decrypt_hex(kel[attr])
-                        except:
-                            # I don't understand it -> invalid
-                            invalid_classad = True
-                            break
+        invalid_classad = False
+        params_decrypted = el["params_decrypted"]
+        for attr in params_decrypted:
+            enc_value = params_decrypted[attr]
+            # Define it even if I don't understand the content
+            params_decrypted[attr] = None
+            if sym_key_obj is not None:
+                try:
+                    params_decrypted[attr] = decryptCache.decryptHex(pub_key_obj, kel['ReqEncKeyCode'],
+                                                                     sym_key_obj, enc_value)
+                except:
+                    # I don't understand it -> invalid
+                    invalid_classad = True
+                    break
 
         # Continue if I have problems in an inner loop
         if invalid_classad:
             logSupport.log.warning("At least one of the encrypted parameters for client %s cannot be decoded. Skipping for security reasons."%k)
             continue
 
-        for attr in kel:
-            if attr in ("ClientName", "FrontendName", "GroupName", "ReqName",
-                        "LastHeardFrom", "ReqPubKeyID", "AuthenticatedIdentity"):
-                el["internals"][attr] = kel[attr]
-
         out[k] = el
 
-    return workGroupByEntries(out)
+    logSupport.log.debug("Decrypted request data: %(KeyHits)i keys and %(ValueHits)i values cached, "
+                         "%(KeyMisses)i keys and %(ValueMisses)i values decrypted" % decryptCache.stats)
+    return out
 
 
 def workGroupByEntries(work):
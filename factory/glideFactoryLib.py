@@ -89,6 +89,10 @@ class FactoryConfig:
         self.max_removes = 5
         self.max_releases = 20
 
+        # Submissions queued for the entry group (see glideFactorySubmitScheduler),
+        # None to submit directly in submitGlideins
+        self.submit_queue = None
+
         # release related limits
         self.max_release_count = 10
         self.min_release_time = 300
@@ -159,6 +163,34 @@ def secClass2Name(client_security_name, proxy_security_class):
 #
 ############################################################
 
+def getCondorQGlideinConstraint(factoryConfig):
+    """
+    Constraint selecting the glideins of this factory and glidein instance
+    """
+
+    return '(%s =?= "%s") && (%s =?= "%s") && (%s =!= UNDEFINED)' % \
+        (factoryConfig.factory_schedd_attribute, factoryConfig.factory_name,
+         factoryConfig.glidein_schedd_attribute, factoryConfig.glidein_name,
+         factoryConfig.credential_id_schedd_attribute)
+
+
+def getCondorQGlideinFormatList(factoryConfig):
+    """
+    Attributes of the glideins needed by the entries
+    """
+
+    return [
+        ("JobStatus", "i"), ("GridJobStatus", "s"), ("ServerTime", "i"),
+        ("EnteredCurrentStatus", "i"), ("GlideinEntrySubmitFile", "s"),
+        (factoryConfig.credential_id_schedd_attribute, "s"),
+        ("HoldReasonCode", "i"), ("HoldReasonSubCode", "i"),
+        ("HoldReason", "s"), ("NumSystemHolds", "i"),
+        (factoryConfig.frontend_name_attribute, "s"),
+        (factoryConfig.client_schedd_attribute, "s"),
+        (factoryConfig.credential_secclass_schedd_attribute, "s")
+    ]
+
+
 def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None):
 
     """
@@ -176,21 +208,10 @@ def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None):
         client_constraint = ' && (%s =?= "%s")' % \
             (factoryConfig.client_schedd_attribute, client_name)
 
-    q_glidein_constraint = '(%s =?= "%s") && (%s =?= "%s") && (%s =?= "%s")%s && (%s =!= UNDEFINED)' % \
-        (factoryConfig.factory_schedd_attribute, factoryConfig.factory_name,
-         factoryConfig.glidein_schedd_attribute, factoryConfig.glidein_name,
-         factoryConfig.entry_schedd_attribute, entry_name, client_constraint,
-         factoryConfig.credential_id_schedd_attribute)
-    q_glidein_format_list = [
-        ("JobStatus", "i"), ("GridJobStatus", "s"), ("ServerTime", "i"),
-        ("EnteredCurrentStatus", "i"), ("GlideinEntrySubmitFile", "s"),
-        (factoryConfig.credential_id_schedd_attribute, "s"),
-        ("HoldReasonCode", "i"), ("HoldReasonSubCode", "i"),
-        ("HoldReason", "s"), ("NumSystemHolds", "i"),
-        (factoryConfig.frontend_name_attribute, "s"),
-        (factoryConfig.client_schedd_attribute, "s"),
-        (factoryConfig.credential_secclass_schedd_attribute, "s")
-    ]
+    q_glidein_constraint = '%s && (%s =?= "%s")%s' % \
+        (getCondorQGlideinConstraint(factoryConfig),
+         factoryConfig.entry_schedd_attribute, entry_name, client_constraint)
+    q_glidein_format_list = getCondorQGlideinFormatList(factoryConfig)
 
     q = condorMonitor.CondorQ(schedd_name)
     q.factory_name = factoryConfig.factory_name
@@ -201,6 +222,51 @@ def getCondorQData(entry_name, client_name, schedd_name, factoryConfig=None):
     return q
 
 
+def getCondorQSnapshot(entry_names, schedd_name, factoryConfig=None):
+    """
+    Get the glideins of multiple entries with a single query of the schedd
+    and split them by entry (GlideinEntryName).
+    Each element is equivalent to getCondorQData(entry_name, None, schedd_name),
+    with the entry name attribute added to the jobs
+
+    @type entry_names: list
+    @param entry_names: names of the entries using schedd_name
+
+    @type schedd_name: string
+    @param schedd_name: name of the factory schedd
+
+    @return: dictionary entry_name -> loaded condorMonitor.CondorQ, for all entry_names
+    """
+
+    if factoryConfig is None:
+        factoryConfig = globals()['factoryConfig']
+
+    entry_attribute = factoryConfig.entry_schedd_attribute
+    entries_constraint = string.join(['(%s =?= "%s")' % (entry_attribute, entry_name)
+                                      for entry_name in entry_names], ' || ')
+    q_glidein_constraint = '%s && (%s)' % (getCondorQGlideinConstraint(factoryConfig), entries_constraint)
+    q_glidein_format_list = getCondorQGlideinFormatList(factoryConfig) + [(entry_attribute, "s")]
+
+    q = condorMonitor.CondorQ(schedd_name)
+    q.load(q_glidein_constraint, q_glidein_format_list)
+
+    out = {}
+    for entry_name in entry_names:
+        entry_q = condorMonitor.CondorQ(schedd_name)
+        entry_q.factory_name = factoryConfig.factory_name
+        entry_q.glidein_name = factoryConfig.glidein_name
+        entry_q.entry_name = entry_name
+        entry_q.client_name = None
+        entry_q.stored_data = {}
+        out[entry_name] = entry_q
+    # single pass over all the glideins
+    for jid, job in q.fetchStored().iteritems():
+        entry_q = out.get(job.get(entry_attribute))
+        if entry_q is not None:
+            entry_q.stored_data[jid] = job
+    return out
+
+
 def getCondorQCredentialList(factoryConfig=None):
     """
     Returns a list of all currently used proxies based on the glideins in the queue.
@@ -538,7 +604,7 @@ class ClientWeb:
 def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
                      req_max_glideins, idle_lifetime, remove_excess, submit_credentials,
                      glidein_totals, frontend_name, client_web, params,
-                     log=logSupport.log, factoryConfig=None):
+                     log=logSupport.log, factoryConfig=None, client_classes=None):
     """Looks at the status of the queue and determines how many glideins to submit.  Returns the number of newly submitted glideins.
 
     If the system is unable to submit glideins because has reached one of the limits (request, entry, frontend:security_class), and
@@ -558,6 +624,8 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
         params (dict): params from the entry configuration or frontend to be passed to the glideins
         log (logger): factory logger
         factoryConfig: factory configuration
+        client_classes (GlideinQueueClasses): classification of the glideins in client_condorq
+            bucketed by credential identifier (see classifyGlideins), if already available
 
     Raises:
         condorExe.ExeError: in case of issues executing condor commands
@@ -566,18 +634,14 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
     if factoryConfig is None:
         factoryConfig = globals()['factoryConfig']
 
-    # Filter out everything but the proper credential identifier.
-    # Need to determine how many more glideins are needed to match this
+    # Classify the glideins in one pass, grouping them by credential identifier.
+    # Only the ones with the request credential are used
+    # to determine how many more glideins are needed to match this
     # request min_idle and max_glidiens
-
-    condorq = condorMonitor.SubQuery(client_condorq, lambda d:(d[factoryConfig.credential_id_schedd_attribute] == submit_credentials.id))
-    condorq.schedd_name = client_condorq.schedd_name
-    condorq.factory_name = client_condorq.factory_name
-    condorq.glidein_name = client_condorq.glidein_name
-    condorq.entry_name = client_condorq.entry_name
-    condorq.client_name = client_condorq.client_name
-    condorq.credentials_id = submit_credentials.id
-    condorq.load()
+    if client_classes is None:
+        client_classes = classifyGlideins(client_condorq, factoryConfig.credential_id_schedd_attribute,
+                                          factoryConfig=factoryConfig)
+    glidein_classes = client_classes.getBucket(submit_credentials.id)
 
     # Check that have not exceeded max held for this security class
     if glidein_totals.has_sec_class_exceeded_max_held(frontend_name):
@@ -585,13 +649,14 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
         log.info("Too many held glideins for this frontend-security class: %i=held %i=max_held" % (glidein_totals.frontend_limits[frontend_name]['held'],
                    glidein_totals.frontend_limits[frontend_name]['max_held']))
         # run sanitize... we have to get out of this mess
-        return sanitizeGlideins(client_condorq, log=log, factoryConfig=factoryConfig)
+        return sanitizeGlideins(client_condorq, log=log, factoryConfig=factoryConfig,
+                                glidein_classes=client_classes)
         # we have done something... return non-0 so sanitize is not called again
 
     # Count glideins for this request credential by status
-    qc_status = getQStatus(condorq)
+    qc_status = dict(glidein_classes.status)
     # Count by status and group by submit file glideins for this request credential
-    qc_status_sf = getQStatusSF(condorq)
+    qc_status_sf = glidein_classes.status_sf
 
     # Held==JobStatus(5)
     q_held_glideins = 0
@@ -611,10 +676,11 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
     if add_glideins <= 0:
         # Have enough idle, don't submit
         log.info("Have enough glideins: idle=%i req_idle=%i, not submitting" % (q_idle_glideins, req_min_idle))
-        return clean_glidein_queue(remove_excess, glidein_totals, condorq,
+        return clean_glidein_queue(remove_excess, glidein_totals, client_condorq,
                                    req_min_idle, req_max_glideins,
                                    frontend_name, log=log,
-                                   factoryConfig=factoryConfig)
+                                   factoryConfig=factoryConfig,
+                                   glidein_classes=glidein_classes)
     else:
         # Need more idle
         # Check that adding more idle doesn't exceed request max_glideins
@@ -627,15 +693,17 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
             if add_glideins < 0:
                 log.info("Additional idle glideins %s needed exceeds request max_glideins limits %s, not submitting" % (add_glideins, req_max_glideins))
                 return clean_glidein_queue(remove_excess, glidein_totals,
-                                           condorq, req_min_idle,
+                                           client_condorq, req_min_idle,
                                            req_max_glideins, frontend_name,
-                                           log=log, factoryConfig=factoryConfig)
+                                           log=log, factoryConfig=factoryConfig,
+                                           glidein_classes=glidein_classes)
             elif add_glideins == 0:
                 log.info("Additional idle glideins not needed, have met request max_glideins limits %s, not submitting" % req_max_glideins)
                 return clean_glidein_queue(remove_excess, glidein_totals,
-                                           condorq, req_min_idle,
+                                           client_condorq, req_min_idle,
                                            req_max_glideins, frontend_name,
-                                           log=log, factoryConfig=factoryConfig)
+                                           log=log, factoryConfig=factoryConfig,
+                                           glidein_classes=glidein_classes)
 
     # Have a valid idle number to request
     # Check that adding more doesn't exceed frontend:sec_class and entry limits
@@ -647,10 +715,11 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
         # Have hit entry or frontend:sec_class limit, cannot submit
         log.info("Additional %s idle glideins requested by %s exceeds frontend:security class limit for the entry, not submitting" % (req_min_idle,
                                                       frontend_name))
-        return clean_glidein_queue(remove_excess, glidein_totals, condorq,
+        return clean_glidein_queue(remove_excess, glidein_totals, client_condorq,
                                    req_min_idle, req_max_glideins,
                                    frontend_name, log=log,
-                                   factoryConfig=factoryConfig)
+                                   factoryConfig=factoryConfig,
+                                   glidein_classes=glidein_classes)
     else:
         # If we are requesting more than the maximum glideins that we can submit at one time, then set to the max submit number
         #   this helps to keep one frontend/request from getting all the glideins
@@ -660,9 +729,14 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
 
     try:
         log.debug("Submitting %i glideins" % add_glideins)
-        submitGlideins(condorq.entry_name, client_int_name, add_glideins, idle_lifetime,
+        submitGlideins(client_condorq.entry_name, client_int_name, add_glideins, idle_lifetime,
                        frontend_name, submit_credentials, client_web, params, qc_status_sf,
                        log=log, factoryConfig=factoryConfig)
+        # With factoryConfig.submit_queue the glideins are only queued, the entry group submits
+        # them after this entry is done (see glideFactorySubmitScheduler), so the submit results
+        # are not available here. The totals count them as submitted: the counts are optimistic
+        # (failed submissions included) until the next condor_q refresh, and this keeps the
+        # following requests of this iteration within the entry and frontend limits
         glidein_totals.add_idle_glideins(add_glideins, frontend_name)
         return add_glideins  # exit, some submitted
     except RuntimeError as e:
@@ -678,7 +752,7 @@ def keepIdleGlideins(client_condorq, client_int_name, req_min_idle,
 
 def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
                         req_max_glideins, frontend_name, log=logSupport.log,
-                        factoryConfig=None):
+                        factoryConfig=None, glidein_classes=None):
     """Cleans up the glideins queue (removes any excesses) per the frontend request.
 
     We are not adjusting the glidein totals with what has been removed from the queue.  It may take a cycle (or more)
@@ -693,6 +767,7 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
         frontend_name:
         log:
         factoryConfig:
+        glidein_classes (GlideinQueueClasses): glideins to clean up, default is all the glideins in condorQ
     Returns:
         int: 1 if some glideins were removed, 0 otherwise
     TODO:V could return the number of glideins removed
@@ -703,6 +778,10 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
     if factoryConfig is None:
         factoryConfig = globals()['factoryConfig']
 
+    if glidein_classes is None:
+        glidein_classes = classifyGlideins(condorQ, factoryConfig=factoryConfig)
+    jids = glidein_classes.jids
+
     # KEL passed the whole glidein totals obj in case we want to adjust
     # entry/fe:sec_class totals?
     sec_class_idle = glidein_totals.frontend_limits[frontend_name]['idle']
@@ -736,7 +815,7 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
             # if we are past max_run, then min_idle does not make sense to start with
             remove_nr = sec_class_running + sec_class_idle - req_max_glideins - remove_excess_margin
 
-        idle_list = extractIdleUnsubmitted(condorQ)
+        idle_list = jids['idle_unsubmitted']
 
         if remove_excess_wait and (len(idle_list) > 0):
             # remove unsubmitted first, if any
@@ -753,7 +832,7 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
                 # Stop ... others will be retried in next round, if needed
                 return 1
 
-        idle_list = extractIdleQueued(condorQ)
+        idle_list = jids['idle_queued']
         if remove_excess_idle and (len(idle_list) > 0):
             # no unsubmitted, go for all the others idle now
             if len(idle_list) > remove_nr:
@@ -773,24 +852,24 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
                                                                            remove_excess_margin, req_max_glideins)
             log.info("Too many glideins: %s" % stat_str)
 
-            run_list = extractRunSimple(condorQ)
+            run_list = jids['running']
             if len(run_list) > remove_nr:
                 run_list = run_list[:remove_nr]  # shorten
             log.info("Removing %i running glideins" % len(run_list))
 
-            rm_list = run_list
+            rm_list = list(run_list)
 
             # Remove Held as well. No reason to keep them alive
             # if we are about to kill running glideins anyhow
 
             # Check if there are held glideins that are not recoverable
-            unrecoverable_held_list = extractUnrecoverableHeldSimple(condorQ, factoryConfig=factoryConfig)
+            unrecoverable_held_list = jids['held_unrecoverable']
             if len(unrecoverable_held_list) > 0:
                 log.info("Removing %i unrecoverable held glideins" % len(unrecoverable_held_list))
                 rm_list += unrecoverable_held_list
 
             # Check if there are held glideins
-            held_list = extractRecoverableHeldSimple(condorQ)
+            held_list = jids['held_recoverable']
             if len(held_list) > 0:
                 log.info("Removing %i held glideins" % len(held_list))
                 rm_list += held_list
@@ -806,14 +885,12 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
         # (only held should be left at this point... idle and running addressed above)
 
         # Check if there are held glideins that are not recoverable
-        unrecoverable_held_list = extractUnrecoverableHeldSimple(
-                                      condorQ, factoryConfig=factoryConfig)
+        unrecoverable_held_list = jids['held_unrecoverable']
         if len(unrecoverable_held_list) > 0:
             log.info("Removing %i unrecoverable held glideins" % len(unrecoverable_held_list))
 
         # Check if there are held glideins
-        held_list = extractRecoverableHeldSimple(condorQ,
-                                                 factoryConfig=factoryConfig)
+        held_list = jids['held_recoverable']
         if len(held_list) > 0:
             log.info("Removing %i held glideins" % len(held_list))
 
@@ -826,14 +903,29 @@ def clean_glidein_queue(remove_excess_tp, glidein_totals, condorQ, req_min_idle,
     return 0
 
 
-def sanitizeGlideins(condorq, log=logSupport.log, factoryConfig=None):
+def sanitizeGlideins(condorq, log=logSupport.log, factoryConfig=None, glidein_classes=None):
+    """Remove the stale and unrecoverable held glideins and release the recoverable held ones
+
+    Args:
+        condorq: condorQ object with the glideins
+        log: factory logger
+        factoryConfig: factory configuration
+        glidein_classes (GlideinQueueClasses): classification of the glideins in condorq, if already available
+
+    Returns:
+        int: 1 if some glideins were removed or released, 0 otherwise
+    """
 
     if factoryConfig is None:
         factoryConfig = globals()['factoryConfig']
 
+    if glidein_classes is None:
+        glidein_classes = classifyGlideins(condorq, factoryConfig=factoryConfig)
+    jids = glidein_classes.jids
+
     glideins_sanitized = 0
     # Check if some glideins have been in idle state for too long
-    stale_list = extractStaleSimple(condorq)
+    stale_list = jids['stale_idle']
     if len(stale_list) > 0:
         glideins_sanitized = 1
         log.warning("Found %i stale glideins" % len(stale_list))
@@ -841,7 +933,7 @@ def sanitizeGlideins(condorq, log=logSupport.log, factoryConfig=None):
                        log=log, factoryConfig=factoryConfig)
 
     # Check if some glideins have been in running state for too long
-    runstale_list = extractRunStale(condorq)
+    runstale_list = jids['stale_running']
     if len(runstale_list) > 0:
         glideins_sanitized = 1
         log.warning("Found %i stale (>%ih) running glideins" % (len(runstale_list), factoryConfig.stale_maxage[2] / 3600))
@@ -849,7 +941,7 @@ def sanitizeGlideins(condorq, log=logSupport.log, factoryConfig=None):
                        log=log, factoryConfig=factoryConfig)
 
     # Check if there are held glideins that are not recoverable AND held for more than 20 iterations
-    unrecoverable_held_forcex_list = extractUnrecoverableHeldForceX(condorq)
+    unrecoverable_held_forcex_list = jids['held_unrecoverable_forcex']
     if len(unrecoverable_held_forcex_list) > 0:
         glideins_sanitized = 1
         log.warning("Found %i unrecoverable held glideins that have been held for over 20 iterations"
@@ -858,22 +950,21 @@ def sanitizeGlideins(condorq, log=logSupport.log, factoryConfig=None):
                        force=True, log=log, factoryConfig=factoryConfig)
 
     # Check if there are held glideins that are not recoverable
-    unrecoverable_held_list = extractUnrecoverableHeldSimple(condorq)
+    unrecoverable_held_list = jids['held_unrecoverable']
     if len(unrecoverable_held_list) > 0:
         glideins_sanitized = 1
         log.warning("Found %i unrecoverable held glideins" % len(unrecoverable_held_list))
-        unrecoverable_held_list_minus_forcex = list( set(unrecoverable_held_list) - set(unrecoverable_held_forcex_list) )
+        unrecoverable_held_list_minus_forcex = diffList(unrecoverable_held_list, unrecoverable_held_forcex_list)
         log.warning("But removing only %i (unrecoverable held - unrecoverable held forcex)" %
                     len(unrecoverable_held_list_minus_forcex))
         removeGlideins(condorq.schedd_name, unrecoverable_held_list_minus_forcex,
                        force=False, log=log, factoryConfig=factoryConfig)
 
     # Check if there are held glideins
-    held_list = extractRecoverableHeldSimple(condorq,
-                                             factoryConfig=factoryConfig)
+    held_list = jids['held_recoverable']
     if len(held_list) > 0:
         glideins_sanitized = 1
-        limited_held_list = extractRecoverableHeldSimpleWithinLimits(condorq, factoryConfig=factoryConfig)
+        limited_held_list = jids['held_recoverable_within_limits']
         log.warning("Found %i held glideins, %i within limits" % (len(held_list), len(limited_held_list)))
         if len(limited_held_list) > 0:
             releaseGlideins(condorq.schedd_name, limited_held_list,
@@ -896,21 +987,18 @@ def logStatsAll(condorq, log=logSupport.log, factoryConfig=None):
     if factoryConfig is None:
         factoryConfig = globals()['factoryConfig']
 
-    # group_by client_name the condorQ data
-    clients_condorq = getQClientNames(condorq, factoryConfig)
-    data = clients_condorq.fetchStored()
+    # group_by client_name the condorQ data, counting the glideins by status (getQStatus() equivalent)
+    # and by submit file (getQStatusSF() equivalent)
+    glidein_classes = classifyGlideins(condorq, factoryConfig.client_schedd_attribute, factoryConfig=factoryConfig)
 
-    for client_name, client_data in data.items():
-        # Count glideins by status
-        # getQStatus() equivalent
-        data_list = sorted(hash_status(v) for v in client_data.values())
-        qc_status = dict((key, len(list(group))) for key, group in groupby([i for i in data_list if i is not None]))
-        # getQStatusSF() equivalent
-        qc_status_sf = {}
-        submit_files = set(v.get('GlideinEntrySubmitFile') for k, v in client_data.items()) - set([None])
-        for sf in submit_files:
-            sf_status = sorted(v['JobStatus'] for k,v in client_data.items() if v.get('GlideinEntrySubmitFile')==sf)
-            qc_status_sf[sf] = dict( (key, len(list(group))) for key, group in groupby(sf_status))
+    for client_name, client_classes in glidein_classes.buckets.items():
+        if client_name is None:
+            # glideins without client
+            continue
+        qc_status = dict(client_classes.status)
+        if None in qc_status:
+            del qc_status[None]
+        qc_status_sf = client_classes.status_sf
 
         sum_idle_count(qc_status)
 
@@ -923,7 +1011,7 @@ def logStatsAll(condorq, log=logSupport.log, factoryConfig=None):
 
 
 def logStats(condorq, client_int_name, client_security_name,
-             proxy_security_class, log=logSupport.log, factoryConfig=None):
+             proxy_security_class, log=logSupport.log, factoryConfig=None, glidein_classes=None):
     """Sum to the current schedd statistics of this entry (from condor_q on the Factory)
     to the values already stored in factoryConfig.client_stats, factoryConfig.qc_stats
 
@@ -934,14 +1022,17 @@ def logStats(condorq, client_int_name, client_security_name,
         proxy_security_class: credential security class used by the client
         log: to log errors/info/...
         factoryConfig: common data block for the entry to get schedd statistics (client_stats, qc_stats)
+        glidein_classes (GlideinQueueClasses): classification of the glideins in condorq, if already available
     """
 
     if factoryConfig is None:
         factoryConfig = globals()['factoryConfig']
 
     # Count glideins by status
-    qc_status = getQStatus(condorq)
-    qc_status_sf = getQStatusSF(condorq)
+    if glidein_classes is None:
+        glidein_classes = classifyGlideins(condorq, factoryConfig=factoryConfig)
+    qc_status = dict(glidein_classes.status)
+    qc_status_sf = glidein_classes.status_sf
 
     sum_idle_count(qc_status)
 
@@ -1095,12 +1186,8 @@ def diffList(base_list, subtract_list):
     if len(subtract_list) == 0:
         return base_list  # nothing to do
 
-    out_list = []
-    for i in base_list:
-        if not (i in subtract_list):
-            out_list.append(i)
-
-    return out_list
+    subtract_set = set(subtract_list)
+    return [i for i in base_list if i not in subtract_set]
 
 
 #
@@ -1200,6 +1287,129 @@ def extractRunStale(q, factoryConfig=None):
     return qstale_list
 
 
+#
+# Single pass classification
+# Same categories of the extract functions above, computed for all the glideins
+# in one scan of the queue, plus the getQStatus and getQStatusSF counts
+#
+
+# category: equivalent extract function
+GLIDEIN_CATEGORIES = (
+    'idle',  # extractIdleSimple
+    'idle_unsubmitted',  # extractIdleUnsubmitted
+    'idle_queued',  # extractIdleQueued
+    'running',  # extractRunSimple
+    'nonrunning',  # extractNonRunSimple
+    'held',  # extractHeldSimple
+    'held_recoverable',  # extractRecoverableHeldSimple
+    'held_recoverable_within_limits',  # extractRecoverableHeldSimpleWithinLimits
+    'held_unrecoverable',  # extractUnrecoverableHeldSimple
+    'held_unrecoverable_forcex',  # extractUnrecoverableHeldForceX
+    'stale_idle',  # extractStaleSimple
+    'stale_running'  # extractRunStale
+)
+
+
+class GlideinQueueClasses:
+    """Glideins of a condor_q classified by classifyGlideins
+
+    Attributes:
+        jids (dict): category (see GLIDEIN_CATEGORIES) -> list of job ids (the keys of the condor_q)
+        status (dict): number of jobs by hash_status, same as getQStatus
+        status_sf (dict): GlideinEntrySubmitFile -> number of jobs by JobStatus, same as getQStatusSF
+        buckets (dict): bucket attribute value -> GlideinQueueClasses of the jobs with that value
+    """
+
+    def __init__(self):
+        self.jids = dict((category, []) for category in GLIDEIN_CATEGORIES)
+        self.status = {}
+        self.status_sf = {}
+        self.buckets = {}
+
+    def add(self, jid, job_status, h_status, submit_file, categories):
+        for category in categories:
+            self.jids[category].append(jid)
+        self.status[h_status] = self.status.get(h_status, 0) + 1
+        if submit_file is not None:
+            sf_status = self.status_sf.setdefault(submit_file, {})
+            sf_status[job_status] = sf_status.get(job_status, 0) + 1
+
+    def getBucket(self, value):
+        """Return the classification of the jobs with the bucket attribute equal to value (empty if none)
+        """
+        if value in self.buckets:
+            return self.buckets[value]
+        return GlideinQueueClasses()
+
+
+def classifyGlideins(condorq, bucket_attribute=None, factoryConfig=None, glideinDescript=None):
+    """Classify the glideins of a condor_q in a single pass
+
+    Replaces multiple calls to the extract functions, getQStatus and getQStatusSF,
+    each one scanning the whole queue. The held glideins are checked with
+    isGlideinUnrecoverable, isGlideinHeldNTimes and isGlideinWithinHeldLimits as the
+    extract functions do, reading the factory configuration only once.
+
+    Args:
+        condorq: condorQ object (or sub-query), already loaded
+        bucket_attribute (str): attribute used to group the glideins also in GlideinQueueClasses.buckets,
+            e.g. factoryConfig.client_schedd_attribute or factoryConfig.credential_id_schedd_attribute
+        factoryConfig: factory configuration
+        glideinDescript: factory glidein configuration, read from the file if needed and not provided
+
+    Returns:
+        GlideinQueueClasses: the classified glideins
+    """
+
+    if factoryConfig is None:
+        factoryConfig = globals()['factoryConfig']
+
+    stale_maxage = factoryConfig.stale_maxage
+    out = GlideinQueueClasses()
+    for jid, el in condorq.stored_data.items():
+        job_status = el["JobStatus"]
+        h_status = hash_status(el)
+        categories = []
+        if job_status == 1:
+            categories.append('idle')
+        if h_status == 1001:
+            categories.append('idle_unsubmitted')
+        elif h_status in (1002, 1010, 1100):
+            categories.append('idle_queued')
+        if job_status == 2:
+            categories.append('running')
+        else:
+            categories.append('nonrunning')
+        if job_status == 5:
+            categories.append('held')
+            if glideinDescript is None:
+                glideinDescript = glideFactoryConfig.getCachedConfig(glideFactoryConfig.GlideinDescript)
+            if isGlideinUnrecoverable(el, factoryConfig=factoryConfig, glideinDescript=glideinDescript):
+                categories.append('held_unrecoverable')
+                if isGlideinHeldNTimes(el, factoryConfig=factoryConfig, n=20):
+                    categories.append('held_unrecoverable_forcex')
+            else:
+                categories.append('held_recoverable')
+                if isGlideinWithinHeldLimits(el, factoryConfig=factoryConfig):
+                    categories.append('held_recoverable_within_limits')
+        if (job_status in (1, 2)) and (job_status in stale_maxage):
+            # same as hash_statusStale
+            if el["ServerTime"] - el["EnteredCurrentStatus"] > stale_maxage[job_status]:
+                if job_status == 1:
+                    categories.append('stale_idle')
+                else:
+                    categories.append('stale_running')
+
+        submit_file = el.get('GlideinEntrySubmitFile')
+        out.add(jid, job_status, h_status, submit_file, categories)
+        if bucket_attribute is not None:
+            bucket_value = el.get(bucket_attribute)
+            if bucket_value not in out.buckets:
+                out.buckets[bucket_value] = GlideinQueueClasses()
+            out.buckets[bucket_value].add(jid, job_status, h_status, submit_file, categories)
+    return out
+
+
 # helper function of extractStaleUnclaimed
 def group_unclaimed(el_list):
     out = {"nr_vms":0, "nr_unclaimed":0, "min_unclaimed_time":1024 * 1024 * 1024}
@@ -1301,6 +1511,9 @@ def submitGlideins(entry_name, client_name, nr_glideins, idle_lifetime, frontend
 
     """Submit the glidein
 
+    If factoryConfig.submit_queue is a list, the condor_submit commands are not executed
+    but appended to it, to be executed by the entry group (see glideFactorySubmitScheduler)
+
     Args:
         entry_name (str):
         client_name (str):
@@ -1322,7 +1535,7 @@ def submitGlideins(entry_name, client_name, nr_glideins, idle_lifetime, frontend
     username = submit_credentials.username
 
     # Need information from glidein.descript, job.descript, and signatures.sha1
-    jobDescript = glideFactoryConfig.JobDescript(entry_name)
+    jobDescript = glideFactoryConfig.getCachedConfig(glideFactoryConfig.JobDescript, entry_name)
     schedd = jobDescript.data["Schedd"]
     algo_name = jobDescript.data.get("EntrySelectionAlgorithm", None)
     if algo_name and algo_name != "Default":
@@ -1330,6 +1543,8 @@ def submitGlideins(entry_name, client_name, nr_glideins, idle_lifetime, frontend
 
     # List of job ids that have been submitted - initialize to empty array
     submitted_jids = []
+    # Number of glideins queued in factoryConfig.submit_queue
+    nr_queued = 0
 
     try:
         entry_env = get_submit_environment(entry_name, client_name,
@@ -1364,9 +1579,6 @@ def submitGlideins(entry_name, client_name, nr_glideins, idle_lifetime, frontend
             nr_submitted = 0
             while (nr_submitted < nr_glideins_sf):
                 sub_env = []
-                if nr_submitted != 0:
-                    time.sleep(factoryConfig.submit_sleep)
-
                 nr_to_submit = (nr_glideins_sf - nr_submitted)
                 if nr_to_submit > factoryConfig.max_cluster_size:
                     nr_to_submit = factoryConfig.max_cluster_size
@@ -1376,6 +1588,19 @@ def submitGlideins(entry_name, client_name, nr_glideins, idle_lifetime, frontend
                 sub_env.append('GLIDEIN_ENTRY_SUBMIT_FILE=%s' % submit_file)
                 exe_env = entry_env + sub_env
 
+                if factoryConfig.submit_queue is not None:
+                    # The entry group will submit, together with the other entries
+                    factoryConfig.submit_queue.append({'entry_name': entry_name, 'client_name': client_name,
+                                                       'username': username, 'schedd': schedd,
+                                                       'exe_env': exe_env, 'submit_file': submit_file,
+                                                       'count': nr_to_submit})
+                    nr_queued += nr_to_submit
+                    nr_submitted += nr_to_submit
+                    continue
+
+                if nr_submitted != 0:
+                    time.sleep(factoryConfig.submit_sleep)
+
                 submit_out = executeSubmit(log, factoryConfig, username, schedd, exe_env, submit_file)
 
                 cluster, count=extractJobId(submit_out)
@@ -1384,8 +1609,11 @@ def submitGlideins(entry_name, client_name, nr_glideins, idle_lifetime, frontend
                 nr_submitted += count
     finally:
         # write out no matter what
-        log.info("Submitted %i glideins to %s: %s" % (len(submitted_jids),
-                                                      schedd, submitted_jids))
+        if nr_queued > 0:
+            log.info("Queued %i glideins for submission to %s" % (nr_queued, schedd))
+        else:
+            log.info("Submitted %i glideins to %s: %s" % (len(submitted_jids),
+                                                          schedd, submitted_jids))
 
 
 # remove the glideins in the list
@@ -1401,36 +1629,36 @@ def removeGlideins(schedd_name, jid_list, force=False, log=logSupport.log,
         factoryConfig = globals()['factoryConfig']
 
     removed_jids = []
-
-    is_not_first = 0
-    for jid in jid_list:
-
-        # Respect the max_removes limit and exit right away if required
-        if len(removed_jids) >= factoryConfig.max_removes:
-            break  # limit reached, stop
-
-        if is_not_first:
-            is_not_first = 1
+    # Jobs are removed in bulk (see condorManager.condorRemoveMany).
+    # The jobs that could not be removed are replaced by the next ones in jid_list,
+    # up to max_removes removed jobs
+    remaining_jids = list(jid_list)
+    while remaining_jids and len(removed_jids) < factoryConfig.max_removes:
+        if removed_jids:
             time.sleep(factoryConfig.remove_sleep)
-
-        try:
-            # this will put a job in X state so that the next condor_rm --forcex below should work
-            condorManager.condorRemoveOne("%li.%li" % (jid[0], jid[1]), schedd_name)
-            removed_jids.append(jid)
-
-            # Force the removal if requested
-            if force == True:
-                try:
-                    log.info("Forcing the removal of glideins in X state")
-                    condorManager.condorRemoveOne("%li.%li" % (jid[0], jid[1]), schedd_name, do_forcex=True)
-                except condorExe.ExeError as e:
-                    log.warning("Forcing the removal of glideins in %s.%s state failed" % (jid[0], jid[1]))
-
-        except condorExe.ExeError as e:
-            # silently ignore errors, and try next one
-            log.warning("removeGlidein(%s,%li.%li): %s" % (schedd_name, jid[0], jid[1], e))
+        jids = remaining_jids[:factoryConfig.max_removes - len(removed_jids)]
+        remaining_jids = remaining_jids[len(jids):]
+
+        # this will put the jobs in X state so that the next condor_rm --forcex below should work
+        done_jids = condorManager.condorRemoveMany(jids, schedd_name)
+        removed_jids += done_jids
+        done_set = set(done_jids)
+        failed_jids = [jid for jid in jids if jid not in done_set]
+        if failed_jids:
+            # silently ignore errors, and try the next ones
+            log.warning("removeGlidein(%s): failed to remove %s" % (schedd_name, failed_jids))
+
+        # Force the removal if requested
+        if force == True and done_jids:
+            log.info("Forcing the removal of glideins in X state")
+            forced_jids = condorManager.condorRemoveMany(done_jids, schedd_name, do_forcex=True)
+            if len(forced_jids) < len(done_jids):
+                forced_set = set(forced_jids)
+                log.warning("Forcing the removal of glideins %s failed" %
+                            [jid for jid in done_jids if jid not in forced_set])
 
     log.info("Removed %i glideins on %s: %s" % (len(removed_jids), schedd_name, removed_jids))
+    return removed_jids
 
 
 # release the glideins in the list
@@ -1446,22 +1674,25 @@ def releaseGlideins(schedd_name, jid_list, log=logSupport.log,
         factoryConfig = globals()['factoryConfig']
 
     released_jids = []
-
-    is_not_first = 0
-    for jid in jid_list:
-        if len(released_jids) > factoryConfig.max_releases:
-            break  # limit reached, stop
-
-        if is_not_first:
-            is_not_first = 1
+    # Jobs are released in bulk (see condorManager.condorReleaseMany).
+    # The jobs that could not be released are replaced by the next ones in jid_list,
+    # up to max_releases released jobs
+    remaining_jids = list(jid_list)
+    while remaining_jids and len(released_jids) < factoryConfig.max_releases:
+        if released_jids:
             time.sleep(factoryConfig.release_sleep)
-        try:
-            condorManager.condorReleaseOne("%li.%li" % (jid[0], jid[1]), schedd_name)
-            released_jids.append(jid)
-        except condorExe.ExeError as e:
-            log.warning("releaseGlidein(%s,%li.%li): %s" % (schedd_name, jid[0], jid[1], e))
+        jids = remaining_jids[:factoryConfig.max_releases - len(released_jids)]
+        remaining_jids = remaining_jids[len(jids):]
+
+        done_jids = condorManager.condorReleaseMany(jids, schedd_name)
+        released_jids += done_jids
+        done_set = set(done_jids)
+        failed_jids = [jid for jid in jids if jid not in done_set]
+        if failed_jids:
+            log.warning("releaseGlidein(%s): failed to release %s" % (schedd_name, failed_jids))
 
     log.info("Released %i glideins on %s: %s" % (len(released_jids), schedd_name, released_jids))
+    return released_jids
 
 
 def in_submit_environment(entry_name, exe_env):
@@ -1480,10 +1711,11 @@ def get_submit_environment(entry_name, client_name, submit_credentials,
         factoryConfig = globals()['factoryConfig']
 
     try:
-        glideinDescript = glideFactoryConfig.GlideinDescript()
-        jobDescript = glideFactoryConfig.JobDescript(entry_name)
-        jobAttributes = glideFactoryConfig.JobAttributes(entry_name)
-        signatures = glideFactoryConfig.SignatureFile()
+        # read only, reuse the objects of the previous submissions if the files did not change
+        glideinDescript = glideFactoryConfig.getCachedConfig(glideFactoryConfig.GlideinDescript)
+        jobDescript = glideFactoryConfig.getCachedConfig(glideFactoryConfig.JobDescript, entry_name)
+        jobAttributes = glideFactoryConfig.getCachedConfig(glideFactoryConfig.JobAttributes, entry_name)
+        signatures = glideFactoryConfig.getCachedConfig(glideFactoryConfig.SignatureFile)
 
         exe_env = ['GLIDEIN_ENTRY_NAME=%s' % entry_name]
 
@@ -1759,7 +1991,7 @@ def isGlideinUnrecoverable(jobInfo, factoryConfig=None, glideinDescript=None):
         factoryConfig = globals()['factoryConfig']
 
     if glideinDescript is None:
-        glideinDescript = glideFactoryConfig.GlideinDescript()
+        glideinDescript = glideFactoryConfig.getCachedConfig(glideFactoryConfig.GlideinDescript)
 
     recoverable = False
     recoverableCodes = {}
@@ -0,0 +1,207 @@
+#
+# Project:
+#   glideinWMS
+#
+# File Version:
+#
+# Description:
+#   Concurrent submission of the glideins of an entry group
+#   The entries queue their condor_submit commands (see glideFactoryLib.submitGlideins
+#   and FactoryConfig.submit_queue), including the environment already prepared
+#   by get_submit_environment. The group executes all of them in forked children,
+#   at most max_workers at a time, and limits the submissions to each schedd
+#   with a token bucket (rate submits per second, up to burst at once).
+#   The schedds are served round robin, so a busy schedd does not delay the others.
+#
+
+import time
+
+from glideinwms.lib import logSupport
+from glideinwms.lib.fork import fork_in_bg
+from glideinwms.lib.fork import fetch_ready_fork_result_list
+from glideinwms.lib.fork import ForkResultError
+from glideinwms.factory import glideFactoryLib
+
+# Max time to wait (in seconds) before checking again the rate limits
+MAX_WAIT_TIME = 1.0
+
+
+class TokenBucket:
+    """Rate limit: rate tokens per second, up to burst tokens accumulated
+    """
+
+    def __init__(self, rate, burst, now=None):
+        """
+        :param rate: tokens per second, <=0 means no limit
+        :param burst: max number of tokens (at least 1), the bucket starts full
+        :param now: current time, default time.time()
+        """
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        if now is None:
+            now = time.time()
+        self.last = now
+
+    def refill(self, now):
+        if self.rate <= 0:
+            self.tokens = float(self.burst)
+        elif now > self.last:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self, now=None):
+        """Take a token if available
+
+        :return: True if a token was taken
+        """
+        if now is None:
+            now = time.time()
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def waitTime(self, now=None):
+        """Return the seconds until a token is available, 0 if available now
+        """
+        if now is None:
+            now = time.time()
+        self.refill(now)
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+def submitRequest(request, log):
+    """Execute one queued condor_submit, in a forked child
+
+    :param request: dictionary queued by glideFactoryLib.submitGlideins
+    :param log: logger of the entry
+    :return: dictionary with the submitted job ids (jids), the error message (error, None if successful)
+        and the duration of condor_submit in seconds (latency)
+    """
+    t_begin = time.time()
+    jids = []
+    error = None
+    try:
+        submit_out = glideFactoryLib.executeSubmit(log, None, request['username'], request['schedd'],
+                                                   request['exe_env'], request['submit_file'])
+        cluster, count = glideFactoryLib.extractJobId(submit_out)
+        jids = [(cluster, j) for j in range(count)]
+    except Exception as e:
+        error = str(e)
+    return {'jids': jids, 'error': error, 'latency': time.time() - t_begin}
+
+
+class SubmitScheduler:
+    """Execute the queued submissions of an entry group concurrently, rate limited per schedd
+    """
+
+    def __init__(self, max_workers=5, rate=1.0, burst=5):
+        """
+        :param max_workers: max number of condor_submit running at the same time
+        :param rate: max submits per second to each schedd, <=0 means no limit
+        :param burst: max number of submits started at once to each schedd
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.rate = rate
+        self.burst = burst
+        # list of (request, log)
+        self.requests = []
+        # schedd -> submit statistics, see getStats
+        self.stats = {}
+
+    def addRequests(self, requests, log=logSupport.log):
+        """Queue the submissions of an entry
+
+        :param requests: list of dictionaries queued by glideFactoryLib.submitGlideins
+        :param log: logger of the entry
+        """
+        for request in requests:
+            self.requests.append((request, log))
+
+    def run(self):
+        """Execute all the queued submissions
+
+        :return: list of (request, result) in the order of the requests, result as returned by submitRequest
+        """
+        pending = {}
+        for idx in range(len(self.requests)):
+            pending.setdefault(self.requests[idx][0]['schedd'], []).append(idx)
+        buckets = {}
+        for schedd in pending:
+            buckets[schedd] = TokenBucket(self.rate, self.burst)
+            self.stats[schedd] = {'Submits': 0, 'Failed': 0, 'Glideins': 0,
+                                  'Latency': 0.0, 'MaxLatency': 0.0, 'Start': None, 'End': None}
+        schedds = sorted(pending.keys())
+
+        results = {}
+        running = {}
+        while pending or running:
+            now = time.time()
+            # start at most one submission per schedd in each round
+            started = True
+            while started and pending and len(running) < self.max_workers:
+                started = False
+                for schedd in schedds:
+                    if len(running) >= self.max_workers:
+                        break
+                    if schedd in pending and buckets[schedd].take(now):
+                        idx = pending[schedd].pop(0)
+                        if not pending[schedd]:
+                            del pending[schedd]
+                        request, log = self.requests[idx]
+                        running[idx] = fork_in_bg(submitRequest, request, log)
+                        if self.stats[schedd]['Start'] is None:
+                            self.stats[schedd]['Start'] = now
+                        started = True
+
+            if running:
+                # waits at most 100ms for the submissions to finish
+                try:
+                    done = fetch_ready_fork_result_list(running)
+                except ForkResultError as e:
+                    done = e.good_results
+                    for idx in e.failed:
+                        done[idx] = {'jids': [], 'error': "condor_submit child failed", 'latency': 0.0}
+                for idx in done:
+                    del running[idx]
+                    results[idx] = done[idx]
+                    self.addStats(self.requests[idx][0]['schedd'], done[idx])
+            elif pending:
+                # all the schedds with submissions are rate limited
+                now = time.time()
+                time.sleep(min([buckets[schedd].waitTime(now) for schedd in pending] + [MAX_WAIT_TIME]))
+
+        out = [(self.requests[idx][0], results[idx]) for idx in range(len(self.requests))]
+        self.requests = []
+        return out
+
+    def addStats(self, schedd, result):
+        stats = self.stats[schedd]
+        stats['Submits'] += 1
+        if result['error'] is not None:
+            stats['Failed'] += 1
+        stats['Glideins'] += len(result['jids'])
+        stats['Latency'] += result['latency']
+        stats['MaxLatency'] = max(stats['MaxLatency'], result['latency'])
+        stats['End'] = time.time()
+
+    def getStats(self):
+        """Return the submit statistics of the last run
+
+        :return: dictionary schedd -> {'Submits', 'Failed', 'Glideins', 'Throughput' (glideins per second),
+            'AvgLatency', 'MaxLatency' (seconds per condor_submit)}
+        """
+        out = {}
+        for schedd, stats in self.stats.items():
+            elapsed = 0.0
+            if stats['Start'] is not None and stats['End'] is not None:
+                elapsed = stats['End'] - stats['Start']
+            out[schedd] = {'Submits': stats['Submits'], 'Failed': stats['Failed'], 'Glideins': stats['Glideins'],
+                           'Throughput': stats['Glideins'] / max(elapsed, 0.001),
+                           'AvgLatency': stats['Latency'] / max(stats['Submits'], 1),
+                           'MaxLatency': stats['MaxLatency']}
+        return out
@@ -212,6 +212,8 @@ def spawn_iteration(work_dir, frontendDescript, groups, max_active,
                     work_dir, group_name, True, dict)
                 pfm = servicePerformance.getPerfMetric(gname)
                 pfm.metric = history_obj['perf_metrics'].metric
+                # history files written by older versions have no counters
+                pfm.counters = getattr(history_obj['perf_metrics'], 'counters', {})
 
                 fm_classad.setPerfMetrics(
                     servicePerformance.getPerfMetric(gname))
@@ -0,0 +1,154 @@
+#
+# Project:
+#   glideinWMS
+#
+# File Version:
+#
+# Description:
+#   Per-schedd cache of the condor_q results of a frontend group
+#   A new group process (glideinFrontendElement) is started at every iteration:
+#   it loads the jobs saved in the group work dir by the previous one (load),
+#   the query children, forked from it, see them, and it saves the jobs of
+#   this iteration for the next one (store, save). A child first queries only the
+#   keys, JobStatus, EnteredCurrentStatus and ServerTime of all the jobs,
+#   reuses the cached jobs whose status did not change (updating ServerTime)
+#   and queries all the attributes only of the jobs that changed status,
+#   with a constraint on EnteredCurrentStatus (delta query).
+#   All the jobs are queried again (full refresh) at least every
+#   full_refresh_interval seconds, to pick up the other changes (e.g. condor_qedit)
+#
+
+import os
+import time
+
+from glideinwms.lib import condorMonitor
+from glideinwms.lib import logSupport
+from glideinwms.lib import util
+
+# Attributes queried for all the jobs to find the ones that changed
+DELTA_FORMAT_LIST = [('ClusterId', 'i'), ('ProcId', 'i'), ('JobStatus', 'i'),
+                     ('EnteredCurrentStatus', 'i'), ('ServerTime', 'i')]
+
+# Attributes added to the jobs by the frontend after the query (appendRealRunning)
+# They are removed from the cached jobs
+DERIVED_ATTRS = ('RunningOn',)
+
+
+class CondorQCache:
+    """Cache of the condor_q results of a group, keyed by schedd name
+    """
+
+    def __init__(self, full_refresh_interval=1800, fname=None):
+        """
+        :param full_refresh_interval: seconds, max time between full queries of a schedd
+        :param fname: file where the cache is saved for the following iterations, None to keep it only in memory
+        """
+        self.full_refresh_interval = full_refresh_interval
+        self.fname = fname
+        # schedd_name -> (query, time of the last full query, stored_data)
+        self.cache = {}
+
+    def load(self):
+        """Load the cache saved by the previous iteration
+        A missing or unreadable file is an empty cache: all the schedds are queried in full
+        """
+        if self.fname is None or not os.path.exists(self.fname):
+            return
+        data = util.file_pickle_load(self.fname, default={},
+                                     mask_exceptions=(logSupport.log.exception, "Reading of the condor_q cache failed: "))
+        if isinstance(data, dict):
+            self.cache = data
+
+    def save(self):
+        """Save the cache for the next iteration
+        """
+        if self.fname is not None:
+            util.file_pickle_dump(self.fname, self.cache,
+                                  mask_exceptions=(logSupport.log.exception, "Saving of the condor_q cache failed: "))
+
+    def store(self, schedd_name, condorq):
+        """Save the result of a query done with loadCondorQ, in the process that will fork the next queries
+
+        :param schedd_name: name of the schedd
+        :param condorq: the CondorQ object returned by loadCondorQ
+        :return: the cache statistics of the query (hits, misses, full), None if condorq was not loaded by loadCondorQ
+        """
+        stats = getattr(condorq, 'cache_stats', None)
+        if stats is None:
+            return None
+        self.cache[schedd_name] = (condorq.cache_query, stats['full_time'], condorq.stored_data)
+        return stats
+
+    def loadCondorQ(self, schedd_name, constraint, format_list, columnar_storage=False):
+        """Return a loaded CondorQ for schedd_name, querying only the jobs that changed if possible
+
+        :param schedd_name: name of the schedd
+        :param constraint: query constraint
+        :param format_list: attributes to query, must contain JobStatus, EnteredCurrentStatus and ServerTime
+        :param columnar_storage: if True the results are stored in a ColumnarResult
+        :return: condorMonitor.CondorQ with the results in stored_data and the cache statistics in cache_stats
+        """
+        query = (constraint, tuple(format_list or ()))
+        condorq = condorMonitor.CondorQ(schedd_name)
+        now = time.time()
+        cached = self.cache.get(schedd_name)
+        if cached is None or cached[0] != query or now - cached[1] > self.full_refresh_interval:
+            data = condorq.fetch(constraint, format_list)
+            stats = {'hits': 0, 'misses': len(data), 'full': 1, 'full_time': now}
+        else:
+            data, stats = self.deltaFetch(condorq, constraint, format_list, cached[2])
+            if stats['full']:
+                stats['full_time'] = now
+            else:
+                stats['full_time'] = cached[1]
+
+        if columnar_storage:
+            data = condorMonitor.ColumnarResult.fromDict(data)
+        condorq.columnar_storage = columnar_storage
+        condorq.stored_data = data
+        condorq.cache_query = query
+        condorq.cache_stats = stats
+        return condorq
+
+    def deltaFetch(self, condorq, constraint, format_list, cached_data):
+        """Query the keys of all the jobs and all the attributes only of the jobs that changed status
+
+        :param condorq: condorMonitor.CondorQ used for the queries
+        :param constraint: query constraint
+        :param format_list: attributes to query
+        :param cached_data: jobs from the previous query, dictionary or ColumnarResult
+        :return: tuple: dictionary with the jobs, cache statistics
+        """
+        status_data = condorq.fetch(constraint, DELTA_FORMAT_LIST)
+        data = {}
+        misses = []
+        for key in status_data:
+            status = status_data[key]
+            job = cached_data.get(key)
+            if (job is not None and 'EnteredCurrentStatus' in status and
+                    job.get('EnteredCurrentStatus') == status['EnteredCurrentStatus'] and
+                    job.get('JobStatus') == status.get('JobStatus')):
+                job = dict(job)
+                for attr in DERIVED_ATTRS:
+                    job.pop(attr, None)
+                if 'ServerTime' in status:
+                    job['ServerTime'] = status['ServerTime']
+                data[key] = job
+            else:
+                misses.append(key)
+
+        stats = {'hits': len(data), 'misses': len(misses), 'full': 0}
+        if misses:
+            if [key for key in misses if 'EnteredCurrentStatus' not in status_data[key]]:
+                # cannot constrain on the status change time
+                stats['full'] = 1
+                delta_constraint = constraint
+            else:
+                min_entered = min([status_data[key]['EnteredCurrentStatus'] for key in misses])
+                delta_constraint = "(%s) && (EnteredCurrentStatus >= %i)" % (constraint, min_entered)
+            delta_data = condorq.fetch(delta_constraint, format_list)
+            for key in misses:
+                # jobs leaving the queue between the queries are not in delta_data
+                if key in delta_data:
+                    data[key] = delta_data[key]
+        return data, stats
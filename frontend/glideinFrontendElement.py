@@ -42,6 +42,10 @@ from glideinwms.lib.pidSupport import register_sighandler
 from glideinwms.frontend import glideinFrontendConfig
 from glideinwms.frontend import glideinFrontendInterface
 from glideinwms.frontend import glideinFrontendLib
+from glideinwms.frontend import glideinFrontendMatchEngine
+from glideinwms.frontend import glideinFrontendMatchCache
+from glideinwms.frontend import glideinFrontendMatchCosts
+from glideinwms.frontend import glideinFrontendCondorQCache
 from glideinwms.frontend import glideinFrontendPidLib
 from glideinwms.frontend import glideinFrontendMonitoring
 from glideinwms.frontend import glideinFrontendPlugins
@@ -158,6 +162,28 @@ class glideinFrontendElement:
         self.global_total_curb_vms_idle = int(self.elementDescript.frontend_data['CurbIdleVMsTotalGlobal'])
 
         self.max_matchmakers = int(self.elementDescript.element_data['MaxMatchmakers'])
+        # Older configurations do not have MatchEngine, default to the classic countMatch
+        self.match_engine = self.elementDescript.element_data.get('MatchEngine', 'classic')
+        self.columnar_storage = (self.elementDescript.element_data.get('ColumnarStorage', 'False') in ('True', '1'))
+        # If enabled, the schedd queries are cached and only the jobs that changed status are queried
+        # The cache is saved in the group work dir for the next iteration
+        self.condorq_cache = None
+        condorq_cache_full_refresh = int(self.elementDescript.element_data.get('CondorQCacheFullRefresh', '0'))
+        if condorq_cache_full_refresh > 0:
+            self.condorq_cache = glideinFrontendCondorQCache.CondorQCache(
+                condorq_cache_full_refresh,
+                os.path.join(glideinFrontendConfig.get_group_dir(self.work_dir, self.group_name),
+                             glideinFrontendConfig.frontendConfig.condorq_cache_file))
+            self.condorq_cache.load()
+        # If enabled, the match results of the entries and job clusters are reused in the following iterations
+        # The cache is saved in the history_obj
+        self.match_cache = None
+        if self.elementDescript.element_data.get('MatchCache', 'False') in ('True', '1'):
+            self.match_cache = glideinFrontendMatchCache.MatchCache()
+            self.match_cache.setState(self.history_obj.get('match_cache'))
+        # Timings of the matchmaking children, used to split the work of the following iterations
+        # The unit costs are updated in the history_obj, saved at the end of the iteration
+        self.match_costs = glideinFrontendMatchCosts.MatchCosts(unit_costs=self.history_obj['match_unit_costs'])
 
         self.removal_type = self.elementDescript.element_data['RemovalType']
         self.removal_wait = int(self.elementDescript.element_data['RemovalWait'])
@@ -432,6 +458,9 @@ class glideinFrontendElement:
             # collector dealt with outside the loop because there is only one
             # nothing else left
 
+        if self.condorq_cache is not None:
+            self.store_condorq_cache()
+
         (self.status_dict, self.fe_counts, self.global_counts, self.status_schedd_dict) = pipe_out[('collector', 0)]
 
         # M2Crypto objects are not picklable, so do the transforamtion here
@@ -459,8 +488,14 @@ class glideinFrontendElement:
                    condorq_dict_types['VomsIdle']['abs'],
                    condorq_dict_types['Running']['abs']))
         self.populate_status_dict_types()
-        glideinFrontendLib.appendRealRunning(self.condorq_dict_running,
-                                             self.status_dict_types['Running']['dict'])
+        servicePerformance.startPerfMetricEvent(self.group_name, 'append_real_running')
+        join_stats = glideinFrontendLib.appendRealRunning(self.condorq_dict_running,
+                                                          self.status_dict_types['Running']['dict'])
+        servicePerformance.endPerfMetricEvent(self.group_name, 'append_real_running')
+        servicePerformance.setPerfMetricCounter(self.group_name, 'real_running_matched', join_stats['matched'])
+        servicePerformance.setPerfMetricCounter(self.group_name, 'real_running_unknown', join_stats['unknown'])
+        logSupport.log.info("Running jobs: %(matched)i on known glidein slots (%(slots)i slots), %(unknown)i unknown" %
+                            join_stats)
 
         self.stats['group'].logGlideins({
              'Total': self.status_dict_types['Total']['abs'],
@@ -537,6 +572,18 @@ class glideinFrontendElement:
 
         # extract only the attribute names from format list
         self.condorq_match_list = [f[0] for f in self.elementDescript.merged_data['JobMatchAttrs']]
+        signature_table = None
+        if self.match_cache is not None:
+            if self.match_cache.setConfig(self.elementDescript.merged_data['MatchExpr'], self.condorq_match_list,
+                                          self.attr_dict, self.elementDescript.merged_data['MatchPolicyModules']):
+                logSupport.log.info("Match configuration changed, the match cache is empty")
+            self.match_cache.setGlideins(self.glidein_dict)
+            # keep the same signatures of the previous iterations
+            signature_table = self.match_cache.signature_table
+        # cluster the jobs once, the signatures are shared by all the matchmaking children
+        nr_signatures = glideinFrontendLib.computeJobSignatures(self.condorq_dict, self.condorq_match_list,
+                                                                signature_table)
+        logSupport.log.debug("Jobs grouped in %i clusters" % nr_signatures)
 
         servicePerformance.startPerfMetricEvent(self.group_name, 'matchmaking')
         self.do_match()
@@ -917,110 +964,45 @@ class glideinFrontendElement:
 
 
     def populate_condorq_dict_types(self):
-        # create a dictionary that does not contain the blacklisted schedds
-        good_condorq_dict=self.condorq_dict.copy() #simple copy enough, will only modify keys
-        for k in self.blacklist_schedds:
-            if k in good_condorq_dict: # some schedds may not have returned anything
-                del good_condorq_dict[k]
-        # use only the good schedds when considering idle
-        condorq_dict_idle = glideinFrontendLib.getIdleCondorQ(good_condorq_dict)
-        condorq_dict_idle_600 = glideinFrontendLib.getOldCondorQ(condorq_dict_idle, 600)
-        condorq_dict_idle_3600 = glideinFrontendLib.getOldCondorQ(condorq_dict_idle, 3600)
-        condorq_dict_proxy = glideinFrontendLib.getIdleProxyCondorQ(condorq_dict_idle)
-        condorq_dict_voms = glideinFrontendLib.getIdleVomsCondorQ(condorq_dict_idle)
-
-        # then report how many we really had
-        condorq_dict_idle_all = glideinFrontendLib.getIdleCondorQ(self.condorq_dict)
-
-        self.condorq_dict_running = glideinFrontendLib.getRunningCondorQ(self.condorq_dict)
-
-        self.condorq_dict_types = {
-            'IdleAll': {
-                'dict':condorq_dict_idle_all,
-                'abs':glideinFrontendLib.countCondorQ(condorq_dict_idle_all)
-            },
-            'Idle': {
-                'dict':condorq_dict_idle,
-                'abs':glideinFrontendLib.countCondorQ(condorq_dict_idle)
-            },
-            #idle 600s or more
-            'OldIdle': {
-                'dict':condorq_dict_idle_600,
-                'abs':glideinFrontendLib.countCondorQ(condorq_dict_idle_600)
-            },
-            #idle 3600s or more
-            'Idle_3600': {
-                'dict':condorq_dict_idle_3600,
-                'abs':glideinFrontendLib.countCondorQ(condorq_dict_idle_3600)
-            },
-            'VomsIdle': {
-                'dict':condorq_dict_voms,
-                'abs':glideinFrontendLib.countCondorQ(condorq_dict_voms)},
-            'ProxyIdle': {
-                'dict':condorq_dict_proxy,
-                'abs':glideinFrontendLib.countCondorQ(condorq_dict_proxy)
-            },
-            'Running': {
-                'dict':self.condorq_dict_running,
-                'abs':glideinFrontendLib.countCondorQ(self.condorq_dict_running)
-            }
-        }
+        # use only the good schedds (not blacklisted) when considering idle
+        # IdleAll reports how many we really had
+        # a single pass on the jobs for all the types, see glideinFrontendLib.CONDORQ_CATEGORIES
+        good_schedds = set(self.condorq_dict.keys()) - set(self.blacklist_schedds)
+        self.condorq_dict_types = glideinFrontendLib.classifyCondorQ(self.condorq_dict, good_schedds)
+        self.condorq_dict_running = self.condorq_dict_types['Running']['dict']
 
     def populate_status_dict_types(self):
-        # dict with static + pslot
-        status_dict_non_dynamic = glideinFrontendLib.getCondorStatusNonDynamic(self.status_dict)
-
-        # dict with idle static + idle pslot
-        status_dict_idle = glideinFrontendLib.getIdleCondorStatus(self.status_dict)
-
-        # dict with static + dynamic + pslot_with_dyanmic_slot
-        status_dict_running = glideinFrontendLib.getRunningCondorStatus(self.status_dict)
-
-        # dict with pslot_with_dyanmic_slot
-        status_dict_running_pslot = glideinFrontendLib.getRunningPSlotCondorStatus(self.status_dict)
-
-        # dict with failed slots
-        status_dict_failed = glideinFrontendLib.getFailedCondorStatus(self.status_dict)
-
         # Dict of dict containing sub-dicts and counts for slots in
-        # different states
-        self.status_dict_types = {
-            'Total': {
-                'dict': self.status_dict,
-                'abs': glideinFrontendLib.countCondorStatus(self.status_dict)
-            },
-            'Idle': {
-                'dict': status_dict_idle,
-                'abs': glideinFrontendLib.countCondorStatus(status_dict_idle)
-            },
-            # For Running, consider static + dynamic + pslot_with_dyanmic_slot
-            # We do this so comparison with the job classad's RemoteHost
-            # can be easily done with the p-slot at the later stage in
-            # appendRealRunning(condor_q_dict, status_dict)
-            # However, while counting we exclude the p-slots that have
-            # one or more dynamic slots
-            'Running': {
-                'dict': status_dict_running,
-                'abs': glideinFrontendLib.countCondorStatus(status_dict_running) - glideinFrontendLib.countCondorStatus(status_dict_running_pslot)
-            },
-            'Failed': {
-                'dict': status_dict_failed,
-                'abs': glideinFrontendLib.countCondorStatus(status_dict_failed)
-            },
-            'TotalCores': {
-                'dict': status_dict_non_dynamic,
-                'abs': glideinFrontendLib.countTotalCoresCondorStatus(status_dict_non_dynamic)
-            },
-            'IdleCores': {
-                'dict': status_dict_idle,
-                'abs': glideinFrontendLib.countIdleCoresCondorStatus(status_dict_idle)
-            },
-            'RunningCores': {
-                'dict': status_dict_running,
-                'abs': glideinFrontendLib.countRunningCoresCondorStatus(status_dict_running)
-            }
-        }
-
+        # different states, classified with a single pass on the slots
+        # For Running, consider static + dynamic + pslot_with_dyanmic_slot
+        # We do this so comparison with the job classad's RemoteHost
+        # can be easily done with the p-slot at the later stage in
+        # appendRealRunning(condor_q_dict, status_dict)
+        # However, while counting we exclude the p-slots that have
+        # one or more dynamic slots
+        self.status_dict_types = glideinFrontendLib.classifyCondorStatus(self.status_dict)
+
+        # Counts of the slots of each request, also by credential,
+        # used by subprocess_count_glidein and count_factory_entries_without_classads
+        (self.status_counts_per_request,
+         self.status_counts_per_request_cred) = glideinFrontendLib.countCondorStatusPerRequest(
+            self.status_dict, self.frontend_name, self.group_name)
+
+    def get_request_status_counts(self, request_name, cred_id=None):
+        """Slot counts of a request, or of a credential of the request
+
+        :param request_name: name of the request (entry@glidein@factory)
+        :param cred_id: credential id, None for all the slots of the request
+        :return: dictionary state -> count, with all the states in glideinFrontendLib.CONDOR_STATUS_TYPES
+        """
+        if cred_id is None:
+            counts = self.status_counts_per_request.get(request_name, {})
+        else:
+            counts = self.status_counts_per_request_cred.get(request_name, {}).get(cred_id, {})
+        out = {}
+        for st in glideinFrontendLib.CONDOR_STATUS_TYPES:
+            out[st] = counts.get(st, 0)
+        return out
 
     def build_resource_classad(self, this_stats_arr, request_name,
                                glidein_el, glidein_in_downtime,
@@ -1436,24 +1418,7 @@ class glideinFrontendElement:
             if glideid_str in processed_glideid_str_set:
                 continue # already processed... ignore
 
-            self.count_status_multi[request_name]={}
-            for st in self.status_dict_types:
-                c = glideinFrontendLib.getClientCondorStatus(
-                        self.status_dict_types[st]['dict'],
-                        self.frontend_name, self.group_name, request_name)
-                if st in ('TotalCores', 'IdleCores', 'RunningCores'):
-                    self.count_status_multi[request_name][st] = \
-                        glideinFrontendLib.countCoresCondorStatus(c, st)
-                elif st == 'Running':
-                    # Running counts are computed differently because of
-                    # the dict composition. Dict also has p-slots
-                    # corresponding to the dynamic slots
-                    self.count_status_multi[request_name][st] = \
-                        glideinFrontendLib.countRunningCondorStatus(c)
-                else:
-                    self.count_status_multi[request_name][st] = \
-                        glideinFrontendLib.countCondorStatus(c)
-
+            self.count_status_multi[request_name] = self.get_request_status_counts(request_name)
             count_status = self.count_status_multi[request_name]
 
             # ignore matching jobs
@@ -1653,13 +1618,33 @@ class glideinFrontendElement:
             condorq_dict = glideinFrontendLib.getCondorQ(
                                [schedd_name],
                                expand_DD(self.elementDescript.merged_data['JobQueryExpr'], self.attr_dict),
-                               condorq_format_list)
+                               condorq_format_list,
+                               columnar_storage=self.columnar_storage,
+                               condorq_cache=self.condorq_cache)
         except Exception:
             logSupport.log.exception("In query schedd child, exception:")
 
         return condorq_dict
 
 
+    def store_condorq_cache(self):
+        """Save the jobs in the condor_q cache for the next iteration and record the cache statistics
+        """
+        counters = {'condorq_cache_hits': 0, 'condorq_cache_misses': 0, 'condorq_cache_full_queries': 0}
+        for schedd_name in self.condorq_dict:
+            stats = self.condorq_cache.store(schedd_name, self.condorq_dict[schedd_name])
+            if stats is not None:
+                counters['condorq_cache_hits'] += stats['hits']
+                counters['condorq_cache_misses'] += stats['misses']
+                counters['condorq_cache_full_queries'] += stats['full']
+        # Saved before the frontend adds attributes to the jobs (appendRealRunning)
+        self.condorq_cache.save()
+        for counter in counters:
+            servicePerformance.setPerfMetricCounter(self.group_name, counter, counters[counter])
+        logSupport.log.info("condor_q cache: %(condorq_cache_hits)i jobs reused, %(condorq_cache_misses)i jobs queried, "
+                            "%(condorq_cache_full_queries)i full queries" % counters)
+
+
     def get_condor_status(self):
 
         # All slots for this group
@@ -1708,7 +1693,8 @@ class glideinFrontendElement:
             status_dict = glideinFrontendLib.getCondorStatus(
                               [None],
                               constraint=constraint,
-                              format_list=status_format_list)
+                              format_list=status_format_list,
+                              columnar_storage=self.columnar_storage)
 
             # Also get all the classads for the whole FE for counting
             # do it in the same thread, as we are hitting the same collector
@@ -1820,25 +1806,41 @@ class glideinFrontendElement:
         :return:
         """
 
-        # IS: Heuristics of 100 glideins per fork
-        #     Based on times seen by CMS
-        glideins_per_fork = 100
-
+        # Work units of the tasks, the cost of each unit comes from the timings
+        # of the previous iterations (self.match_costs)
+        # - each condorq_dict_types bucket is matched against all the entries
+        # - the real running jobs are clustered and then joined with the entries
+        # - the glideins of each entry are counted from the per request slot counts
         glidein_list = self.glidein_dict.keys()
-        # split the list in equal pieces
-        # the result is a list of lists
-        split_glidein_list = [glidein_list[i:i+glideins_per_fork]
-                              for i in range(0, len(glidein_list), glideins_per_fork)]
-
-        forkm_obj = ForkManager()
-
+        nr_entries = len(glidein_list)
+        task_units = {'Real': self.condorq_dict_types['Running']['abs'] + nr_entries}
+        for dt in self.condorq_dict_types:
+            task_units[dt] = self.condorq_dict_types[dt]['abs'] * nr_entries
+        task_costs = {}
+        for key in task_units:
+            task_costs[key] = self.match_costs.estimate(glideinFrontendMatchCosts.getTaskKind(key), task_units[key])
+        entry_cost = self.match_costs.getUnitCost(glideinFrontendMatchCosts.GLIDEIN_KIND)
+        fork_order, split_glidein_list, task_costs, predicted_imbalance = glideinFrontendMatchCosts.planMatchWork(
+            task_costs, glidein_list, entry_cost, self.max_matchmakers)
         for i in range(len(split_glidein_list)):
-            forkm_obj.add_fork(('Glidein', i), self.subprocess_count_glidein, split_glidein_list[i])
+            task_units[(glideinFrontendMatchCosts.GLIDEIN_KIND, i)] = len(split_glidein_list[i])
+        logSupport.log.info("Matchmaking: %i tasks (%i chunks of entries) on %i matchmakers, "
+                            "expected %.2f seconds, predicted imbalance %.2f" %
+                            (len(fork_order), len(split_glidein_list), self.max_matchmakers,
+                             glideinFrontendMatchCosts.getMakespan([task_costs[k] for k in fork_order],
+                                                                   self.max_matchmakers),
+                             predicted_imbalance))
 
-        forkm_obj.add_fork('Real', self.subprocess_count_real)
+        forkm_obj = ForkManager()
 
-        for dt in self.condorq_dict_types:
-            forkm_obj.add_fork(dt, self.subprocess_count_dt, dt)
+        # longest tasks first, the matchmakers free at the end take the short ones
+        for key in fork_order:
+            if key == 'Real':
+                forkm_obj.add_fork('Real', self.subprocess_count_real)
+            elif key in self.condorq_dict_types:
+                forkm_obj.add_fork(key, self.subprocess_count_dt, key)
+            else:
+                forkm_obj.add_fork(key, self.subprocess_count_glidein, split_glidein_list[key[1]])
 
         try:
             t_begin = time.time()
@@ -1849,10 +1851,16 @@ class glideinFrontendElement:
             logSupport.log.exception("Terminating iteration due to errors:")
             return
         logSupport.log.info("All children terminated - took %s seconds" % t_end)
+        self.update_match_costs(forkm_obj.timings, task_units, t_end, predicted_imbalance)
 
         for dt, el in self.condorq_dict_types.iteritems():
             # c, p, h, pmc, t returned by  subprocess_count_dt(self, dt)
-            (el['count'], el['prop'], el['hereonly'], el['prop_mc'], el['total']) = pipe_out[dt]
+            (el['count'], el['prop'], el['hereonly'], el['prop_mc'], el['total']) = pipe_out[dt][:5]
+            if self.match_cache is not None:
+                # the new match results are appended when the match cache is enabled
+                self.match_cache.mergeChildResults(pipe_out[dt][5])
+        if self.match_cache is not None:
+            self.update_match_cache()
 
         (self.count_real_jobs, self.count_real_glideins) = pipe_out['Real']
         self.count_status_multi = {}
@@ -1870,8 +1878,29 @@ class glideinFrontendElement:
             self.glexec=self.elementDescript.merged_data['GLIDEIN_Glexec_Use']
 
 
+    def update_match_costs(self, timings, task_units, t_end, predicted_imbalance):
+        """Add the timings of the matchmaking children to the cost model and log the actual imbalance
+
+        :param timings: dictionary fork key -> seconds taken by the child
+        :param task_units: dictionary fork key -> work units of the task
+        :param t_end: seconds taken by all the children
+        :param predicted_imbalance: imbalance predicted by glideinFrontendMatchCosts.planMatchWork
+        """
+        if not timings:
+            return
+        for key in timings:
+            self.match_costs.update(glideinFrontendMatchCosts.getTaskKind(key), task_units.get(key, 0), timings[key])
+        actual_imbalance = glideinFrontendMatchCosts.getImbalance(t_end, sum(timings.values()),
+                                                                  self.max_matchmakers)
+        servicePerformance.setPerfMetricCounter(self.group_name, 'match_imbalance_predicted', predicted_imbalance)
+        servicePerformance.setPerfMetricCounter(self.group_name, 'match_imbalance_actual', actual_imbalance)
+        longest_key = max(timings.keys(), key=lambda k: timings[k])
+        logSupport.log.info("Matchmaking imbalance: actual %.2f, predicted %.2f (longest task %s, %.2f seconds)" %
+                            (actual_imbalance, predicted_imbalance, longest_key, timings[longest_key]))
+
     def subprocess_count_dt(self, dt):
         """Count the matches (glideins matching entries) using glideinFrontendLib.countMatch
+        or glideinFrontendMatchEngine.countMatch, depending on the match_engine setting
         Will make calculations in parallel, using multiple processes
 
         :param dt: index within the data dictionary
@@ -1880,7 +1909,15 @@ class glideinFrontendElement:
 
         out = ()
 
-        c, p, h, pmc = glideinFrontendLib.countMatch(
+        engine_args = {}
+        if self.match_engine == 'vectorized':
+            count_match = glideinFrontendMatchEngine.countMatch
+            # the expression string is needed to evaluate it by columns
+            engine_args['match_expr'] = self.elementDescript.merged_data['MatchExpr']
+        else:
+            count_match = glideinFrontendLib.countMatch
+
+        c, p, h, pmc = count_match(
                         self.elementDescript.merged_data['MatchExprCompiledObj'],
                         self.condorq_dict_types[dt]['dict'],
                         self.glidein_dict,
@@ -1888,17 +1925,33 @@ class glideinFrontendElement:
                         self.ignore_down_entries,
                         self.condorq_match_list,
                         match_policies=self.elementDescript.merged_data['MatchPolicyModules'],
+                        match_cache=self.match_cache,
 # This is the line to enable if you want the frontend to dump data structures during countMatch
 # You can then use the profile_frontend.py script to execute the countMatch function with real data
 # Data will be saved into /tmp/frontend_dump/ . Make sure to create the dir beforehand.
-#                        group_name=self.group_name
+#                        group_name=self.group_name,
+                        **engine_args
                         )
         t = glideinFrontendLib.countCondorQ(self.condorq_dict_types[dt]['dict'])
 
         out = (c, p, h, pmc, t)
+        if self.match_cache is not None:
+            out += (self.match_cache.getChildResults(),)
 
         return out
 
+    def update_match_cache(self):
+        """Remove the entries and job clusters not seen in this iteration from the match cache,
+        keep it in the history for the next iteration and record the cache statistics
+        """
+        self.match_cache.prune(self.condorq_dict, self.condorq_match_list)
+        # saved at the end of the iteration, with the rest of the history_obj
+        self.history_obj['match_cache'] = self.match_cache.getState()
+        servicePerformance.setPerfMetricCounter(self.group_name, 'match_cache_hits', self.match_cache.hits)
+        servicePerformance.setPerfMetricCounter(self.group_name, 'match_cache_misses', self.match_cache.misses)
+        logSupport.log.info("Match cache: %i matches reused, %i evaluated" % (self.match_cache.hits,
+                                                                             self.match_cache.misses))
+
     def subprocess_count_real(self):
         """Count the jobs running on the glideins for these requests using glideinFrontendLib.countRealRunning
         Will make calculations in parallel,using multiple processes
@@ -1929,54 +1982,14 @@ class glideinFrontendElement:
         for glideid in glidein_list:
             request_name = glideid[1]
 
-            count_status_multi[request_name] = {}
+            # the slots are already counted by request and credential
+            # (populate_status_dict_types), no need to filter them again
+            count_status_multi[request_name] = self.get_request_status_counts(request_name)
             count_status_multi_per_cred[request_name] = {}
             for cred in self.x509_proxy_plugin.cred_list:
-                count_status_multi_per_cred[request_name][cred.getId()] = {}
-
-            # It is cheaper to get Idle and Running from request-only
-            # classads then filter out requests from Idle and Running
-            # glideins
-            total_req_dict = glideinFrontendLib.getClientCondorStatus(
-                        self.status_dict_types['Total']['dict'],
-                        self.frontend_name, self.group_name, request_name)
-
-            req_dict_types = {
-                'Total': total_req_dict,
-                'Idle': glideinFrontendLib.getIdleCondorStatus(total_req_dict),
-                'Running': glideinFrontendLib.getRunningCondorStatus(total_req_dict),
-                'Failed': glideinFrontendLib.getFailedCondorStatus(total_req_dict),
-                'TotalCores': glideinFrontendLib.getCondorStatusNonDynamic(total_req_dict),
-                'IdleCores': glideinFrontendLib.getIdleCoresCondorStatus(total_req_dict),
-                'RunningCores': glideinFrontendLib.getRunningCoresCondorStatus(total_req_dict),
-            }
-
-            for st in req_dict_types:
-                req_dict = req_dict_types[st]
-                if st in ('TotalCores', 'IdleCores', 'RunningCores'):
-                    count_status_multi[request_name][st]=glideinFrontendLib.countCoresCondorStatus(req_dict, st)
-                elif st == 'Running':
-                    # Running counts are computed differently because of
-                    # the dict composition. Dict also has p-slots
-                    # corresponding to the dynamic slots
-                    count_status_multi[request_name][st] = \
-                        glideinFrontendLib.countRunningCondorStatus(req_dict)
-                else:
-                    count_status_multi[request_name][st]=glideinFrontendLib.countCondorStatus(req_dict)
-
-                for cred in self.x509_proxy_plugin.cred_list:
-                    cred_id=cred.getId()
-                    cred_dict = glideinFrontendLib.getClientCondorStatusCredIdOnly(req_dict, cred_id)
-
-                    if st in ('TotalCores', 'IdleCores', 'RunningCores'):
-                        count_status_multi_per_cred[request_name][cred_id][st] = glideinFrontendLib.countCoresCondorStatus(cred_dict, st)
-                    elif st == 'Running':
-                        # Running counts are computed differently because of
-                        # the dict composition. Dict also has p-slots
-                        # corresponding to the dynamic slots
-                        count_status_multi_per_cred[request_name][cred_id][st] = glideinFrontendLib.countRunningCondorStatus(cred_dict)
-                    else:
-                        count_status_multi_per_cred[request_name][cred_id][st] = glideinFrontendLib.countCondorStatus(cred_dict)
+                cred_id = cred.getId()
+                count_status_multi_per_cred[request_name][cred_id] = self.get_request_status_counts(request_name,
+                                                                                                    cred_id)
 
         out = (count_status_multi, count_status_multi_per_cred)
 
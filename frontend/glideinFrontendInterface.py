@@ -1612,6 +1612,10 @@ class FrontendMonitorClassad(classadSupport.Classad):
             attr_name = '%s_%s_%s' % (frontendConfig.glidein_perfmetric_prefix,
                                       perf_metrics.name, event)
             self.adParams[attr_name] = perf_metrics.event_lifetime(event)
+        for counter in getattr(perf_metrics, 'counters', {}):
+            attr_name = '%s_%s_%s' % (frontendConfig.glidein_perfmetric_prefix,
+                                      perf_metrics.name, counter)
+            self.adParams[attr_name] = perf_metrics.counters[counter]
 
 
 class FrontendMonitorClassadAdvertiser(classadSupport.ClassadAdvertiser):
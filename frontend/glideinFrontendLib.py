@@ -32,9 +32,12 @@ from glideinwms.lib import condorMonitor, logSupport
 #
 # If not all the jobs of the schedd has to be considered,
 # specify the appropriate constraint
+# With columnar_storage, the jobs are stored in a condorMonitor.ColumnarResult
+# and the subqueries (getIdleCondorQ, ...) are views of it
 #
 def getCondorQ(schedd_names, constraint=None, format_list=None,
-               want_format_completion=True, job_status_filter=(1, 2)):
+               want_format_completion=True, job_status_filter=(1, 2), columnar_storage=False,
+               condorq_cache=None):
     if format_list is not None:
         if want_format_completion:
             format_list = condorMonitor.complete_format_list(
@@ -51,7 +54,8 @@ def getCondorQ(schedd_names, constraint=None, format_list=None,
             js_arr.append('(JobStatus=?=%i)'%n)
         js_constraint = string.join(js_arr, '||')
 
-    return getCondorQConstrained(schedd_names, js_constraint, constraint, format_list)
+    return getCondorQConstrained(schedd_names, js_constraint, constraint, format_list, columnar_storage,
+                                 condorq_cache)
 
 
 def getIdleVomsCondorQ(condorq_dict):
@@ -102,45 +106,140 @@ def getRunningCondorQ(condorq_dict):
     return out
 
 
-def appendRealRunning(condorq_dict, status_dict):
+# Job categories of classifyCondorQ and the constraint of each one
+# The Idle* categories other than IdleAll include only the jobs of the good schedds
+CONDORQ_CATEGORIES = {
+    'IdleAll': lambda el: el.get('JobStatus') == 1,
+    'Idle': lambda el: el.get('JobStatus') == 1,
+    # idle 600s or more
+    'OldIdle': lambda el: ((el.get('JobStatus') == 1) and ('ServerTime' in el and 'EnteredCurrentStatus' in el) and
+                           ((el['ServerTime'] - el['EnteredCurrentStatus']) >= 600)),
+    # idle 3600s or more
+    'Idle_3600': lambda el: ((el.get('JobStatus') == 1) and ('ServerTime' in el and 'EnteredCurrentStatus' in el) and
+                             ((el['ServerTime'] - el['EnteredCurrentStatus']) >= 3600)),
+    'ProxyIdle': lambda el: (el.get('JobStatus') == 1) and ('x509userproxy' in el),
+    'VomsIdle': lambda el: (el.get('JobStatus') == 1) and ('x509UserProxyFirstFQAN' in el),
+    'Running': lambda el: el.get('JobStatus') == 2}
+
+
+def classifyCondorQ(condorq_dict, good_schedds=None):
+    """Put the jobs in all the categories (CONDORQ_CATEGORIES) at once, with a single pass on the jobs of each schedd
+    Same results as getIdleCondorQ, getOldCondorQ, getIdleProxyCondorQ, getIdleVomsCondorQ and getRunningCondorQ,
+    without scanning the jobs once per category.
+    The jobs are not copied, each category of a schedd is a SubQuery storing a view on the schedd data
+    (condorMonitor.selectKeys), and the jobs are counted during the pass
+
+    :param condorq_dict: dictionary: sched_name->CondorQ object
+    :param good_schedds: schedds to use for the Idle* categories other than IdleAll, all if None
+    :return: dictionary category -> {'dict': dictionary sched_name->SubQuery, 'abs': number of jobs}
+    """
+    out = {}
+    for category in CONDORQ_CATEGORIES:
+        out[category] = {'dict': {}, 'abs': 0}
+    for schedd_name in condorq_dict.keys():
+        condorq = condorq_dict[schedd_name]
+        condorq_data = condorq.fetchStored()
+        is_good = (good_schedds is None) or (schedd_name in good_schedds)
+        idle_all = []
+        idle = []
+        idle_600 = []
+        idle_3600 = []
+        idle_proxy = []
+        idle_voms = []
+        running = []
+        for jid, job in condorq_data.iteritems():
+            job_status = job.get('JobStatus')
+            if job_status == 1:
+                idle_all.append(jid)
+                if not is_good:
+                    continue
+                idle.append(jid)
+                if 'ServerTime' in job and 'EnteredCurrentStatus' in job:
+                    idle_time = job['ServerTime'] - job['EnteredCurrentStatus']
+                    if idle_time >= 600:
+                        idle_600.append(jid)
+                        if idle_time >= 3600:
+                            idle_3600.append(jid)
+                if 'x509userproxy' in job:
+                    idle_proxy.append(jid)
+                if 'x509UserProxyFirstFQAN' in job:
+                    idle_voms.append(jid)
+            elif job_status == 2:
+                running.append(jid)
+
+        categories = [('IdleAll', idle_all), ('Running', running)]
+        if is_good:
+            categories += [('Idle', idle), ('OldIdle', idle_600), ('Idle_3600', idle_3600),
+                           ('ProxyIdle', idle_proxy), ('VomsIdle', idle_voms)]
+        for category, jids in categories:
+            # the constraint is kept, so that the subquery can be reloaded
+            sq = condorMonitor.SubQuery(condorq, CONDORQ_CATEGORIES[category])
+            sq.stored_data = condorMonitor.selectKeys(condorq_data, jids)
+            out[category]['dict'][schedd_name] = sq
+            out[category]['abs'] += len(jids)
+    return out
+
+
+def getRunningOnMap(status_dict):
+    """Map the names of the glidein slots to the provenance of the jobs running there ('RunningOn')
+    The map is built once for all the jobs (see appendRealRunning). If the same slot is
+    in more collectors, the first one is used. Slots without the glidein attributes are not included.
+    The slots of the same entry and factory schedd share the same RunningOn string
+
+    :param status_dict: running glideins from condor_status, keyed by collector name
+    :return: dictionary slot name -> 'Entry@GlideinName@Factory@FactoryPool'
+    """
+    running_on_map = {}
+    # (entry, glidein name, factory, schedd) -> RunningOn
+    running_on_strs = {}
+    for collector_name in status_dict:
+        condor_status = status_dict[collector_name].fetchStored()
+        for slot_name in condor_status:
+            if slot_name in running_on_map:
+                continue
+            slot = condor_status[slot_name]
+            try:
+                key = (slot['GLIDEIN_Entry_Name'], slot['GLIDEIN_Name'], slot['GLIDEIN_Factory'], slot['GLIDEIN_Schedd'])
+            except KeyError:
+                continue  # not a glidein, the jobs running there will be UNKNOWN
+            if key not in running_on_strs:
+                # there is currently no way to get the factory
+                # collector from condor status so this hack grabs
+                # the hostname of the schedd
+                # split by : to remove port number if there
+                fact_pool = key[3].split('@')[-1].split(':')[0]
+                running_on_strs[key] = "%s@%s@%s@%s" % (key[0], key[1], key[2], fact_pool)
+            running_on_map[slot_name] = running_on_strs[key]
+    return running_on_map
+
+
+def appendRealRunning(condorq_dict, status_dict, running_on_map=None):
     """Adds provenance information from condor_status to the condor_q dictionary
     The name of static or pslots is the value of RemoteHost
     NOTE: HTC 8.5 may change RemoteHost to be the DynamicSlot name
+    The jobs are joined in one pass with the map of the slots (getRunningOnMap)
 
     :param condorq_dict: adding 'RunningOn' to each job
     :param status_dict: running jobs from condor_status
-    :return:
+    :param running_on_map: map slot name -> RunningOn, from getRunningOnMap(status_dict), computed if None
+    :return: dictionary with the join statistics: 'matched' and 'unknown' jobs, 'slots' in the map
     """
+    if running_on_map is None:
+        running_on_map = getRunningOnMap(status_dict)
+    matched = 0
+    unknown = 0
     for schedd_name in condorq_dict:
         condorq = condorq_dict[schedd_name].fetchStored()
-
         for jid in condorq:
-            found = False
-
-            if 'RemoteHost' in condorq[jid]:
-                remote_host = condorq[jid]['RemoteHost']
-
-                for collector_name in status_dict:
-                    condor_status = status_dict[collector_name].fetchStored()
-                    if remote_host in condor_status:
-                        # there is currently no way to get the factory
-                        # collector from condor status so this hack grabs
-                        # the hostname of the schedd
-                        schedd = condor_status[remote_host]['GLIDEIN_Schedd'].split('@')
-
-                        # split by : to remove port number if there
-                        fact_pool = schedd[-1].split(':')[0]
-
-                        condorq[jid]['RunningOn'] = "%s@%s@%s@%s" % (
-                            condor_status[remote_host]['GLIDEIN_Entry_Name'],
-                            condor_status[remote_host]['GLIDEIN_Name'],
-                            condor_status[remote_host]['GLIDEIN_Factory'],
-                            fact_pool)
-                        found = True
-                        break
-
-            if not found:
-                condorq[jid]['RunningOn'] = 'UNKNOWN'
+            job = condorq[jid]
+            running_on = running_on_map.get(job.get('RemoteHost'))
+            if running_on is None:
+                job['RunningOn'] = 'UNKNOWN'
+                unknown += 1
+            else:
+                job['RunningOn'] = running_on
+                matched += 1
+    return {'matched': matched, 'unknown': unknown, 'slots': len(running_on_map)}
 
 
 #
@@ -203,7 +302,7 @@ def getCondorQUsers(condorq_dict):
 #    return schedd_count, cpu_schedd_count, first_t
 
 def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_entries,
-               condorq_match_list=None, match_policies=[], group_name=None):
+               condorq_match_list=None, match_policies=[], group_name=None, match_cache=None):
     """
     Get the number of jobs that match each glidein
     
@@ -214,6 +313,8 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
     :param glidein_dict: output of interface.findGlideins
     :param attr_dict:  dictionary of constant attributes
     :param condorq_match_list: list of job attributes from the XML file
+    :param match_cache: glideinFrontendMatchCache.MatchCache with the results of the previous iterations,
+        used only with the job signatures computed with its signature_table
 
     :return: tuple of 4 elements, where first 3 are a dictionary of
         glidein name where elements are number of jobs matching
@@ -233,29 +334,11 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
     # This was used to save real data from the CMS frontend and improve the speed of this function
     # See https://cdcvs.fnal.gov/redmine/issues/20302
     if group_name:
-        mydir = "/tmp/frontend_dump/" + group_name
-        try:
-            os.mkdir(mydir)
-        except:
-            pass
-        with open(mydir+'/glidein_dict.pickle', 'w') as fd:
-            pickle.dump(glidein_dict, fd)
-        with open(mydir+'/attr_dict.pickle', 'w') as fd:
-            pickle.dump(attr_dict, fd)
-        with open(mydir+'/condorq_match_list.pickle', 'w') as fd:
-            pickle.dump(condorq_match_list, fd)
-        for schedd in condorq_dict.keys():
-            pickle.dump(condorq_dict[schedd].fetchStored(), open(mydir+'/condorq_dict_%s.pickle' % schedd, 'w'))
+        dumpMatchData(group_name, condorq_dict, glidein_dict, attr_dict, condorq_match_list)
 
     out_glidein_counts={}
     out_cpu_counts={}
 
-    # new_out_counts
-    # keys: are site indexes(numbers)
-    # elements: number of real idle jobs associated with each site
-    new_out_counts = {}
-    glideindex = 0
-
     #
     # To speed up dictionary lookup
     # we will convert Schedd_Name#ClusterId.ProcID into a number
@@ -298,13 +381,21 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
         cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
         condorq = condorq_dict[schedd]
         condorq_data = condorq.fetchStored()
+        # signatures precomputed once for all the job types, if available
+        job_signatures = getJobSignatures(condorq, condorq_match_list)
+        if job_signatures is None:
+            # the cache is usable only with the precomputed signatures
+            match_cache = None
         for jid in condorq_data:
             # For each job, hash the job using the attributes
             #  listed from xml under match_attrs
             # Jobs that hash to the same value should
             #  be considered equivalent and part of the same
             #  cluster for matching purposes
-            jh = hashJob(condorq_data[jid], condorq_match_list)
+            if job_signatures is not None:
+                jh = job_signatures[jid]
+            else:
+                jh = hashJob(condorq_data[jid], condorq_match_list)
             if jh not in cq_dict_clusters_el:
                 cq_dict_clusters_el[jh] = []
             # Add the job to the correct cluster according to the
@@ -361,9 +452,13 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
 
                 try:
                     # Do not match downtime entries
+                    match = None
                     if ignore_down_entries and safe_boolcomp(glidein_dict[glidename]['attrs'].get('GLIDEIN_In_Downtime', False), True):
                         match = False
-                    else:
+                    elif match_cache is not None:
+                        # None if this entry and cluster were not evaluated in a previous iteration
+                        match = match_cache.getMatch(glidename, jh)
+                    if match is None:
                         # Evaluate the Compiled object first.
                         # Evaluation order does not really matter.
                         match = eval(match_obj)
@@ -377,6 +472,8 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
                                     # and logged
                                     logSupport.log.warning("Match expression from policy file '%s' evaluated to non boolean result; assuming False" % policy.file)
                                 break
+                        if match_cache is not None:
+                            match_cache.addMatch(glidename, jh, match == True)
 
                     if match == True:
                         # The lines inside this 'if' can be replaced with the following three commented lines for profiling
@@ -458,24 +555,43 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
 
     count_unmatched = len(cq_jobs-jrange)
 
+    return countMatchProportions(glidein_dict, out_glidein_counts, out_cpu_counts,
+                                 [(vtuple[0], len(vtuple[1])) for vtuple in outvals],
+                                 count_unmatched)
+
+
+def countMatchProportions(glidein_dict, out_glidein_counts, out_cpu_counts, subset_counts, count_unmatched):
+    """Compute the proportional counts of countMatch from the unique subsets of matching jobs
+
+    :param glidein_dict: glidein_name->dictionary of params and attrs, same order used for the entry indexes
+    :param out_glidein_counts: glidein name->number of jobs matching (straight match), modified in place
+    :param out_cpu_counts: glidein name->number of CPUs requested by the jobs matching, modified in place
+    :param subset_counts: list of tuples (set of entry indexes, number of jobs matching exactly those entries)
+    :param count_unmatched: number of jobs not matching any entry
+    :return: tuple of 4 dictionaries, same as countMatch
+    """
+    # new_out_counts
+    # keys: are site indexes(numbers)
+    # elements: number of real idle jobs associated with each site
+    new_out_counts = {}
     # unique_to_site: keys are sites, elements are num of unique jobs
     unique_to_site = {}
-    # each tuple is ([list of site_indexes],jobs associated with those sites)
+    # each tuple is ([list of site_indexes],number of jobs associated with those sites)
     # this loop necessary to avoid key error
-    for vtuple in outvals:
+    for vtuple in subset_counts:
         for site_index in vtuple[0]:
             new_out_counts[site_index] = 0.0
             unique_to_site[site_index] = 0
     # for every tuple of([site_index],jobs), cycle through each site index
     # new_out_counts[site_index] is the number of jobs over the number
     # of indexes, may not be an integer.
-    for vtuple in outvals:
+    for vtuple in subset_counts:
         for site_index in vtuple[0]:
-            new_out_counts[site_index] = new_out_counts[site_index]+(1.0*len(vtuple[1])/len(vtuple[0]))
+            new_out_counts[site_index] = new_out_counts[site_index]+(1.0*vtuple[1]/len(vtuple[0]))
         # if the site has jobs unique to it
         if len(vtuple[0]) == 1:
             temp_sites = vtuple[0]
-            unique_to_site[temp_sites.pop()] = len(vtuple[1])
+            unique_to_site[temp_sites.pop()] = vtuple[1]
     # create a list of all sites, list_of_sites[site_index]=site
     list_of_sites = []
     i = 0
@@ -522,6 +638,25 @@ def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_ent
             final_unique, final_out_cpu_counts)
 
 
+def dumpMatchData(group_name, condorq_dict, glidein_dict, attr_dict, condorq_match_list):
+    """Save the countMatch input data structures in /tmp/frontend_dump/<group_name>
+    They can be used later with profile_frontend.py
+    """
+    mydir = "/tmp/frontend_dump/" + group_name
+    try:
+        os.mkdir(mydir)
+    except:
+        pass
+    with open(mydir+'/glidein_dict.pickle', 'w') as fd:
+        pickle.dump(glidein_dict, fd)
+    with open(mydir+'/attr_dict.pickle', 'w') as fd:
+        pickle.dump(attr_dict, fd)
+    with open(mydir+'/condorq_match_list.pickle', 'w') as fd:
+        pickle.dump(condorq_match_list, fd)
+    for schedd in condorq_dict.keys():
+        pickle.dump(condorq_dict[schedd].fetchStored(), open(mydir+'/condorq_dict_%s.pickle' % schedd, 'w'))
+
+
 def countRealRunning(match_obj, condorq_dict, glidein_dict,
                      attr_dict, condorq_match_list=None, match_policies=[]):
     """Counts all the running jobs on an entry
@@ -542,7 +677,9 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict,
     out_glidein_counts = {}
 
     if condorq_match_list is not None:
-        condorq_match_list = condorq_match_list + ['RunningOn']
+        hash_match_list = condorq_match_list + ['RunningOn']
+    else:
+        hash_match_list = None
     # add an else branch in case the initial list is None? Probably should never happen
     # else:
     #     condorq_match_list = ['RunningOn']
@@ -553,16 +690,31 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict,
     # dict of job clusters
     # group together those that have the same attributes
     cq_dict_clusters = {}
+    # RunningOn is part of the cluster hash, so each cluster runs on a single entry
+    # index of the clusters by RunningOn: running_on -> {scheddIdx: [jh, ...]}
+    # each entry looks only at its clusters instead of checking all of them
+    running_on_index = {}
+    # schedds with clusters without RunningOn, they cannot match any entry
+    schedds_missing_running_on = set()
     for scheddIdx in range(nr_schedds):
         schedd = schedds[scheddIdx]
         cq_dict_clusters[scheddIdx] = {}
         cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
         condorq = condorq_dict[schedd]
         condorq_data = condorq.fetchStored()
+        # RunningOn is added after the query (appendRealRunning), it is not in the precomputed signatures
+        job_signatures = getJobSignatures(condorq, condorq_match_list)
         for jid in condorq_data.keys():
-            jh = hashJob(condorq_data[jid], condorq_match_list)
+            if job_signatures is not None:
+                jh = (job_signatures[jid], condorq_data[jid].get('RunningOn'))
+            else:
+                jh = hashJob(condorq_data[jid], hash_match_list)
             if jh not in cq_dict_clusters_el:
                 cq_dict_clusters_el[jh] = []
+                if 'RunningOn' in condorq_data[jid]:
+                    running_on_index.setdefault(condorq_data[jid]['RunningOn'], {}).setdefault(scheddIdx, []).append(jh)
+                else:
+                    schedds_missing_running_on.add(scheddIdx)
             cq_dict_clusters_el[jh].append(jid)
 
     for glidename in glidein_dict:
@@ -581,6 +733,7 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict,
         #   pslot name but removing slotN_N@ will still identify the glidein (so this code is robust to the change)
         job_ids = set()
         glidein_ids = set()
+        glide_clusters = running_on_index.get(glide_str, {})
         for scheddIdx in range(nr_schedds):
             schedd = schedds[scheddIdx]
             cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
@@ -589,17 +742,18 @@ def countRealRunning(match_obj, condorq_dict, glidein_dict,
             schedd_count = 0
 
             missing_keys = set()
+            if scheddIdx in schedds_missing_running_on:
+                missing_keys.add("'RunningOn'")
             tb_count = 0
             recent_tb = None
 
-            for jh in cq_dict_clusters_el.keys():
+            # only the clusters running on this entry (job['RunningOn']==glide_str)
+            for jh in glide_clusters.get(scheddIdx, []):
                 # get the first job... they are all the same
                 first_jid = cq_dict_clusters_el[jh][0]
                 job = condorq_data[first_jid]
                 try:
-                    # Evaluate the Compiled object first.
-                    # Evaluation order does not really matter.
-                    match = ((job['RunningOn']==glide_str) and eval(match_obj))
+                    match = eval(match_obj)
                     for policy in match_policies:
                         if match == True:
                             # Policies are supposed to be ANDed
@@ -673,7 +827,7 @@ def evalParamExpr(expr_obj, frontend, glidein):
 
 
 def getCondorStatus(collector_names, constraint=None, format_list=None,
-                    want_format_completion=True, want_glideins_only=True):
+                    want_format_completion=True, want_glideins_only=True, columnar_storage=False):
     """
     Return a dictionary of collectors containing interesting classads
     Each element is a condorStatus
@@ -682,6 +836,7 @@ def getCondorStatus(collector_names, constraint=None, format_list=None,
     @param format_list:
     @param want_format_completion:
     @param want_glideins_only:
+    @param columnar_storage: if True store the classads in a condorMonitor.ColumnarResult
     @return:
     """
     type_constraint = '(True)'
@@ -711,7 +866,8 @@ def getCondorStatus(collector_names, constraint=None, format_list=None,
     if want_glideins_only:
         type_constraint += '&&(IS_MONITOR_VM=!=True)&&(GLIDEIN_Factory=!=UNDEFINED)&&(GLIDEIN_Name=!=UNDEFINED)&&(GLIDEIN_Entry_Name=!=UNDEFINED)'
 
-    return getCondorStatusConstrained(collector_names, type_constraint, constraint, format_list)
+    return getCondorStatusConstrained(collector_names, type_constraint, constraint, format_list,
+                                      columnar_storage=columnar_storage)
 
 
 def getCondorStatusNonDynamic(status_dict):
@@ -1071,6 +1227,153 @@ def countRunningCoresCondorStatus(status_dict):
     return count
 
 
+# Slot categories of classifyCondorStatus and the constraint of each one
+# Same as getIdleCondorStatus, getRunningCondorStatus, getRunningPSlotCondorStatus,
+# getFailedCondorStatus and getCondorStatusNonDynamic
+CONDOR_STATUS_CATEGORIES = {
+    'Idle': lambda el: ((el.get('State') == 'Unclaimed') and (el.get('Activity') == 'Idle') and
+                        ((el.get('PartitionableSlot') != True) or (el.get('TotalSlots') == 1) or
+                         (el.get('Cpus', 0) > 0 and el.get('Memory', 2501) > 2500))),
+    'Running': lambda el: (((el.get('State') == 'Claimed') and (el.get('Activity') in ('Busy', 'Retiring'))) or
+                           ((el.get('PartitionableSlot') == True) and (el.get('TotalSlots', 1) > 1))),
+    'RunningPSlot': lambda el: (el.get('PartitionableSlot') == True) and (el.get('TotalSlots', 1) > 1),
+    'Failed': lambda el: (el.get('State') == "Drained") and (el.get('Activity') == "Retiring"),
+    'NonDynamic': lambda el: el.get('SlotType') != 'Dynamic'}
+
+# Slot counts of the groups, in the order used by getSlotCounts
+CONDOR_STATUS_TYPES = ('Total', 'Idle', 'Running', 'Failed', 'TotalCores', 'IdleCores', 'RunningCores')
+
+
+def getSlotCategories(el):
+    """Return the set of CONDOR_STATUS_CATEGORIES of a slot
+    """
+    categories = set()
+    for category, constraint in CONDOR_STATUS_CATEGORIES.iteritems():
+        if constraint(el):
+            categories.add(category)
+    return categories
+
+
+def getSlotCounts(el, categories):
+    """Contribution of a slot to each of the CONDOR_STATUS_TYPES counts
+    Same as countCondorStatus, countRunningCondorStatus and countCoresCondorStatus on the slot categories
+    (Running and RunningCores exclude the p-slots, TotalCores counts the non dynamic slots)
+
+    :param el: slot classad
+    :param categories: categories of the slot, from getSlotCategories
+    :return: list with the counts, in CONDOR_STATUS_TYPES order
+    """
+    is_pslot = el.get('PartitionableSlot', False)
+    counts = [1, 0, 0, 0, 0, 0, 0]
+    if 'Idle' in categories:
+        counts[1] = 1
+        counts[5] = el.get('Cpus', 0)
+    if ('Running' in categories) and not is_pslot:
+        counts[2] = 1
+        counts[6] = el.get('Cpus', 0)
+    if 'Failed' in categories:
+        counts[3] = 1
+    if 'NonDynamic' in categories:
+        if is_pslot:
+            counts[4] = el.get('TotalSlotCpus', 0)
+        else:
+            counts[4] = el.get('Cpus', 0)
+    return counts
+
+
+def classifyCondorStatus(status_dict):
+    """Put the slots in all the categories (CONDOR_STATUS_CATEGORIES) at once, with a single pass on the slots
+    Same results and counts as the get*CondorStatus and count*CondorStatus functions used on status_dict
+    The slots are not copied, each category of a collector is a SubQuery storing a view on the collector data
+    (condorMonitor.selectKeys)
+
+    :param status_dict: output of getCondorStatus
+    :return: dictionary type -> {'dict': dictionary collector_name->SubQuery, 'abs': count} for the
+        CONDOR_STATUS_TYPES, same as status_dict_types of the frontend groups ('Running' includes the p-slots
+        with dynamic slots, for appendRealRunning, but does not count them)
+    """
+    views = {}
+    for category in CONDOR_STATUS_CATEGORIES:
+        views[category] = {}
+    counts = [0] * len(CONDOR_STATUS_TYPES)
+    running_abs = 0
+    for collector_name in status_dict:
+        collector_status = status_dict[collector_name]
+        status_data = collector_status.fetchStored()
+        keys = {}
+        for category in CONDOR_STATUS_CATEGORIES:
+            keys[category] = []
+        for slot_name, el in status_data.iteritems():
+            categories = getSlotCategories(el)
+            for category in categories:
+                keys[category].append(slot_name)
+            slot_counts = getSlotCounts(el, categories)
+            for i in range(len(counts)):
+                counts[i] += slot_counts[i]
+        # the group Running count excludes the p-slots with dynamic slots
+        running_abs += len(keys['Running']) - len(keys['RunningPSlot'])
+        for category, constraint in CONDOR_STATUS_CATEGORIES.iteritems():
+            sq = condorMonitor.SubQuery(collector_status, constraint)
+            sq.stored_data = condorMonitor.selectKeys(status_data, keys[category])
+            views[category][collector_name] = sq
+    types_dict = {'Total': status_dict, 'Idle': views['Idle'], 'Running': views['Running'],
+                  'Failed': views['Failed'], 'TotalCores': views['NonDynamic'],
+                  'IdleCores': views['Idle'], 'RunningCores': views['Running']}
+    out = {}
+    for i in range(len(CONDOR_STATUS_TYPES)):
+        status_type = CONDOR_STATUS_TYPES[i]
+        out[status_type] = {'dict': types_dict[status_type], 'abs': counts[i]}
+    out['Running']['abs'] = running_abs
+    return out
+
+
+def countCondorStatusPerRequest(status_dict, frontend_name, group_name):
+    """Count the slots of all the requests of a group at once, by type and by credential, with a single pass
+    on the slots grouped by request (GLIDECLIENT_Name and entry) and credential (GLIDEIN_CredentialIdentifier)
+    Same counts as getClientCondorStatus, for each request, and getClientCondorStatusCredIdOnly, for each
+    credential, followed by the get*CondorStatus and count*CondorStatus functions of each type
+
+    :param status_dict: output of getCondorStatus
+    :param frontend_name: name of the frontend
+    :param group_name: name of the group
+    :return: tuple (counts, counts_per_cred): counts[request_name][type] and counts_per_cred[request_name][cred_id][type]
+        for the CONDOR_STATUS_TYPES. The requests and credentials without slots are not included
+    """
+    # new clients use the same name for all requests, old ones include the request name
+    client_name_new = "%s.%s" % (frontend_name, group_name)
+    client_suffix_old = "@%s" % client_name_new
+    counts = {}
+    counts_per_cred = {}
+    for collector_name in status_dict:
+        for el in status_dict[collector_name].fetchStored().itervalues():
+            client_name = el.get('GLIDECLIENT_Name')
+            if client_name == client_name_new:
+                try:
+                    request_name = "%s@%s@%s" % (el['GLIDEIN_Entry_Name'], el['GLIDEIN_Name'], el['GLIDEIN_Factory'])
+                except KeyError:
+                    continue  # not a glidein slot
+            elif (client_name is not None) and client_name.endswith(client_suffix_old):
+                request_name = client_name[:-len(client_suffix_old)]
+            else:
+                continue  # not a slot of this group
+            slot_counts = getSlotCounts(el, getSlotCategories(el))
+            request_counts = counts.setdefault(request_name, [0] * len(CONDOR_STATUS_TYPES))
+            for i in range(len(slot_counts)):
+                request_counts[i] += slot_counts[i]
+            if 'GLIDEIN_CredentialIdentifier' in el:
+                cred_counts = counts_per_cred.setdefault(request_name, {}).setdefault(
+                    el['GLIDEIN_CredentialIdentifier'], [0] * len(CONDOR_STATUS_TYPES))
+                for i in range(len(slot_counts)):
+                    cred_counts[i] += slot_counts[i]
+    for request_name in counts:
+        counts[request_name] = dict(zip(CONDOR_STATUS_TYPES, counts[request_name]))
+    for request_name in counts_per_cred:
+        for cred_id in counts_per_cred[request_name]:
+            counts_per_cred[request_name][cred_id] = dict(zip(CONDOR_STATUS_TYPES,
+                                                              counts_per_cred[request_name][cred_id]))
+    return counts, counts_per_cred
+
+
 #
 # Given startd classads, return the list of all the factory entries
 # Each element in the list is (req_name, node_name)
@@ -1129,7 +1432,8 @@ def getCondorStatusSchedds(collector_names, constraint=None, format_list=None,
 # If not all the jobs of the schedd has to be considered,
 # specify the appropriate additional constraint
 #
-def getCondorQConstrained(schedd_names, type_constraint, constraint=None, format_list=None):
+def getCondorQConstrained(schedd_names, type_constraint, constraint=None, format_list=None, columnar_storage=False,
+                          condorq_cache=None):
     out_condorq_dict = {}
     for schedd in schedd_names:
         if schedd == '':
@@ -1140,8 +1444,12 @@ def getCondorQConstrained(schedd_names, type_constraint, constraint=None, format
             full_constraint = "(%s) && (%s)" % (full_constraint, constraint)
 
         try:
-            condorq = condorMonitor.CondorQ(schedd)
-            condorq.load(full_constraint, format_list)
+            if condorq_cache is not None:
+                # query only the jobs that changed since the last iteration, if possible
+                condorq = condorq_cache.loadCondorQ(schedd, full_constraint, format_list, columnar_storage)
+            else:
+                condorq = condorMonitor.CondorQ(schedd, columnar_storage=columnar_storage)
+                condorq.load(full_constraint, format_list)
             if len(condorq.fetchStored()) > 0:
                 out_condorq_dict[schedd] = condorq
         except condorMonitor.QueryError:
@@ -1165,7 +1473,7 @@ def getCondorQConstrained(schedd_names, type_constraint, constraint=None, format
 # specify the appropriate additional constraint
 #
 def getCondorStatusConstrained(collector_names, type_constraint, constraint=None,
-                               format_list=None, subsystem_name=None):
+                               format_list=None, subsystem_name=None, columnar_storage=False):
     out_status_dict = {}
     for collector in collector_names:
         full_constraint = type_constraint[0:]  # make copy
@@ -1174,7 +1482,8 @@ def getCondorStatusConstrained(collector_names, type_constraint, constraint=None
 
         try:
             status = condorMonitor.CondorStatus(subsystem_name=subsystem_name,
-                                                pool_name=collector)
+                                                pool_name=collector,
+                                                columnar_storage=columnar_storage)
             status.load(full_constraint, format_list)
         except condorMonitor.QueryError:
             if collector is not None:
@@ -1204,6 +1513,7 @@ def getCondorStatusConstrained(collector_names, type_constraint, constraint=None
 #
 # Input: list of sets
 # Output: list of (index set, value subset) pairs + a set that is the union of all input sets
+#         The pairs are sorted by the (sorted) indexes of the index set
 #
 # Example in:
 #   [set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]), set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]),
@@ -1211,8 +1521,8 @@ def getCondorStatusConstrained(collector_names, type_constraint, constraint=None
 #         21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35]),
 #    set([11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30])]
 # Example out:
-#   ([(set([2]), set([32, 33, 34, 35, 31])),
-#     (set([0, 1, 2]), set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])),
+#   ([(set([0, 1, 2]), set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10])),
+#     (set([2]), set([32, 33, 34, 35, 31])),
 #     (set([2, 3]), set([11, 12, 13, 14, 15, 16, 17, 18, 19, 20,
 #                        21, 22, 23, 24, 25, 26, 27, 28, 29, 30]))],
 #    set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20,
@@ -1220,71 +1530,110 @@ def getCondorStatusConstrained(collector_names, type_constraint, constraint=None
 #
 def uniqueSets(in_sets):
     # sets is a list of sets
-    sorted_sets = []
-    for i in in_sets:
-        common_list = []
-        common = set()
-        new_unique = set()
-        old_unique_list = []
-        old_unique = set()
-        new = []
-        # make a list of the elements common to i
-        # (current iteration of sets) and the existing
-        # sorted sets
-        for k in sorted_sets:
-            # for now, old unique is a set with all elements of
-            # sorted_sets
-            old_unique = old_unique | k
-            common = k & i
-            if common:
-                common_list.append(common)
+    # Each element is labeled with the signature of the input sets containing it
+    # (the sorted list of their indexes, i.e. a sparse bitmap over the input sets).
+    # Elements with the same signature form one of the unique subsets,
+    # so the partition is built in a single pass over all the elements
+    # instead of intersecting each input set with all the subsets found so far
+    signatures = {}
+    for idx in range(len(in_sets)):
+        for el in in_sets[idx]:
+            sig = signatures.get(el)
+            if sig is None:
+                signatures[el] = [idx]
             else:
-                pass
-        # figure out which elements in i
-        # and which elements in old_uniques are unique
-        for j in common_list:
-            i = i - j
-            old_unique = old_unique - j
-        # make a list of all the unique elements in sorted_sets
-        for k in sorted_sets:
-            old_unique_list.append(k & old_unique)
-        new_unique = i
-        if new_unique:
-            new.append(new_unique)
-        for o in old_unique_list:
-            if o:
-                new.append(o)
-        for c in common_list:
-            if c:
-                new.append(c)
-        sorted_sets = new
+                sig.append(idx)
+
+    partition = {}
+    for el, sig in signatures.iteritems():
+        sig = tuple(sig)
+        subset = partition.get(sig)
+        if subset is None:
+            partition[sig] = set([el])
+        else:
+            subset.add(el)
 
-    # set with all unique elements
-    sum_set = set()
-    for s in sorted_sets:
-        sum_set = sum_set | s
-
-
-    sorted_sets.append(sum_set)
-
-    # index_list is a list of lists. Each list corresponds to 
-    # an element in sorted_sets, and contains the indexes of 
-    # that elements shared elements in the initial list of sets
-    index_list = []
-    for s in sorted_sets:
-        indexes = []
-        temp_sets = in_sets[:]
-        for t in temp_sets:
-            if s & t:
-                indexes.append(temp_sets.index(t))
-                temp_sets[temp_sets.index(t)] = set()
-        index_list.append(indexes)
-
-    # create output
+    # create output, sorted by signature to have a stable order
     outvals = []
-    for i in range(len(index_list) - 1): # last one contains all the values
-        outvals.append((set(index_list[i]), sorted_sets[i]))
-    return (outvals, sorted_sets[-1])
+    for sig in sorted(partition.keys()):
+        outvals.append((set(sig), partition[sig]))
+    # set with all unique elements
+    return (outvals, set(signatures.keys()))
+
+class JobSignatureTable(dict):
+    """Dictionary hashJob tuple->signature (integer), new hashes get a new signature
+    Signatures are never reused, also after removing elements from the table,
+    so the same table can be used for multiple iterations (see glideinFrontendMatchCache)
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.next_signature = 0
+
+    def __missing__(self, jh):
+        sig = self.next_signature
+        self.next_signature += 1
+        self[jh] = sig
+        return sig
+
+
+def computeJobSignatures(condorq_dict, condorq_match_list=None, signature_table=None):
+    """Compute once the cluster signature of all the jobs, see hashJob
+    Jobs with the same values of the match attributes get the same signature,
+    a small integer shared by all the schedds in condorq_dict.
+    The signatures are stored in the CondorQ objects (job_signatures attribute), so that
+    the SubQuery objects derived from them and the forked children can use them (getJobSignatures)
+
+    :param condorq_dict: dictionary: sched_name->CondorQ object
+    :param condorq_match_list: list of job attributes used for clustering (all if None)
+    :param signature_table: JobSignatureTable to keep the same signatures across iterations,
+        a new one is used if None
+    :return: number of different signatures
+    """
+    if condorq_match_list is not None:
+        match_keys = tuple(sorted(set(condorq_match_list)))
+    else:
+        match_keys = None
+    if signature_table is None:
+        signature_table = JobSignatureTable()
+    used_signatures = set()
+    for schedd_name in condorq_dict:
+        condorq = condorq_dict[schedd_name]
+        condorq_data = condorq.fetchStored()
+        job_signatures = {}
+        for jid in condorq_data:
+            job = condorq_data[jid]
+            if match_keys is None:
+                jh = hashJob(job)
+            else:
+                jh = tuple([(k, job[k]) for k in match_keys if k in job])
+            job_signatures[jid] = signature_table[jh]
+        condorq.job_signatures = (match_keys, job_signatures)
+        used_signatures.update(job_signatures.itervalues())
+    return len(used_signatures)
+
+
+def getJobSignatures(condorq, condorq_match_list=None):
+    """Return the job signatures computed by computeJobSignatures for condorq
+    or for the query it was derived from (SubQuery)
+
+    :param condorq: CondorQ or SubQuery object
+    :param condorq_match_list: list of job attributes used for clustering (all if None)
+    :return: dictionary jid->signature, None if not available for condorq_match_list
+    """
+    if condorq_match_list is not None:
+        match_keys = tuple(sorted(set(condorq_match_list)))
+    else:
+        match_keys = None
+    while condorq is not None:
+        job_signatures = getattr(condorq, 'job_signatures', None)
+        if job_signatures is not None:
+            if job_signatures[0] == match_keys:
+                return job_signatures[1]
+            return None
+        condorq = getattr(condorq, 'query', None)
+    return None
+
 
 def hashJob(condorq_el, condorq_match_list=None):
     out=[]
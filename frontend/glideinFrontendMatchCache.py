@@ -0,0 +1,182 @@
+#
+# Project:
+#   glideinWMS
+#
+# File Version:
+#
+# Description:
+#   Cache of the matchmaking results of a frontend group across iterations
+#   The result of the match expression (ANDed with the match policies) is stored
+#   for each (entry fingerprint, job cluster signature) pair, valid as long as
+#   the match configuration does not change (match expression, match attributes,
+#   attr_dict and content of the match policy files).
+#   The entry fingerprint is computed from the attrs and params of the entry,
+#   the monitoring values (changing at every iteration) are not part of it.
+#   The cache lives in the group process: the matchmaking children (countMatch)
+#   read it and return the results of the pairs they evaluated (getChildResults),
+#   that are merged in the group process (mergeChildResults)
+#   A new group process is started at every iteration, so the cache is saved
+#   in the group history (getState) and loaded by the next one (setState)
+#
+
+import hashlib
+
+from glideinwms.frontend import glideinFrontendLib
+
+
+def entryFingerprint(glidein):
+    """Fingerprint of the attributes and parameters of an entry
+
+    :param glidein: the entry (glidein) dictionary, with 'attrs' and 'params'
+    :return: string, digest of the entry attributes and parameters
+    """
+    return hashlib.md5(repr((sorted(glidein.get('attrs', {}).items()),
+                             sorted(glidein.get('params', {}).items())))).hexdigest()
+
+
+def configDigest(match_expr, condorq_match_list, attr_dict, match_policies):
+    """Digest of everything that can change the result of a match besides the entry and the job
+
+    :param match_expr: match expression string
+    :param condorq_match_list: list of job attributes used for the clusters
+    :param attr_dict: dictionary of constant attributes
+    :param match_policies: list of MatchPolicy objects, the content of the files is part of the digest
+    :return: string, digest of the configuration
+    """
+    digest = hashlib.md5()
+    digest.update(repr((match_expr, sorted(condorq_match_list or []), sorted((attr_dict or {}).items()))))
+    for policy in match_policies:
+        try:
+            with open(policy.file, 'r') as fd:
+                digest.update(fd.read())
+        except (IOError, OSError, TypeError):
+            # file not readable, changes are detected only when the file name changes
+            digest.update(repr(policy.file))
+    return digest.hexdigest()
+
+
+class MatchCache:
+    """Results of the match of the entries against the job clusters, kept across iterations
+    """
+
+    def __init__(self):
+        self.config_digest = None
+        # the signatures of the job clusters must be the same in all the iterations
+        self.signature_table = glideinFrontendLib.JobSignatureTable()
+        # entry fingerprint -> {job signature: match}
+        self.results = {}
+        # glidename -> entry fingerprint, for the current iteration
+        self.fingerprints = {}
+        # results evaluated in this process (matchmaking child), not in self.results
+        self.new_results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def getState(self):
+        """Return the cache as builtin types, to save it for the next iteration (glideinFrontendConfig.HistoryFile)
+        """
+        return {'config_digest': self.config_digest,
+                'signatures': dict(self.signature_table),
+                'next_signature': self.signature_table.next_signature,
+                'results': self.results}
+
+    def setState(self, state):
+        """Load the cache saved by the previous iteration (output of getState)
+        A missing or invalid state is an empty cache
+
+        :param state: dictionary returned by getState, None or empty if nothing was saved
+        """
+        try:
+            signature_table = glideinFrontendLib.JobSignatureTable()
+            signature_table.update(state['signatures'])
+            signature_table.next_signature = state['next_signature']
+            self.results = dict(state['results'])
+            self.config_digest = state['config_digest']
+            self.signature_table = signature_table
+        except (KeyError, TypeError, ValueError):
+            self.config_digest = None
+            self.signature_table = glideinFrontendLib.JobSignatureTable()
+            self.results = {}
+
+    def setConfig(self, match_expr, condorq_match_list, attr_dict, match_policies):
+        """Invalidate the cache if the match configuration changed
+
+        :return: True if the cache was invalidated
+        """
+        digest = configDigest(match_expr, condorq_match_list, attr_dict, match_policies)
+        if digest == self.config_digest:
+            return False
+        self.config_digest = digest
+        self.signature_table = glideinFrontendLib.JobSignatureTable()
+        self.results = {}
+        return True
+
+    def setGlideins(self, glidein_dict):
+        """Compute the fingerprints of the entries of this iteration and reset the iteration counters
+
+        :param glidein_dict: dictionary: glidein_name->dictionary of params and attrs
+        """
+        self.fingerprints = {}
+        for glidename in glidein_dict:
+            self.fingerprints[glidename] = entryFingerprint(glidein_dict[glidename])
+        self.new_results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def getMatch(self, glidename, signature):
+        """Return the cached match result (True/False) of an entry and a job cluster, None if not available
+        """
+        fingerprint = self.fingerprints.get(glidename)
+        try:
+            match = self.results[fingerprint][signature]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return match
+
+    def addMatch(self, glidename, signature, match):
+        """Add the match result of an entry and a job cluster evaluated in this process
+        """
+        fingerprint = self.fingerprints.get(glidename)
+        if fingerprint is None:
+            return
+        self.new_results.setdefault(fingerprint, {})[signature] = match
+
+    def getChildResults(self):
+        """Return the results evaluated in this process and the counters, to send them to the group process
+        """
+        return {'results': self.new_results, 'hits': self.hits, 'misses': self.misses}
+
+    def mergeChildResults(self, child_results):
+        """Add the results evaluated by a matchmaking child (output of getChildResults)
+        """
+        for fingerprint, new_matches in child_results['results'].iteritems():
+            self.results.setdefault(fingerprint, {}).update(new_matches)
+        self.hits += child_results['hits']
+        self.misses += child_results['misses']
+
+    def prune(self, condorq_dict, condorq_match_list):
+        """Remove the entries and the job clusters not present in this iteration
+
+        :param condorq_dict: dictionary: sched_name->CondorQ object, with the signatures of all the jobs
+        :param condorq_match_list: list of job attributes used for the signatures
+        """
+        used_signatures = set()
+        for schedd_name in condorq_dict:
+            job_signatures = glideinFrontendLib.getJobSignatures(condorq_dict[schedd_name], condorq_match_list)
+            if job_signatures is not None:
+                used_signatures.update(job_signatures.itervalues())
+        for jh in self.signature_table.keys():
+            if self.signature_table[jh] not in used_signatures:
+                del self.signature_table[jh]
+
+        used_fingerprints = set(self.fingerprints.values())
+        for fingerprint in self.results.keys():
+            if fingerprint not in used_fingerprints:
+                del self.results[fingerprint]
+                continue
+            matches = self.results[fingerprint]
+            for signature in matches.keys():
+                if signature not in used_signatures:
+                    del matches[signature]
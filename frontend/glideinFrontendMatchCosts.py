@@ -0,0 +1,162 @@
+#
+# Project:
+#   glideinWMS
+#
+# File Version:
+#
+# Description:
+#   Cost model of the matchmaking children of a frontend group (do_match)
+#   The work of do_match is made of tasks: the matchmaking of each condorq_dict_types
+#   bucket, the count of the real running jobs and the count of the glideins of the
+#   entries. The first two cannot be split, the entries are split in chunks.
+#   Each task has a number of work units, from the size of its input, and a cost in
+#   seconds per unit, the moving average of the timings of the previous iterations
+#   (MatchCosts). The tasks are forked longest first and the entries are split in chunks
+#   not longer than the average load of a worker, so that all the matchmakers finish
+#   at about the same time (planMatchWork)
+#
+
+import math
+import heapq
+
+# Weight of the last iteration in the moving averages
+DEFAULT_ALPHA = 0.5
+
+# Seconds per work unit used before the first timing of a task
+# Match: job x entry evaluated by countMatch, Real: running job or entry
+# in countRealRunning, Glidein: entry counted by subprocess_count_glidein
+DEFAULT_UNIT_COSTS = {'Match': 2e-6,
+                      'Real': 1e-5,
+                      'Glidein': 1e-4}
+
+# Minimum expected seconds of a chunk of entries, splitting less work does not pay for the fork
+MIN_CHUNK_COST = 1.0
+
+# Kind of the glidein counting tasks, the fork keys are (GLIDEIN_KIND, chunk index)
+GLIDEIN_KIND = 'Glidein'
+
+
+def getTaskKind(key):
+    """Kind of a do_match task, used to share the costs of the tasks doing the same work
+
+    :param key: fork key of the task, condorq_dict_types key, 'Real' or ('Glidein', chunk index)
+    :return: 'Glidein' for all the chunks of entries, the key otherwise
+    """
+    if isinstance(key, tuple):
+        return key[0]
+    return key
+
+
+class MatchCosts:
+    """Cost of the work units of the do_match tasks, kept across iterations
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, unit_costs=None):
+        """
+        :param alpha: weight of the last iteration in the moving averages
+        :param unit_costs: dictionary with the unit costs of the previous iterations, updated in place,
+            None to start from DEFAULT_UNIT_COSTS
+        """
+        self.alpha = alpha
+        # task kind -> seconds per work unit
+        if unit_costs is None:
+            unit_costs = {}
+        self.unit_costs = unit_costs
+
+    def getUnitCost(self, kind):
+        """Seconds per work unit of a kind of task, DEFAULT_UNIT_COSTS if not timed yet
+        (the condorq_dict_types buckets default to 'Match')
+        """
+        if kind in self.unit_costs:
+            return self.unit_costs[kind]
+        return DEFAULT_UNIT_COSTS.get(kind, DEFAULT_UNIT_COSTS['Match'])
+
+    def estimate(self, kind, units):
+        """Expected seconds for a task
+
+        :param kind: kind of task (see getTaskKind)
+        :param units: number of work units of the task
+        :return: expected time in seconds
+        """
+        return units * self.getUnitCost(kind)
+
+    def update(self, kind, units, seconds):
+        """Add the timing of a task of this iteration
+        The chunks of entries can be added one at a time
+
+        :param kind: kind of task (see getTaskKind)
+        :param units: number of work units of the task, tasks without work are ignored
+        :param seconds: time taken by the task
+        """
+        if units <= 0:
+            return
+        unit_cost = float(seconds) / units
+        if kind not in self.unit_costs:
+            self.unit_costs[kind] = unit_cost
+        else:
+            self.unit_costs[kind] += self.alpha * (unit_cost - self.unit_costs[kind])
+
+
+def getMakespan(costs, nr_workers):
+    """Time to run the tasks with nr_workers processes, each task started, in order,
+    as soon as a process is free (as done by ForkManager.bounded_fork_and_collect)
+
+    :param costs: list of the times of the tasks, in fork order
+    :param nr_workers: number of parallel processes
+    :return: time to complete all the tasks
+    """
+    loads = [0.0] * max(nr_workers, 1)
+    for cost in costs:
+        heapq.heappush(loads, heapq.heappop(loads) + cost)
+    return max(loads)
+
+
+def getImbalance(makespan, total, nr_workers):
+    """Ratio between the time to complete the work and the time if it was evenly spread
+    1 if all the workers finish at the same time, nr_workers if a single one does all the work
+
+    :param makespan: time to complete all the work
+    :param total: sum of the times of all the tasks
+    :param nr_workers: number of parallel processes
+    :return: imbalance, 1 if there is no work
+    """
+    if total <= 0:
+        return 1.0
+    return makespan * max(nr_workers, 1) / float(total)
+
+
+def planMatchWork(task_costs, entries, entry_cost, nr_workers):
+    """Split the entries in chunks and order the do_match tasks so that the workers finish together
+
+    The entries are split in chunks with a cost not larger than the average load of a worker
+    (and not smaller than MIN_CHUNK_COST), then all the tasks are forked longest first
+
+    :param task_costs: dictionary key -> expected time of the tasks that cannot be split
+    :param entries: list of the entries to split in chunks
+    :param entry_cost: expected time for an entry
+    :param nr_workers: number of parallel processes (max_matchmakers)
+    :return: tuple (fork_order, chunks, task_costs, predicted_imbalance): list of the keys in fork order,
+        list of the chunks of entries (key ('Glidein', i) for chunks[i]), dictionary key -> expected time
+        for all the tasks, including the chunks, and the predicted imbalance (see getImbalance)
+    """
+    nr_workers = max(nr_workers, 1)
+    entries_cost = float(len(entries) * entry_cost)
+    total = sum(task_costs.values()) + entries_cost
+    nr_chunks = 0
+    if entries:
+        nr_chunks = 1
+        if total > 0:
+            nr_chunks = min(int(math.ceil(entries_cost * nr_workers / total)),
+                            int(entries_cost / MIN_CHUNK_COST))
+        nr_chunks = min(max(nr_chunks, 1), len(entries), nr_workers)
+    chunks = []
+    for i in range(nr_chunks):
+        chunks.append(entries[len(entries) * i // nr_chunks:len(entries) * (i + 1) // nr_chunks])
+
+    all_costs = dict(task_costs)
+    for i in range(nr_chunks):
+        all_costs[(GLIDEIN_KIND, i)] = len(chunks[i]) * entry_cost
+    # longest first, by key if the same cost
+    fork_order = sorted(all_costs.keys(), key=lambda k: (-all_costs[k], str(k)))
+    makespan = getMakespan([all_costs[k] for k in fork_order], nr_workers)
+    return fork_order, chunks, all_costs, getImbalance(makespan, total, nr_workers)
@@ -0,0 +1,697 @@
+#
+# Project:
+#   glideinWMS
+#
+# File Version:
+#
+# Description:
+#   Alternative matchmaking engine for the frontend groups
+#   The job clusters and the entries are loaded in array backed tables
+#   and the match expression (ANDed with the match policies) is evaluated
+#   one entry at a time against the whole column of job clusters.
+#   The expression is compiled in column operations (ColumnExpression): the parts
+#   using only the entry are evaluated once per entry, the parts using only the job
+#   once for all the entries, and the rest with one operation per column.
+#   Expressions that cannot be compiled are evaluated one job at a time.
+#   The results are the same as glideinFrontendLib.countMatch
+#
+
+import sys
+import ast
+import operator
+import itertools
+import traceback
+from array import array
+
+from glideinwms.lib.util import safe_boolcomp
+from glideinwms.lib import logSupport
+from glideinwms.frontend import glideinFrontendLib
+
+
+class JobClusterTable:
+    """Array backed table of the job clusters in a condorq_dict
+
+    Jobs with the same values of the match attributes (see glideinFrontendLib.hashJob
+    and glideinFrontendLib.computeJobSignatures)
+    are in the same cluster. There is one row per (schedd, cluster), as in countMatch,
+    and the first job found in the cluster is used as representative for the matchmaking.
+    """
+
+    def __init__(self, condorq_dict, condorq_match_list=None):
+        """Group the jobs of all the schedds in clusters
+
+        :param condorq_dict: dictionary: sched_name->CondorQ object
+        :param condorq_match_list: list of job attributes used for clustering (all if None)
+        """
+        self.schedds = condorq_dict.keys()
+        # representative job of each cluster
+        self.jobs = []
+        # index (in self.schedds) of the schedd of each cluster
+        self.schedd_idxs = array('i')
+        # number of jobs in each cluster
+        self.counts = array('l')
+        # CPUs requested by all the jobs in each cluster, python numbers to have the same sums of countMatch
+        self.cpus = []
+        # total number of jobs in the table
+        self.nr_jobs = 0
+        # cluster signature of each row (see glideinFrontendLib.computeJobSignatures),
+        # None if the signatures are not available
+        self.signatures = []
+
+        for schedd_idx in range(len(self.schedds)):
+            condorq = condorq_dict[self.schedds[schedd_idx]]
+            condorq_data = condorq.fetchStored()
+            job_signatures = glideinFrontendLib.getJobSignatures(condorq, condorq_match_list)
+            schedd_rows = {}
+            for jid in condorq_data:
+                job = condorq_data[jid]
+                if job_signatures is not None:
+                    jh = job_signatures[jid]
+                else:
+                    jh = glideinFrontendLib.hashJob(job, condorq_match_list)
+                    self.signatures = None
+                row = schedd_rows.get(jh)
+                if row is None:
+                    schedd_rows[jh] = len(self.jobs)
+                    self.jobs.append(job)
+                    if self.signatures is not None:
+                        self.signatures.append(jh)
+                    self.schedd_idxs.append(schedd_idx)
+                    self.counts.append(1)
+                else:
+                    self.counts[row] += 1
+            self.nr_jobs += len(condorq_data)
+
+        # Since all jobs are same the CPUs required by a cluster are based on one job
+        for row in range(len(self.jobs)):
+            self.cpus.append(self.jobs[row].get('RequestCpus', 1) * self.counts[row])
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def countRows(self, rows):
+        """Return the number of jobs and the number of CPUs in the clusters at the given rows
+        """
+        counts = self.counts
+        cpus = self.cpus
+        return sum([counts[row] for row in rows]), sum([cpus[row] for row in rows])
+
+
+class EntryTable:
+    """Table of the entries (glideins) to match, in the same order as glidein_dict
+    """
+
+    def __init__(self, glidein_dict, ignore_down_entries=False):
+        """
+        :param glidein_dict: dictionary: glidein_name->dictionary of params and attrs
+        :param ignore_down_entries: if True entries in downtime will not match any job
+        """
+        self.names = glidein_dict.keys()
+        self.glideins = [glidein_dict[glidename] for glidename in self.names]
+        # 1 for entries that are not considered in the matchmaking
+        self.skip = array('b', [0] * len(self.names))
+        if ignore_down_entries:
+            for idx in range(len(self.glideins)):
+                if safe_boolcomp(self.glideins[idx]['attrs'].get('GLIDEIN_In_Downtime', False), True):
+                    self.skip[idx] = 1
+
+    def __len__(self):
+        return len(self.names)
+
+
+class _RowError(object):
+    """Exception raised evaluating an expression for a row (or for all the rows, if a scalar)
+    """
+    __slots__ = ('exc_type', 'exc')
+
+    def __init__(self, exc_type, exc):
+        self.exc_type = exc_type
+        self.exc = exc
+
+
+def _currentRowError():
+    return _RowError(*sys.exc_info()[:2])
+
+
+class _Column(object):
+    """Values of an expression for all the rows, some values may be _RowError
+    """
+    __slots__ = ('values', 'has_errors')
+
+    def __init__(self, values, has_errors=None):
+        self.values = values
+        if has_errors is None:
+            has_errors = bool([v for v in values if isinstance(v, _RowError)])
+        self.has_errors = has_errors
+
+
+class UnsupportedExpression(Exception):
+    """The expression cannot be evaluated by columns
+    """
+    pass
+
+
+def _not_contains(a, b):
+    return a not in b
+
+
+def _call(func, *args):
+    return func(*args)
+
+
+# Operators of the binary, unary and comparison nodes, all the elements are evaluated (not lazy)
+BINARY_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                    ast.Div: operator.div, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+                    ast.Pow: operator.pow, ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+                    ast.BitOr: operator.or_, ast.BitXor: operator.xor, ast.BitAnd: operator.and_}
+UNARY_OPERATORS = {ast.Not: operator.not_, ast.USub: operator.neg, ast.UAdd: operator.pos,
+                   ast.Invert: operator.invert}
+COMPARE_OPERATORS = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+                     ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Is: operator.is_, ast.IsNot: operator.is_not,
+                     ast.In: lambda a, b: a in b, ast.NotIn: _not_contains}
+
+
+# Methods without side effects: the subexpressions using only job and calling only these methods are
+# evaluated once for all the jobs, also where and, or and if select only some rows (see ColumnExpression)
+PURE_METHODS = frozenset(['get', 'has_key', 'keys', 'split', 'strip', 'lower', 'upper', 'startswith', 'endswith',
+                          'find'])
+
+
+def _iterColumns(operands, nr_rows):
+    """Values of the operands for all the rows, the scalars are repeated
+    """
+    return [op.values if isinstance(op, _Column) else itertools.repeat(op, nr_rows) for op in operands]
+
+
+def _mapColumns(func, operands, nr_rows):
+    """Apply func to the operands (scalars or _Column), row by row
+
+    :param func: function of the operands
+    :param operands: list of scalars and _Column objects
+    :param nr_rows: number of rows
+    :return: scalar or _RowError if all the operands are scalars, _Column otherwise
+    """
+    if not [op for op in operands if isinstance(op, _Column)]:
+        for op in operands:
+            if isinstance(op, _RowError):
+                return op
+        try:
+            return func(*operands)
+        except Exception:
+            return _currentRowError()
+    for op in operands:
+        if isinstance(op, _RowError):
+            # the same error for all the rows, the operands before have no errors
+            return op
+        if _hasErrors(op):
+            break
+    else:
+        # fast path: the whole column at once (map of the operator functions does not run python code)
+        try:
+            return _Column(map(func, *_iterColumns(operands, nr_rows)), False)
+        except Exception:
+            pass  # some rows fail, evaluated one by one below
+    values = []
+    has_errors = False
+    for row_values in itertools.izip(*_iterColumns(operands, nr_rows)):
+        errors = [v for v in row_values if isinstance(v, _RowError)]
+        if errors:
+            values.append(errors[0])
+            has_errors = True
+            continue
+        try:
+            value = func(*row_values)
+        except Exception:
+            value = _currentRowError()
+        values.append(value)
+        has_errors = has_errors or isinstance(value, _RowError)
+    return _Column(values, has_errors)
+
+
+def _hasErrors(operand):
+    if isinstance(operand, _Column):
+        return operand.has_errors
+    return isinstance(operand, _RowError)
+
+
+def _nrRows(jobs, rows):
+    if rows is None:
+        return len(jobs)
+    return len(rows)
+
+
+def _truePositions(column, value_is_true):
+    """Positions of the values of column that are true (value_is_true True) or false, errors excluded
+    """
+    values = column.values
+    if column.has_errors:
+        return [pos for pos, value in enumerate(values)
+                if not isinstance(value, _RowError) and bool(value) == value_is_true]
+    if not value_is_true:
+        values = map(operator.not_, values)
+    return list(itertools.compress(xrange(len(column.values)), values))
+
+
+def _selectRows(rows, positions):
+    """Indexes in the jobs of the rows at the given positions (rows is None for all the jobs)
+    """
+    if rows is None:
+        return positions
+    return [rows[pos] for pos in positions]
+
+
+def _mergeColumn(column, branches):
+    """Values of column, replaced at the positions of each branch by the values of its operand
+
+    :param column: _Column
+    :param branches: list of (positions, operand), the operand (scalar or _Column) evaluated only at the positions
+    :return: _Column
+    """
+    values = list(column.values)
+    has_errors = column.has_errors
+    for positions, operand in branches:
+        if isinstance(operand, _Column):
+            for pos, value in itertools.izip(positions, operand.values):
+                values[pos] = value
+        else:
+            for pos in positions:
+                values[pos] = operand
+        has_errors = has_errors or _hasErrors(operand)
+    return _Column(values, has_errors)
+
+
+def _lazyBoolOp(is_and):
+    """Column function of and (is_and True) or or (is_and False)
+    The second operand is evaluated only for the rows where the first one does not decide the result
+    """
+    def evaluate(operand_funcs, jobs, glidein, rows):
+        first = operand_funcs[0](jobs, glidein, rows)
+        if not isinstance(first, _Column):
+            if isinstance(first, _RowError) or bool(first) != is_and:
+                return first
+            return operand_funcs[1](jobs, glidein, rows)
+        positions = _truePositions(first, is_and)
+        if not positions:
+            return first
+        if len(positions) == len(first.values):
+            return operand_funcs[1](jobs, glidein, rows)
+        return _mergeColumn(first, [(positions, operand_funcs[1](jobs, glidein, _selectRows(rows, positions)))])
+    return evaluate
+
+
+def _lazyIf(operand_funcs, jobs, glidein, rows):
+    """Column function of if: the body and the else are evaluated only for the rows selecting them
+    """
+    test = operand_funcs[0](jobs, glidein, rows)
+    if not isinstance(test, _Column):
+        if isinstance(test, _RowError):
+            return test
+        if test:
+            return operand_funcs[1](jobs, glidein, rows)
+        return operand_funcs[2](jobs, glidein, rows)
+    branches = []
+    for positions, func in ((_truePositions(test, True), operand_funcs[1]),
+                            (_truePositions(test, False), operand_funcs[2])):
+        if not positions:
+            continue
+        if len(positions) == len(test.values):
+            return func(jobs, glidein, rows)
+        branches.append((positions, func(jobs, glidein, _selectRows(rows, positions))))
+    return _mergeColumn(test, branches)
+
+
+def _selectColumn(operand, rows):
+    """Values of operand (scalar or _Column for all the jobs) at the indexes in rows
+    """
+    if not isinstance(operand, _Column):
+        return operand
+    values = operand.values
+    has_errors = False
+    if operand.has_errors:
+        has_errors = None  # only if some selected value is an error
+    return _Column([values[row] for row in rows], has_errors)
+
+
+def _jobsColumn(jobs, glidein, rows):
+    """Column of the jobs at the indexes in rows (all the jobs if None)
+    """
+    if rows is None:
+        return _Column(jobs, False)
+    return _Column([jobs[row] for row in rows], False)
+
+
+def _nodeNames(node):
+    return set([n.id for n in ast.walk(node) if isinstance(n, ast.Name)])
+
+
+def _isPure(node):
+    """True if evaluating node has no side effects (it calls only PURE_METHODS)
+    """
+    for n in ast.walk(node):
+        if isinstance(n, ast.Call) and not (isinstance(n.func, ast.Attribute) and n.func.attr in PURE_METHODS):
+            return False
+    return True
+
+
+class ColumnExpression:
+    """Match expression compiled in operations on the columns of the jobs
+
+    The expression is evaluated with the globals and the namespace of the evaluation one job at a time
+    (MatchEvaluator), the same names available in countMatch (job, glidein, attr_dict).
+    The subexpressions without job are evaluated with eval, once per entry (or once if they do
+    not use glidein), the subexpressions using job but not glidein are evaluated once for all the entries.
+    Comparisons, boolean and arithmetic operators, subscripts, attributes and calls are applied to
+    whole columns. The second operand of and and or, and the branches of if, are evaluated only for
+    the rows where Python would evaluate them (short circuit).
+    Raises UnsupportedExpression if the expression uses job in other ways (e.g. comprehensions, lambda).
+    """
+
+    def __init__(self, match_expr, match_globals, namespace):
+        """
+        :param match_expr: match expression string
+        :param match_globals: globals used in the evaluation
+        :param namespace: names available to the expression besides job (attr_dict), glidein is set
+            at each evaluation
+        """
+        try:
+            tree = ast.parse(match_expr.strip(), '<string>', 'eval')
+        except SyntaxError:
+            raise UnsupportedExpression("Invalid expression")
+        self.match_globals = match_globals
+        self.namespace = namespace
+        # results of the subexpressions using only job (or nothing) for the current jobs
+        self.cached_jobs = None
+        self.cache = {}
+        self.nr_cached = 0
+        self.evaluate_func = self.compileNode(tree.body)
+
+    def compileNode(self, node):
+        """Return a function (jobs, glidein, rows) -> scalar or _Column evaluating node
+        for the jobs at the indexes in rows (all the jobs if rows is None)
+        """
+        names = _nodeNames(node)
+        if 'job' not in names:
+            code = compile(ast.fix_missing_locations(ast.Expression(body=node)), '<string>', 'eval')
+            return self.cached(self.scalarFunc(code), 'glidein' not in names)
+        if isinstance(node, ast.Name):
+            # only job, other names are scalars
+            return self.cached(_jobsColumn, True, True)
+        func, operand_nodes, lazy = self.nodeOperation(node)
+        operand_funcs = [self.compileNode(n) for n in operand_nodes]
+
+        if lazy:
+            def evaluate(jobs, glidein, rows):
+                return func(operand_funcs, jobs, glidein, rows)
+        else:
+            def evaluate(jobs, glidein, rows):
+                return _mapColumns(func, [f(jobs, glidein, rows) for f in operand_funcs], _nrRows(jobs, rows))
+        return self.cached(evaluate, 'glidein' not in names, _isPure(node))
+
+    def nodeOperation(self, node):
+        """Return the function applied to each row by node, the nodes of its operands
+        and whether it is lazy (the function receives the functions evaluating the operands)
+        """
+        if isinstance(node, ast.BoolOp):
+            if len(node.values) > 2:
+                # same result of a and b and c as (a and b) and c
+                left = ast.BoolOp(op=node.op, values=node.values[:-1])
+                return self.nodeOperation(ast.BoolOp(op=node.op, values=[left, node.values[-1]]))
+            return _lazyBoolOp(isinstance(node.op, ast.And)), node.values, True
+        if isinstance(node, ast.Compare):
+            if len(node.ops) > 1:
+                # a < b < c is a < b and b < c
+                pairs = []
+                left = node.left
+                for op, right in zip(node.ops, node.comparators):
+                    pairs.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+                    left = right
+                return self.nodeOperation(ast.BoolOp(op=ast.And(), values=pairs))
+            return COMPARE_OPERATORS[type(node.ops[0])], [node.left, node.comparators[0]], False
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            return BINARY_OPERATORS[type(node.op)], [node.left, node.right], False
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            return UNARY_OPERATORS[type(node.op)], [node.operand], False
+        if isinstance(node, ast.IfExp):
+            return _lazyIf, [node.test, node.body, node.orelse], True
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Index):
+            return operator.getitem, [node.value, node.slice.value], False
+        if isinstance(node, ast.Attribute):
+            attr = node.attr
+            return lambda obj: getattr(obj, attr), [node.value], False
+        if isinstance(node, ast.Call) and not (node.starargs or node.kwargs):
+            if node.keywords:
+                raise UnsupportedExpression("Keyword arguments in a call using job")
+            if isinstance(node.func, ast.Attribute) and 'job' in _nodeNames(node.func.value):
+                # method of a column, e.g. job.get("RequestMemory", 0)
+                attr = node.func.attr
+                return (lambda obj, *args: getattr(obj, attr)(*args)), [node.func.value] + node.args, False
+            return _call, [node.func] + node.args, False
+        raise UnsupportedExpression("Unsupported use of job in %s" % type(node).__name__)
+
+    def scalarFunc(self, code):
+        match_globals = self.match_globals
+        namespace = self.namespace
+
+        def evaluate(jobs, glidein, rows):
+            namespace['glidein'] = glidein
+            try:
+                return eval(code, match_globals, namespace)
+            except Exception:
+                return _currentRowError()
+        return evaluate
+
+    def cached(self, func, same_for_all_entries, pure=False):
+        """Evaluate func only once for the same jobs and rows if it does not depend on the entry
+        If pure (no side effects) it is evaluated once for all the rows and the values of the
+        rows selected by the and, or and if around it are returned: the other values are not used
+        """
+        if not same_for_all_entries:
+            return func
+        self.nr_cached += 1
+        key = self.nr_cached
+        cache = self.cache
+
+        def evaluate(jobs, glidein, rows):
+            if self.cached_jobs is not jobs:
+                self.cached_jobs = jobs
+                cache.clear()
+            if pure and rows is not None:
+                return _selectColumn(evaluate(jobs, glidein, None), rows)
+            cached = cache.get(key)
+            if cached is None or not (cached[0] is rows or cached[0] == rows):
+                # the results depend on the rows selected by the and, or and if around it
+                cached = (rows, func(jobs, glidein, rows))
+                cache[key] = cached
+            return cached[1]
+        return evaluate
+
+    def evaluate(self, jobs, glidein):
+        """Evaluate the expression for all the jobs
+
+        :param jobs: list of jobs (e.g. JobClusterTable.jobs), the same list object for the cached results
+        :param glidein: the entry (glidein) dictionary
+        :return: tuple: list with the value of the expression for each job (_RowError if the evaluation failed),
+            False if there are no _RowError values
+        """
+        result = self.evaluate_func(jobs, glidein, None)
+        if isinstance(result, _Column):
+            return result.values, result.has_errors
+        return [result] * len(jobs), isinstance(result, _RowError)
+
+
+class MatchEvaluator:
+    """Evaluator for the match expression and the match policies
+
+    The expression is evaluated with the same names available in countMatch (job, glidein, attr_dict)
+    and the policies are ANDed in the same order.
+    If the expression string is available and can be compiled (ColumnExpression) the expression is
+    evaluated by columns, otherwise one job at a time, reusing the namespace (only job and glidein are updated).
+    The policies are python functions, called for each job matching the expression.
+    """
+
+    def __init__(self, match_obj, match_policies=[], attr_dict=None, match_expr=None):
+        """
+        :param match_obj: output of compile(match string,'<string>','eval')
+        :param match_policies: list of MatchPolicy objects
+        :param attr_dict: dictionary of constant attributes
+        :param match_expr: match string, if None the expression is evaluated one job at a time
+        """
+        self.match_obj = match_obj
+        self.policies = [(policy.pyObject.match, policy.file) for policy in match_policies]
+        self.match_globals = vars(glideinFrontendLib)
+        self.namespace = {'job': None, 'glidein': None, 'attr_dict': attr_dict}
+        self.column_expr = None
+        if match_expr is not None:
+            try:
+                self.column_expr = ColumnExpression(match_expr, self.match_globals, self.namespace)
+            except UnsupportedExpression as e:
+                logSupport.log.debug("Match expression evaluated one job at a time: %s" % e)
+
+    def evaluateColumn(self, glidein, jobs, match_cache=None, glidename=None, signatures=None):
+        """Match one entry against all the jobs
+
+        :param glidein: the entry (glidein) dictionary
+        :param jobs: list of jobs (e.g. JobClusterTable.jobs), the results of the parts of the expression
+            not using the entry are reused while the same list is passed
+        :param match_cache: glideinFrontendMatchCache.MatchCache, if not None the results of
+            the previous iterations are reused and the new ones added
+        :param glidename: name of the entry, key in match_cache
+        :param signatures: list of the signatures of the jobs, keys in match_cache
+        :return: tuple: array of the indexes of the matching jobs, set of missing keys,
+            number of other exceptions, most recent traceback of the other exceptions
+        """
+        if self.column_expr is None:
+            return self.evaluateRows(glidein, jobs, match_cache, glidename, signatures)
+        policies = self.policies
+        values, has_errors = self.column_expr.evaluate(jobs, glidein)
+
+        matched = array('i')
+        missing_keys = set()
+        tb_count = 0
+        recent_tb = None
+        if not (has_errors or policies or match_cache is not None):
+            matched.extend([row for row in xrange(len(values)) if values[row] == True])
+            return matched, missing_keys, tb_count, recent_tb
+        for row in xrange(len(jobs)):
+            if match_cache is not None:
+                match = match_cache.getMatch(glidename, signatures[row])
+                if match is not None:
+                    if match:
+                        matched.append(row)
+                    continue
+            match = values[row]
+            try:
+                if isinstance(match, _RowError):
+                    raise match.exc_type, match.exc
+                for policy_match, policy_file in policies:
+                    if match is True:
+                        # Policies are supposed to be ANDed: match AND policy == policy because match is True
+                        match = policy_match(jobs[row], glidein)
+                    else:
+                        if match != False:
+                            # Non boolean results should be discarded and logged
+                            logSupport.log.warning("Match expression from policy file '%s' evaluated to non boolean result; assuming False" % policy_file)
+                        break
+                if match_cache is not None:
+                    match_cache.addMatch(glidename, signatures[row], match == True)
+                if match == True:
+                    matched.append(row)
+            except KeyError:
+                tb = traceback.format_exception_only(*sys.exc_info()[:2])
+                key = ((tb[-1].split(':'))[1]).strip()
+                missing_keys.add(key)
+            except Exception:
+                tb_count += 1
+                recent_tb = traceback.format_exception(sys.exc_info()[0],
+                                                       sys.exc_info()[1],
+                                                       sys.exc_info()[2])
+        return matched, missing_keys, tb_count, recent_tb
+
+    def evaluateRows(self, glidein, jobs, match_cache=None, glidename=None, signatures=None):
+        """Match one entry against all the jobs, evaluating the expression one job at a time
+        Same parameters and return value of evaluateColumn
+        """
+        match_obj = self.match_obj
+        match_globals = self.match_globals
+        policies = self.policies
+        namespace = self.namespace
+        namespace['glidein'] = glidein
+
+        matched = array('i')
+        missing_keys = set()
+        tb_count = 0
+        recent_tb = None
+        for row in xrange(len(jobs)):
+            if match_cache is not None:
+                match = match_cache.getMatch(glidename, signatures[row])
+                if match is not None:
+                    if match:
+                        matched.append(row)
+                    continue
+            job = jobs[row]
+            namespace['job'] = job
+            try:
+                match = eval(match_obj, match_globals, namespace)
+                for policy_match, policy_file in policies:
+                    if match is True:
+                        # Policies are supposed to be ANDed: match AND policy == policy because match is True
+                        match = policy_match(job, glidein)
+                    else:
+                        if match != False:
+                            # Non boolean results should be discarded and logged
+                            logSupport.log.warning("Match expression from policy file '%s' evaluated to non boolean result; assuming False" % policy_file)
+                        break
+                if match_cache is not None:
+                    match_cache.addMatch(glidename, signatures[row], match == True)
+                if match == True:
+                    matched.append(row)
+            except KeyError:
+                tb = traceback.format_exception(sys.exc_info()[0],
+                                                sys.exc_info()[1],
+                                                sys.exc_info()[2])
+                key = ((tb[-1].split(':'))[1]).strip()
+                missing_keys.add(key)
+            except Exception:
+                tb_count += 1
+                recent_tb = traceback.format_exception(sys.exc_info()[0],
+                                                       sys.exc_info()[1],
+                                                       sys.exc_info()[2])
+        return matched, missing_keys, tb_count, recent_tb
+
+
+def countMatch(match_obj, condorq_dict, glidein_dict, attr_dict, ignore_down_entries,
+               condorq_match_list=None, match_policies=[], group_name=None, match_cache=None, match_expr=None):
+    """Get the number of jobs that match each glidein
+
+    Same parameters and return value of glideinFrontendLib.countMatch
+
+    :param match_obj: output of re.compile(match string,'<string>','eval')
+    :param condorq_dict: output of getidleCondorQ
+    :param glidein_dict: output of interface.findGlideins
+    :param attr_dict: dictionary of constant attributes
+    :param ignore_down_entries: if True entries in downtime will not match any job
+    :param condorq_match_list: list of job attributes from the XML file
+    :param match_policies: list of MatchPolicy objects
+    :param group_name: if set dump the input data structures (see glideinFrontendLib.dumpMatchData)
+    :param match_cache: glideinFrontendMatchCache.MatchCache with the results of the previous iterations
+    :param match_expr: match string (compiled in match_obj), to evaluate the expression by columns
+        (see ColumnExpression), if None the expression is evaluated one job at a time
+    :return: tuple of 4 dictionaries: count, prop, hereonly, prop_mc
+    """
+    if group_name:
+        glideinFrontendLib.dumpMatchData(group_name, condorq_dict, glidein_dict, attr_dict, condorq_match_list)
+
+    jobs_table = JobClusterTable(condorq_dict, condorq_match_list)
+    entries_table = EntryTable(glidein_dict, ignore_down_entries)
+    evaluator = MatchEvaluator(match_obj, match_policies, attr_dict, match_expr)
+    if jobs_table.signatures is None:
+        # the cache is usable only with the precomputed signatures
+        match_cache = None
+
+    out_glidein_counts = {}
+    out_cpu_counts = {}
+    # list of sets of matching clusters (rows), one per entry
+    list_of_all_clusters = []
+    for entry_idx in range(len(entries_table)):
+        glidename = entries_table.names[entry_idx]
+        if entries_table.skip[entry_idx]:
+            matched = array('i')
+        else:
+            matched, missing_keys, tb_count, recent_tb = evaluator.evaluateColumn(entries_table.glideins[entry_idx],
+                                                                                  jobs_table.jobs, match_cache,
+                                                                                  glidename, jobs_table.signatures)
+            if missing_keys:
+                logSupport.log.debug("Failed to evaluate resource match in countMatch. Possibly match_expr has errors and trying to reference job or site attribute(s) '%s' in an inappropriate way." % (','.join(missing_keys)))
+            if tb_count > 0:
+                logSupport.log.debug("There were %s exceptions in countMatch subprocess. Most recent traceback: %s " % (tb_count, recent_tb))
+        out_glidein_counts[glidename], out_cpu_counts[glidename] = jobs_table.countRows(matched)
+        list_of_all_clusters.append(set(matched))
+
+    # Unique subsets of clusters, converted in number of jobs
+    (outvals_cl, jrange_cl) = glideinFrontendLib.uniqueSets(list_of_all_clusters)
+    del list_of_all_clusters
+    subset_counts = [(vtuple[0], jobs_table.countRows(vtuple[1])[0]) for vtuple in outvals_cl]
+    count_unmatched = jobs_table.nr_jobs - jobs_table.countRows(jrange_cl)[0]
+
+    return glideinFrontendLib.countMatchProportions(glidein_dict, out_glidein_counts, out_cpu_counts,
+                                                    subset_counts, count_unmatched)
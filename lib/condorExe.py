@@ -26,8 +26,10 @@ class UnconfigError(RuntimeError):
 
 
 class ExeError(RuntimeError):
-    def __init__(self, err_str):
+    def __init__(self, err_str, stdout_lines=None):
         RuntimeError.__init__(self, err_str)
+        # stdout of the failed command as a list of lines, if available
+        self.stdout_lines = stdout_lines
 
 
 #
@@ -73,6 +75,24 @@ def exe_cmd_sbin(condor_exe, args, stdin_data=None, env={}):
     return iexe_cmd(cmd, stdin_data, env)
 
 
+def exe_cmd_chunks(condor_exe, args, stdin_data=None, env={}):
+    """
+    Execute a condor command and return a generator over chunks of its output
+    Use it instead of exe_cmd when the output can be big and can be processed incrementally
+    (e.g. with condorMonitor.xml2iter)
+    The command is started only when the generator is first iterated
+    """
+    global condor_bin_path
+
+    if condor_bin_path is None:
+        raise UnconfigError("condor_bin_path is undefined!")
+    condor_exe_path = os.path.join(condor_bin_path, condor_exe)
+
+    cmd = "%s %s" % (condor_exe_path, args)
+
+    return iexe_cmd_chunks(cmd, stdin_data, env)
+
+
 ############################################################
 #
 # P R I V A T E, do not use
@@ -128,17 +148,43 @@ def iexe_cmd(cmd, stdin_data=None, child_env=None):
         stdoutdata = subprocessSupport.iexe_cmd(cmd, stdin_data=stdin_data,
                                                 child_env=child_env)
     except Exception as ex:
+        stdoutdata = getattr(ex, 'stdout', None) or stdoutdata
         msg = "Unexpected Error running '%s'. Details: %s. Stdout: %s" % (cmd, ex, stdoutdata)
         try:
             logSupport.log.debug(msg)
             logSupport.log.debug(generate_bash_script(cmd, os.environ))
         except:
             pass
-        raise ExeError(msg)
+        raise ExeError(msg, stdoutdata.splitlines())
 
     return stdoutdata.splitlines()
 
 
+# can throw ExeError
+def iexe_cmd_chunks(cmd, stdin_data=None, child_env=None):
+    """
+    Fork a process and execute cmd, yielding its output in chunks (see subprocessSupport.iexe_cmd_chunks)
+
+    @type cmd: string
+    @param cmd: Sting containing the entire command including all arguments
+    @type stdin_data: string
+    @param stdin_data: Data that will be fed to the command via stdin
+    @type child_env: dict
+    @param child_env: Environment to be set before execution
+    """
+    try:
+        for chunk in subprocessSupport.iexe_cmd_chunks(cmd, stdin_data=stdin_data, child_env=child_env):
+            yield chunk
+    except Exception as ex:
+        msg = "Unexpected Error running '%s'. Details: %s" % (cmd, ex)
+        try:
+            logSupport.log.debug(msg)
+            logSupport.log.debug(generate_bash_script(cmd, os.environ))
+        except:
+            pass
+        raise ExeError(msg)
+
+
 #
 # Set condor_bin_path
 #
@@ -127,6 +127,94 @@ def condorReleaseOne(cluster_or_uname,schedd_name=None,pool_name=None,
     return cached_exe_cmd("condor_release", opts,
                           schedd_name, pool_name, schedd_lookup_cache)
 
+##############################################
+#
+# Bulk job control
+# A single command acts on many job ids (at most MAX_JOBS_PER_CMD at a time)
+# and returns the list of the jobs on which the command succeeded
+#
+
+# Max number of job ids on one command line
+MAX_JOBS_PER_CMD = 500
+
+# condor_rm, condor_hold and condor_release report each job done on a line
+#  Job 123.0 marked for removal
+#  Job 123.0 held
+#  Job 123.0 released
+JOB_DONE_RE = re.compile(r'^Job ([0-9]+)\.([0-9]+) (marked for removal|removed|held|released)')
+
+
+def parseJobActionOutput(lines):
+    """
+    Return the set of (ClusterId, ProcId) reported as done in the output of
+    condor_rm, condor_hold or condor_release
+    """
+    done = set()
+    for line in lines:
+        m = JOB_DONE_RE.match(line.strip())
+        if m is not None:
+            done.add((int(m.group(1)), int(m.group(2))))
+    return done
+
+
+def condorJobAction(cmd, jid_list, schedd_name=None, pool_name=None, opts="",
+                    schedd_lookup_cache=condorMonitor.local_schedd_cache):
+    """
+    Execute cmd (condor_rm, condor_hold or condor_release) on a list of jobs,
+    with one command per MAX_JOBS_PER_CMD jobs
+
+    @param cmd: command name
+    @param jid_list: list of (ClusterId, ProcId)
+    @param opts: additional command options
+    @return: list of the (ClusterId, ProcId) on which the command succeeded, in the order of jid_list
+    """
+    done_jids = []
+    for start in range(0, len(jid_list), MAX_JOBS_PER_CMD):
+        jids = jid_list[start:start+MAX_JOBS_PER_CMD]
+        arg_str = "%s%s " % (opts, string.join(["%i.%i" % (jid[0], jid[1]) for jid in jids], " "))
+        try:
+            lines = cached_exe_cmd(cmd, arg_str, schedd_name, pool_name, schedd_lookup_cache)
+            failed = False
+        except condorExe.ExeError as e:
+            # some jobs may have succeeded anyway, see the output
+            lines = e.stdout_lines or []
+            failed = True
+        done = parseJobActionOutput(lines)
+        if not failed and not done:
+            # the command succeeded without the usual output, trust the exit code
+            done_jids += jids
+        else:
+            done_jids += [jid for jid in jids if (jid[0], jid[1]) in done]
+    return done_jids
+
+
+def condorRemoveMany(jid_list, schedd_name=None, pool_name=None,
+                     do_forcex=False,
+                     schedd_lookup_cache=condorMonitor.local_schedd_cache):
+    """
+    Remove a list of jobs from the queue, see condorJobAction
+    """
+    opts = ""
+    if do_forcex:
+        opts = "-forcex "
+    return condorJobAction("condor_rm", jid_list, schedd_name, pool_name, opts, schedd_lookup_cache)
+
+
+def condorHoldMany(jid_list, schedd_name=None, pool_name=None,
+                   schedd_lookup_cache=condorMonitor.local_schedd_cache):
+    """
+    Hold a list of jobs, see condorJobAction
+    """
+    return condorJobAction("condor_hold", jid_list, schedd_name, pool_name, "", schedd_lookup_cache)
+
+
+def condorReleaseMany(jid_list, schedd_name=None, pool_name=None,
+                      schedd_lookup_cache=condorMonitor.local_schedd_cache):
+    """
+    Release a list of jobs, see condorJobAction
+    """
+    return condorJobAction("condor_release", jid_list, schedd_name, pool_name, "", schedd_lookup_cache)
+
 ##############################################
 #
 # Issue a condor_reschedule
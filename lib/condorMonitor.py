@@ -19,10 +19,13 @@ import sys
 import string
 import copy
 import socket
+import collections
+from array import array
 import xml.parsers.expat
-from itertools import groupby
+from itertools import groupby, chain, islice
 from . import condorExe
 from . import condorSecurity
+from . import logSupport
 
 USE_HTCONDOR_PYTHON_BINDINGS = False
 try:
@@ -37,7 +40,7 @@ try:
     # without the knowledge of CONDOR_CONFIG. A reload is needed.
     # Furthemore _CONDOR_ variables are ignored by htcondor and need to be added
     # manually to htcondor.param.
-    # This mandates that we do a htcondor_full_reload() every time to use the bindings.
+    # This mandates that we do a htcondor_full_reload() every time the environment changes (see BindingsCache).
     import htcondor  # pylint: disable=import-error
     import classad   # pylint: disable=import-error
     USE_HTCONDOR_PYTHON_BINDINGS = True
@@ -233,9 +236,91 @@ class NoneDiskCache:
         return None
 
 
+def get_condor_config_env():
+    """
+    Return the part of the environment affecting the HTCondor configuration
+    (CONDOR_CONFIG and the _CONDOR_ variables), as a sorted tuple
+    """
+    return tuple(sorted([(k, v) for k, v in os.environ.items()
+                         if k == 'CONDOR_CONFIG' or k.startswith('_CONDOR_')]))
+
+
+class BindingsCache:
+    """
+    Per process cache of the htcondor-python bindings configuration and connections.
+    The configuration is reloaded (htcondor_full_reload) only when the environment
+    affecting it changes, e.g. different security settings, or in a new (forked) process.
+    The Collector and Schedd objects are reused until the next reload or reset
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.config_env = None
+        self.collectors = {}
+        self.schedds = {}
+
+    def reset(self):
+        """
+        Forget the configuration and the connections, e.g. after an error
+        """
+        self.pid = None
+        self.config_env = None
+        self.collectors = {}
+        self.schedds = {}
+
+    def reloadConfig(self):
+        """
+        Reload the bindings configuration if the environment changed since the last reload
+        """
+        config_env = get_condor_config_env()
+        if self.pid != os.getpid() or self.config_env != config_env:
+            htcondor_full_reload()
+            self.collectors = {}
+            self.schedds = {}
+            self.pid = os.getpid()
+            self.config_env = config_env
+
+    def getCollector(self, pool_name=None):
+        """
+        Return the htcondor.Collector for pool_name (the default collector if None)
+        """
+        try:
+            return self.collectors[pool_name]
+        except KeyError:
+            pass
+        if pool_name:
+            collector = htcondor.Collector(str(pool_name))
+        else:
+            collector = htcondor.Collector()
+        self.collectors[pool_name] = collector
+        return collector
+
+    def getSchedd(self, schedd_name=None, pool_name=None):
+        """
+        Return the htcondor.Schedd for schedd_name in pool_name (the local schedd if None)
+        The schedd location is cached also in disk_cache
+        """
+        global disk_cache
+        try:
+            return self.schedds[(schedd_name, pool_name)]
+        except KeyError:
+            pass
+        if schedd_name:
+            schedd_ad = disk_cache.get(schedd_name + '.locate')
+            if schedd_ad is None:
+                schedd_ad = self.getCollector(pool_name).locate(htcondor.DaemonTypes.Schedd, schedd_name)
+                disk_cache.save(schedd_name + '.locate', schedd_ad)
+            schedd = htcondor.Schedd(schedd_ad)
+        else:
+            schedd = htcondor.Schedd()
+        self.schedds[(schedd_name, pool_name)] = schedd
+        return schedd
+
+
 # default global object
 local_schedd_cache = LocalScheddCache()
 disk_cache = NoneDiskCache()
+bindings_cache = BindingsCache()
 
 
 def condorq_attrs(q_constraint, attribute_list):
@@ -340,33 +425,19 @@ class CondorQEdit:
         """ Given equal sized lists of job ids, attributes and values,
             executes in one large transaction a single qedit for each job.
         """
-        global disk_cache
         joblist = joblist or []
         attributes = attributes or []
         values = values or []
         if not (len(joblist) == len(attributes) == len(values)):
             raise QueryError("Arguments to QEdit.executeAll should have the same length")
         try:
-            htcondor_full_reload()
-            if self.pool_name:
-                collector = htcondor.Collector(str(self.pool_name))
-            else:
-                collector = htcondor.Collector()
-
-            if self.schedd_name:
-                schedd_ad = disk_cache.get(self.schedd_name + '.locate')
-                if schedd_ad is None:
-                    schedd_ad = collector.locate(htcondor.DaemonTypes.Schedd,
-                                                 self.schedd_name)
-                    disk_cache.save(self.schedd_name + '.locate', schedd_ad)
-
-                schedd = htcondor.Schedd(schedd_ad)
-            else:
-                schedd = htcondor.Schedd()
+            bindings_cache.reloadConfig()
+            schedd = bindings_cache.getSchedd(self.schedd_name, self.pool_name)
             with schedd.transaction() as _:
                 for jobid, attr, val in zip(joblist, attributes, values):
                     schedd.edit([jobid], attr, classad.quote(val))
         except Exception as ex:
+            bindings_cache.reset()
             s = 'default'
             if self.schedd_name is not None:
                 s = self.schedd_name
@@ -400,8 +471,10 @@ class CondorQuery(StoredQuery):
     """
 
     def __init__(self, exe_name, resource_str, group_attribute,
-                 pool_name=None, security_obj=None, env={}):
+                 pool_name=None, security_obj=None, env={}, columnar_storage=False):
         self.exe_name = exe_name
+        # if True the results are stored in a ColumnarResult instead of a dictionary of dictionaries
+        self.columnar_storage = columnar_storage
         self.env = env
         self.resource_str = resource_str
         self.group_attribute = group_attribute
@@ -485,11 +558,19 @@ class CondorQuery(StoredQuery):
         """
         try:
             if USE_HTCONDOR_PYTHON_BINDINGS:
-                return self.fetch_using_bindings(constraint=constraint,
-                                                 format_list=format_list)
-            else:
-                return self.fetch_using_exe(constraint=constraint,
-                                            format_list=format_list)
+                try:
+                    return self.fetch_using_bindings(constraint=constraint,
+                                                     format_list=format_list)
+                except NotImplementedError:
+                    # The command line tools are the fallback
+                    pass
+                except PBError as ex:
+                    # The command line tools are the fallback, the failure of the bindings is logged
+                    # (logSupport may not be initialized when used by the tools)
+                    if logSupport.log is not None:
+                        logSupport.log.warning("Python bindings query failed, using the HTCondor commands: %s" % ex)
+            return self.fetch_using_exe(constraint=constraint,
+                                        format_list=format_list)
         except Exception as ex:
             err_str = 'Error executing htcondor query to pool %s with constraint %s and format_list %s: %s. Env is %s' % (self.pool_name, constraint, format_list, ex, os.environ)
             raise QueryError(err_str), None, sys.exc_info()[2]
@@ -524,24 +605,32 @@ class CondorQuery(StoredQuery):
             self.security_obj.enforce_requests()
 
             if full_xml:
-                xml_data = condorExe.exe_cmd(self.exe_name, "%s -xml %s %s" %
-                                             (self.resource_str, self.pool_str, constraint_str), env=self.env)
+                xml_chunks = condorExe.exe_cmd_chunks(self.exe_name, "%s -xml %s %s" %
+                                                      (self.resource_str, self.pool_str, constraint_str), env=self.env)
             else:
                 # format_str is defined because full_xml False means (format_list is not None)
-                xml_data = condorExe.exe_cmd(self.exe_name, "%s %s -xml %s %s" %
-                                             (self.resource_str, format_str, self.pool_str, constraint_str), env=self.env)
+                xml_chunks = condorExe.exe_cmd_chunks(self.exe_name, "%s %s -xml %s %s" %
+                                                      (self.resource_str, format_str, self.pool_str, constraint_str),
+                                                      env=self.env)
+            # The command runs while its output is consumed, so this must be in the security context
+            # The classads are parsed as the output arrives, without keeping the whole XML in memory
+            if self.columnar_storage:
+                dict_data = list2columns(xml2iter(xml_chunks), self.group_attribute)
+            else:
+                dict_data = list2dict(xml2iter(xml_chunks), self.group_attribute)
         finally:
             # restore old security context
             self.security_obj.restore_state()
 
-        list_data = xml2list(xml_data)
-        del xml_data
-        dict_data = list2dict(list_data, self.group_attribute)
         return dict_data
 
     def fetch_using_bindings(self, constraint=None, format_list=None):
         """Fetch the results using htcondor-python bindings
 
+        Only the attributes in format_list are requested (projection), the configuration
+        and the connections are reused (bindings_cache) and the classads are converted
+        to python values by bindings2iter
+
         Args:
             constraint (str): Constraints to be applied to the query
             format_list (list): Classad attr & type. [(attr1, 'i'), ('attr2', 's')]
@@ -550,9 +639,55 @@ class CondorQuery(StoredQuery):
 
         Raises:
             NotImplementedError: the operation is not implemented using bindings
+            PBError: the query failed
+
+        """
+        constraint = bindings_friendly_constraint(constraint)
+        attrs = bindings_friendly_attrs(format_list)
+
+        self.security_obj.save_state()
+        try:
+            self.security_obj.enforce_requests()
+            bindings_cache.reloadConfig()
+            results = self.bindings_query(constraint, attrs)
+            if self.columnar_storage:
+                results_dict = list2columns(bindings2iter(results), self.group_attribute)
+            else:
+                results_dict = list2dict(bindings2iter(results), self.group_attribute)
+        except NotImplementedError:
+            raise
+        except Exception as ex:
+            # the connections may be stale
+            bindings_cache.reset()
+            err_str = 'Error querying %s using python bindings: %s' % (self.bindings_target_str(), ex)
+            raise PBError(err_str), None, sys.exc_info()[2]
+        finally:
+            self.security_obj.restore_state()
+
+        return results_dict
+
+    def bindings_query(self, constraint, attrs):
+        """Query using htcondor-python bindings, called by fetch_using_bindings
+
+        Args:
+            constraint (str): Constraint in bindings format (bindings_friendly_constraint)
+            attrs (list): Attributes to return, all if empty (bindings_friendly_attrs)
+
+        Returns (iterable): classad.ClassAd objects
+
+        Raises:
+            NotImplementedError: the operation is not implemented using bindings
+
+        """
+        raise NotImplementedError("bindings_query() not implemented")
 
+    def bindings_target_str(self):
+        """Return a string describing the daemon queried, for the error messages
         """
-        raise NotImplementedError("fetch_using_bindings() not implemented")
+        p = 'default'
+        if self.pool_name is not None:
+            p = self.pool_name
+        return 'pool %s' % p
 
     def load(self, constraint=None, format_list=None):
         """
@@ -579,7 +714,7 @@ class CondorQ(CondorQuery):
     """
 
     def __init__(self, schedd_name=None, pool_name=None, security_obj=None,
-                 schedd_lookup_cache=local_schedd_cache):
+                 schedd_lookup_cache=local_schedd_cache, columnar_storage=False):
         self.schedd_name = schedd_name
 
         if schedd_lookup_cache is None:
@@ -589,7 +724,7 @@ class CondorQ(CondorQuery):
                                                           pool_name)
         CondorQuery.__init__(self, "condor_q", schedd_str,
                              ["ClusterId", "ProcId"],
-                             pool_name, security_obj, env)
+                             pool_name, security_obj, env, columnar_storage)
 
     def fetch(self, constraint=None, format_list=None):
         if format_list is not None:
@@ -599,54 +734,24 @@ class CondorQ(CondorQuery):
         return CondorQuery.fetch(self, constraint=constraint,
                                  format_list=format_list)
 
-    def fetch_using_bindings(self, constraint=None, format_list=None):
-        """Fetch the condor_q results using htcondor-python bindings
+    def bindings_query(self, constraint, attrs):
+        """Query the schedd using htcondor-python bindings
 
         Args:
-            constraint (str): Constraints to be applied to the query
-            format_list (list): Classad attr & type. [(attr1, 'i'), ('attr2', 's')]
+            constraint (str): Constraint in bindings format (bindings_friendly_constraint)
+            attrs (list): Attributes to return, all if empty (bindings_friendly_attrs)
 
-        Returns (dict): Dict containing the results
+        Returns (iterable): classad.ClassAd objects
 
         """
-        global disk_cache
-        results_dict = {}  # defined here in case of exception
-        constraint = bindings_friendly_constraint(constraint)
-        attrs = bindings_friendly_attrs(format_list)
-
-        self.security_obj.save_state()
-        try:
-            self.security_obj.enforce_requests()
-            htcondor_full_reload()
-            if self.pool_name:
-                collector = htcondor.Collector(str(self.pool_name))
-            else:
-                collector = htcondor.Collector()
-
-            if self.schedd_name is None:
-                schedd = htcondor.Schedd()
-            else:
-                schedd_ad = disk_cache.get(self.schedd_name + '.locate')
-                if schedd_ad is None:
-                    schedd_ad = collector.locate(htcondor.DaemonTypes.Schedd,
-                                                 self.schedd_name)
-                    disk_cache.save(self.schedd_name + '.locate', schedd_ad)
-                schedd = htcondor.Schedd(schedd_ad)
-            results = schedd.query(constraint, attrs)
-            results_dict = list2dict(results, self.group_attribute)
-        except Exception as ex:
-            s = 'default'
-            if self.schedd_name is not None:
-                s = self.schedd_name
-            p = 'default'
-            if self.pool_name is not None:
-                p = self.pool_name
-            err_str = 'Error querying schedd %s in pool %s using python bindings: %s' % (s, p, ex)
-            raise PBError(err_str), None, sys.exc_info()[2]
-        finally:
-            self.security_obj.restore_state()
+        schedd = bindings_cache.getSchedd(self.schedd_name, self.pool_name)
+        return schedd.query(constraint, attrs)
 
-        return results_dict
+    def bindings_target_str(self):
+        s = 'default'
+        if self.schedd_name is not None:
+            s = self.schedd_name
+        return 'schedd %s in %s' % (s, CondorQuery.bindings_target_str(self))
 
 
 class CondorStatus(CondorQuery):
@@ -654,13 +759,13 @@ class CondorStatus(CondorQuery):
     Class to implement condor_status. Uses htcondor-python bindings if possible.
     """
 
-    def __init__(self, subsystem_name=None, pool_name=None, security_obj=None):
+    def __init__(self, subsystem_name=None, pool_name=None, security_obj=None, columnar_storage=False):
         if subsystem_name is None:
             subsystem_str = ""
         else:
             subsystem_str = "-%s" % subsystem_name
         CondorQuery.__init__(self, "condor_status", subsystem_str,
-                             "Name", pool_name, security_obj, {})
+                             "Name", pool_name, security_obj, {}, columnar_storage)
 
     def fetch(self, constraint=None, format_list=None):
         if format_list is not None:
@@ -669,36 +774,13 @@ class CondorStatus(CondorQuery):
         return CondorQuery.fetch(self, constraint=constraint,
                                  format_list=format_list)
 
-    def fetch_using_bindings(self, constraint=None, format_list=None):
+    def bindings_query(self, constraint, attrs):
         """
-        Fetch the results using htcondor-python bindings
+        Query the collector using htcondor-python bindings
         """
-        results_dict = {}  # defined here in case of exception
-        constraint = bindings_friendly_constraint(constraint)
-        attrs = bindings_friendly_attrs(format_list)
-
         adtype = resource_str_to_py_adtype(self.resource_str)
-        self.security_obj.save_state()
-        try:
-            self.security_obj.enforce_requests()
-            htcondor_full_reload()
-            if self.pool_name:
-                collector = htcondor.Collector(str(self.pool_name))
-            else:
-                collector = htcondor.Collector()
-
-            results = collector.query(adtype, constraint, attrs)
-            results_dict = list2dict(results, self.group_attribute)
-        except Exception as ex:
-            p = 'default'
-            if self.pool_name is not None:
-                p = self.pool_name
-            err_str = 'Error querying pool %s using python bindings: %s' % (p, ex)
-            raise PBError(err_str), None, sys.exc_info()[2]
-        finally:
-            self.security_obj.restore_state()
-
-        return results_dict
+        collector = bindings_cache.getCollector(self.pool_name)
+        return collector.query(adtype, constraint, attrs)
 
 
 #
@@ -888,91 +970,163 @@ def complete_format_list(in_format_list, req_format_els):
 #</classads>
 #
 
-# 3 xml2list XML handler functions
-def xml2list_start_element(name, attrs):
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
-    if name == "c":
-        xml2list_inclassad = {}
-    elif name == "a":
-        xml2list_inattr = {"name": attrs["n"], "val": ""}
-        xml2list_intype = "s"
-    elif name == "i":
-        xml2list_intype = "i"
-    elif name == "r":
-        xml2list_intype = "r"
-    elif name == "b":
-        xml2list_intype = "b"
-        if 'v' in attrs:
-            xml2list_inattr["val"] = (attrs["v"] in ('T', 't', '1'))
-        else:
-            # extended syntax... value in text area
-            xml2list_inattr["val"] = None
-    elif name == "un":
-        xml2list_intype = "un"
-        xml2list_inattr["val"] = None
-    elif name in ("s", "e"):
-        pass  # nothing to do
-    elif name == "classads":
-        pass  # top element, nothing to do
-    else:
-        raise TypeError("Unsupported type: %s" % name)
-
-
-def xml2list_end_element(name):
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
-    if name == "c":
-        xml2list_data.append(xml2list_inclassad)
-        xml2list_inclassad = None
-    elif name == "a":
-        xml2list_inclassad[xml2list_inattr["name"]] = xml2list_inattr["val"]
-        xml2list_inattr = None
-    elif name in ("i", "b", "un", "r"):
-        xml2list_intype = "s"
-    elif name in ("s", "e"):
-        pass # nothing to do
-    elif name == "classads":
-        pass # top element, nothing to do
-    else:
-        raise TypeError("Unexpected type: %s" % name)
+class Xml2ListParser:
+    """Incremental parser of the Condor XML format
+    The data can be fed in chunks of any size (see feed) and the classads are returned as soon as
+    they are complete, so the whole XML text does not need to be in memory.
+    All the state is in the object, so multiple parsers can be used at the same time.
+    Attribute names are interned (one string object per name, shared by all the classads of a query)
+    """
 
+    def __init__(self):
+        self.parser = xml.parsers.expat.ParserCreate()
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+        self.parser.CharacterDataHandler = self.char_data
+        # complete classads not yet returned by feed
+        self.classads = []
+        self.inclassad = None
+        # name of the current attribute, None when not in an attribute
+        self.inattr = None
+        self.intype = None
+        # value of the current attribute, if set in the XML element attributes (b, un)
+        self.inval = None
+        # text of the current attribute
+        self.intext = []
+        self.attr_names = {}
+        # data before the XML header is discarded
+        self.found_xml = False
+        self.preamble = ""
+
+    def start_element(self, name, attrs):
+        if name == "c":
+            self.inclassad = {}
+        elif name == "a":
+            attr_name = attrs["n"]
+            self.inattr = self.attr_names.setdefault(attr_name, attr_name)
+            self.intype = "s"
+            self.inval = None
+            self.intext = []
+        elif name == "i":
+            self.intype = "i"
+        elif name == "r":
+            self.intype = "r"
+        elif name == "b":
+            self.intype = "b"
+            if 'v' in attrs:
+                self.inval = (attrs["v"] in ('T', 't', '1'))
+            # else extended syntax... value in text area
+        elif name == "un":
+            self.intype = "un"
+        elif name in ("s", "e"):
+            pass  # nothing to do
+        elif name == "classads":
+            pass  # top element, nothing to do
+        else:
+            raise TypeError("Unsupported type: %s" % name)
+
+    def end_element(self, name):
+        if name == "c":
+            self.classads.append(self.inclassad)
+            self.inclassad = None
+        elif name == "a":
+            self.inclassad[self.inattr] = self.attr_value()
+            self.inattr = None
+            self.intext = []
+        elif name in ("i", "b", "un", "r", "s", "e"):
+            pass  # the value is converted at the end of the attribute
+        elif name == "classads":
+            pass  # top element, nothing to do
+        else:
+            raise TypeError("Unexpected type: %s" % name)
 
-def xml2list_char_data(data):
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
-    if xml2list_inattr is None:
-        # only process when in attribute
-        return
+    def char_data(self, data):
+        if self.inattr is None:
+            # only process when in attribute
+            return
+        # expat may split the text of an element in multiple calls
+        self.intext.append(data)
 
-    if xml2list_intype == "i":
-        xml2list_inattr["val"] = int(data)
-    elif xml2list_intype == "r":
-        xml2list_inattr["val"] = float(data)
-    elif xml2list_intype == "b":
-        if xml2list_inattr["val"] is not None:
-            # nothing to do, value was in attribute
-            pass
+    def attr_value(self):
+        """Return the value of the current attribute, converted according to its type
+        """
+        if self.intype == "i":
+            return int(string.join(self.intext, ""))
+        elif self.intype == "r":
+            return float(string.join(self.intext, ""))
+        elif self.intype == "b":
+            if self.inval is not None:
+                # value was in attribute
+                return self.inval
+            return (string.join(self.intext, "")[:1] in ('T', 't', '1'))
+        elif self.intype == "un":
+            return None
         else:
-            xml2list_inattr["val"] = (data[0] in ('T', 't', '1'))
-    elif xml2list_intype == "un":
-        # nothing to do, value was in attribute
-        pass
-    else:
-        unescaped_data = string.replace(data, '\\"', '"')
-        xml2list_inattr["val"] += unescaped_data
+            return string.replace(string.join(self.intext, ""), '\\"', '"')
 
+    def feed(self, data, is_final=False):
+        """Parse a chunk of XML data
+
+        :param data: string with the next part of the XML document
+        :param is_final: True if this is the last chunk
+        :return: list of the classads completed by this chunk
+        """
+        if not self.found_xml:
+            # look for the xml header at the beginning of a line
+            data = self.preamble + data
+            if data[:5] == "<?xml":
+                pos = 0
+            else:
+                pos = data.find("\n<?xml")
+                if pos >= 0:
+                    pos += 1
+            if pos < 0:
+                # keep only what could be the beginning of the header
+                self.preamble = data[-5:]
+                return []
+            self.found_xml = True
+            self.preamble = ""
+            data = data[pos:]
+        try:
+            self.parser.Parse(data, is_final)
+        except TypeError as e:
+            raise RuntimeError("Failed to parse XML data, TypeError: %s" % e)
+        except:
+            raise RuntimeError("Failed to parse XML data, generic error")
+        out = self.classads
+        self.classads = []
+        return out
+
+    def close(self):
+        """Signal the end of the data
+        :return: list of the remaining classads
+        """
+        if not self.found_xml:
+            # no xml, so no classads
+            return []
+        return self.feed("", True)
 
-def xml2list(xml_data):
-    global xml2list_data, xml2list_inclassad, xml2list_inattr, xml2list_intype
 
-    xml2list_data = []
-    xml2list_inclassad = None
-    xml2list_inattr = None
-    xml2list_intype = None
+def xml2iter(xml_chunks):
+    """Generator over the classads in the XML data
+
+    :param xml_chunks: iterable of strings (lines or chunks of any size, e.g. from condorExe.exe_cmd_chunks)
+    :return: generator of dictionaries, one per classad, ready for list2dict
+    """
+    parser = Xml2ListParser()
+    for chunk in xml_chunks:
+        for ad in parser.feed(chunk):
+            yield ad
+    for ad in parser.close():
+        yield ad
 
-    p = xml.parsers.expat.ParserCreate()
-    p.StartElementHandler = xml2list_start_element
-    p.EndElementHandler = xml2list_end_element
-    p.CharacterDataHandler = xml2list_char_data
 
+def xml2list(xml_data):
+    """Convert the XML data in a list of dictionaries, one per classad
+
+    :param xml_data: list of lines, e.g. the output of condorExe.exe_cmd
+    :return: list of dictionaries
+    """
     found_xml = -1
     for line in range(len(xml_data)):
         # look for the xml header
@@ -980,16 +1134,37 @@ def xml2list(xml_data):
             found_xml = line
             break
 
-    if found_xml >= 0:
-        try:
-            p.Parse(string.join(xml_data[found_xml:]), 1)
-        except TypeError as e:
-            raise RuntimeError("Failed to parse XML data, TypeError: %s" % e)
-        except:
-            raise RuntimeError("Failed to parse XML data, generic error")
-    # else no xml, so return an empty list
+    if found_xml < 0:
+        # no xml, so return an empty list
+        return []
+    # lines are joined with a space, as it always was
+    lines = chain(xml_data[found_xml:found_xml + 1], (" " + line for line in islice(xml_data, found_xml + 1, None)))
+    return list(xml2iter(lines))
+
+
+def bindings2iter(ads):
+    """Generator converting the classads returned by the htcondor-python bindings
+    in dictionaries with python values, like the ones from xml2iter
+
+    Expressions are evaluated, attributes that are Undefined (or Error) are skipped.
+    Attribute names are interned (one string object per name)
 
-    return xml2list_data
+    :param ads: iterable of classad.ClassAd
+    :return: generator of dictionaries, one per classad, ready for list2dict
+    """
+    expr_type = classad.ExprTree
+    value_type = classad.Value  # Undefined and Error
+    attr_names = {}
+    for ad in ads:
+        ad_dict = {}
+        for attr, value in ad.items():
+            if isinstance(value, expr_type):
+                # Try to evaluate the condor expr and use its value
+                value = value.eval()
+            if isinstance(value, value_type):
+                continue
+            ad_dict[attr_names.setdefault(attr, attr)] = value
+        yield ad_dict
 
 
 def list2dict(list_data, attr_name):
@@ -1017,7 +1192,7 @@ def list2dict(list_data, attr_name):
     #  the older ones without any warning
     #  AND the original description mentions ... "and group the results" ... there is no grouping
     # 5. 'Undefined' attributes are not added to the dict_el (dict elements may have different keys)
-    # 6. using '%s'%a_value != 'Undefined' and  str(list_el[a]) != 'Undefined' for the same. Use twice the better one
+    #  The classads from the python bindings are converted by bindings2iter, where Undefined values are dropped
 
     if type(attr_name) in (type([]), type((1, 2))):
         attr_list = attr_name
@@ -1026,46 +1201,419 @@ def list2dict(list_data, attr_name):
 
     dict_data = {}
     for list_el in list_data:
-        if type(attr_name) in (type([]), type((1, 2))):
-            dict_name = []
-            for an in attr_name:
-                if an in list_el:
-                    dict_name.append(list_el[an])
-                else:
-                    # Try lower cases
-                    for k in list_el:
-                        if an.lower()==k.lower():
-                            dict_name.append(list_el[k])
-                            break
-            dict_name=tuple(dict_name)
+        dict_name, dict_el = list_el2dict(list_el, attr_name, attr_list)
+        dict_data[dict_name] = dict_el
+    return dict_data
+
+
+def list_el2dict(list_el, attr_name, attr_list):
+    """
+    Convert one element of the list in list2dict
+
+    :param list_el: dictionary (classad) to convert
+    :param attr_name: string (1 attribute) or list or tuple (one or more attributes) with the attributes to use as key
+    :param attr_list: attr_name as a list
+    :return: tuple: key, dictionary with all the elements but those in attr_list
+    """
+    if type(attr_name) in (type([]), type((1, 2))):
+        dict_name = []
+        for an in attr_name:
+            if an in list_el:
+                dict_name.append(list_el[an])
+            else:
+                # Try lower cases
+                for k in list_el:
+                    if an.lower()==k.lower():
+                        dict_name.append(list_el[k])
+                        break
+        dict_name=tuple(dict_name)
+    else:
+        dict_name = list_el[attr_name]
+    # dict_el will have all the elements but those in attr_list
+    # the values are already python values (from xml2iter or bindings2iter)
+    dict_el = {}
+    for a in list_el:
+        if not (a in attr_list):
+            dict_el[a] = list_el[a]
+    return dict_name, dict_el
+
+
+def list2columns(list_data, attr_name):
+    """
+    Same as list2dict, but the result is stored in a ColumnarResult
+
+    :param list_data: list (or iterable) of dictionaries to convert
+    :param attr_name: string (1 attribute) or list or tuple (one or more attributes) with the attributes to use as key
+    :return: ColumnarResult
+    """
+    if type(attr_name) in (type([]), type((1, 2))):
+        attr_list = attr_name
+    else:
+        attr_list = [attr_name]
+
+    columns_data = ColumnarResult()
+    for list_el in list_data:
+        dict_name, dict_el = list_el2dict(list_el, attr_name, attr_list)
+        columns_data.setRow(dict_name, dict_el)
+    columns_data.compact()
+    return columns_data
+
+
+#
+# Columnar storage of the query results
+#
+
+# Python type of the values in the typed arrays
+COLUMN_TYPES = {'l': int, 'd': float}
+
+
+# Marks the attributes missing in a row
+class _Missing(object):
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        # keep it a singleton when unpickled
+        return "MISSING"
+
+MISSING = _Missing()
+
+
+class ColumnarResult(collections.Mapping):
+    """
+    Read only dictionary of dictionaries (like the output of list2dict) stored by columns.
+    There is one column per attribute, with one value per row (MISSING if the row does not have the attribute).
+    After compact(), the columns with int or float values in all the rows are stored in typed arrays
+    and the equal strings in a column are stored only once.
+    The values are ColumnarRow objects, behaving like dictionaries, created on access.
+    Selections of rows (subqueries) can be stored as IndexView objects instead of copies.
+    """
+
+    def __init__(self):
+        # keys of the rows, in row order
+        self.row_keys = []
+        # key -> row index
+        self.row_index = {}
+        # attribute name -> list or array of values
+        self.columns = {}
+
+    @classmethod
+    def fromDict(cls, dict_data):
+        """Create a ColumnarResult from a dictionary of dictionaries (e.g. the output of list2dict)
+        """
+        columns_data = cls()
+        for key, el in dict_data.iteritems():
+            columns_data.setRow(key, el)
+        columns_data.compact()
+        return columns_data
+
+    def setRow(self, key, el):
+        """Add a row, or replace an existing one (like assigning to a dictionary)
+
+        :param key: key of the row
+        :param el: dictionary with the attributes of the row
+        """
+        row = self.row_index.get(key)
+        if row is None:
+            row = len(self.row_keys)
+            self.row_keys.append(key)
+            self.row_index[key] = row
+            for attr in self.columns.keys():
+                self._getListColumn(attr).append(MISSING)
         else:
-            dict_name = list_el[attr_name]
-        # dict_el will have all the elements but those in attr_list
-        dict_el = {}
-        for a in list_el:
-            if not (a in attr_list):
+            for attr, column in self.columns.items():
+                if attr not in el and column[row] is not MISSING:
+                    self.delValue(row, attr)
+        for attr, value in el.iteritems():
+            self.setValue(row, attr, value)
+
+    def setValue(self, row, attr, value):
+        column = self.columns.get(attr)
+        if column is None:
+            column = [MISSING] * len(self.row_keys)
+            self.columns[attr] = column
+        elif isinstance(column, array):
+            if type(value) is COLUMN_TYPES[column.typecode]:
                 try:
-                    if (USE_HTCONDOR_PYTHON_BINDINGS == True):
-                        if (list_el[a].__class__.__name__ == 'ExprTree'):
-                            # Try to evaluate the condor expr and use its value
-                            # If cannot be evaluated, keep the expr as is
-                            a_value = list_el[a].eval()
-                            if '%s'%a_value != 'Undefined':
-                                # Cannot use classad.Value.Undefined for
-                                # for comparison as it gets cast to int
-                                dict_el[a] = a_value
-                        elif str(list_el[a]) != 'Undefined':
-                            # No need for Undefined check to see if
-                            # attribute exists in the fetched classad
-                            dict_el[a] = list_el[a]
-                    else:
-                        dict_el[a] = list_el[a]
-                except:
-                    # Do not fail
+                    column[row] = value
+                    return
+                except OverflowError:
                     pass
+            # the value does not fit in the typed array anymore
+            column = self._getListColumn(attr)
+        column[row] = value
+
+    def delValue(self, row, attr):
+        column = self.columns.get(attr)
+        if column is None or column[row] is MISSING:
+            raise KeyError(attr)
+        self._getListColumn(attr)[row] = MISSING
+
+    def _getListColumn(self, attr):
+        """Return the column of attr as a list, converting the typed arrays (see compact),
+        that cannot store MISSING or values of other types
+        """
+        column = self.columns[attr]
+        if isinstance(column, array):
+            column = self.columns[attr] = list(column)
+        return column
+
+    def compact(self):
+        """Reduce the memory used by the columns
+        int and float columns without missing values are converted to arrays, equal strings are shared
+        """
+        for attr, column in self.columns.items():
+            if isinstance(column, array) or not column:
+                continue
+            value_types = set([type(value) for value in column])
+            if value_types == set([int]):
+                typecode = 'l'
+            elif value_types == set([float]):
+                typecode = 'd'
+            else:
+                typecode = None
+            if typecode is not None:
+                try:
+                    self.columns[attr] = array(typecode, column)
+                    continue
+                except OverflowError:
+                    pass
+            strings = {}
+            for row in xrange(len(column)):
+                value = column[row]
+                if type(value) in (str, unicode):
+                    column[row] = strings.setdefault(value, value)
+
+    def column(self, attr):
+        """Return the column of an attribute (list or array, MISSING marks the rows without it)
+        """
+        column = self.columns.get(attr)
+        if column is None:
+            return [MISSING] * len(self.row_keys)
+        return column
 
-        dict_data[dict_name] = dict_el
-    return dict_data
+    def row(self, row):
+        return ColumnarRow(self, row)
+
+    def select(self, constraint_func):
+        """Return an IndexView with the rows satisfying constraint_func
+        """
+        return IndexView(self, array('l', [row for row in xrange(len(self.row_keys))
+                                            if constraint_func(ColumnarRow(self, row))]))
+
+    def __getitem__(self, key):
+        return ColumnarRow(self, self.row_index[key])
+
+    def __contains__(self, key):
+        return key in self.row_index
+
+    def __iter__(self):
+        return iter(self.row_keys)
+
+    def __len__(self):
+        return len(self.row_keys)
+
+    def keys(self):
+        return self.row_keys[:]
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+    def __getstate__(self):
+        # row_index can be rebuilt, no need to pickle it
+        return {'row_keys': self.row_keys, 'columns': self.columns}
+
+    def __setstate__(self, state):
+        self.row_keys = state['row_keys']
+        self.columns = state['columns']
+        self.row_index = dict([(self.row_keys[row], row) for row in xrange(len(self.row_keys))])
+
+
+class ColumnarRow(collections.MutableMapping):
+    """
+    One row of a ColumnarResult, behaving like the dictionary of the classad
+    Changes are written in the ColumnarResult
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, attr):
+        column = self.table.columns.get(attr)
+        if column is None:
+            raise KeyError(attr)
+        value = column[self.row]
+        if value is MISSING:
+            raise KeyError(attr)
+        return value
+
+    def __setitem__(self, attr, value):
+        self.table.setValue(self.row, attr, value)
+
+    def __delitem__(self, attr):
+        self.table.delValue(self.row, attr)
+
+    def __iter__(self):
+        row = self.row
+        for attr, column in self.table.columns.iteritems():
+            if column[row] is not MISSING:
+                yield attr
+
+    def __len__(self):
+        row = self.row
+        return len([1 for column in self.table.columns.itervalues() if column[row] is not MISSING])
+
+    def has_key(self, attr):
+        return attr in self
+
+    def copy(self):
+        return dict(self.iteritems())
+
+    def __repr__(self):
+        return repr(self.copy())
+
+    def __reduce__(self):
+        # pickled (and copied) as a plain dictionary
+        return dict, (self.copy(),)
+
+
+class IndexView(collections.Mapping):
+    """
+    Read only selection of the rows of a ColumnarResult (e.g. the idle jobs),
+    stored as an array of row indexes instead of a copy of the dictionary
+    """
+
+    def __init__(self, table, rows):
+        """
+        :param table: ColumnarResult
+        :param rows: array of row indexes
+        """
+        self.table = table
+        self.rows = rows
+        self._row_set = None
+
+    def select(self, constraint_func):
+        """Return an IndexView with the rows of this view satisfying constraint_func
+        """
+        table = self.table
+        return IndexView(table, array('l', [row for row in self.rows if constraint_func(ColumnarRow(table, row))]))
+
+    def rowSet(self):
+        if self._row_set is None:
+            self._row_set = frozenset(self.rows)
+        return self._row_set
+
+    def __getitem__(self, key):
+        row = self.table.row_index[key]
+        if row not in self.rowSet():
+            raise KeyError(key)
+        return ColumnarRow(self.table, row)
+
+    def __contains__(self, key):
+        row = self.table.row_index.get(key)
+        return row is not None and row in self.rowSet()
+
+    def __iter__(self):
+        row_keys = self.table.row_keys
+        for row in self.rows:
+            yield row_keys[row]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+    def __getstate__(self):
+        return {'table': self.table, 'rows': self.rows}
+
+    def __setstate__(self, state):
+        self.table = state['table']
+        self.rows = state['rows']
+        self._row_set = None
+
+
+class KeyView(collections.Mapping):
+    """
+    Read only selection of the elements of a dictionary (e.g. the idle jobs),
+    stored as a list of keys instead of a copy of the dictionary.
+    Same as IndexView, for the results not in columnar storage
+    """
+
+    def __init__(self, data, keys):
+        """
+        :param data: dictionary
+        :param keys: list of keys of data
+        """
+        self.data = data
+        self.key_list = keys
+        self._key_set = None
+
+    def keySet(self):
+        if self._key_set is None:
+            self._key_set = frozenset(self.key_list)
+        return self._key_set
+
+    def __getitem__(self, key):
+        if key not in self.keySet():
+            raise KeyError(key)
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.keySet()
+
+    def __iter__(self):
+        return iter(self.key_list)
+
+    def __len__(self):
+        return len(self.key_list)
+
+    # faster than the Mapping methods, no check of the keys
+    def iteritems(self):
+        data = self.data
+        for key in self.key_list:
+            yield (key, data[key])
+
+    def itervalues(self):
+        data = self.data
+        for key in self.key_list:
+            yield data[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return list(self.itervalues())
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+    def __getstate__(self):
+        return {'data': self.data, 'key_list': self.key_list}
+
+    def __setstate__(self, state):
+        self.data = state['data']
+        self.key_list = state['key_list']
+        self._key_set = None
+
+
+def selectKeys(data, keys):
+    """
+    Return a read only view with the elements of data with these keys, without copying them
+    An IndexView for ColumnarResult and IndexView data, a KeyView otherwise
+    """
+    if isinstance(data, ColumnarResult):
+        row_index = data.row_index
+        return IndexView(data, array('l', [row_index[key] for key in keys]))
+    elif isinstance(data, IndexView):
+        row_index = data.table.row_index
+        return IndexView(data.table, array('l', [row_index[key] for key in keys]))
+    elif isinstance(data, KeyView):
+        return KeyView(data.data, keys)
+    return KeyView(data, keys)
 
 
 def applyConstraint(data, constraint_func):
@@ -1076,6 +1624,9 @@ def applyConstraint(data, constraint_func):
 
     if constraint_func is None:
         return data
+    elif isinstance(data, (ColumnarResult, IndexView)):
+        # lightweight view on the same columns
+        return data.select(constraint_func)
     else:
         outdata = {}
         for key, val in data.iteritems():
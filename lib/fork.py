@@ -43,6 +43,8 @@ class ForkResultError(RuntimeError):
 def fork_in_bg(function_torun, *args):
     # fork and call a function with args
     #  return a dict with {'r': fd, 'pid': pid} where fd is the stdout from a pipe.
+    #  The result is pickled with the binary protocol, faster to dump and load
+    #  and smaller than protocol 0 (parent and child are the same python)
     #    example:
     #      def add(i, j): return i+j
     #      d = fork_in_bg(add, i, j)
@@ -55,7 +57,7 @@ def fork_in_bg(function_torun, *args):
         os.close(r)
         try:
             out = function_torun(*args)
-            os.write(w, cPickle.dumps(out))
+            os.write(w, cPickle.dumps(out, cPickle.HIGHEST_PROTOCOL))
         except:
             logSupport.log.warning("Forked process '%s' failed" % str(function_torun))
             logSupport.log.exception("Forked process '%s' failed" % str(function_torun))
@@ -93,13 +95,16 @@ def fetch_fork_result(r, pid):
     @return: Unpickled object
     """
 
-    rin = ""
+    chunks = []
     out = None
     try:
         s = os.read(r, 1024*1024)
         while s != "":  # "" means EOF
-            rin += s
+            chunks.append(s)
             s = os.read(r, 1024*1024)
+        # join once, the results can be hundreds of MB
+        rin = "".join(chunks)
+        del chunks
         # pickle can fail w/ EOFError if rin is empty. Any output from pickle is never an empty string, e.g. None is 'N.' 
         out = cPickle.loads(rin)
     except (OSError, IOError, EOFError, cPickle.UnpicklingError) as err:
@@ -287,6 +292,8 @@ class ForkManager:
         self.functions_tofork = {}
         # I need a separate list to keep the order
         self.key_list = []
+        # seconds from the fork to the collection of the result, for each key (bounded_fork_and_collect)
+        self.timings = {}
         return
 
     def __len__(self):
@@ -317,6 +324,7 @@ class ForkManager:
         nr_errors = 0
 
         pipe_ids = {}
+        start_times = {}
         forks_remaining = max_forks
         functions_remaining = len(self.functions_tofork)
 
@@ -348,6 +356,7 @@ class ForkManager:
                 post_work_info.update(post_work_info_subset)
                 forks_remaining += len(post_work_info_subset)
                 functions_remaining -= len(post_work_info_subset)
+                self._record_timings(post_work_info_subset, start_times)
 
                 for i in (post_work_info_subset.keys() + failed_keys):
                     if pipe_ids.get(i):
@@ -356,6 +365,7 @@ class ForkManager:
             # end while
 
             # yes, we can, do it
+            start_times[key] = time.time()
             pipe_ids[key] = fork_in_bg(*self.functions_tofork[key])
             forks_remaining -= 1
         # end for
@@ -384,6 +394,7 @@ class ForkManager:
             post_work_info.update(post_work_info_subset)
             forks_remaining += len(post_work_info_subset)
             functions_remaining -= len(post_work_info_subset)
+            self._record_timings(post_work_info_subset, start_times)
 
             for i in (post_work_info_subset.keys() + failed_keys):
                 del pipe_ids[i]
@@ -397,3 +408,11 @@ class ForkManager:
             raise ForkResultError(nr_errors, post_work_info)
 
         return post_work_info
+
+    def _record_timings(self, results, start_times):
+        """Record the time taken by the children whose results were just collected
+        The time includes the wait for the collection (polling interval)
+        """
+        now = time.time()
+        for key in results:
+            self.timings[key] = now - start_times[key]
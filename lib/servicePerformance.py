@@ -25,6 +25,8 @@ class PerfMetric:
         # metric is a dict of dict with following structure
         # {event_name: {'start_time': time(), 'end_time': time()}}
         self.metric = {}
+        # counters is a dict {counter_name: value}, e.g. cache hits and misses
+        self.counters = {}
 
 
     def register_event_time(self, event_name, t_tag, t=None):
@@ -59,6 +61,14 @@ class PerfMetric:
         return float('{0:.3f}'.format(lifetime))
 
 
+    def set_counter(self, counter_name, value):
+        self.counters[counter_name] = value
+
+
+    def increment_counter(self, counter_name, value=1):
+        self.counters[counter_name] = self.counters.get(counter_name, 0) + value
+
+
     def __str__(self):
         return self.__repr__()
 
@@ -92,6 +102,14 @@ def getPerfMetricEventLifetime(name, event_name):
     return getPerfMetric(name).event_lifetime(event_name)
 
 
+def setPerfMetricCounter(name, counter_name, value):
+    getPerfMetric(name).set_counter(counter_name, value)
+
+
+def incrementPerfMetricCounter(name, counter_name, value=1):
+    getPerfMetric(name).increment_counter(counter_name, value)
+
+
 def getPerfMetric(name):
     """
     Given the name of the service, return the PerfMetric object
@@ -1,6 +1,7 @@
 import os
 import subprocess
 import shlex
+import tempfile
 
 # Exception classes used by this module.
 class CalledProcessError(Exception):
@@ -9,10 +10,12 @@ class CalledProcessError(Exception):
     The exit status will be stored in the returncode attribute;
     check_output() will also store the output in the output attribute.
     """
-    def __init__(self, returncode, cmd, output=None):
+    def __init__(self, returncode, cmd, output=None, stdout=None):
         self.returncode = returncode
         self.cmd = cmd
         self.output = output
+        # stdout of the failed process, if available
+        self.stdout = stdout
     def __str__(self):
         return "Command '%s' returned non-zero exit status %s: %s" % (self.cmd, self.returncode, self.output)
 
@@ -78,9 +81,74 @@ def iexe_cmd(cmd, useShell=False, stdin_data=None, child_env=None):
         err_str = "Error running '%s'\nStdout:%s\nStderr:%s\nException OSError:%s"
         raise RuntimeError(err_str % (cmd, stdoutdata, stderrdata, e))
     if exitStatus:
-        raise CalledProcessError(exitStatus, cmd, output="".join(stderrdata))
+        raise CalledProcessError(exitStatus, cmd, output="".join(stderrdata), stdout=stdoutdata)
     return stdoutdata
 
+def iexe_cmd_chunks(cmd, chunk_size=65536, stdin_data=None, child_env=None):
+    """
+    Fork a process and execute cmd, yielding its stdout in chunks as soon as they are read.
+    Same as iexe_cmd but the output is never kept in memory all at once.
+
+    stderr (and stdin_data) go through temporary files, so that the pipes cannot fill up
+    while the caller is processing the chunks.
+    The exit status is checked only after the whole stdout is consumed.
+    If the caller stops early, the process is killed.
+
+    @type cmd: string
+    @param cmd: String containing the entire command including all arguments
+    @type chunk_size: int
+    @param chunk_size: maximum size of the chunks of stdout yielded
+    @type stdin_data: string
+    @param stdin_data: Data that will be fed to the command via stdin
+    @type child_env: dict
+    @param child_env: Environment to be set before execution
+    """
+    if child_env:
+        for k in os.environ:
+            if not k in child_env:
+                child_env[k] = os.environ[k]
+    else:
+        child_env = os.environ
+
+    stdin_file = tempfile.TemporaryFile()
+    stderr_file = tempfile.TemporaryFile()
+    process = None
+    try:
+        if stdin_data:
+            stdin_file.write(stdin_data)
+            stdin_file.seek(0)
+        try:
+            process = subprocess.Popen(shlex.split(cmd.encode('utf8')),
+                                       stdin=stdin_file,
+                                       stdout=subprocess.PIPE,
+                                       stderr=stderr_file,
+                                       env=child_env)
+        except OSError as e:
+            err_str = "Error running '%s'\nStdout:%s\nStderr:%s\nException OSError:%s"
+            raise RuntimeError(err_str % (cmd, "", "", e))
+
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        exitStatus = process.wait()
+        process = None
+        if exitStatus:
+            stderr_file.seek(0)
+            raise CalledProcessError(exitStatus, cmd, output=stderr_file.read())
+    finally:
+        if process is not None:
+            # the caller did not consume all the output
+            try:
+                process.kill()
+                process.wait()
+            except OSError:
+                pass
+        stdin_file.close()
+        stderr_file.close()
+
+
 def call(*popenargs, **kwargs):
     """Run command with arguments.  Wait for command to complete, then
     return the returncode attribute.
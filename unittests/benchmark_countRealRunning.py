@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#
+# Project:
+#   glideinWMS
+#
+# Description:
+#   micro-benchmark of the frontend glideinFrontendLib.countRealRunning function
+#   Compares the current implementation, visiting only the job clusters running on
+#   each entry (index by RunningOn), with the original one, checking all the clusters
+#   for each entry (copied below), on a synthetic pool
+#   The original implementation is O(entries x clusters): it is run only on a sample of
+#   the entries and its time for all the entries is extrapolated
+#   Usage: benchmark_countRealRunning.py [NR_ENTRIES NR_RUNNING_JOBS [NR_SAMPLE_ENTRIES]]
+#     default: 5000 entries, 500000 running jobs, 10 sampled entries
+#   Exits with 1 if the two implementations return different results
+#
+# Author:
+#   glideinWMS team
+#
+
+from __future__ import print_function
+
+import sys
+import time
+import random
+
+from glideinwms.frontend import glideinFrontendLib
+
+
+class NullLog:
+
+    def debug(self, msg):
+        pass
+
+    warning = debug
+
+
+class FakeCondorQ:
+    """Same interface of the CondorQ objects used by countRealRunning
+    """
+
+    def __init__(self, stored_data):
+        self.stored_data = stored_data
+
+    def fetchStored(self):
+        return self.stored_data
+
+
+def countRealRunningAllClusters(match_obj, condorq_dict, glidein_dict, condorq_match_list):
+    """Original implementation of countRealRunning, without policies and error handling
+    Used as reference for the results and the timing
+    """
+    out_job_counts = {}
+    out_glidein_counts = {}
+    hash_match_list = condorq_match_list + ['RunningOn']
+    schedds = condorq_dict.keys()
+    nr_schedds = len(schedds)
+
+    cq_dict_clusters = {}
+    for scheddIdx in range(nr_schedds):
+        cq_dict_clusters[scheddIdx] = {}
+        cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
+        condorq_data = condorq_dict[schedds[scheddIdx]].fetchStored()
+        for jid in condorq_data.keys():
+            jh = glideinFrontendLib.hashJob(condorq_data[jid], hash_match_list)
+            if jh not in cq_dict_clusters_el:
+                cq_dict_clusters_el[jh] = []
+            cq_dict_clusters_el[jh].append(jid)
+
+    for glidename in glidein_dict:
+        glide_str = "%s@%s" % (glidename[1], glidename[0].split(':')[0])
+        glidein = glidein_dict[glidename]
+        job_ids = set()
+        glidein_ids = set()
+        for scheddIdx in range(nr_schedds):
+            cq_dict_clusters_el = cq_dict_clusters[scheddIdx]
+            condorq_data = condorq_dict[schedds[scheddIdx]].fetchStored()
+            for jh in cq_dict_clusters_el.keys():
+                job = condorq_data[cq_dict_clusters_el[jh][0]]
+                if (job['RunningOn'] == glide_str) and eval(match_obj, globals(), {'job': job, 'glidein': glidein}):
+                    for jid in cq_dict_clusters_el[jh]:
+                        job = condorq_data[jid]
+                        job_ids.add("%d %s" % (scheddIdx, jid))
+                        token = job['RemoteHost'].split('@')
+                        glidein_ids.add('%s@%s' % (token[-2], token[-1]))
+        out_job_counts[glidename] = len(job_ids)
+        out_glidein_counts[glidename] = len(glidein_ids)
+    return out_job_counts, out_glidein_counts
+
+
+def syntheticPool(nr_entries, nr_jobs, seed):
+    """Generate nr_entries entries (glidein_dict) and nr_jobs jobs running on them,
+    spread over 10 schedds (condorq_dict), with RunningOn set as done by appendRealRunning
+    """
+    rnd = random.Random(seed)
+    glidein_dict = {}
+    glide_strs = []
+    for i in range(nr_entries):
+        glidename = ('factory%d.example.com:9618' % (i % 3), 'entry_%d@gfactory_instance@gfactory_service' % i,
+                     'frontend_%d' % (i % 3))
+        glidein_dict[glidename] = {'attrs': {'GLIDEIN_Site': 'Site_%d' % (i % 200), 'GLIDEIN_CPUS': 1},
+                                   'monitor': {}, 'params': {}}
+        glide_strs.append("%s@%s" % (glidename[1], glidename[0].split(':')[0]))
+    users = ['user%d@example.com' % i for i in range(50)]
+    desired_sites = [','.join(['Site_%d' % rnd.randint(0, 199) for j in range(5)]) for i in range(100)]
+    condorq_dict = {}
+    for schedd_idx in range(10):
+        condorq_dict['schedd%d.example.com' % schedd_idx] = FakeCondorQ({})
+    schedd_names = sorted(condorq_dict.keys())
+    for i in range(nr_jobs):
+        entry_idx = rnd.randint(0, nr_entries - 1)
+        job = {'JobStatus': 2, 'User': rnd.choice(users), 'DESIRED_Sites': rnd.choice(desired_sites),
+               'RunningOn': glide_strs[entry_idx],
+               'RemoteHost': 'slot1_%d@glidein_%d_%d@wn%d.example.com' % (i % 8, entry_idx, i % 1000, i % 5000)}
+        condorq_dict[schedd_names[i % 10]].stored_data[(i, 0)] = job
+    return condorq_dict, glidein_dict
+
+
+def main():
+    nr_entries = 5000
+    nr_jobs = 500000
+    nr_sample = 10
+    if len(sys.argv) > 2:
+        nr_entries = int(sys.argv[1])
+        nr_jobs = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        nr_sample = int(sys.argv[3])
+    glideinFrontendLib.logSupport.log = NullLog()
+    match_list = ['User', 'DESIRED_Sites']
+    match_obj = compile('glidein["attrs"]["GLIDEIN_Site"] in job["DESIRED_Sites"]', "<string>", "eval")
+
+    condorq_dict, glidein_dict = syntheticPool(nr_entries, nr_jobs, nr_entries)
+    t_begin = time.time()
+    job_counts, glidein_counts = glideinFrontendLib.countRealRunning(match_obj, condorq_dict, glidein_dict, {},
+                                                                     match_list)
+    t_indexed = time.time() - t_begin
+
+    sample_keys = sorted(glidein_dict.keys())[:nr_sample]
+    sample_dict = dict([(k, glidein_dict[k]) for k in sample_keys])
+    t_begin = time.time()
+    ref_job_counts, ref_glidein_counts = countRealRunningAllClusters(match_obj, condorq_dict, sample_dict, match_list)
+    t_reference = time.time() - t_begin
+
+    same = ((ref_job_counts == dict([(k, job_counts[k]) for k in sample_keys])) and
+            (ref_glidein_counts == dict([(k, glidein_counts[k]) for k in sample_keys])))
+    print("entries=%d running_jobs=%d matched_jobs=%d" % (nr_entries, nr_jobs, sum(job_counts.values())))
+    print("indexed (all entries)=%.2fs all-clusters (%d entries)=%.2fs, extrapolated to all entries=%.1fs %s" %
+          (t_indexed, len(sample_keys), t_reference, t_reference * nr_entries / max(len(sample_keys), 1),
+           same and "OK" or "DIFFERENT"))
+    if not same:
+        print("ERROR: the implementations returned different results")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
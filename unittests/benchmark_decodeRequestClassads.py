@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+#
+# Project:
+#   glideinWMS
+#
+# Description:
+#   micro-benchmark of the decoding of the glideclient (request) classads done by
+#   glideinwms/factory/glideFactoryInterface.py findGroupWork (decodeRequestClassads)
+#   Compares the current single pass implementation with the original one, walking
+#   the attributes once per prefix (copied below), on synthetic classads and, optionally,
+#   on recorded ones, e.g. the output of:
+#     condor_status -any -xml -constraint 'GlideinMyType=?="glideclient"'
+#   The recorded classads are decoded without factory key (the encrypted values are not decrypted)
+#   The decryption cache is disabled, to time only the decoding
+#   Usage: benchmark_decodeRequestClassads.py [RECORDED_XML ...]
+#   Exits with 1 if the two implementations return different results
+#
+# Author:
+#   glideinWMS team
+#
+
+from __future__ import print_function
+
+import sys
+import time
+import random
+import binascii
+
+from glideinwms.lib import condorMonitor
+from glideinwms.factory import glideFactoryInterface as gfi
+
+
+class NullLog:
+
+    def debug(self, msg):
+        pass
+
+    warning = debug
+
+
+class FakeSymKey:
+    """Symmetric key with a cheap decryption, only hex decoding
+    """
+
+    def decrypt_hex(self, data):
+        return binascii.a2b_hex(data)
+
+
+class FakePubKey:
+
+    def get_pub_key_id(self):
+        return 'benchmark_key'
+
+    def extract_sym_key(self, enc_key_code):
+        return FakeSymKey()
+
+
+class NoDecryptCache:
+    """Same interface as glideFactoryInterface.DecryptCache, always decrypting
+    """
+
+    def __init__(self):
+        self.resetStats()
+
+    def resetStats(self):
+        self.stats = {'KeyHits': 0, 'KeyMisses': 0, 'ValueHits': 0, 'ValueMisses': 0}
+
+    def newCycle(self):
+        pass
+
+    def getSymKey(self, pub_key_obj, enc_key_code):
+        return pub_key_obj.extract_sym_key(enc_key_code)
+
+    def decryptHex(self, pub_key_obj, enc_key_code, sym_key_obj, ciphertext):
+        return sym_key_obj.decrypt_hex(ciphertext)
+
+
+def decodeRequestClassadsMultiPass(data, pub_key_obj=None):
+    """Original implementation of the decoding in findGroupWork
+    Used as reference for the results and the timing
+    """
+    factoryConfig = gfi.factoryConfig
+    reserved_names = ("ReqName", "ReqGlidein", "ClientName", "FrontendName",
+                      "GroupName", "ReqPubKeyID", "ReqEncKeyCode",
+                      "ReqEncIdentity", "AuthenticatedIdentity")
+    out = {}
+    for k in data:
+        kel = data[k]
+        el = {"requests": {}, "web": {}, "params": {},
+              "params_decrypted": {}, "monitor": {}, "internals": {}}
+
+        for (key, prefix) in (("requests", factoryConfig.client_req_prefix),
+                              ("web", factoryConfig.client_web_prefix),
+                              ("params", factoryConfig.glidein_param_prefix),
+                              ("monitor", factoryConfig.glidein_monitor_prefix)):
+            plen = len(prefix)
+            for attr in kel:
+                if attr in reserved_names:
+                    continue
+                if attr[:plen] == prefix:
+                    el[key][attr[plen:]] = kel[attr]
+
+        sym_key_obj = None
+        if (pub_key_obj is not None) and ('ReqPubKeyID' in kel):
+            try:
+                sym_key_obj = pub_key_obj.extract_sym_key(kel['ReqEncKeyCode'])
+            except:
+                continue
+
+        if (sym_key_obj is not None):
+            try:
+                enc_identity = sym_key_obj.decrypt_hex(kel['ReqEncIdentity'])
+            except:
+                continue
+            if enc_identity != kel['AuthenticatedIdentity']:
+                continue
+
+        invalid_classad = False
+        for (key, prefix) in (("params_decrypted", factoryConfig.encrypted_param_prefix),):
+            plen = len(prefix)
+            for attr in kel:
+                if attr in reserved_names:
+                    continue
+                if attr[:plen] == prefix:
+                    el[key][attr[plen:]] = None
+                    if sym_key_obj is not None:
+                        try:
+                            el[key][attr[plen:]] = sym_key_obj.decrypt_hex(kel[attr])
+                        except:
+                            invalid_classad = True
+                            break
+
+        if invalid_classad:
+            continue
+
+        for attr in kel:
+            if attr in ("ClientName", "FrontendName", "GroupName", "ReqName",
+                        "LastHeardFrom", "ReqPubKeyID", "AuthenticatedIdentity"):
+                el["internals"][attr] = kel[attr]
+
+        out[k] = el
+    return out
+
+
+def syntheticClassads(nr_classads, seed):
+    """Generate nr_classads glideclient classads, similar to the ones of a frontend
+    with many groups requesting glideins to many entries
+    """
+    rnd = random.Random(seed)
+    data = {}
+    for i in range(nr_classads):
+        fe_name = 'frontend%d.group%d' % (i % 7, i % 13)
+        identity = 'vofrontend_service@fe%d.example.com' % (i % 7)
+        name = 'entry_%d@gfactory_instance@gfactory_service@%s' % (i, fe_name)
+        kel = {'MyType': 'glideclient', 'GlideinMyType': 'glideclient', 'Name': name,
+               'ReqName': 'entry_%d@gfactory_instance@gfactory_service' % i,
+               'ReqGlidein': 'entry_%d@gfactory_instance@gfactory_service' % i,
+               'ClientName': fe_name, 'FrontendName': 'frontend%d' % (i % 7), 'GroupName': 'group%d' % (i % 13),
+               'ReqPubKeyID': 'benchmark_key', 'ReqEncKeyCode': 'key%d' % (i % 7),
+               'ReqEncIdentity': binascii.b2a_hex(identity), 'AuthenticatedIdentity': identity,
+               'LastHeardFrom': 1500000000 + i, 'UpdateSequenceNumber': rnd.randint(0, 1000),
+               'ReqIdleGlideins': rnd.randint(0, 100), 'ReqMaxGlideins': rnd.randint(100, 1000),
+               'ReqRemoveExcess': 'NO', 'ReqRemoveExcessMargin': 0, 'ReqIdleLifetime': 0,
+               'WebURL': 'http://fe%d.example.com/vofrontend/stage' % (i % 7),
+               'WebSignType': 'sha1', 'WebDescriptFile': 'description.a1b2c3.cfg',
+               'WebDescriptSign': '%040x' % rnd.getrandbits(160), 'WebGroupURL': 'http://fe/group',
+               'WebGroupDescriptFile': 'description.d4e5f6.cfg', 'WebGroupDescriptSign': '%040x' % rnd.getrandbits(160),
+               'GlideinEncParamSecurityName': binascii.b2a_hex('frontend%d' % (i % 7)),
+               'GlideinEncParamSecurityClass': binascii.b2a_hex('frontend'),
+               'GlideinEncParamSubmitProxy': binascii.b2a_hex('/var/lib/gwms-factory/proxy%d' % i)}
+        for j in range(20):
+            kel['GlideinParamGLIDEIN_Param%d' % j] = 'value%d' % rnd.randint(0, 10)
+        for attr in ('Idle', 'Running', 'RunningHere', 'GlideinsIdle', 'GlideinsRunning', 'GlideinsTotal',
+                     'TotalIdle', 'TotalRunning', 'TotalRunningHere', 'TotalGlideinsIdle', 'TotalGlideinsRunning'):
+            kel['GlideinMonitor%s' % attr] = rnd.randint(0, 1000)
+        data[name] = kel
+    return data
+
+
+def compare(name, data, pub_key_obj):
+    """Time both implementations on data and check the results
+    Returns True if the results are the same
+    """
+    timings = []
+    results = []
+    for func in (decodeRequestClassadsMultiPass, gfi.decodeRequestClassads):
+        t_begin = time.time()
+        results.append(func(data, pub_key_obj))
+        timings.append(time.time() - t_begin)
+    same = results[0] == results[1]
+    print("%-32s classads=%-6d multi-pass=%.4fs single-pass=%.4fs %s" %
+          (name, len(data), timings[0], timings[1], same and "OK" or "DIFFERENT"))
+    return same
+
+
+def main():
+    # only the decoding is timed
+    gfi.decryptCache = NoDecryptCache()
+    gfi.logSupport.log = NullLog()
+    all_same = True
+    for nr_classads in (1000, 5000, 20000):
+        data = syntheticClassads(nr_classads, nr_classads)
+        all_same = compare("synthetic %d" % nr_classads, data, FakePubKey()) and all_same
+    for fname in sys.argv[1:]:
+        with open(fname) as fd:
+            data = condorMonitor.list2dict(condorMonitor.xml2list(fd.read().splitlines()), 'Name')
+        all_same = compare(fname, data, None) and all_same
+    if not all_same:
+        print("ERROR: the implementations returned different results")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Project:
+#   glideinWMS
+#
+# Description:
+#   benchmark of the collection of the results of the children of glideinwms/lib/fork.py
+#   Forks children returning a condor_q-like dictionary of jobs and prints the time
+#   (and the max RSS of the parent) needed to collect the results with ForkManager
+#   and with the original implementation (protocol 0 pickle, concatenation of the reads)
+#   The max RSS is for the whole run, run a single implementation to compare the memory used
+#   Usage: benchmark_fork_result.py [NR_JOBS [NR_CHILDREN [original|current]]]
+#
+# Author:
+#   glideinWMS team
+#
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+import cPickle
+import random
+import resource
+
+from glideinwms.lib import fork
+
+
+def make_jobs(nr_jobs):
+    """Return a dictionary similar to the stored_data of a CondorQ
+    """
+    rnd = random.Random(nr_jobs)
+    jobs = {}
+    for i in range(nr_jobs):
+        jobs[(i // 100, i % 100)] = {'JobStatus': rnd.choice([1, 2]),
+                                     'EnteredCurrentStatus': rnd.randint(0, 100000),
+                                     'ServerTime': 100000,
+                                     'RequestMemory': rnd.choice([1000, 2000, 2500, 4000]),
+                                     'RequestCpus': rnd.choice([1, 8]),
+                                     'Owner': 'user%d@fnal.gov' % rnd.randint(0, 50),
+                                     'DESIRED_Sites': 'T1_US_FNAL,T2_US_UCSD,T2_US_Wisconsin',
+                                     'x509userproxy': '/var/lib/condor/spool/%d/x509up' % i,
+                                     'RemoteHost': 'slot1_%d@glidein_%d@wn%d.local' % (i % 8, i, i)}
+    return jobs
+
+
+def original_fork_and_collect(function_torun, nr_children):
+    """fork_in_bg and fetch_fork_result before the binary pickle
+    """
+    pipe_ids = []
+    for i in range(nr_children):
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.write(w, cPickle.dumps(function_torun()))
+            os.close(w)
+            os._exit(0)
+        os.close(w)
+        pipe_ids.append((r, pid))
+    results = {}
+    for i in range(nr_children):
+        r, pid = pipe_ids[i]
+        rin = ""
+        s = os.read(r, 1024*1024)
+        while s != "":
+            rin += s
+            s = os.read(r, 1024*1024)
+        os.close(r)
+        os.waitpid(pid, 0)
+        results[i] = cPickle.loads(rin)
+    return results
+
+
+def current_fork_and_collect(function_torun, nr_children):
+    forkm_obj = fork.ForkManager()
+    for i in range(nr_children):
+        forkm_obj.add_fork(i, function_torun)
+    return forkm_obj.fork_and_collect()
+
+
+IMPLEMENTATIONS = {'original': original_fork_and_collect,
+                   'current': current_fork_and_collect}
+
+
+def main():
+    nr_jobs = 100000
+    nr_children = 4
+    if len(sys.argv) > 1:
+        nr_jobs = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        nr_children = int(sys.argv[2])
+    names = ['original', 'current']
+    if len(sys.argv) > 3:
+        names = [sys.argv[3]]
+
+    jobs = make_jobs(nr_jobs)
+    for name in names:
+        t_begin = time.time()
+        results = IMPLEMENTATIONS[name](lambda: jobs, nr_children)
+        t_end = time.time() - t_begin
+        if len(results) != nr_children or results[0] != jobs:
+            print("ERROR: wrong results with the %s implementation" % name)
+            sys.exit(1)
+        del results
+        print("%-8s %d children x %d jobs: %.3f seconds, parent max RSS %d KB" %
+              (name, nr_children, nr_jobs, t_end, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#
+# Project:
+#   glideinWMS
+#
+# Description:
+#   micro-benchmark of the frontend matchmaking engines (countMatch)
+#   Compares glideinFrontendLib.countMatch (classic), glideinFrontendMatchEngine.countMatch
+#   evaluating the match expression one job at a time (vectorized rows) and by columns
+#   (vectorized columns, ColumnExpression), on a synthetic pool, with the CMS match expression
+#   Usage: benchmark_matchEngine.py [NR_ENTRIES NR_JOBS]
+#     default: 1000 entries, 100000 idle jobs
+#   Exits with 1 if the engines return different results
+#
+# Author:
+#   glideinWMS team
+#
+
+from __future__ import print_function
+
+import sys
+import time
+import random
+
+from glideinwms.frontend import glideinFrontendLib
+from glideinwms.frontend import glideinFrontendMatchEngine
+
+# The CMS matching expression as of April 17th 2019 (same as profile_frontend.py)
+MATCH_EXPR = """(((glidein["attrs"].get("GLIDEIN_MaxMemMBs", 0) == 0) or (job.get("RequestMemory", 0)<=glidein["attrs"]["GLIDEIN_MaxMemMBs"])) and ((job.get("REQUIRED_OS", "any")=="any") or (glidein["attrs"].get("GLIDEIN_REQUIRED_OS", "any")=="any") or (job.get("REQUIRED_OS")==glidein["attrs"]["GLIDEIN_REQUIRED_OS"])) and ((job.get("MaxWallTimeMins", 0)*60)>=glidein["attrs"].get("GLIDEIN_Job_Min_Time", 0)) and ((job.get("MaxWallTimeMins", 0)+10)<(glidein["attrs"]["GLIDEIN_Max_Walltime"]-glidein["attrs"]["GLIDEIN_Retire_Time_Spread"])/60))"""
+MATCH_LIST = ['RequestMemory', 'REQUIRED_OS', 'MaxWallTimeMins', 'RequestCpus']
+
+
+class NullLog:
+
+    def debug(self, msg):
+        pass
+
+    warning = debug
+    info = debug
+
+
+class FakeCondorQ:
+    """Same interface of the CondorQ objects used by countMatch
+    """
+
+    def __init__(self, stored_data):
+        self.stored_data = stored_data
+
+    def fetchStored(self):
+        return self.stored_data
+
+
+def syntheticPool(nr_entries, nr_jobs, seed):
+    """Generate nr_entries entries (glidein_dict) and nr_jobs idle jobs, spread over 5 schedds (condorq_dict)
+    """
+    rnd = random.Random(seed)
+    glidein_dict = {}
+    for i in range(nr_entries):
+        glidename = ('factory.example.com', 'entry_%d@gfactory_instance@gfactory_service' % i, 'frontend')
+        attrs = {'GLIDEIN_Site': 'Site_%d' % (i % 200), 'GLIDEIN_CPUS': rnd.choice([1, 4, 8]),
+                 'GLIDEIN_Max_Walltime': rnd.choice([86400, 172800]), 'GLIDEIN_Retire_Time_Spread': 3600,
+                 'GLIDEIN_Job_Min_Time': rnd.choice([0, 600])}
+        if i % 3:
+            attrs['GLIDEIN_MaxMemMBs'] = rnd.choice([2000, 2500, 16000])
+        if i % 5 == 0:
+            attrs['GLIDEIN_REQUIRED_OS'] = rnd.choice(['rhel6', 'rhel7'])
+        glidein_dict[glidename] = {'attrs': attrs, 'monitor': {}, 'params': {}}
+    condorq_dict = {}
+    for schedd_idx in range(5):
+        condorq_dict['schedd%d.example.com' % schedd_idx] = FakeCondorQ({})
+    schedd_names = sorted(condorq_dict.keys())
+    for i in range(nr_jobs):
+        job = {'JobStatus': 1, 'RequestMemory': rnd.choice([1000, 2000, 2500, 4000, 8000]),
+               'MaxWallTimeMins': rnd.choice([60, 600, 1440, 2000, 2800]), 'RequestCpus': rnd.choice([1, 4, 8])}
+        if i % 4:
+            job['REQUIRED_OS'] = rnd.choice(['any', 'rhel6', 'rhel7'])
+        condorq_dict[schedd_names[i % 5]].stored_data[(i, 0)] = job
+    return condorq_dict, glidein_dict
+
+
+def main():
+    nr_entries = 1000
+    nr_jobs = 100000
+    if len(sys.argv) > 2:
+        nr_entries = int(sys.argv[1])
+        nr_jobs = int(sys.argv[2])
+    glideinFrontendLib.logSupport.log = NullLog()
+    match_obj = compile(MATCH_EXPR, "<string>", "eval")
+    condorq_dict, glidein_dict = syntheticPool(nr_entries, nr_jobs, nr_entries)
+
+    results = []
+    timings = []
+    for count_match, engine_args in ((glideinFrontendLib.countMatch, {}),
+                                     (glideinFrontendMatchEngine.countMatch, {}),
+                                     (glideinFrontendMatchEngine.countMatch, {'match_expr': MATCH_EXPR})):
+        t_begin = time.time()
+        results.append(count_match(match_obj, condorq_dict, glidein_dict, {}, False, MATCH_LIST, **engine_args))
+        timings.append(time.time() - t_begin)
+    same = not [r for r in results[1:] if r != results[0]]
+    print("entries=%d idle_jobs=%d matched_jobs=%d" % (nr_entries, nr_jobs, sum(results[0][0].values())))
+    print("classic=%.2fs vectorized (rows)=%.2fs vectorized (columns)=%.2fs %s" %
+          (timings[0], timings[1], timings[2], same and "OK" or "DIFFERENT"))
+    if not same:
+        print("ERROR: the engines returned different results")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
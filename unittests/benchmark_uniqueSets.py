@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+#
+# Project:
+#   glideinWMS
+#
+# Description:
+#   micro-benchmark of the frontend glideinFrontendLib.uniqueSets function
+#   Compares the current implementation with the original iterative one (copied below)
+#   on randomized inputs and, optionally, on recorded inputs.
+#   The recorded inputs are pickle files containing the list of sets passed to uniqueSets,
+#   e.g. the list_of_all_jobs built by countMatch on a production frontend
+#   Usage: benchmark_uniqueSets.py [RECORDED_PICKLE ...]
+#   Exits with 1 if the two implementations return different results
+#
+# Author:
+#   glideinWMS team
+#
+
+from __future__ import print_function
+
+import sys
+import time
+import pickle
+import random
+
+from glideinwms.frontend.glideinFrontendLib import uniqueSets
+
+
+def uniqueSetsIterative(in_sets):
+    """Original implementation of uniqueSets, by Benjamin Hass @ UCSD
+    Used as reference for the results and the timing
+    """
+    sorted_sets = []
+    for i in in_sets:
+        common_list = []
+        common = set()
+        new_unique = set()
+        old_unique_list = []
+        old_unique = set()
+        new = []
+        for k in sorted_sets:
+            old_unique = old_unique | k
+            common = k & i
+            if common:
+                common_list.append(common)
+        for j in common_list:
+            i = i - j
+            old_unique = old_unique - j
+        for k in sorted_sets:
+            old_unique_list.append(k & old_unique)
+        new_unique = i
+        if new_unique:
+            new.append(new_unique)
+        for o in old_unique_list:
+            if o:
+                new.append(o)
+        for c in common_list:
+            if c:
+                new.append(c)
+        sorted_sets = new
+
+    sum_set = set()
+    for s in sorted_sets:
+        sum_set = sum_set | s
+    sorted_sets.append(sum_set)
+
+    index_list = []
+    for s in sorted_sets:
+        indexes = []
+        temp_sets = in_sets[:]
+        for t in temp_sets:
+            if s & t:
+                indexes.append(temp_sets.index(t))
+                temp_sets[temp_sets.index(t)] = set()
+        index_list.append(indexes)
+
+    outvals = []
+    for i in range(len(index_list) - 1):
+        outvals.append((set(index_list[i]), sorted_sets[i]))
+    return (outvals, sorted_sets[-1])
+
+
+def normalize(result):
+    """Return the result of uniqueSets in a form that does not depend on the order of the subsets
+    """
+    outvals, all_elements = result
+    return sorted([(sorted(idx_set), sorted(el_set)) for idx_set, el_set in outvals]), sorted(all_elements)
+
+
+def randomSets(nr_sets, nr_elements, nr_groups, seed):
+    """Generate nr_sets random sets of elements in range(nr_elements)
+    Elements are assigned to nr_groups groups, each matching a random selection of the sets,
+    similar to job clusters matching a selection of entries
+    """
+    rnd = random.Random(seed)
+    groups = []
+    for i in range(nr_groups):
+        groups.append([idx for idx in range(nr_sets) if rnd.random() < 0.3])
+    out_sets = [set() for i in range(nr_sets)]
+    for el in range(nr_elements):
+        for idx in groups[rnd.randrange(nr_groups)]:
+            out_sets[idx].add(el)
+    return out_sets
+
+
+def compare(name, in_sets):
+    """Time both implementations on in_sets and check the results
+    Returns True if the results are the same
+    """
+    timings = []
+    results = []
+    for func in (uniqueSetsIterative, uniqueSets):
+        t_begin = time.time()
+        results.append(func(in_sets))
+        timings.append(time.time() - t_begin)
+    same = normalize(results[0]) == normalize(results[1])
+    print("%-32s sets=%-5d subsets=%-5d iterative=%.4fs current=%.4fs %s" %
+          (name, len(in_sets), len(results[1][0]), timings[0], timings[1], same and "OK" or "DIFFERENT"))
+    return same
+
+
+def main():
+    all_same = True
+    for nr_sets, nr_elements, nr_groups in ((10, 1000, 5), (50, 5000, 20), (200, 10000, 50),
+                                            (500, 20000, 100)):
+        in_sets = randomSets(nr_sets, nr_elements, nr_groups, nr_sets)
+        all_same = compare("random %d/%d/%d" % (nr_sets, nr_elements, nr_groups), in_sets) and all_same
+    for fname in sys.argv[1:]:
+        with open(fname) as fd:
+            in_sets = pickle.load(fd)
+        all_same = compare(fname, in_sets) and all_same
+    if not all_same:
+        print("ERROR: the implementations returned different results")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   Local mock of the htcondor-python bindings (htcondor and classad modules)
+   A FakeSchedd and a FakeCollector serve lists of classads from memory,
+   to test the bindings code in glideinwms/lib/condorMonitor.py without HTCondor.
+
+   Usage:
+     with fake_htcondor.patch_bindings(schedd_ads=ads) as bindings:
+         condorMonitor.CondorQ('schedd1').fetch()
+         bindings.schedds  # the FakeSchedd objects created
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+import types
+import contextlib
+import mock
+
+
+class Value(object):
+    """Like classad.Value, the type of Undefined and Error
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class ExprTree(object):
+    """Like classad.ExprTree, the expression evaluates to value
+    """
+
+    def __init__(self, expr, value):
+        self.expr = expr
+        self.value = value
+
+    def eval(self):
+        return self.value
+
+    def __str__(self):
+        return self.expr
+
+
+class ClassAd(dict):
+    """Like classad.ClassAd, a dictionary of attribute values (python values, ExprTree or Value)
+    """
+    pass
+
+
+class FakeBindings(object):
+    """The fake htcondor and classad modules, with the list of daemons contacted
+    """
+
+    def __init__(self, schedd_ads=None, collector_ads=None, match_func=None):
+        """
+        :param schedd_ads: list of dictionaries, the jobs returned by all the schedds
+        :param collector_ads: list of dictionaries, the classads returned by all the collectors
+        :param match_func: function(constraint, ad) returning True if the ad matches the constraint,
+            by default only the constraint True matches (the constraints are not evaluated)
+        """
+        self.schedd_ads = [ClassAd(ad) for ad in (schedd_ads or [])]
+        self.collector_ads = [ClassAd(ad) for ad in (collector_ads or [])]
+        self.match_func = match_func or (lambda constraint, ad: constraint is True)
+        self.schedds = []
+        self.collectors = []
+        self.reloads = 0
+        self.queries = []
+
+        self.htcondor = types.ModuleType('htcondor')
+        self.htcondor.param = {}
+        self.htcondor.reload_config = self.reload_config
+        self.htcondor.Schedd = self.Schedd
+        self.htcondor.Collector = self.Collector
+        self.htcondor.DaemonTypes = mock.Mock()
+        self.htcondor.AdTypes = mock.Mock()
+
+        self.classad = types.ModuleType('classad')
+        self.classad.Value = Value
+        self.classad.Value.Undefined = Value('Undefined')
+        self.classad.Value.Error = Value('Error')
+        self.classad.ExprTree = ExprTree
+        self.classad.ClassAd = ClassAd
+        self.classad.quote = lambda val: '"%s"' % val
+
+    def reload_config(self):
+        self.reloads += 1
+
+    def query_ads(self, ads, constraint, attrs):
+        self.queries.append((constraint, attrs))
+        results = []
+        for ad in ads:
+            if self.match_func(constraint, ad):
+                if attrs:
+                    # projection
+                    ad = ClassAd([(k, v) for k, v in ad.items() if k in attrs])
+                results.append(ad)
+        return results
+
+    def Schedd(self, location=None):
+        schedd = FakeSchedd(self, location)
+        self.schedds.append(schedd)
+        return schedd
+
+    def Collector(self, pool=None):
+        collector = FakeCollector(self, pool)
+        self.collectors.append(collector)
+        return collector
+
+
+class FakeSchedd(object):
+
+    def __init__(self, bindings, location=None):
+        self.bindings = bindings
+        self.location = location
+
+    def query(self, constraint=True, attrs=[]):
+        return self.bindings.query_ads(self.bindings.schedd_ads, constraint, attrs)
+
+
+class FakeCollector(object):
+
+    def __init__(self, bindings, pool=None):
+        self.bindings = bindings
+        self.pool = pool
+
+    def locate(self, daemon_type, name):
+        return ClassAd({'Name': name, 'MyAddress': '<127.0.0.1:9618?sock=%s>' % name})
+
+    def query(self, ad_type, constraint=True, attrs=[]):
+        return self.bindings.query_ads(self.bindings.collector_ads, constraint, attrs)
+
+
+@contextlib.contextmanager
+def patch_bindings(schedd_ads=None, collector_ads=None, match_func=None):
+    """Make condorMonitor use the fake bindings, yields the FakeBindings object
+    """
+    from glideinwms.lib import condorMonitor
+    bindings = FakeBindings(schedd_ads, collector_ads, match_func)
+    with mock.patch.object(condorMonitor, 'htcondor', bindings.htcondor, create=True):
+        with mock.patch.object(condorMonitor, 'classad', bindings.classad, create=True):
+            with mock.patch.object(condorMonitor, 'USE_HTCONDOR_PYTHON_BINDINGS', True):
+                with mock.patch.object(condorMonitor, 'bindings_cache', condorMonitor.BindingsCache()):
+                    yield bindings
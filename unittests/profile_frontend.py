@@ -6,6 +6,9 @@
 # Description:
 #   profile the countMatch frontend function
 #   Uncomment lines in glideinFrontendElement.subprocess_count_dt to get the data to execute this script
+#   With "compare" as first argument, runs both the classic and the vectorized matching engines,
+#   checks that they return the same results and prints the time taken by each one
+#   Usage: profile_frontend.py [profile|compare] [DUMP_DIR]
 #
 # Author:
 #   Marco Mascheroni
@@ -16,11 +19,13 @@ from __future__ import print_function
 import os
 import sys
 import glob
+import time
 import pickle
 import cProfile
 
 from glideinwms.lib import logSupport
 from glideinwms.frontend.glideinFrontendLib import countMatch
+from glideinwms.frontend import glideinFrontendMatchEngine
 
 # Replicating the class since this should be executed standalone on a production frontend
 class FakeLogger(object):
@@ -83,10 +88,36 @@ class mock_condorq_el:
         return self.obj
 
 
+def compare_engines(mexpr, cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list):
+    """Run countMatch with both engines (the vectorized one also evaluating one job at a time),
+    check that the results are the same and print the timing
+    Returns True if the results are the same
+    """
+    results = {}
+    for engine_name, count_match, engine_args in (
+            ('classic', countMatch, {}),
+            ('vectorized (rows)', glideinFrontendMatchEngine.countMatch, {}),
+            ('vectorized (columns)', glideinFrontendMatchEngine.countMatch, {'match_expr': mexpr})):
+        t_begin = time.time()
+        results[engine_name] = count_match(cexpr, condorq_dict, glidein_dict, attr_dict, False, condorq_match_list,
+                                           **engine_args)
+        print("%s countMatch took %.3f seconds" % (engine_name, time.time() - t_begin))
+    if [r for r in results.values() if r != results['classic']]:
+        print("ERROR: the matching engines returned different results")
+        return False
+    print("The matching engines returned the same results")
+    return True
+
+
 def main():
     # Need to be global for cProfile to work
     global cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list
+    mode = "profile"
+    if len(sys.argv) > 1:
+        mode = sys.argv[1]
     dumpdir = "/tmp/frontend_dump/main/" # This will profile the main group. Change it to profile another one
+    if len(sys.argv) > 2:
+        dumpdir = sys.argv[2]
     # The CMS matching expression as of April 17th 2019
     mexpr = """(((glidein["attrs"].get("GLIDEIN_MaxMemMBs", 0) == 0) or (job.get("RequestMemory", 0)<=glidein["attrs"]["GLIDEIN_MaxMemMBs"])) and ((job.get("REQUIRED_OS", "any")=="any") or (glidein["attrs"].get("GLIDEIN_REQUIRED_OS", "any")=="any") or (job.get("REQUIRED_OS")==glidein["attrs"]["GLIDEIN_REQUIRED_OS"])) and ((job.get("MaxWallTimeMins", 0)*60)>=glidein["attrs"].get("GLIDEIN_Job_Min_Time", 0)) and ((job.get("MaxWallTimeMins", 0)+10)<(glidein["attrs"]["GLIDEIN_Max_Walltime"]-glidein["attrs"]["GLIDEIN_Retire_Time_Spread"])/60))"""
     logSupport.log = FakeLogger()
@@ -114,7 +145,11 @@ def main():
 
     print("Frontend dump loaded")
 
-    cProfile.run('countMatch(cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list)')
+    if mode == "compare":
+        if not compare_engines(mexpr, cexpr, condorq_dict, glidein_dict, attr_dict, condorq_match_list):
+            sys.exit(1)
+    else:
+        cProfile.run('countMatch(cexpr, condorq_dict, glidein_dict, attr_dict, False, condorq_match_list)')
 
 
 if __name__ == "__main__":
@@ -22,6 +22,7 @@ from glideinwms.lib import condorExe
 from glideinwms.lib.condorExe import iexe_cmd
 from glideinwms.lib.condorExe import exe_cmd
 from glideinwms.lib.condorExe import exe_cmd_sbin
+from glideinwms.lib.condorExe import exe_cmd_chunks
 from glideinwms.lib.condorExe import ExeError
 
 
@@ -106,6 +107,23 @@ class TestCondorExe(unittest.TestCase):
             self.failUnlessRaises(
                 ExeError, exe_cmd_sbin, script, self.dummy_args)
 
+    def test_exe_cmd_chunks(self):
+        """
+        exe_cmd_chunks returns the same output of exe_cmd, in chunks.
+        The errors are raised while consuming the output.
+        """
+        for script in self.normal_exit_scripts:
+            output = "".join(exe_cmd_chunks(script, self.dummy_args))
+            self.assertEqual(output.splitlines(), exe_cmd(script, self.dummy_args))
+
+        for script in self.abnormal_exit_scripts:
+            self.failUnlessRaises(ExeError, list, exe_cmd_chunks(script, self.dummy_args))
+
+        # Stopping early does not block
+        chunks = exe_cmd_chunks(self.normal_exit_scripts[0], self.dummy_args)
+        self.assertTrue(chunks.next())
+        chunks.close()
+
 
 if __name__ == '__main__':
     unittest.main(
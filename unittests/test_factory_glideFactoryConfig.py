@@ -13,6 +13,8 @@ from __future__ import print_function
 import unittest2 as unittest
 import xmlrunner
 import os
+import shutil
+import tempfile
 
 
 from glideinwms.unittests.unittest_utils import TestImportError
@@ -31,6 +33,7 @@ from glideinwms.factory.glideFactoryConfig import JobAttributes
 from glideinwms.factory.glideFactoryConfig import JobParams
 from glideinwms.factory.glideFactoryConfig import FrontendDescript
 from glideinwms.factory.glideFactoryConfig import SignatureFile
+from glideinwms.factory.glideFactoryConfig import ConfigCache
 
 
 class TestFactoryConfig(unittest.TestCase):
@@ -122,6 +125,53 @@ class TestFactoryConfig(unittest.TestCase):
         os.chdir(self.testdir)
 
 
+class TestConfigCache(unittest.TestCase):
+
+    def setUp(self):
+        self.testdir = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.workdir, 'entry_el8_osg34'))
+        for fname in ('glidein.descript', 'attributes.cfg', 'signatures.sha1',
+                      'entry_el8_osg34/job.descript', 'entry_el8_osg34/attributes.cfg'):
+            shutil.copy(os.path.join('fixtures/factory/work-dir', fname), os.path.join(self.workdir, fname))
+        os.chdir(self.workdir)
+        self.cache = ConfigCache()
+
+    def tearDown(self):
+        os.chdir(self.testdir)
+        shutil.rmtree(self.workdir)
+
+    def test_reuse(self):
+        job_descript = self.cache.get(JobDescript, 'el8_osg34')
+        self.assertTrue(self.cache.get(JobDescript, 'el8_osg34') is job_descript)
+        self.assertTrue(self.cache.get(SignatureFile) is self.cache.get(SignatureFile))
+        self.assertEqual(self.cache.get(JobAttributes, 'el8_osg34').files,
+                         ['attributes.cfg', 'entry_el8_osg34/attributes.cfg'])
+        self.assertEqual(self.cache.stats, {'Hits': 2, 'Misses': 3})
+        self.assertEqual(self.cache.get(JobDescript, 'el8_osg34').data, JobDescript('el8_osg34').data)
+
+    def test_file_changes(self):
+        job_attrs = self.cache.get(JobAttributes, 'el8_osg34')
+        # the main file is joined with the entry one
+        with open('attributes.cfg', 'a') as fd:
+            fd.write('CACHE_TEST "changed"\n')
+        new_job_attrs = self.cache.get(JobAttributes, 'el8_osg34')
+        self.assertFalse(new_job_attrs is job_attrs)
+        self.assertEqual(new_job_attrs.data['CACHE_TEST'], 'changed')
+        self.assertTrue(self.cache.get(JobAttributes, 'el8_osg34') is new_job_attrs)
+        # replaced file, e.g. by a reconfig
+        shutil.copy('entry_el8_osg34/job.descript', 'job.descript.new')
+        job_descript = self.cache.get(JobDescript, 'el8_osg34')
+        os.rename('job.descript.new', 'entry_el8_osg34/job.descript')
+        self.assertFalse(self.cache.get(JobDescript, 'el8_osg34') is job_descript)
+
+    def test_invalidate(self):
+        glidein_descript = self.cache.get(GlideinDescript)
+        self.cache.invalidate()
+        self.assertFalse(self.cache.get(GlideinDescript) is glidein_descript)
+        self.assertEqual(self.cache.stats, {'Hits': 0, 'Misses': 2})
+
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=xmlrunner.XMLTestRunner(
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Project:
+    glideinWMS
+Purpose:
+    unit test of glideinwms/factory/glideFactoryEntryCosts.py
+Author:
+    glideinWMS team
+"""
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import unittest2 as unittest
+import xmlrunner
+
+from glideinwms.unittests.unittest_utils import FakeLogger
+from glideinwms.unittests.unittest_utils import TestImportError
+try:
+    from glideinwms.factory import glideFactoryEntryCosts
+except ImportError as err:
+    raise TestImportError(str(err))
+
+
+class TestEntryCosts(unittest.TestCase):
+
+    def setUp(self):
+        glideFactoryEntryCosts.logSupport.log = FakeLogger()
+        self.startup_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.startup_dir)
+
+    def test_update_save_load(self):
+        costs = glideFactoryEntryCosts.EntryCosts(
+            glideFactoryEntryCosts.getCostsFile(self.startup_dir, 'group_0'), alpha=0.5)
+        costs.update('el7', 10, 4, now=100)
+        costs.update('el7', 20, 0, now=200)
+        self.assertEqual(costs.costs['el7'], {'WorkTime': 15.0, 'Requests': 2.0, 'Time': 200})
+        costs.save()
+        loaded = glideFactoryEntryCosts.EntryCosts(costs.fname)
+        loaded.load()
+        self.assertEqual(loaded.costs, costs.costs)
+        self.assertEqual(os.listdir(self.startup_dir), ['entry_costs.group_0.json'])
+
+    def test_load_all_groups(self):
+        # the entry el7 moved from group_0 to group_1 with a reconfig
+        old = glideFactoryEntryCosts.EntryCosts(glideFactoryEntryCosts.getCostsFile(self.startup_dir, 'group_0'))
+        old.update('el7', 50, 1, now=100)
+        old.update('el6', 5, 1, now=100)
+        old.save()
+        new = glideFactoryEntryCosts.EntryCosts(glideFactoryEntryCosts.getCostsFile(self.startup_dir, 'group_1'))
+        new.update('el7', 8, 1, now=200)
+        new.save()
+        with open(glideFactoryEntryCosts.getCostsFile(self.startup_dir, 'group_2'), 'w') as fd:
+            fd.write('corrupted')
+        costs = glideFactoryEntryCosts.loadEntryCosts(self.startup_dir)
+        self.assertEqual(sorted(costs.keys()), ['el6', 'el7'])
+        self.assertEqual(costs['el7']['WorkTime'], 8)
+
+
+class TestGroupEntriesByCost(unittest.TestCase):
+
+    def cost(self, work_time):
+        return {'WorkTime': work_time, 'Requests': 1, 'Time': 0}
+
+    def test_balanced(self):
+        costs = {'a': self.cost(10), 'b': self.cost(9), 'c': self.cost(1), 'd': self.cost(2), 'e': self.cost(1)}
+        groups = glideFactoryEntryCosts.groupEntriesByCost(['a', 'b', 'c', 'd', 'e'], 2, costs)
+        # 12 and 11 seconds, not 20 and 3 as slicing the sorted list
+        self.assertEqual(groups, [['a', 'c', 'e'], ['b', 'd']])
+
+    def test_unknown_costs(self):
+        # no costs recorded, same number of entries per group
+        groups = glideFactoryEntryCosts.groupEntriesByCost(['a', 'b', 'c', 'd', 'e'], 2, {})
+        self.assertEqual(sorted([len(group) for group in groups]), [2, 3])
+        # new entries get the average cost
+        groups = glideFactoryEntryCosts.groupEntriesByCost(['a', 'b', 'c'], 2, {'a': self.cost(2), 'b': self.cost(4)})
+        self.assertEqual(groups, [['b'], ['a', 'c']])
+
+    def test_more_groups_than_entries(self):
+        self.assertEqual(glideFactoryEntryCosts.groupEntriesByCost(['a', 'b'], 5, {}), [['a'], ['b']])
+        self.assertEqual(glideFactoryEntryCosts.groupEntriesByCost([], 2, {}), [])
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+Project:
+    glideinWMS
+Purpose:
+    unit test of the persistent entry workers in glideinwms/factory/glideFactoryEntryGroup.py
+Author:
+    glideinWMS team
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+import unittest2 as unittest
+import xmlrunner
+import os
+import time
+import mock
+
+from glideinwms.unittests.unittest_utils import FakeLogger
+from glideinwms.unittests.unittest_utils import TestImportError
+try:
+    from glideinwms.factory import glideFactoryEntryGroup
+    from glideinwms.lib.fork import ForkResultError
+except ImportError as err:
+    raise TestImportError(str(err))
+
+
+class FakeEntry(object):
+    """Entry keeping track of the iterations in the process where it lives
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.log = FakeLogger()
+        self.gflFactoryConfig = mock.Mock()
+        self.gflFactoryConfig.submit_queue = None
+        self.iterations = 0
+        self.stats_written = 0
+        self.pid = None
+        self.queuedGlideinsSnapshot = None
+
+    def initIteration(self, factory_in_downtime):
+        self.iterations += 1
+
+    def unsetInDowntime(self):
+        pass
+
+    def writeStats(self):
+        self.stats_written += 1
+
+    def setQueuedGlideinsSnapshot(self, condorQ):
+        self.queuedGlideinsSnapshot = condorQ
+
+    def getState(self):
+        return {'iterations': self.iterations, 'stats_written': self.stats_written, 'pid': os.getpid(),
+                'snapshot': self.queuedGlideinsSnapshot}
+
+    def setState(self, state):
+        self.iterations = state['iterations']
+        self.stats_written = state['stats_written']
+        self.pid = state['pid']
+        self.state = state
+
+
+def fake_check_and_perform_work(factory_in_downtime, entry, work):
+    if entry.name == 'crash':
+        os._exit(1)
+    if entry.name == 'hang':
+        time.sleep(60)
+    if entry.gflFactoryConfig.submit_queue is not None:
+        entry.gflFactoryConfig.submit_queue = [{'entry_name': entry.name, 'client_name': fe, 'schedd': 'schedd1',
+                                                'count': 1} for fe in sorted(work)]
+    return len(work)
+
+
+def fake_update_entries_stats(factory_in_downtime, entry_list):
+    return entry_list
+
+
+@mock.patch('glideinwms.factory.glideFactoryEntry.update_entries_stats', fake_update_entries_stats)
+@mock.patch('glideinwms.factory.glideFactoryEntry.check_and_perform_work', fake_check_and_perform_work)
+class TestEntryWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        glideFactoryEntryGroup.logSupport.log = FakeLogger()
+        glideFactoryEntryGroup.logSupport.roll_all_logs = mock.Mock()
+        self.my_entries = dict([(name, FakeEntry(name)) for name in ('el6', 'el7', 'el8')])
+        self.pool = glideFactoryEntryGroup.EntryWorkerPool(self.my_entries, 2, 30)
+
+    def tearDown(self):
+        self.pool.stop()
+
+    def test_partitions(self):
+        self.assertEqual(self.pool.partitions, [['el6', 'el8'], ['el7']])
+        pool = glideFactoryEntryGroup.EntryWorkerPool(self.my_entries, 10, 30)
+        self.assertEqual(len(pool.workers), 3)
+
+    def test_resident_state(self):
+        work = {'el6': {'fe1': 'req'}, 'el7': {}, 'el8': {'fe1': 'req', 'fe2': 'req'}}
+        for i in range(3):
+            results = self.pool.perform_work(False, False, work)
+        self.assertEqual(sorted(results.keys()), ['el6', 'el7', 'el8'])
+        self.assertEqual(results['el6']['work_done'], 1)
+        self.assertEqual(results['el8']['work_done'], 2)
+        self.assertFalse('work_done' in results['el7'])
+        # The entries are kept in the worker across iterations
+        self.assertEqual(results['el6']['iterations'], 3)
+        self.assertEqual(results['el6']['stats_written'], 3)
+        self.assertEqual(results['el7']['stats_written'], 3)
+        # The entries in the group are not updated by the pool
+        self.assertEqual(self.my_entries['el7'].stats_written, 0)
+
+    def test_find_and_perform_work(self):
+        work = {'el6': {'fe1': 'req'}, 'el7': {}, 'el8': {}}
+        with mock.patch.object(glideFactoryEntryGroup, 'find_work', return_value=work):
+            groupwork_done = glideFactoryEntryGroup.find_and_perform_work(
+                True, False, None, None, 'group_0', self.my_entries, self.pool)
+        self.assertEqual(groupwork_done.keys(), ['el6'])
+        self.assertEqual(groupwork_done['el6']['work_done'], 1)
+        # the cost of the entry
+        self.assertEqual(groupwork_done['el6']['requests'], 1)
+        self.assertTrue(groupwork_done['el6']['work_time'] >= 0)
+        self.assertEqual(self.my_entries['el6'].pid, self.pool.workers[0]['pid'])
+        self.assertEqual(self.my_entries['el7'].pid, self.pool.workers[1]['pid'])
+
+    def test_queue_snapshots(self):
+        self.my_entries['el6'].scheddName = 'schedd1'
+        self.my_entries['el7'].scheddName = 'schedd2'
+        self.my_entries['el8'].scheddName = 'schedd1'
+
+        def fake_snapshot(entry_names, schedd_name, factoryConfig=None):
+            if schedd_name == 'schedd2':
+                raise RuntimeError('schedd2 not responding')
+            return dict([(name, {'schedd': schedd_name}) for name in entry_names])
+
+        with mock.patch.object(glideFactoryEntryGroup.gfl, 'getCondorQSnapshot',
+                               side_effect=fake_snapshot) as m_snapshot:
+            snapshots = glideFactoryEntryGroup.get_queue_snapshots(self.my_entries)
+        self.assertEqual(m_snapshot.call_count, 2)
+        self.assertEqual(snapshots, {'el6': {'schedd': 'schedd1'}, 'el8': {'schedd': 'schedd1'}})
+
+        glidein_descript = mock.Mock()
+        glidein_descript.data = {'SharedQueueSnapshot': 'True'}
+        work = {'el6': {'fe1': 'req'}, 'el7': {'fe1': 'req'}, 'el8': {}}
+        with mock.patch.object(glideFactoryEntryGroup, 'find_work', return_value=work):
+            with mock.patch.object(glideFactoryEntryGroup, 'get_queue_snapshots', return_value=snapshots):
+                glideFactoryEntryGroup.find_and_perform_work(
+                    True, False, glidein_descript, None, 'group_0', self.my_entries, self.pool)
+        # the workers received the snapshots of their entries
+        self.assertEqual(self.my_entries['el6'].state['snapshot'], {'schedd': 'schedd1'})
+        self.assertEqual(self.my_entries['el7'].state['snapshot'], None)
+
+    def test_submit_scheduler(self):
+        for entry in self.my_entries.values():
+            entry.gflFactoryConfig.submit_queue = []
+        glidein_descript = mock.Mock()
+        glidein_descript.data = {'SubmitScheduler': 'True'}
+        work = {'el6': {'fe1': 'req'}, 'el7': {}, 'el8': {'fe1': 'req', 'fe2': 'req'}}
+
+        def fake_run(scheduler):
+            return [(request, {'jids': [(1, 0)], 'error': None, 'latency': 0.1})
+                    for request, log in scheduler.requests]
+
+        with mock.patch.object(glideFactoryEntryGroup, 'find_work', return_value=work):
+            with mock.patch.object(glideFactoryEntryGroup.glideFactorySubmitScheduler.SubmitScheduler, 'run',
+                                   autospec=True, side_effect=fake_run) as m_run:
+                glideFactoryEntryGroup.find_and_perform_work(
+                    False, False, glidein_descript, None, 'group_0', self.my_entries, self.pool)
+                self.assertEqual(m_run.call_count, 1)
+                # one scheduler for the submissions of all the entries
+                self.assertEqual(sorted([(r['entry_name'], r['client_name']) for r, l in m_run.call_args[0][0].requests]),
+                                 [('el6', 'fe1'), ('el8', 'fe1'), ('el8', 'fe2')])
+
+    def test_failed_worker(self):
+        self.my_entries['crash'] = FakeEntry('crash')
+        pool = glideFactoryEntryGroup.EntryWorkerPool(self.my_entries, 2, 30)
+        self.assertEqual(pool.partitions, [['crash', 'el7'], ['el6', 'el8']])
+        try:
+            with mock.patch.object(glideFactoryEntryGroup, 'find_work', return_value={'el7': {'fe1': 'req'}}):
+                glideFactoryEntryGroup.find_and_perform_work(False, False, None, None, 'group_0',
+                                                             self.my_entries, pool)
+            self.assertEqual(self.my_entries['el7'].iterations, 1)
+            with self.assertRaises(ForkResultError) as cm:
+                pool.perform_work(False, False, {'crash': {'fe1': 'req'}, 'el6': {'fe1': 'req'}})
+            self.assertEqual(cm.exception.nr_errors, 1)
+            self.assertEqual(sorted(cm.exception.good_results.keys()), ['el6', 'el8'])
+            self.assertEqual(pool.workers[0], None)
+            # The worker is restarted at the next iteration, from the state of its last completed one
+            results = pool.perform_work(False, False, {'el7': {'fe1': 'req'}})
+            self.assertEqual(results['el7']['work_done'], 1)
+            self.assertEqual(results['el7']['iterations'], 2)
+        finally:
+            pool.stop()
+
+    def test_hung_worker(self):
+        self.my_entries['hang'] = FakeEntry('hang')
+        pool = glideFactoryEntryGroup.EntryWorkerPool(self.my_entries, 2, 1)
+        self.assertEqual(pool.partitions, [['el6', 'el8'], ['el7', 'hang']])
+        try:
+            pool.perform_work(False, False, {})
+            pid = pool.workers[1]['pid']
+            t_begin = time.time()
+            with self.assertRaises(ForkResultError) as cm:
+                pool.perform_work(False, False, {'hang': {'fe1': 'req'}, 'el6': {'fe1': 'req'}})
+            self.assertTrue(time.time() - t_begin < 10)
+            self.assertEqual(cm.exception.nr_errors, 1)
+            self.assertEqual(sorted(cm.exception.good_results.keys()), ['el6', 'el8'])
+            # The hung worker is killed and reaped
+            self.assertEqual(pool.workers[1], None)
+            self.assertRaises(OSError, os.kill, pid, 0)
+            results = pool.perform_work(False, False, {'el7': {'fe1': 'req'}})
+            self.assertEqual(results['el7']['work_done'], 1)
+            self.assertNotEqual(results['el7']['pid'], pid)
+        finally:
+            pool.stop()
+
+    def test_messages(self):
+        r, w = os.pipe()
+        msg = {'data': 'x' * 100000}
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            glideFactoryEntryGroup.write_message(w, msg)
+            os._exit(0)
+        os.close(w)
+        self.assertEqual(glideFactoryEntryGroup.read_message(r), msg)
+        self.assertRaises(EOFError, glideFactoryEntryGroup.read_message, r)
+        os.close(r)
+        os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Project:
+    glideinWMS
+Purpose:
+    unit test of the decoding of the requests in glideinwms/factory/glideFactoryInterface.py
+Author:
+    glideinWMS team
+"""
+from __future__ import absolute_import
+import os
+import unittest2 as unittest
+import xmlrunner
+import tempfile
+import shutil
+import mock
+
+from glideinwms.unittests.unittest_utils import FakeLogger
+from glideinwms.unittests.unittest_utils import TestImportError
+try:
+    from glideinwms.factory import glideFactoryInterface as gfi
+except ImportError as err:
+    raise TestImportError(str(err))
+
+
+class FakeSymKey(object):
+
+    def __init__(self, key_code):
+        self.key_code = key_code
+        self.decrypted = 0
+
+    def decrypt_hex(self, data):
+        if data == 'corrupted':
+            raise ValueError("cannot decrypt")
+        self.decrypted += 1
+        return data[len(self.key_code):]
+
+
+class FakePubKey(object):
+
+    def __init__(self, pub_key_id='key1'):
+        self.pub_key_id = pub_key_id
+        self.extracted = []
+
+    def get_pub_key_id(self):
+        return self.pub_key_id
+
+    def extract_sym_key(self, enc_key_code):
+        if enc_key_code == 'bad':
+            raise ValueError("cannot decrypt")
+        self.extracted.append(enc_key_code)
+        return FakeSymKey(enc_key_code)
+
+
+class TestDecryptCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = gfi.DecryptCache()
+        self.pub_key = FakePubKey()
+
+    def test_sym_keys(self):
+        key_a = self.cache.getSymKey(self.pub_key, 'a')
+        self.assertTrue(self.cache.getSymKey(self.pub_key, 'a') is key_a)
+        self.assertEqual(self.pub_key.extracted, ['a'])
+        # a different factory key is a different entry
+        self.cache.getSymKey(FakePubKey('key2'), 'a')
+        self.assertEqual(self.cache.stats['KeyHits'], 1)
+        self.assertEqual(self.cache.stats['KeyMisses'], 2)
+        # failures are not cached
+        self.assertRaises(ValueError, self.cache.getSymKey, self.pub_key, 'bad')
+        self.assertEqual(len(self.cache.sym_keys), 2)
+
+    def test_eviction(self):
+        self.cache.getSymKey(self.pub_key, 'a')
+        self.cache.getSymKey(self.pub_key, 'b')
+        self.cache.newCycle()
+        # a is used again in the new cycle
+        self.cache.getSymKey(self.pub_key, 'a')
+        self.cache.getSymKey(self.pub_key, 'c')
+        self.cache.newCycle()
+        self.assertEqual(sorted(self.cache.old_sym_keys.keys()), [('key1', 'a'), ('key1', 'c')])
+        self.assertEqual(self.pub_key.extracted, ['a', 'b', 'c'])
+
+    def test_cycles(self):
+        # the items are all used again in each cycle, in the same order: all hits, whatever the number
+        sym_key = self.cache.getSymKey(self.pub_key, 'a')
+        for i in range(3):
+            self.cache.newCycle()
+            self.cache.resetStats()
+            for j in range(10000):
+                self.cache.decryptHex(self.pub_key, 'a', sym_key, 'aval%d' % j)
+        self.assertEqual(self.cache.stats['ValueHits'], 10000)
+        self.assertEqual(self.cache.stats['ValueMisses'], 0)
+        self.assertEqual(sym_key.decrypted, 10000)
+
+    def test_values(self):
+        sym_key = self.cache.getSymKey(self.pub_key, 'a')
+        self.assertEqual(self.cache.decryptHex(self.pub_key, 'a', sym_key, 'aval1'), 'val1')
+        self.assertEqual(self.cache.decryptHex(self.pub_key, 'a', sym_key, 'aval1'), 'val1')
+        self.assertEqual(self.cache.decryptHex(self.pub_key, 'a', sym_key, 'a'), '')
+        self.assertEqual(self.cache.decryptHex(self.pub_key, 'a', sym_key, 'a'), '')
+        self.assertEqual(sym_key.decrypted, 2)
+        self.assertRaises(ValueError, self.cache.decryptHex, self.pub_key, 'a', sym_key, 'corrupted')
+
+
+class TestSplitRequestClassad(unittest.TestCase):
+
+    def test_default_prefixes(self):
+        kel = {'ReqName': 'el7@gfactory_instance@gfactory', 'ReqIdleGlideins': 1, 'ReqEncKeyCode': 'a',
+               'WebURL': 'http://fe', 'GlideinParamX': 'x', 'GlideinEncParamY': 'y', 'GlideinMonitorZ': 3,
+               'LastHeardFrom': 10, 'MyType': 'glideclient'}
+        el = gfi.splitRequestClassad(kel, gfi.getRequestPrefixTable())
+        self.assertEqual(el, {'requests': {'IdleGlideins': 1}, 'web': {'URL': 'http://fe'}, 'params': {'X': 'x'},
+                              'params_decrypted': {'Y': 'y'}, 'monitor': {'Z': 3},
+                              'internals': {'ReqName': 'el7@gfactory_instance@gfactory', 'LastHeardFrom': 10}})
+
+    def test_overlapping_prefixes(self):
+        prefix_table = gfi.compileRequestPrefixTable((('requests', 'G'), ('params', 'GlideinParam'),
+                                                      ('monitor', 'GlideinParam')))
+        el = gfi.splitRequestClassad({'GlideinParamX': 1, 'Gx': 2, 'gx': 3}, prefix_table)
+        self.assertEqual(el['requests'], {'lideinParamX': 1, 'x': 2})
+        self.assertEqual(el['params'], {'X': 1})
+        self.assertEqual(el['monitor'], {'X': 1})
+
+
+class TestFindGroupWork(unittest.TestCase):
+
+    def setUp(self):
+        gfi.logSupport.log = FakeLogger()
+        self.lock_dir = tempfile.mkdtemp()
+        self.patcher = mock.patch.object(gfi.factoryConfig, 'lock_dir', self.lock_dir)
+        self.patcher.start()
+        self.cache_patcher = mock.patch.object(gfi, 'decryptCache', gfi.DecryptCache())
+        self.cache_patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.cache_patcher.stop()
+        shutil.rmtree(self.lock_dir)
+
+    def classad(self, fe_name, key_code):
+        return {'ReqName': 'el7@gfactory_instance@gfactory', 'ClientName': fe_name, 'ReqPubKeyID': 'key1',
+                'ReqEncKeyCode': key_code, 'ReqEncIdentity': key_code + 'fe@host',
+                'AuthenticatedIdentity': 'fe@host', 'ReqIdleGlideins': 1,
+                'GlideinEncParamSecurityName': key_code + 'sec1'}
+
+    def test_decrypt_once(self):
+        data = {'fe1': self.classad('fe1', 'a'), 'fe2': self.classad('fe2', 'a'), 'fe3': self.classad('fe3', 'b')}
+        pub_key = FakePubKey()
+        with mock.patch.object(gfi.condorMonitor, 'CondorStatus') as m_status:
+            m_status.return_value.fetchStored.return_value = data
+            for i in range(3):
+                work = gfi.findGroupWork('gfactory', 'gfactory_instance', ['el7'], None, pub_key)
+        self.assertEqual(sorted(pub_key.extracted), ['a', 'b'])
+        self.assertEqual(sorted(work['el7'].keys()), ['fe1', 'fe2', 'fe3'])
+        self.assertEqual(work['el7']['fe3']['params_decrypted'], {'SecurityName': 'sec1'})
+        self.assertEqual(gfi.decryptCache.stats['KeyMisses'], 0)
+        self.assertEqual(gfi.decryptCache.stats['ValueMisses'], 0)
+
+
+class TestWorkSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        gfi.logSupport.log = FakeLogger()
+        self.lock_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.lock_dir, gfi.WORK_SNAPSHOT_FNAME)
+        self.patcher = mock.patch.object(gfi.factoryConfig, 'lock_dir', self.lock_dir)
+        self.patcher.start()
+        self.cache_patcher = mock.patch.object(gfi, 'decryptCache', gfi.DecryptCache())
+        self.cache_patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.cache_patcher.stop()
+        shutil.rmtree(self.lock_dir)
+
+    def classad(self, entry, fe_name, pub_key_id='key1', signtype='sha1'):
+        kel = {'GlideinMyType': gfi.factoryConfig.client_id, 'ReqName': '%s@gfactory_instance@gfactory' % entry,
+               'ReqGlidein': '%s@gfactory_instance@gfactory' % entry, 'ClientName': fe_name,
+               'AuthenticatedIdentity': 'fe@host', 'ReqIdleGlideins': 1, 'WebSignType': signtype}
+        if pub_key_id is not None:
+            kel.update({'ReqPubKeyID': pub_key_id, 'ReqEncKeyCode': 'a', 'ReqEncIdentity': 'afe@host'})
+        return kel
+
+    def publish(self, data, entries=('el6', 'el7')):
+        with mock.patch.object(gfi.condorMonitor, 'CondorStatus') as m_status:
+            m_status.return_value.fetchStored.return_value = data
+            version = gfi.publishWorkSnapshot('gfactory', 'gfactory_instance', list(entries), ['sha1'], self.fname)
+        # a single query, for all the entries and keys
+        constraint = m_status.return_value.load.call_args[0][0]
+        self.assertTrue('el6@gfactory_instance@gfactory,el7@gfactory_instance@gfactory' in constraint)
+        self.assertFalse('ReqPubKeyID' in constraint)
+        return version
+
+    def test_publish_load(self):
+        data = {'fe1': self.classad('el7', 'fe1')}
+        version = self.publish(data)
+        self.assertEqual(self.publish(data), version + 1)
+        snapshot = gfi.loadWorkSnapshot(self.fname, 60)
+        self.assertEqual(snapshot['version'], version + 1)
+        self.assertEqual(snapshot['data'], data)
+        # no temporary files left
+        self.assertEqual(sorted(os.listdir(self.lock_dir)), ['gfi_status.lock', gfi.WORK_SNAPSHOT_FNAME])
+        # too old, missing or corrupted
+        self.assertEqual(gfi.loadWorkSnapshot(self.fname, -1), None)
+        self.assertEqual(gfi.loadWorkSnapshot(self.fname + '.missing', 60), None)
+        with open(self.fname, 'w') as fd:
+            fd.write('corrupted')
+        self.assertEqual(gfi.loadWorkSnapshot(self.fname, 60), None)
+
+    def test_filter(self):
+        data = {'fe1': self.classad('el7', 'fe1'), 'fe2': self.classad('el7', 'fe2', 'key2'),
+                'fe3': self.classad('el7', 'fe3', None), 'fe4': self.classad('el6', 'fe4'),
+                'fe5': self.classad('el7', 'fe5', signtype='md5')}
+        del data['fe2']['ReqEncIdentity']
+        out = gfi.filterWorkSnapshot(data, ['el7@gfactory_instance@gfactory'], ['sha1'], FakePubKey())
+        self.assertEqual(sorted(out.keys()), ['fe1', 'fe3'])
+        out = gfi.filterWorkSnapshot(data, ['el7@gfactory_instance@gfactory'], None, None)
+        self.assertEqual(sorted(out.keys()), ['fe1', 'fe2', 'fe3', 'fe5'])
+
+    def test_find_group_work(self):
+        self.publish({'fe1': self.classad('el7', 'fe1'), 'fe4': self.classad('el6', 'fe4')})
+        with mock.patch.object(gfi.condorMonitor, 'CondorStatus') as m_status:
+            work = gfi.findGroupWork('gfactory', 'gfactory_instance', ['el7'], ['sha1'], FakePubKey(),
+                                     work_snapshot_fname=self.fname, work_snapshot_max_age=60)
+            self.assertFalse(m_status.called)
+            self.assertEqual(work.keys(), ['el7'])
+            self.assertEqual(work['el7'].keys(), ['fe1'])
+            # entries not in the snapshot or stale snapshot, query the collector
+            m_status.return_value.fetchStored.return_value = {}
+            gfi.findGroupWork('gfactory', 'gfactory_instance', ['el8'], ['sha1'], FakePubKey(),
+                              work_snapshot_fname=self.fname, work_snapshot_max_age=60)
+            gfi.findGroupWork('gfactory', 'gfactory_instance', ['el7'], ['sha1'], FakePubKey(),
+                              work_snapshot_fname=self.fname, work_snapshot_max_age=-1)
+            self.assertEqual(m_status.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
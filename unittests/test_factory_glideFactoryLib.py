@@ -22,6 +22,7 @@ from glideinwms.unittests.unittest_utils import FakeLogger
 from glideinwms.factory.glideFactoryLib import FactoryConfig
 from glideinwms.factory.glideFactoryLib import secClass2Name
 from glideinwms.factory.glideFactoryLib import getCondorQData
+from glideinwms.factory.glideFactoryLib import getCondorQSnapshot
 from glideinwms.factory.glideFactoryLib import getCondorQCredentialList
 from glideinwms.factory.glideFactoryLib import getQCredentials
 from glideinwms.factory.glideFactoryLib import getQProxSecClass
@@ -40,7 +41,7 @@ from glideinwms.factory.glideFactoryLib import getCondorStatusData
 # from glideinwms.factory.glideFactoryLib import hash_status
 # from glideinwms.factory.glideFactoryLib import sum_idle_count
 # from glideinwms.factory.glideFactoryLib import hash_statusStale
-# from glideinwms.factory.glideFactoryLib import diffList
+from glideinwms.factory.glideFactoryLib import diffList
 # from glideinwms.factory.glideFactoryLib import extractStaleSimple
 # from glideinwms.factory.glideFactoryLib import extractUnrecoverableHeldSimple
 # from glideinwms.factory.glideFactoryLib import extractUnrecoverableHeldForceX
@@ -60,8 +61,8 @@ from glideinwms.factory.glideFactoryLib import getCondorStatusData
 # from glideinwms.factory.glideFactoryLib import executeSubmit
 # from glideinwms.factory.glideFactoryLib import pickSubmitFile
 # from glideinwms.factory.glideFactoryLib import submitGlideins
-# from glideinwms.factory.glideFactoryLib import removeGlideins
-# from glideinwms.factory.glideFactoryLib import releaseGlideins
+from glideinwms.factory.glideFactoryLib import removeGlideins
+from glideinwms.factory.glideFactoryLib import releaseGlideins
 # from glideinwms.factory.glideFactoryLib import in_submit_environment
 # from glideinwms.factory.glideFactoryLib import get_submit_environment
 # from glideinwms.factory.glideFactoryLib import isGlideinWithinHeldLimits
@@ -184,6 +185,31 @@ class TestFactoryConfig(unittest.TestCase):
         self.assertEqual(cd.client_name, client_name)
         self.assertEqual(cd.entry_name, entry_name)
 
+    def test_get_condor_q_snapshot(self):
+        self.cnf.config_whoamI('my_factory', 'my_glidein')
+        jobs = {(1, 0): {'GlideinEntryName': 'entry1', 'JobStatus': 1},
+                (1, 1): {'GlideinEntryName': 'entry2', 'JobStatus': 2},
+                (2, 0): {'GlideinEntryName': 'entry1', 'JobStatus': 5},
+                (3, 0): {'GlideinEntryName': 'other_entry', 'JobStatus': 1}}
+        all_q = mock.Mock()
+        all_q.fetchStored.return_value = jobs
+        with mock.patch.object(glideinwms.factory.glideFactoryLib, 'condorMonitor') as m_condorMonitor:
+            m_condorMonitor.CondorQ.side_effect = [all_q, mock.Mock(), mock.Mock(), mock.Mock()]
+            snapshot = getCondorQSnapshot(['entry1', 'entry2', 'entry3'], 'schedd_name', self.cnf)
+        # one query for all the entries
+        self.assertEqual(all_q.load.call_count, 1)
+        constraint, format_list = all_q.load.call_args[0]
+        self.assertTrue('(GlideinEntryName =?= "entry1") || (GlideinEntryName =?= "entry2") || '
+                        '(GlideinEntryName =?= "entry3")' in constraint)
+        self.assertTrue('(GlideinFactory =?= "my_factory")' in constraint)
+        self.assertTrue(('GlideinEntryName', 's') in format_list)
+        self.assertEqual(sorted(snapshot.keys()), ['entry1', 'entry2', 'entry3'])
+        self.assertEqual(sorted(snapshot['entry1'].stored_data.keys()), [(1, 0), (2, 0)])
+        self.assertEqual(snapshot['entry2'].stored_data.keys(), [(1, 1)])
+        self.assertEqual(snapshot['entry3'].stored_data, {})
+        self.assertEqual(snapshot['entry1'].entry_name, 'entry1')
+        self.assertEqual(snapshot['entry1'].client_name, None)
+
     def test_get_q_credentials(self):
         glideinwms.factory.glideFactoryLib.logSupport.log = FakeLogger()
         glideinwms.factory.glideFactoryLib.condorMonitor = mock.Mock()
@@ -440,10 +466,84 @@ class TestHashStatusStale(unittest.TestCase):
 
 
 class TestDiffList(unittest.TestCase):
-    @unittest.skip('for now')
     def test_diff_list(self):
-        # self.assertEqual(expected, diffList(base_list, subtract_list))
-        assert False  # TODO: implement your test here
+        base_list = [(1, 0), (1, 1), (2, 0), (3, 0)]
+        self.assertEqual([(1, 0), (3, 0)], diffList(base_list, [(2, 0), (1, 1), (4, 0)]))
+        self.assertTrue(diffList(base_list, []) is base_list)
+
+
+class TestClassifyGlideins(unittest.TestCase):
+
+    class FakeCondorQ:
+        def __init__(self, stored_data):
+            self.stored_data = stored_data
+
+        def fetchStored(self, constraint_func=None):
+            return dict((k, v) for k, v in self.stored_data.items() if constraint_func is None or constraint_func(v))
+
+    class GlideinDescriptMock:
+        data = {'RecoverableExitcodes': '24,36 7 8'}
+        files = []
+
+    def setUp(self):
+        glideinwms.factory.glideFactoryLib.logSupport.log = FakeLogger()
+        now = 1500000000
+        week = 7 * 24 * 3600
+        jobs = {(1, 0): {'JobStatus': 1, 'ServerTime': now, 'EnteredCurrentStatus': now - 10},
+                (1, 1): {'JobStatus': 1, 'ServerTime': now, 'EnteredCurrentStatus': now - 2 * week,
+                         'GridJobStatus': 'PENDING'},
+                (2, 0): {'JobStatus': 2, 'ServerTime': now, 'EnteredCurrentStatus': now - 10,
+                         'GridJobStatus': 'STAGE_OUT'},
+                (2, 1): {'JobStatus': 2, 'ServerTime': now, 'EnteredCurrentStatus': now - 5 * week},
+                (3, 0): {'JobStatus': 5, 'ServerTime': now, 'EnteredCurrentStatus': now - 10,
+                         'HoldReasonCode': 24, 'NumSystemHolds': 1},
+                (3, 1): {'JobStatus': 5, 'ServerTime': now, 'EnteredCurrentStatus': now - week,
+                         'HoldReasonCode': 24, 'NumSystemHolds': 2},
+                (3, 2): {'JobStatus': 5, 'ServerTime': now, 'EnteredCurrentStatus': now - 10,
+                         'HoldReasonCode': 12, 'NumSystemHolds': 21},
+                (3, 3): {'JobStatus': 5, 'ServerTime': now, 'EnteredCurrentStatus': now - 10,
+                         'HoldReasonCode': 12, 'NumSystemHolds': 1},
+                (4, 0): {'JobStatus': 4, 'ServerTime': now, 'EnteredCurrentStatus': now - 10}}
+        for jid, el in jobs.items():
+            el['GlideinClient'] = 'client%i' % (jid[1] % 2)
+            el['GlideinEntrySubmitFile'] = 'job.condor'
+        self.condorq = self.FakeCondorQ(jobs)
+        self.cnf = FactoryConfig()
+
+    def test_same_as_extract(self):
+        extract_functions = {
+            'idle': glideinwms.factory.glideFactoryLib.extractIdleSimple,
+            'idle_unsubmitted': glideinwms.factory.glideFactoryLib.extractIdleUnsubmitted,
+            'idle_queued': glideinwms.factory.glideFactoryLib.extractIdleQueued,
+            'running': glideinwms.factory.glideFactoryLib.extractRunSimple,
+            'nonrunning': glideinwms.factory.glideFactoryLib.extractNonRunSimple,
+            'held': glideinwms.factory.glideFactoryLib.extractHeldSimple,
+            'held_recoverable': glideinwms.factory.glideFactoryLib.extractRecoverableHeldSimple,
+            'held_recoverable_within_limits':
+                glideinwms.factory.glideFactoryLib.extractRecoverableHeldSimpleWithinLimits,
+            'held_unrecoverable': glideinwms.factory.glideFactoryLib.extractUnrecoverableHeldSimple,
+            'held_unrecoverable_forcex': glideinwms.factory.glideFactoryLib.extractUnrecoverableHeldForceX,
+            'stale_idle': glideinwms.factory.glideFactoryLib.extractStaleSimple,
+            'stale_running': glideinwms.factory.glideFactoryLib.extractRunStale}
+        with mock.patch.object(glideinwms.factory.glideFactoryLib, 'factoryConfig', self.cnf), \
+                mock.patch.object(glideinwms.factory.glideFactoryLib.glideFactoryConfig, 'GlideinDescript',
+                                  self.GlideinDescriptMock):
+            classes = glideinwms.factory.glideFactoryLib.classifyGlideins(self.condorq, factoryConfig=self.cnf)
+            for category, func in extract_functions.items():
+                self.assertEqual(sorted(classes.jids[category]),
+                                 sorted(func(self.condorq, factoryConfig=self.cnf)), category)
+        self.assertEqual(classes.jids['held_unrecoverable_forcex'], [(3, 2)])
+        self.assertEqual(classes.jids['held_recoverable_within_limits'], [(3, 1)])
+        self.assertEqual(classes.status, {1001: 1, 1002: 1, 2: 1, 4010: 1, 5: 4, 4: 1})
+        self.assertEqual(classes.status_sf, {'job.condor': {1: 2, 2: 2, 4: 1, 5: 4}})
+
+    def test_buckets(self):
+        classes = glideinwms.factory.glideFactoryLib.classifyGlideins(
+            self.condorq, 'GlideinClient', factoryConfig=self.cnf, glideinDescript=self.GlideinDescriptMock())
+        self.assertEqual(sorted(classes.buckets.keys()), ['client0', 'client1'])
+        self.assertEqual(sorted(classes.getBucket('client1').jids['held']), [(3, 1), (3, 3)])
+        self.assertEqual(classes.getBucket('client1').status, {1002: 1, 2: 1, 5: 2})
+        self.assertEqual(classes.getBucket('other').jids['idle'], [])
 
 
 class TestExtractStaleSimple(unittest.TestCase):
@@ -618,32 +718,48 @@ class TestSubmitGlideins(unittest.TestCase):
 
 
 class TestRemoveGlideins(unittest.TestCase):
-    @unittest.skip('for now')
-    def test_remove_glideins(self):
-        # self.assertEqual(
-        #     expected,
-        #     removeGlideins(
-        #         schedd_name,
-        #         jid_list,
-        #         force,
-        #         log,
-        #         factoryConfig))
-        # assert False # TODO: implement your test here
-        assert False
+
+    def setUp(self):
+        self.cnf = FactoryConfig()
+        self.cnf.max_removes = 4
+        self.jids = [(10, i) for i in range(8)]
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(glideinwms.factory.glideFactoryLib, 'condorManager')
+    def test_remove_glideins(self, m_manager, m_sleep):
+        # 10.1 cannot be removed and is replaced by the next glidein
+        m_manager.condorRemoveMany.side_effect = lambda jids, schedd, do_forcex=False: [
+            jid for jid in jids if jid != (10, 1)]
+        removed = removeGlideins('schedd1', self.jids, force=True, log=FakeLogger(), factoryConfig=self.cnf)
+        self.assertEqual(removed, [(10, 0), (10, 2), (10, 3), (10, 4)])
+        self.assertEqual(m_manager.condorRemoveMany.call_args_list,
+                         [mock.call(self.jids[:4], 'schedd1'),
+                          mock.call([(10, 0), (10, 2), (10, 3)], 'schedd1', do_forcex=True),
+                          mock.call([(10, 4)], 'schedd1'),
+                          mock.call([(10, 4)], 'schedd1', do_forcex=True)])
+        m_sleep.assert_called_once_with(self.cnf.remove_sleep)
 
 
 class TestReleaseGlideins(unittest.TestCase):
-    @unittest.skip('for now')
-    def test_release_glideins(self):
-        # self.assertEqual(
-        #     expected,
-        #     releaseGlideins(
-        #         schedd_name,
-        #         jid_list,
-        #         log,
-        #         factoryConfig))
-        # # assert False # TODO: implement your test here
-        assert False
+
+    def setUp(self):
+        self.cnf = FactoryConfig()
+        self.cnf.max_releases = 3
+        self.jids = [(10, i) for i in range(8)]
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(glideinwms.factory.glideFactoryLib, 'condorManager')
+    def test_release_glideins(self, m_manager, m_sleep):
+        m_manager.condorReleaseMany.side_effect = lambda jids, schedd: jids
+        released = releaseGlideins('schedd1', self.jids, log=FakeLogger(), factoryConfig=self.cnf)
+        # the release limit is max_releases
+        self.assertEqual(released, self.jids[:3])
+        m_manager.condorReleaseMany.assert_called_once_with(self.jids[:3], 'schedd1')
+        self.assertFalse(m_sleep.called)
+        # no glidein can be released
+        m_manager.condorReleaseMany.side_effect = lambda jids, schedd: []
+        self.assertEqual(releaseGlideins('schedd1', self.jids, log=FakeLogger(), factoryConfig=self.cnf), [])
+        self.assertEqual(m_manager.condorReleaseMany.call_count, 4)
 
 
 class TestInSubmitEnvironment(unittest.TestCase):
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Project:
+    glideinWMS
+Purpose:
+    unit test of glideinwms/factory/glideFactorySubmitScheduler.py
+Author:
+    glideinWMS team
+"""
+from __future__ import absolute_import
+import unittest2 as unittest
+import xmlrunner
+import mock
+
+from glideinwms.unittests.unittest_utils import FakeLogger
+from glideinwms.unittests.unittest_utils import TestImportError
+try:
+    from glideinwms.factory import glideFactorySubmitScheduler
+except ImportError as err:
+    raise TestImportError(str(err))
+
+
+def make_request(schedd, count, submit_file='job.condor'):
+    return {'entry_name': 'el7', 'client_name': 'fe1', 'username': 'frontend', 'schedd': schedd,
+            'exe_env': ['GLIDEIN_COUNT=%i' % count], 'submit_file': submit_file, 'count': count}
+
+
+def fake_execute_submit(log, factoryConfig, username, schedd, exe_env, submit_file):
+    if submit_file == 'bad.condor':
+        raise RuntimeError("condor_submit failed")
+    count = int(exe_env[0].split('=')[1])
+    return ["Submitting job(s).", "%i job(s) submitted to cluster %i." % (count, len(schedd))]
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        bucket = glideFactorySubmitScheduler.TokenBucket(2, 3, now=100)
+        self.assertEqual([bucket.take(100) for i in range(4)], [True, True, True, False])
+        self.assertEqual(bucket.waitTime(100), 0.5)
+        self.assertTrue(bucket.take(100.5))
+        self.assertFalse(bucket.take(100.5))
+        # no more than burst tokens accumulate
+        bucket.refill(1000)
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_no_limit(self):
+        bucket = glideFactorySubmitScheduler.TokenBucket(0, 1, now=100)
+        self.assertTrue(all([bucket.take(100) for i in range(10)]))
+        self.assertEqual(bucket.waitTime(100), 0)
+
+
+@mock.patch.object(glideFactorySubmitScheduler.glideFactoryLib, 'executeSubmit', fake_execute_submit)
+class TestSubmitScheduler(unittest.TestCase):
+
+    def test_run(self):
+        scheduler = glideFactorySubmitScheduler.SubmitScheduler(max_workers=2, rate=0, burst=1)
+        requests = [make_request('schedd_a', 10), make_request('schedd_a', 3),
+                    make_request('schedd_bb', 1, 'bad.condor'), make_request('schedd_bb', 2)]
+        scheduler.addRequests(requests, FakeLogger())
+        results = scheduler.run()
+        self.assertEqual([request for request, result in results], requests)
+        self.assertEqual(results[0][1]['jids'], [(8, j) for j in range(10)])
+        self.assertEqual(results[1][1]['jids'], [(8, 0), (8, 1), (8, 2)])
+        self.assertEqual(results[2][1]['jids'], [])
+        self.assertEqual(results[2][1]['error'], "condor_submit failed")
+        self.assertEqual(results[3][1]['error'], None)
+        stats = scheduler.getStats()
+        self.assertEqual((stats['schedd_a']['Submits'], stats['schedd_a']['Glideins'], stats['schedd_a']['Failed']),
+                         (2, 13, 0))
+        self.assertEqual((stats['schedd_bb']['Submits'], stats['schedd_bb']['Glideins'], stats['schedd_bb']['Failed']),
+                         (2, 2, 1))
+        self.assertEqual(scheduler.requests, [])
+
+    def test_rate_limit(self):
+        scheduler = glideFactorySubmitScheduler.SubmitScheduler(max_workers=5, rate=1000, burst=1)
+        scheduler.addRequests([make_request('schedd_a', 1) for i in range(3)], FakeLogger())
+        with mock.patch('time.sleep') as m_sleep:
+            results = scheduler.run()
+        self.assertEqual(len([r for r in results if r[1]['error'] is None]), 3)
+        # the waits for the bucket are bounded by the refill time
+        for call in m_sleep.call_args_list:
+            self.assertTrue(call[0][0] <= 0.001)
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
@@ -17,6 +17,7 @@ from __future__ import print_function
 import dis
 import re
 import sys
+import random
 import StringIO
 import xmlrunner
 import mock
@@ -67,7 +68,7 @@ class FETestCaseBase(unittest.TestCase):
         glideinwms.frontend.glideinFrontendLib.logSupport.log = FakeLogger()
         # Only condor cliens are mocked, not the python bindings
         condorMonitor.USE_HTCONDOR_PYTHON_BINDINGS = False
-        with mock.patch('glideinwms.lib.condorExe.exe_cmd') as m_exe_cmd:
+        with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
             f = open('cs.fixture')
             m_exe_cmd.return_value = f.readlines()
             self.status_dict = glideinFrontendLib.getCondorStatus(['coll1'])
@@ -102,7 +103,7 @@ class FETestCaseBase(unittest.TestCase):
         with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv') as m_iGetEnv:
             cq = condorMonitor.CondorQ(schedd_name='sched1', pool_name='pool1')
 
-        with mock.patch('glideinwms.lib.condorExe.exe_cmd') as m_exe_cmd:
+        with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
             f = open('cq.fixture')
             m_exe_cmd.return_value = f.readlines()
             cq.load()
@@ -240,6 +241,44 @@ class FETestCaseCount(FETestCaseBase):
             {self.glidein_dict_k1: 1, self.glidein_dict_k2: 1, self.glidein_dict_k3: 0})
         self.assertEqual(expected, actual)
 
+    def test_computeJobSignatures(self):
+        match_list = ['User', 'DESIRED_Sites']
+        nr_signatures = glideinFrontendLib.computeJobSignatures(self.condorq_dict, match_list)
+        condorq = self.condorq_dict['sched1']
+        job_signatures = glideinFrontendLib.getJobSignatures(condorq, match_list)
+        data = condorq.fetchStored()
+        self.assertEqual(sorted(job_signatures.keys()), sorted(data.keys()))
+        self.assertEqual(nr_signatures, len(set([glideinFrontendLib.hashJob(job, match_list) for job in data.values()])))
+        for jid1 in data:
+            for jid2 in data:
+                self.assertEqual(job_signatures[jid1] == job_signatures[jid2],
+                                 glideinFrontendLib.hashJob(data[jid1], match_list) ==
+                                 glideinFrontendLib.hashJob(data[jid2], match_list))
+        # the subqueries share the signatures
+        cq_idle_dict = glideinFrontendLib.getIdleCondorQ(self.condorq_dict)
+        self.assertTrue(glideinFrontendLib.getJobSignatures(cq_idle_dict['sched1'], match_list) is job_signatures)
+        # not valid for a different list of attributes
+        self.assertEqual(glideinFrontendLib.getJobSignatures(cq_idle_dict['sched1'], ['User']), None)
+
+    def test_count_with_signatures(self):
+        match_list = ['User', 'DESIRED_Sites', 'JobStatus']
+        match_obj = compile('not job.has_key("DESIRED_Sites") or glidein["attrs"].get("GLIDEIN_Site") in job["DESIRED_Sites"]',
+                            "<string>", "eval")
+        cq_idle_dict = glideinFrontendLib.getIdleCondorQ(self.condorq_dict)
+        cq_run_dict = glideinFrontendLib.getRunningCondorQ(self.condorq_dict)
+        glideinFrontendLib.appendRealRunning(cq_run_dict, self.status_dict)
+        expected_match = glideinFrontendLib.countMatch(
+            match_obj, cq_idle_dict, self.glidein_dict, {}, False, match_list)
+        expected_real = glideinFrontendLib.countRealRunning(
+            match_obj, cq_run_dict, self.glidein_dict, {}, match_list)
+        glideinFrontendLib.computeJobSignatures(self.condorq_dict, match_list)
+        with mock.patch.object(glideinFrontendLib, 'hashJob') as m_hashJob:
+            self.assertEqual(expected_match, glideinFrontendLib.countMatch(
+                match_obj, cq_idle_dict, self.glidein_dict, {}, False, match_list))
+            self.assertEqual(expected_real, glideinFrontendLib.countRealRunning(
+                match_obj, cq_run_dict, self.glidein_dict, {}, match_list))
+            self.assertFalse(m_hashJob.called)
+
     def test_countRealRunning_missingKey(self):
         cq_run_dict = glideinFrontendLib.getRunningCondorQ(self.condorq_dict)
         glideinFrontendLib.appendRealRunning(cq_run_dict, self.status_dict)
@@ -273,7 +312,7 @@ class FETestCaseCount(FETestCaseBase):
 class FETestCaseCondorStatus(FETestCaseBase):
 
     def test_getCondorStatus(self):
-        with mock.patch('glideinwms.lib.condorExe.exe_cmd') as m_exe_cmd:
+        with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
             f = open('cs.fixture')
             m_exe_cmd.return_value = f.readlines()
             condorStatus = glideinFrontendLib.getCondorStatus(['coll1'],
@@ -318,6 +357,62 @@ class FETestCaseCondorStatus(FETestCaseBase):
             glideinFrontendLib.countCondorStatus(
                 self.status_dict), 6)
 
+    def chainedStatusCounts(self, status_dict, cred_id=None):
+        """Counts of the slots, by state, with the original chained filters
+        """
+        if cred_id is not None:
+            status_dict = glideinFrontendLib.getClientCondorStatusCredIdOnly(status_dict, cred_id)
+        return {'Total': glideinFrontendLib.countCondorStatus(status_dict),
+                'Idle': glideinFrontendLib.countCondorStatus(glideinFrontendLib.getIdleCondorStatus(status_dict)),
+                'Running': glideinFrontendLib.countRunningCondorStatus(
+                    glideinFrontendLib.getRunningCondorStatus(status_dict)),
+                'Failed': glideinFrontendLib.countCondorStatus(glideinFrontendLib.getFailedCondorStatus(status_dict)),
+                'TotalCores': glideinFrontendLib.countTotalCoresCondorStatus(
+                    glideinFrontendLib.getCondorStatusNonDynamic(status_dict)),
+                'IdleCores': glideinFrontendLib.countIdleCoresCondorStatus(
+                    glideinFrontendLib.getIdleCondorStatus(status_dict)),
+                'RunningCores': glideinFrontendLib.countRunningCoresCondorStatus(
+                    glideinFrontendLib.getRunningCondorStatus(status_dict))}
+
+    def addStatusCredentials(self):
+        # add the credentials and an old style client name to the fixture slots
+        slots = self.status_dict['coll1'].stored_data
+        for i, slot_name in enumerate(sorted(slots)):
+            slots[slot_name]['GLIDEIN_CredentialIdentifier'] = 'cred%d' % (i % 2)
+            slots[slot_name]['Cpus'] = i + 1
+        slots['glidein_4@cmswn004.local']['GLIDECLIENT_Name'] = 'Site_Name4@v3_0@factory1@CMS-CERN.main'
+        slots['glidein_5@cmswn005.local'].update({'State': 'Drained', 'Activity': 'Retiring'})
+
+    def test_classifyCondorStatus(self):
+        self.addStatusCredentials()
+        status_dict_types = glideinFrontendLib.classifyCondorStatus(self.status_dict)
+        self.assertItemsEqual(status_dict_types['Idle']['dict']['coll1'].fetchStored().keys(),
+                              glideinFrontendLib.getIdleCondorStatus(self.status_dict)['coll1'].fetchStored().keys())
+        self.assertItemsEqual(status_dict_types['Running']['dict']['coll1'].fetchStored().keys(),
+                              glideinFrontendLib.getRunningCondorStatus(self.status_dict)['coll1'].fetchStored().keys())
+        abs_counts = dict([(st, status_dict_types[st]['abs']) for st in status_dict_types])
+        self.assertEqual(abs_counts, self.chainedStatusCounts(self.status_dict))
+
+    def test_countCondorStatusPerRequest(self):
+        self.addStatusCredentials()
+        counts, counts_per_cred = glideinFrontendLib.countCondorStatusPerRequest(self.status_dict,
+                                                                                 'CMS-CERN', 'main')
+        requests = ['Site_Name%d@v3_0@factory1' % x for x in xrange(1, 6)]
+        for request_name in requests:
+            req_dict = glideinFrontendLib.getClientCondorStatus(self.status_dict, 'CMS-CERN', 'main',
+                                                                request_name)
+            expected = self.chainedStatusCounts(req_dict)
+            if expected['Total'] == 0:
+                self.assertFalse(request_name in counts)
+                continue
+            self.assertEqual(counts[request_name], expected)
+            for cred_id in ('cred0', 'cred1'):
+                expected = self.chainedStatusCounts(req_dict, cred_id)
+                self.assertEqual(counts_per_cred[request_name].get(cred_id, expected), expected)
+        self.assertEqual(counts['Site_Name4@v3_0@factory1']['Idle'], 1)
+        # glidein_1@cmswn001.local is a slot of another group
+        self.assertEqual(sum([c['Total'] for c in counts.values()]), 5)
+
     def test_getFactoryEntryList(self):
         entries = glideinFrontendLib.getFactoryEntryList(self.status_dict)
         expected = [
@@ -333,7 +428,7 @@ class FETestCaseCondorStatus(FETestCaseBase):
             expected)
 
     def test_getCondorStatusSchedds(self):
-        with mock.patch('glideinwms.lib.condorExe.exe_cmd') as m_exe_cmd:
+        with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
             f = open('cs.schedd.fixture')
             m_exe_cmd.return_value = f.readlines()
             condorStatus = glideinFrontendLib.getCondorStatusSchedds(['coll1'])
@@ -357,7 +452,28 @@ class FETestCaseMisc(FETestCaseBase):
              set([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20,
                   21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35]))
 
-        self.assertItemsEqual(expected, glideinFrontendLib.uniqueSets(input))
+        # The order of the (index set, value subset) pairs is not relevant to the callers
+        # (countMatch sums the counts of the subsets), so they are compared in any order
+        outvals, all_elements = glideinFrontendLib.uniqueSets(input)
+        self.assertItemsEqual(expected[0], outvals)
+        self.assertEqual(expected[1], all_elements)
+
+    def test_uniqueSets_random(self):
+        rnd = random.Random(42)
+        input = [set([el for el in range(200) if rnd.random() < 0.4]) for i in range(30)]
+        input.append(set())
+        outvals, all_elements = glideinFrontendLib.uniqueSets(input)
+
+        self.assertEqual(all_elements, set().union(*input))
+        covered = set()
+        for idx_set, el_set in outvals:
+            self.assertTrue(el_set)
+            self.assertFalse(covered & el_set)
+            covered |= el_set
+            for el in el_set:
+                self.assertEqual(idx_set, set([i for i in range(len(input)) if el in input[i]]))
+        self.assertEqual(covered, all_elements)
+        self.assertEqual(len(outvals), len(set([tuple(sorted(i)) for i, _ in outvals])))
 
     def test_hashJob(self):
         in1 = {1: 'a', 2: 'b', 3: 'c'}
@@ -380,6 +496,14 @@ class FETestCaseMisc(FETestCaseBase):
              for x in cq_run_dict['sched1'].fetchStored().values()],
             expected)
 
+    def test_appendRealRunning_stats(self):
+        cq_run_dict = glideinFrontendLib.getRunningCondorQ(self.condorq_dict)
+        running_on_map = glideinFrontendLib.getRunningOnMap(self.status_dict)
+        self.assertEqual(running_on_map[self.status_dict['coll1'].fetchStored().keys()[0]].split('@')[-1],
+                         'submit.local')
+        stats = glideinFrontendLib.appendRealRunning(cq_run_dict, self.status_dict, running_on_map)
+        self.assertEqual(stats, {'matched': 5, 'unknown': 1, 'slots': len(running_on_map)})
+
     def test_getGlideinCpusNum(self):
         self.assertEqual(glideinFrontendLib.getGlideinCpusNum(
             self.glidein_dict[self.glidein_dict_k1]), 1)
@@ -430,15 +554,15 @@ class FETestCaseCondorQ(FETestCaseBase):
 
         glideinFrontendLib.getCondorQ(schedd_names, job_status_filter=None)
         m_getCondorQConstrained.assert_called_with(
-            schedd_names, 'True', None, None)
+            schedd_names, 'True', None, None, False, None)
 
         glideinFrontendLib.getCondorQ(schedd_names)
         m_getCondorQConstrained.assert_called_with(
-            schedd_names, '(JobStatus=?=1)||(JobStatus=?=2)', None, None)
+            schedd_names, '(JobStatus=?=1)||(JobStatus=?=2)', None, None, False, None)
 
         glideinFrontendLib.getCondorQ(schedd_names, job_status_filter=[5])
         m_getCondorQConstrained.assert_called_with(
-            schedd_names, '(JobStatus=?=5)', None, None)
+            schedd_names, '(JobStatus=?=5)', None, None, False, None)
 
         constraint = '(JobStatus=?=1)||(JobStatus=?=2)'
         format_list = list((('x509UserProxyFirstFQAN', 's'),))
@@ -447,7 +571,9 @@ class FETestCaseCondorQ(FETestCaseBase):
             schedd_names,
             constraint,
             'True',
-            format_list + self.default_format)
+            format_list + self.default_format,
+            False,
+            None)
 
     @mock.patch.object(glideinFrontendLib.condorMonitor, 'SubQuery')
     def test_oldCondorQ(self, m_SubQuery):
@@ -503,6 +629,45 @@ class FETestCaseCondorQ(FETestCaseBase):
                 'sched1'].fetchStored().keys()
         self.assertEqual(condor_ids, [(12345, 0)])
 
+    def chainedCondorQTypes(self, condorq_dict, good_schedds):
+        """The job types as built by populate_condorq_dict_types before classifyCondorQ
+        """
+        good_condorq_dict = dict([(k, v) for k, v in condorq_dict.items() if k in good_schedds])
+        idle = glideinFrontendLib.getIdleCondorQ(good_condorq_dict)
+        types = {'IdleAll': glideinFrontendLib.getIdleCondorQ(condorq_dict),
+                 'Idle': idle,
+                 'OldIdle': glideinFrontendLib.getOldCondorQ(idle, 600),
+                 'Idle_3600': glideinFrontendLib.getOldCondorQ(idle, 3600),
+                 'ProxyIdle': glideinFrontendLib.getIdleProxyCondorQ(idle),
+                 'VomsIdle': glideinFrontendLib.getIdleVomsCondorQ(idle),
+                 'Running': glideinFrontendLib.getRunningCondorQ(condorq_dict)}
+        return dict([(k, {'dict': v, 'abs': glideinFrontendLib.countCondorQ(v)}) for k, v in types.items()])
+
+    def test_classifyCondorQ(self):
+        condorq_data = self.condorq_dict['sched1'].fetchStored()
+        # some old idle jobs
+        for jid, age in (((12345, 1), 700), ((12345, 2), 4000)):
+            condorq_data[jid]['EnteredCurrentStatus'] = 1500000000
+            condorq_data[jid]['ServerTime'] = 1500000000 + age
+        sched2 = condorMonitor.StoredQuery()
+        sched2.stored_data = dict([((1, jid[1]), job) for jid, job in condorq_data.items()])
+        condorq_dict = {'sched1': self.condorq_dict['sched1'], 'sched2': sched2}
+        for good_schedds in (['sched1', 'sched2'], ['sched1']):
+            expected = self.chainedCondorQTypes(condorq_dict, good_schedds)
+            actual = glideinFrontendLib.classifyCondorQ(condorq_dict, good_schedds)
+            self.assertEqual(sorted(actual.keys()), sorted(expected.keys()))
+            for category in expected:
+                self.assertEqual(actual[category]['abs'], expected[category]['abs'], category)
+                self.assertEqual(sorted(actual[category]['dict'].keys()), sorted(expected[category]['dict'].keys()))
+                for schedd_name in expected[category]['dict']:
+                    view = actual[category]['dict'][schedd_name].fetchStored()
+                    self.assertTrue(isinstance(view, condorMonitor.KeyView))
+                    self.assertEqual(view, expected[category]['dict'][schedd_name].fetchStored())
+        self.assertEqual(actual['Idle_3600']['dict']['sched1'].fetchStored().keys(), [(12345, 2)])
+        self.assertEqual(actual['IdleAll']['abs'], 2 * actual['Idle']['abs'])
+        # the jobs are not copied
+        self.assertTrue(actual['Idle']['dict']['sched1'].fetchStored()[(12345, 2)] is condorq_data[(12345, 2)])
+
     def test_countCondorQ(self):
         count = glideinFrontendLib.countCondorQ(self.condorq_dict)
         self.assertEqual(count, self.total_jobs)
@@ -512,7 +677,7 @@ class FETestCaseCondorQ(FETestCaseBase):
         self.assertItemsEqual(users, ['user1@fnal.gov', 'user2@fnal.gov'])
 
     @mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv')
-    @mock.patch('glideinwms.lib.condorExe.exe_cmd')
+    @mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks')
     def test_getCondorQ(self, m_exe_cmd, m_iGetEnv):
         f = open('cq.fixture')
         m_exe_cmd.return_value = f.readlines()
@@ -526,6 +691,51 @@ class FETestCaseCondorQ(FETestCaseBase):
                     0, self.total_jobs)])
 
 
+class FETestCaseColumnar(FETestCaseBase):
+
+    def prepare_columnar_condorq_dict(self):
+        with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv'):
+            cq = condorMonitor.CondorQ(schedd_name='sched1', pool_name='pool1', columnar_storage=True)
+
+        with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
+            f = open('cq.fixture')
+            m_exe_cmd.return_value = f.readlines()
+            cq.load()
+
+        return {'sched1': cq}
+
+    def test_subqueries(self):
+        columnar_condorq_dict = self.prepare_columnar_condorq_dict()
+        for get_func in (glideinFrontendLib.getIdleCondorQ, glideinFrontendLib.getRunningCondorQ,
+                         glideinFrontendLib.getIdleProxyCondorQ):
+            expected = get_func(self.condorq_dict)
+            actual = get_func(columnar_condorq_dict)
+            self.assertTrue(isinstance(actual['sched1'].fetchStored(), condorMonitor.IndexView))
+            self.assertEqual(actual['sched1'].fetchStored(), expected['sched1'].fetchStored())
+            self.assertEqual(glideinFrontendLib.countCondorQ(actual), glideinFrontendLib.countCondorQ(expected))
+
+    def test_classifyCondorQ(self):
+        columnar_condorq_dict = self.prepare_columnar_condorq_dict()
+        expected = glideinFrontendLib.classifyCondorQ(self.condorq_dict)
+        actual = glideinFrontendLib.classifyCondorQ(columnar_condorq_dict)
+        for category in expected:
+            view = actual[category]['dict']['sched1'].fetchStored()
+            self.assertTrue(isinstance(view, condorMonitor.IndexView))
+            self.assertTrue(view.table is columnar_condorq_dict['sched1'].fetchStored())
+            self.assertEqual(view, expected[category]['dict']['sched1'].fetchStored())
+            self.assertEqual(actual[category]['abs'], expected[category]['abs'])
+
+    def test_countMatch(self):
+        columnar_condorq_dict = self.prepare_columnar_condorq_dict()
+        match_obj = compile('not job.has_key("DESIRED_Sites") or glidein["attrs"].get("GLIDEIN_Site") in job["DESIRED_Sites"]',
+                            "<string>", "eval")
+        expected = glideinFrontendLib.countMatch(
+            match_obj, glideinFrontendLib.getIdleCondorQ(self.condorq_dict), self.glidein_dict, {}, False)
+        actual = glideinFrontendLib.countMatch(
+            match_obj, glideinFrontendLib.getIdleCondorQ(columnar_condorq_dict), self.glidein_dict, {}, False)
+        self.assertEqual(expected, actual)
+
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=xmlrunner.XMLTestRunner(
@@ -14,6 +14,8 @@ Project:
 from __future__ import absolute_import
 from __future__ import print_function
 import os
+import shutil
+import tempfile
 import mock
 import unittest2 as unittest
 import xmlrunner
@@ -205,6 +207,7 @@ class FEElementTestCase(unittest.TestCase):
             'glideinwms.frontend.glideinFrontendConfig.GroupSignatureDescript')
         @mock.patch('glideinwms.frontend.glideinFrontendConfig.AttrsDescript')
         def create_glideinFrontendElement(
+                work_dir,
                 m_AttrsDescript,
                 m_GroupSignatureDescript,
                 m_ParamsDescript,
@@ -214,16 +217,18 @@ class FEElementTestCase(unittest.TestCase):
             m_ParamsDescript.return_value = self.paramsDescript
             m_ElementMergedDescript.return_value = self.elementDescript
 
-            self.gfe = glideinFrontendElement.glideinFrontendElement(
-                1, '', 'group1', '')
-            self.gfe.elementDescript = self.elementDescript
+            gfe = glideinFrontendElement.glideinFrontendElement(
+                1, work_dir, 'group1', '')
+            gfe.elementDescript = self.elementDescript
+            return gfe
 
         # @mock.patch defines these so disable pylint complaint
-        create_glideinFrontendElement()  # pylint: disable=no-value-for-parameter
+        self.create_glideinFrontendElement = create_glideinFrontendElement
+        self.gfe = create_glideinFrontendElement('')  # pylint: disable=no-value-for-parameter
 
     def test_get_condor_q(self):
         with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv'):
-            with mock.patch('glideinwms.lib.condorExe.exe_cmd') as m_exe_cmd:
+            with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
                 f = open('cq.fixture')
                 m_exe_cmd.return_value = f.readlines()
                 cq = self.gfe.get_condor_q('schedd1')
@@ -233,6 +238,85 @@ class FEElementTestCase(unittest.TestCase):
                 (12345, x) for x in xrange(
                     0, 13)])
 
+    def test_condorq_cache_across_iterations(self):
+        """The condor_q cache saved by the group process of an iteration is used by the one of the next iteration
+        """
+        jobs = dict([((1, i), {'ClusterId': 1, 'ProcId': i, 'JobStatus': 1, 'EnteredCurrentStatus': 1000 + i,
+                               'ServerTime': 2000}) for i in range(10)])
+        work_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(glideinFrontendConfig.get_group_dir(work_dir, 'group1'))
+            self.elementDescript.element_data['CondorQCacheFullRefresh'] = '1800'
+            with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv'):
+                with mock.patch.object(condorMonitor.CondorQ, 'fetch', return_value=jobs):
+                    for iteration in range(2):
+                        gfe = self.create_glideinFrontendElement(work_dir)  # pylint: disable=no-value-for-parameter
+                        gfe.condorq_dict = gfe.get_condor_q('schedd1')
+                        gfe.store_condorq_cache()
+                        stats = gfe.condorq_dict['schedd1'].cache_stats
+                        if iteration == 0:
+                            self.assertEqual(stats['full'], 1)
+            self.assertEqual(stats['full'], 0)
+            self.assertEqual(stats['hits'], 10)
+            self.assertEqual(stats['misses'], 0)
+        finally:
+            del self.elementDescript.element_data['CondorQCacheFullRefresh']
+            shutil.rmtree(work_dir)
+
+    def test_match_cache_across_iterations(self):
+        """The match cache saved in the history by the group process of an iteration
+        is used by the one of the next iteration
+        """
+        glidein_dict = {'entry1': {'attrs': {'GLIDEIN_Site': 'Site1'}, 'params': {}}}
+        work_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(glideinFrontendConfig.get_group_dir(work_dir, 'group1'))
+            self.elementDescript.element_data['MatchCache'] = 'True'
+            with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv'):
+                condorq = condorMonitor.CondorQ('schedd1')
+            condorq.stored_data = {(1, 0): {'User': 'user1'}}
+            for iteration in range(2):
+                gfe = self.create_glideinFrontendElement(work_dir)  # pylint: disable=no-value-for-parameter
+                # the configuration of the previous iteration is in the history
+                self.assertEqual(gfe.match_cache.setConfig('True', ['User'], {}, []), iteration == 0)
+                gfe.match_cache.setGlideins(glidein_dict)
+                glideinwms.frontend.glideinFrontendLib.computeJobSignatures({'schedd1': condorq}, ['User'],
+                                                                           gfe.match_cache.signature_table)
+                signature = condorq.job_signatures[1][(1, 0)]
+                match = gfe.match_cache.getMatch('entry1', signature)
+                if iteration == 0:
+                    self.assertEqual(match, None)
+                    # as done by a matchmaking child
+                    gfe.match_cache.addMatch('entry1', signature, True)
+                    gfe.match_cache.mergeChildResults(gfe.match_cache.getChildResults())
+                gfe.condorq_dict = {'schedd1': condorq}
+                gfe.condorq_match_list = ['User']
+                gfe.update_match_cache()
+                gfe.history_obj.save()
+            self.assertEqual(match, True)
+            self.assertEqual(gfe.match_cache.hits, 1)
+        finally:
+            del self.elementDescript.element_data['MatchCache']
+            shutil.rmtree(work_dir)
+
+    def test_match_costs_across_iterations(self):
+        """The unit costs learned by the group process of an iteration are used by the one of the next iteration
+        """
+        work_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(glideinFrontendConfig.get_group_dir(work_dir, 'group1'))
+            gfe = self.create_glideinFrontendElement(work_dir)  # pylint: disable=no-value-for-parameter
+            gfe.update_match_costs({'Idle': 2.0, 'Real': 1.0}, {'Idle': 1000, 'Real': 10}, 2.0, 1.0)
+            gfe.history_obj.save()
+            gfe = self.create_glideinFrontendElement(work_dir)  # pylint: disable=no-value-for-parameter
+            self.assertEqual(gfe.match_costs.getUnitCost('Idle'), 0.002)
+            self.assertEqual(gfe.match_costs.getUnitCost('Real'), 0.1)
+            # the moving average continues from the saved costs
+            gfe.update_match_costs({'Idle': 4.0}, {'Idle': 1000}, 4.0, 1.0)
+            self.assertAlmostEqual(gfe.history_obj['match_unit_costs']['Idle'], 0.003)
+        finally:
+            shutil.rmtree(work_dir)
+
     def test_compute_glidein_max_run(self):
         self.assertEqual(self.gfe.compute_glidein_max_run(
             {'Idle': 412}, 971, 0), 1591)
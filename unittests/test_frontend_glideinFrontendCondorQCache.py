@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for glideinwms/frontend/glideinFrontendCondorQCache.py
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import xmlrunner
+import mock
+import unittest2 as unittest
+
+from glideinwms.unittests.unittest_utils import FakeLogger
+import glideinwms.lib.condorMonitor as condorMonitor
+import glideinwms.frontend.glideinFrontendCondorQCache as glideinFrontendCondorQCache
+
+CONSTRAINT = '(JobStatus=?=1)||(JobStatus=?=2)'
+FORMAT_LIST = [('JobStatus', 'i'), ('EnteredCurrentStatus', 'i'), ('ServerTime', 'i'),
+               ('RequestCpus', 'i'), ('ClusterId', 'i'), ('ProcId', 'i')]
+
+
+class FakeSchedd(object):
+    """Jobs in the queue, fetch returns the attributes in format_list of the jobs matching
+    the constraints used by CondorQCache
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.queries = []
+
+    def fetch(self, constraint=None, format_list=None):
+        self.queries.append((constraint, format_list))
+        return self.query(constraint, format_list)
+
+    def query(self, constraint, format_list):
+        min_entered = -1
+        if 'EnteredCurrentStatus >= ' in constraint:
+            min_entered = int(constraint.split('EnteredCurrentStatus >= ')[1].rstrip(')'))
+        attrs = [attr for attr, attr_type in format_list]
+        out = {}
+        for key, job in self.jobs.items():
+            if job.get('EnteredCurrentStatus', 0) >= min_entered:
+                out[key] = dict([(a, job[a]) for a in attrs if a in job])
+        return out
+
+
+def make_jobs(nr_jobs, server_time):
+    jobs = {}
+    for i in range(nr_jobs):
+        jobs[(1, i)] = {'ClusterId': 1, 'ProcId': i, 'JobStatus': 1, 'EnteredCurrentStatus': 100 + i,
+                        'ServerTime': server_time, 'RequestCpus': 1}
+    return jobs
+
+
+class TestCondorQCache(unittest.TestCase):
+
+    def setUp(self):
+        glideinFrontendCondorQCache.logSupport.log = FakeLogger()
+        self.schedd = FakeSchedd(make_jobs(10, 1000))
+        self.cache = glideinFrontendCondorQCache.CondorQCache(1800)
+        self.patcher = mock.patch.object(condorMonitor.CondorQ, 'fetch', side_effect=self.schedd.fetch)
+        self.patcher.start()
+        self.patcher_env = mock.patch.object(condorMonitor.LocalScheddCache, 'iGetEnv')
+        self.patcher_env.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.patcher_env.stop()
+
+    def load(self, columnar_storage=False):
+        condorq = self.cache.loadCondorQ('schedd1', CONSTRAINT, FORMAT_LIST, columnar_storage)
+        self.cache.store('schedd1', condorq)
+        return condorq
+
+    def expected(self):
+        return self.schedd.query(CONSTRAINT, FORMAT_LIST)
+
+    def test_full_then_delta(self):
+        condorq = self.load()
+        self.assertEqual(condorq.cache_stats['full'], 1)
+        self.assertEqual(condorq.fetchStored(), self.expected())
+
+        # frontend additions are not kept
+        condorq.fetchStored()[(1, 0)]['RunningOn'] = 'slot1@glidein_1@wn1'
+        # one job started running, one left the queue, one was submitted, the time moved
+        for job in self.schedd.jobs.values():
+            job['ServerTime'] = 1060
+        self.schedd.jobs[(1, 3)].update({'JobStatus': 2, 'EnteredCurrentStatus': 1050})
+        del self.schedd.jobs[(1, 5)]
+        self.schedd.jobs[(2, 0)] = {'ClusterId': 2, 'ProcId': 0, 'JobStatus': 1, 'EnteredCurrentStatus': 1055,
+                                    'ServerTime': 1060, 'RequestCpus': 8}
+        self.schedd.queries = []
+        condorq = self.load()
+        self.assertEqual(condorq.fetchStored(), self.expected())
+        self.assertEqual(condorq.cache_stats['hits'], 8)
+        self.assertEqual(condorq.cache_stats['misses'], 2)
+        self.assertEqual(condorq.cache_stats['full'], 0)
+        self.assertEqual(self.schedd.queries,
+                         [(CONSTRAINT, glideinFrontendCondorQCache.DELTA_FORMAT_LIST),
+                          ('(%s) && (EnteredCurrentStatus >= 1050)' % CONSTRAINT, FORMAT_LIST)])
+
+    def test_no_changes(self):
+        self.load()
+        self.schedd.queries = []
+        condorq = self.load(columnar_storage=True)
+        self.assertTrue(isinstance(condorq.fetchStored(), condorMonitor.ColumnarResult))
+        self.assertEqual(condorq.fetchStored(), self.expected())
+        self.assertEqual(condorq.cache_stats['hits'], 10)
+        # only the status query
+        self.assertEqual(len(self.schedd.queries), 1)
+        # columnar data in the cache
+        condorq = self.load()
+        self.assertEqual(condorq.fetchStored(), self.expected())
+
+    def test_full_refresh(self):
+        self.load()
+        with mock.patch('time.time', return_value=self.cache.cache['schedd1'][1] + 1801):
+            condorq = self.load()
+        self.assertEqual(condorq.cache_stats['full'], 1)
+        # a different query is not delta
+        condorq = self.cache.loadCondorQ('schedd1', 'True', FORMAT_LIST)
+        self.assertEqual(condorq.cache_stats['full'], 1)
+        # nor a different schedd
+        condorq = self.cache.loadCondorQ('schedd2', CONSTRAINT, FORMAT_LIST)
+        self.assertEqual(condorq.cache_stats['full'], 1)
+
+    def test_save_load(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmp_dir, 'condorq_cache.pk')
+            # nothing saved yet
+            cache = glideinFrontendCondorQCache.CondorQCache(1800, fname)
+            cache.load()
+            self.assertEqual(cache.cache, {})
+            self.cache = cache
+            self.load(columnar_storage=True)
+            cache.save()
+            # the next iteration, in a different process
+            self.cache = glideinFrontendCondorQCache.CondorQCache(1800, fname)
+            self.cache.load()
+            self.schedd.queries = []
+            condorq = self.load()
+            self.assertEqual(condorq.fetchStored(), self.expected())
+            self.assertEqual(condorq.cache_stats['hits'], 10)
+            self.assertEqual(len(self.schedd.queries), 1)
+            # a corrupted file is an empty cache
+            with open(fname, 'w') as fd:
+                fd.write('garbage')
+            cache = glideinFrontendCondorQCache.CondorQCache(1800, fname)
+            cache.load()
+            self.assertEqual(cache.cache, {})
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_store_other_condorq(self):
+        self.assertEqual(self.cache.store('schedd1', condorMonitor.CondorQ('schedd1')), None)
+        self.assertEqual(self.cache.cache, {})
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
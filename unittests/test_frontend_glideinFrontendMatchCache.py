@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for glideinwms/frontend/glideinFrontendMatchCache.py
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+import copy
+import cPickle
+import os
+import tempfile
+import xmlrunner
+import mock
+import unittest2 as unittest
+
+import glideinwms.frontend.glideinFrontendLib as glideinFrontendLib
+import glideinwms.frontend.glideinFrontendMatchEngine as glideinFrontendMatchEngine
+import glideinwms.frontend.glideinFrontendMatchCache as glideinFrontendMatchCache
+from glideinwms.unittests.test_frontend import FETestCaseBase
+
+MATCH_EXPR = 'not job.has_key("DESIRED_Sites") or glidein["attrs"].get("GLIDEIN_Site") in job["DESIRED_Sites"]'
+MATCH_LIST = ['DESIRED_Sites', 'User', 'JobStatus']
+
+
+class FakePolicy(object):
+
+    def __init__(self, fname):
+        self.file = fname
+
+
+class TestMatchCache(FETestCaseBase):
+
+    def setUp(self):
+        super(TestMatchCache, self).setUp()
+        self.match_obj = compile(MATCH_EXPR, "<string>", "eval")
+        self.match_cache = glideinFrontendMatchCache.MatchCache()
+
+    def new_iteration(self):
+        """Do in the group process what glideinFrontendElement does before the matchmaking
+        """
+        self.match_cache.setConfig(MATCH_EXPR, MATCH_LIST, {}, [])
+        self.match_cache.setGlideins(self.glidein_dict)
+        glideinFrontendLib.computeJobSignatures(self.condorq_dict, MATCH_LIST, self.match_cache.signature_table)
+
+    def count_match(self, count_match_func=glideinFrontendLib.countMatch, use_cache=True):
+        """Count the matches as a matchmaking child and merge its results in the cache
+        """
+        match_cache = None
+        if use_cache:
+            match_cache = copy.deepcopy(self.match_cache)
+        out = count_match_func(self.match_obj, glideinFrontendLib.getIdleCondorQ(self.condorq_dict),
+                               self.glidein_dict, {}, False, MATCH_LIST, match_cache=match_cache)
+        if use_cache:
+            self.match_cache.mergeChildResults(match_cache.getChildResults())
+        return out
+
+    def test_same_results(self):
+        for count_match_func in (glideinFrontendLib.countMatch, glideinFrontendMatchEngine.countMatch):
+            self.match_cache = glideinFrontendMatchCache.MatchCache()
+            self.new_iteration()
+            expected = self.count_match(count_match_func, use_cache=False)
+            self.assertEqual(self.count_match(count_match_func), expected)
+            self.assertEqual(self.match_cache.hits, 0)
+            nr_pairs = self.match_cache.misses
+            self.assertTrue(nr_pairs > 0)
+
+            self.new_iteration()
+            self.assertEqual(self.count_match(count_match_func), expected)
+            self.assertEqual(self.match_cache.hits, nr_pairs)
+            self.assertEqual(self.match_cache.misses, 0)
+
+    def test_changed_entry(self):
+        self.new_iteration()
+        self.count_match()
+        nr_pairs = self.match_cache.misses
+        self.glidein_dict[self.glidein_dict_k1]['attrs']['GLIDEIN_Site'] = 'Site_Name2'
+        # the monitoring values are not part of the fingerprint
+        self.glidein_dict[self.glidein_dict_k2]['monitor']['GlideinMonitorTotalStatusRunning'] = 10
+        self.new_iteration()
+        expected = self.count_match(use_cache=False)
+        self.assertEqual(self.count_match(), expected)
+        self.assertEqual(self.match_cache.misses, nr_pairs / len(self.glidein_dict))
+        self.assertEqual(expected[0][self.glidein_dict_k1], expected[0][self.glidein_dict_k2])
+
+    def test_config_change(self):
+        self.new_iteration()
+        self.count_match()
+        self.assertFalse(self.match_cache.setConfig(MATCH_EXPR, MATCH_LIST, {}, []))
+        self.assertTrue(self.match_cache.setConfig('True', MATCH_LIST, {}, []))
+        self.assertEqual(self.match_cache.results, {})
+        self.assertTrue(self.match_cache.setConfig('True', MATCH_LIST, {'GLIDEIN_Max_Walltime': 3600}, []))
+
+        fd, fname = tempfile.mkstemp()
+        try:
+            os.write(fd, 'def match(job, glidein):\n    return True\n')
+            os.close(fd)
+            policies = [FakePolicy(fname)]
+            self.assertTrue(self.match_cache.setConfig('True', MATCH_LIST, {}, policies))
+            self.assertFalse(self.match_cache.setConfig('True', MATCH_LIST, {}, policies))
+            with open(fname, 'a') as fd:
+                fd.write('# changed\n')
+            self.assertTrue(self.match_cache.setConfig('True', MATCH_LIST, {}, policies))
+        finally:
+            os.remove(fname)
+
+    def test_state(self):
+        self.new_iteration()
+        expected = self.count_match()
+        nr_pairs = self.match_cache.misses
+        # the next iteration is in a new group process, with the state saved in the history file
+        state = cPickle.loads(cPickle.dumps(self.match_cache.getState(), cPickle.HIGHEST_PROTOCOL))
+        self.match_cache = glideinFrontendMatchCache.MatchCache()
+        self.match_cache.setState(state)
+        self.new_iteration()
+        self.assertEqual(self.count_match(), expected)
+        self.assertEqual(self.match_cache.hits, nr_pairs)
+        self.assertEqual(self.match_cache.misses, 0)
+        # new clusters do not reuse the saved signatures
+        self.assertEqual(self.match_cache.signature_table[('User', 'new_user')], state['next_signature'])
+        # nothing saved
+        for state in (None, {}, {'results': {}}):
+            self.match_cache.setState(state)
+            self.assertEqual(self.match_cache.results, {})
+            self.assertEqual(self.match_cache.config_digest, None)
+            self.assertEqual(len(self.match_cache.signature_table), 0)
+
+    def test_prune(self):
+        self.new_iteration()
+        self.count_match()
+        nr_signatures = len(self.match_cache.signature_table)
+        del self.glidein_dict[self.glidein_dict_k3]
+        self.new_iteration()
+        self.match_cache.prune(self.condorq_dict, MATCH_LIST)
+        self.assertEqual(len(self.match_cache.results), 2)
+        self.assertEqual(len(self.match_cache.signature_table), nr_signatures)
+        # only the idle jobs left
+        self.condorq_dict = glideinFrontendLib.getIdleCondorQ(self.condorq_dict)
+        self.new_iteration()
+        self.match_cache.prune(self.condorq_dict, MATCH_LIST)
+        signatures = set(self.match_cache.signature_table.values())
+        self.assertTrue(len(signatures) < nr_signatures)
+        for matches in self.match_cache.results.values():
+            self.assertTrue(set(matches.keys()) <= signatures)
+        # signatures are not reused
+        self.assertEqual(self.match_cache.signature_table.next_signature, nr_signatures)
+
+    def test_no_signatures(self):
+        self.match_cache.setGlideins(self.glidein_dict)
+        with mock.patch.object(self.match_cache, 'getMatch') as m_getMatch:
+            for count_match_func in (glideinFrontendLib.countMatch, glideinFrontendMatchEngine.countMatch):
+                count_match_func(self.match_obj, self.condorq_dict, self.glidein_dict, {}, False, MATCH_LIST,
+                                 match_cache=self.match_cache)
+            self.assertFalse(m_getMatch.called)
+        self.assertEqual(self.match_cache.new_results, {})
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for glideinwms/frontend/glideinFrontendMatchCosts.py
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+import xmlrunner
+import unittest2 as unittest
+
+import glideinwms.frontend.glideinFrontendMatchCosts as glideinFrontendMatchCosts
+
+
+class TestMatchCosts(unittest.TestCase):
+
+    def test_update(self):
+        costs = glideinFrontendMatchCosts.MatchCosts(alpha=0.5)
+        # defaults before the first timing, the buckets are matchmaking
+        self.assertEqual(costs.getUnitCost('Idle'), glideinFrontendMatchCosts.DEFAULT_UNIT_COSTS['Match'])
+        self.assertEqual(costs.getUnitCost('Glidein'), glideinFrontendMatchCosts.DEFAULT_UNIT_COSTS['Glidein'])
+        costs.update('Idle', 100, 2)
+        costs.update('Idle', 100, 4)
+        self.assertEqual(costs.estimate('Idle', 10), 0.3)
+        # no work, no information
+        costs.update('Running', 0, 2)
+        self.assertFalse('Running' in costs.unit_costs)
+        self.assertEqual(glideinFrontendMatchCosts.getTaskKind(('Glidein', 3)), 'Glidein')
+        self.assertEqual(glideinFrontendMatchCosts.getTaskKind('Idle'), 'Idle')
+
+
+class TestPlanMatchWork(unittest.TestCase):
+
+    def test_makespan(self):
+        self.assertEqual(glideinFrontendMatchCosts.getMakespan([1, 1, 1, 3], 2), 4)
+        self.assertEqual(glideinFrontendMatchCosts.getMakespan([3, 1, 1, 1], 2), 3)
+        self.assertEqual(glideinFrontendMatchCosts.getImbalance(4, 6, 2), 4 * 2 / 6.)
+        self.assertEqual(glideinFrontendMatchCosts.getImbalance(0, 0, 2), 1)
+
+    def test_chunks(self):
+        entries = ['entry%d' % i for i in range(100)]
+        # the entries are most of the work: one chunk per worker
+        fork_order, chunks, costs, imbalance = glideinFrontendMatchCosts.planMatchWork(
+            {'Idle': 2, 'Real': 1}, entries, 1, 4)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(sum(chunks, []), entries)
+        self.assertEqual(fork_order[-2:], ['Idle', 'Real'])
+        self.assertEqual(costs[('Glidein', 0)], 25)
+        self.assertTrue(imbalance < 1.1)
+        # the entries are a small part of the work, a single chunk
+        fork_order, chunks, costs, imbalance = glideinFrontendMatchCosts.planMatchWork(
+            {'Idle': 100, 'Running': 50, 'Real': 10}, entries, 0.2, 4)
+        self.assertEqual(chunks, [entries])
+        self.assertEqual(fork_order, ['Idle', 'Running', ('Glidein', 0), 'Real'])
+        # the Idle bucket alone takes longer than the average load
+        self.assertEqual(imbalance, 100 * 4 / 180.)
+        # too little work to split
+        fork_order, chunks, costs, imbalance = glideinFrontendMatchCosts.planMatchWork({}, entries, 1e-4, 4)
+        self.assertEqual(chunks, [entries])
+        self.assertEqual(glideinFrontendMatchCosts.planMatchWork({'Real': 1}, [], 1, 4)[:2], (['Real'], []))
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
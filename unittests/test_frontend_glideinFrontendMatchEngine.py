@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for glideinwms/frontend/glideinFrontendMatchEngine.py
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+from __future__ import print_function
+import copy
+import xmlrunner
+import mock
+import unittest2 as unittest
+
+import glideinwms.frontend.glideinFrontendLib as glideinFrontendLib
+import glideinwms.frontend.glideinFrontendMatchEngine as glideinFrontendMatchEngine
+from glideinwms.unittests.test_frontend import FETestCaseBase
+
+
+class FakePolicy(object):
+    """Minimal MatchPolicy replacement: only file and pyObject.match are used
+    """
+
+    def __init__(self, match_func, fname='fake_policy.py'):
+        self.file = fname
+        self.pyObject = mock.Mock()
+        self.pyObject.match = match_func
+
+
+class TestJobClusterTable(FETestCaseBase):
+
+    def test_clusters(self):
+        table = glideinFrontendMatchEngine.JobClusterTable(self.condorq_dict, ['DESIRED_Sites'])
+        self.assertEqual(table.nr_jobs, 13)
+        self.assertEqual(sum(table.counts), 13)
+        self.assertEqual(len(table), len(set([j.get('DESIRED_Sites') for j in table.jobs])))
+        self.assertEqual(table.countRows(range(len(table))), (13, 13))
+        # integer CPUs as in the classic countMatch
+        self.assertTrue(isinstance(table.countRows(range(len(table)))[1], int))
+
+    def test_precomputed_signatures(self):
+        expected = glideinFrontendMatchEngine.JobClusterTable(self.condorq_dict, ['DESIRED_Sites'])
+        glideinFrontendLib.computeJobSignatures(self.condorq_dict, ['DESIRED_Sites'])
+        with mock.patch.object(glideinFrontendLib, 'hashJob') as m_hashJob:
+            table = glideinFrontendMatchEngine.JobClusterTable(self.condorq_dict, ['DESIRED_Sites'])
+            self.assertFalse(m_hashJob.called)
+        self.assertEqual(sorted(table.counts), sorted(expected.counts))
+
+    def test_no_match_list(self):
+        table = glideinFrontendMatchEngine.JobClusterTable(self.condorq_dict)
+        self.assertEqual(sum(table.counts), 13)
+        self.assertEqual(table.countRows([]), (0, 0))
+
+
+class TestCountMatch(FETestCaseBase):
+
+    match_exprs = ['not job.has_key("DESIRED_Sites") or glidein["attrs"].get("GLIDEIN_Site") in job["DESIRED_Sites"]',
+                   'True',
+                   'False',
+                   'job.get("JobStatus") == 1',
+                   'glidein["attrs"]["GLIDEIN_CPUS"] == 4 or attr_dict.get("ANY", False)',
+                   # errors only in some rows, short circuit, chained comparisons, calls and if
+                   'job["DESIRED_Sites"].split(",")[0] == glidein["attrs"]["GLIDEIN_Site"]',
+                   'job.get("JobStatus") == 1 and glidein["attrs"]["GLIDEIN_Site"] in job["DESIRED_Sites"]',
+                   '0 < job.get("JobStatus", 0) <= glidein["attrs"]["GLIDEIN_CPUS"]',
+                   'len(job.get("DESIRED_Sites", "")) > 10 if job.get("JobStatus") == 2 else not job["Missing"]',
+                   '(job.get("RequestMemory", 0) + 10) * 2 < glidein["attrs"]["GLIDEIN_MaxMemMBs"]',
+                   'job.get("JobStatus") / 0 == 1',
+                   # the classic engine raises for the entry with 'aUtO' GLIDEIN_CPUS
+                   'int(glidein["attrs"]["GLIDEIN_CPUS"]) > job.get("JobStatus")',
+                   # names from the globals of the classic countMatch (glideinFrontendLib)
+                   'safe_boolcomp(job.get("JobStatus"), 2) or string.upper(glidein["attrs"]["GLIDEIN_Site"]) in '
+                   'string.upper(job.get("DESIRED_Sites", ""))']
+
+    def assertSameAsClassic(self, match_expr, ignore_down_entries=False, match_list=None, match_policies=[]):
+        match_obj = compile(match_expr, "<string>", "eval")
+        expected = glideinFrontendLib.countMatch(
+            match_obj, self.condorq_dict, copy.deepcopy(self.glidein_dict), {}, ignore_down_entries,
+            match_list, match_policies=match_policies)
+        actual = glideinFrontendMatchEngine.countMatch(
+            match_obj, self.condorq_dict, copy.deepcopy(self.glidein_dict), {}, ignore_down_entries,
+            match_list, match_policies=match_policies)
+        self.assertEqual(expected, actual, "Different results for '%s'" % match_expr)
+        # evaluated by columns
+        actual = glideinFrontendMatchEngine.countMatch(
+            match_obj, self.condorq_dict, copy.deepcopy(self.glidein_dict), {}, ignore_down_entries,
+            match_list, match_policies=match_policies, match_expr=match_expr)
+        self.assertEqual(expected, actual, "Different results by columns for '%s'" % match_expr)
+        # also the same types (e.g. integer counts)
+        for expected_counts, actual_counts in zip(expected, actual):
+            for key in expected_counts:
+                self.assertEqual(type(expected_counts[key]), type(actual_counts[key]), key)
+
+    def test_column_expression(self):
+        jobs = glideinFrontendMatchEngine.JobClusterTable(self.condorq_dict).jobs
+        glidein = self.glidein_dict[self.glidein_dict_k1]
+        match_globals = vars(glideinFrontendLib)
+        for match_expr in self.match_exprs:
+            column_expr = glideinFrontendMatchEngine.ColumnExpression(match_expr, match_globals, {'attr_dict': {}})
+            values, has_errors = column_expr.evaluate(jobs, glidein)
+            self.assertEqual(has_errors, bool([v for v in values if isinstance(v, glideinFrontendMatchEngine._RowError)]))
+            for row in range(len(jobs)):
+                try:
+                    expected = eval(match_expr, match_globals, {'job': jobs[row], 'glidein': glidein, 'attr_dict': {}})
+                except Exception as e:
+                    self.assertTrue(isinstance(values[row], glideinFrontendMatchEngine._RowError), match_expr)
+                    self.assertEqual(type(values[row].exc), type(e))
+                else:
+                    self.assertEqual(values[row], expected, match_expr)
+
+    def test_column_expression_cache(self):
+        jobs = glideinFrontendMatchEngine.JobClusterTable(self.condorq_dict).jobs
+        column_expr = glideinFrontendMatchEngine.ColumnExpression(
+            'job.get("JobStatus") == glidein["attrs"]["GLIDEIN_CPUS"]', vars(glideinFrontendLib), {'attr_dict': {}})
+        column_expr.evaluate(jobs, self.glidein_dict[self.glidein_dict_k1])
+        # the job.get column is evaluated only for the first entry
+        with mock.patch.object(glideinFrontendMatchEngine, '_mapColumns',
+                               wraps=glideinFrontendMatchEngine._mapColumns) as m_map:
+            values = column_expr.evaluate(jobs, self.glidein_dict[self.glidein_dict_k2])[0]
+            self.assertEqual(m_map.call_count, 1)
+        self.assertEqual(values, [job.get('JobStatus') == 4 for job in jobs])
+        # a new table
+        new_jobs = list(jobs)
+        with mock.patch.object(glideinFrontendMatchEngine, '_mapColumns',
+                               wraps=glideinFrontendMatchEngine._mapColumns) as m_map:
+            column_expr.evaluate(new_jobs, self.glidein_dict[self.glidein_dict_k2])
+            self.assertEqual(m_map.call_count, 2)
+        self.assertTrue(column_expr.cached_jobs is new_jobs)
+
+    def test_short_circuit(self):
+        """The second operand of and/or and the branches of if are evaluated only for the rows
+        where the classic countMatch evaluates them
+        """
+        for match_expr in ('job.get("JobStatus") == 1 and attr_dict["check"](job)',
+                           'job.get("JobStatus") == 1 or attr_dict["check"](job)',
+                           'attr_dict["check"](job) if job.get("JobStatus") == 2 else False',
+                           'job.get("JobStatus") == 2 and (job.has_key("DESIRED_Sites") or attr_dict["check"](job))',
+                           # no rows need the second operand
+                           'job.get("JobStatus") == 7 and attr_dict["check"](job)'):
+            match_obj = compile(match_expr, "<string>", "eval")
+            check = mock.Mock(return_value=True)
+            expected = glideinFrontendLib.countMatch(match_obj, self.condorq_dict, self.glidein_dict,
+                                                     {'check': check}, False)
+            # the parts using only job are evaluated once for all the entries, not once per entry
+            expected_jobs = set([id(call[0][0]) for call in check.call_args_list])
+            check.reset_mock()
+            actual = glideinFrontendMatchEngine.countMatch(match_obj, self.condorq_dict, self.glidein_dict,
+                                                           {'check': check}, False, match_expr=match_expr)
+            self.assertEqual(expected, actual, match_expr)
+            self.assertEqual(set([id(call[0][0]) for call in check.call_args_list]), expected_jobs, match_expr)
+
+    def test_unsupported_expression(self):
+        for match_expr in ('[s for s in job["DESIRED_Sites"].split(",")] != []',
+                           'job.get("JobStatus", default=1) == 1',
+                           '(lambda: job)() is not None'):
+            self.assertRaises(glideinFrontendMatchEngine.UnsupportedExpression,
+                              glideinFrontendMatchEngine.ColumnExpression, match_expr, {}, {})
+            match_obj = compile(match_expr, "<string>", "eval")
+            evaluator = glideinFrontendMatchEngine.MatchEvaluator(match_obj, [], {}, match_expr)
+            self.assertTrue(evaluator.column_expr is None)
+            self.assertSameAsClassic(match_expr)
+
+    def test_countMatch(self):
+        match_obj = compile(self.match_exprs[0], "<string>", "eval")
+        match_counts = glideinFrontendMatchEngine.countMatch(
+            match_obj, self.condorq_dict, self.glidein_dict, {}, False)
+        keys = (self.glidein_dict_k1, self.glidein_dict_k2, self.glidein_dict_k3, (None, None, None))
+        self.assertEqual([match_counts[0][k] for k in keys], [10, 8, 4, 1])
+        self.assertEqual([match_counts[1][k] for k in keys], [7, 5, 2, 1])
+        self.assertEqual([match_counts[2][k] for k in keys], [4, 2, 0, 1])
+        self.assertEqual([match_counts[3][k] for k in keys], [7, 2, 2, 1])
+
+    def test_same_as_classic(self):
+        for match_expr in self.match_exprs:
+            self.assertSameAsClassic(match_expr)
+            self.assertSameAsClassic(match_expr, match_list=['DESIRED_Sites', 'JobStatus'])
+
+    def test_same_as_classic_downtime(self):
+        self.glidein_dict[self.glidein_dict_k1]['attrs']['GLIDEIN_In_Downtime'] = True
+        for match_expr in self.match_exprs:
+            self.assertSameAsClassic(match_expr, ignore_down_entries=True)
+            self.assertSameAsClassic(match_expr, ignore_down_entries=False)
+
+    def test_same_as_classic_policies(self):
+        policies = [FakePolicy(lambda job, glidein: job.get('JobStatus') == 2),
+                    FakePolicy(lambda job, glidein: glidein['attrs']['GLIDEIN_Site'] != 'Site_Name3')]
+        for match_expr in self.match_exprs:
+            self.assertSameAsClassic(match_expr, match_policies=policies)
+
+    def test_countMatch_missingKey(self):
+        with mock.patch.object(glideinFrontendMatchEngine.logSupport.log, 'debug') as m_debug:
+            match_obj = compile('glidein["attrs"]["FOO"] == 3', "<string>", "eval")
+            glideinFrontendMatchEngine.countMatch(match_obj, self.condorq_dict, self.glidein_dict, {}, False)
+            m_debug.assert_called_with(
+                "Failed to evaluate resource match in countMatch. Possibly match_expr has "
+                "errors and trying to reference job or site attribute(s) ''FOO'' in an inappropriate way.")
+
+    def test_countMatch_otherException(self):
+        with mock.patch.object(glideinFrontendMatchEngine.logSupport.log, 'debug') as m_debug:
+            match_obj = compile('3/0', "<string>", "eval")
+            match_counts = glideinFrontendMatchEngine.countMatch(
+                match_obj, self.condorq_dict, self.glidein_dict, {}, False)
+            log_msg = m_debug.call_args[0]
+            self.assertTrue('ZeroDivisionError: integer division or modulo by zero' in str(log_msg), log_msg)
+            self.assertEqual(match_counts[0][(None, None, None)], 13)
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
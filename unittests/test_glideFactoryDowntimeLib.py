@@ -15,7 +15,9 @@ import tempfile
 import tarfile
 import unittest2 as unittest
 import time
+import random
 import xmlrunner
+import mock
 
 # unittest_utils will handle putting the appropriate directories on the python
 # path for us.
@@ -219,6 +221,97 @@ class TestDowntimes(unittest.TestCase):
                 check_time=now))
 
 
+def checkDowntimeScan(time_list, entry, frontend, security_class, check_time):
+    """Original checkDowntime, scanning all the periods read from the file, used as reference
+    """
+    for time_tuple in time_list:
+        if (time_tuple[2] != "All") and (entry != time_tuple[2]):
+            continue
+        if (time_tuple[2] == "All") and (entry == "factory"):
+            continue
+        if (time_tuple[3] != "All") and (frontend != time_tuple[3]):
+            continue
+        if (time_tuple[4] != "All") and (security_class != time_tuple[4]):
+            continue
+        if check_time < time_tuple[0]:
+            continue
+        comment = ' '.join(time_tuple[5][1:])
+        if (time_tuple[1] is None) or (check_time <= time_tuple[1]):
+            return (comment, True)
+    return ("", False)
+
+
+class TestDowntimeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmp_dir, "downtimes.txt")
+
+    def tearDown(self):
+        glideFactoryDowntimeLib.invalidateDowntimeIndex(self.fname)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_as_scan(self):
+        rnd = random.Random(42)
+        names = {'entry': ["All", "factory", "el6", "el7"], 'frontend': ["All", "fe1", "fe2"],
+                 'security_class': ["All", "sc1", "sc2"]}
+        now = 1500000000
+        for i in range(200):
+            start = now + rnd.randint(-1000, 1000)
+            end = rnd.choice([None, start + rnd.randint(0, 500)])
+            glideFactoryDowntimeLib.addPeriod(self.fname, start, end, rnd.choice(names['entry']),
+                                              rnd.choice(names['frontend']), rnd.choice(names['security_class']),
+                                              comment="period %d" % i)
+        time_list = glideFactoryDowntimeLib.read(self.fname)
+        for check_time in range(now - 1100, now + 1600, 50):
+            for entry in names['entry'] + ["Any"]:
+                for frontend in names['frontend'] + ["Any"]:
+                    for security_class in names['security_class'] + ["Any"]:
+                        self.assertEqual(
+                            glideFactoryDowntimeLib.checkDowntime(self.fname, entry, frontend, security_class,
+                                                                  check_time),
+                            checkDowntimeScan(time_list, entry, frontend, security_class, check_time))
+
+    def test_boundaries(self):
+        rnd = random.Random(7)
+        now = 1500000000
+        for i in range(40):
+            start = now + rnd.randint(-100, 100)
+            end = rnd.choice([None, start, start + rnd.randint(0, 50)])
+            glideFactoryDowntimeLib.addPeriod(self.fname, start, end, rnd.choice(["All", "el7"]),
+                                              comment="period %d" % i)
+        time_list = glideFactoryDowntimeLib.read(self.fname)
+        check_times = set()
+        for time_tuple in time_list:
+            for boundary in time_tuple[:2]:
+                if boundary is not None:
+                    check_times.update([boundary - 1, boundary, boundary + 1])
+        for check_time in sorted(check_times):
+            for entry in ["el7", "el6"]:
+                self.assertEqual(glideFactoryDowntimeLib.checkDowntime(self.fname, entry, check_time=check_time),
+                                 checkDowntimeScan(time_list, entry, "Any", "Any", check_time))
+
+    def test_reparse_on_change(self):
+        now = long(time.time())
+        with mock.patch.object(glideFactoryDowntimeLib, 'read', wraps=glideFactoryDowntimeLib.read) as m_read:
+            # no file, no downtime
+            self.assertEqual(glideFactoryDowntimeLib.checkDowntime(self.fname, "el7"), ("", False))
+            glideFactoryDowntimeLib.addPeriod(self.fname, now - 60, None, "el7", comment="down")
+            for i in range(5):
+                self.assertEqual(glideFactoryDowntimeLib.checkDowntime(self.fname, "el7"), ("down", True))
+                self.assertEqual(glideFactoryDowntimeLib.checkDowntime(self.fname, "el6"), ("", False))
+            self.assertEqual(m_read.call_count, 2)
+            # changes visible right away, also in the same second
+            glideFactoryDowntimeLib.endDowntime(self.fname, now - 30, "el7")
+            self.assertFalse(glideFactoryDowntimeLib.checkDowntime(self.fname, "el7")[1])
+            self.assertEqual(m_read.call_count, 3)
+            # changes by other processes are detected from the file
+            with open(self.fname, 'a') as fd:
+                fd.write("%s None el6 All All # manual\n" % glideFactoryDowntimeLib.timeConversion.getISO8601_Local(now - 10))
+            self.assertEqual(glideFactoryDowntimeLib.checkDowntime(self.fname, "el6"), ("manual", True))
+            self.assertEqual(m_read.call_count, 4)
+
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=xmlrunner.XMLTestRunner(
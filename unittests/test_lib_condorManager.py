@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit tests for the bulk job control of glideinwms/lib/condorManager.py
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+import xmlrunner
+import mock
+import unittest2 as unittest
+
+from glideinwms.lib import condorManager
+from glideinwms.lib.condorExe import ExeError
+
+
+def job_lines(jids, action):
+    return ["Job %i.%i %s" % (jid[0], jid[1], action) for jid in jids]
+
+
+class TestParseJobActionOutput(unittest.TestCase):
+
+    def test_parse(self):
+        lines = ["Job 12.0 marked for removal", "  Job 12.1 held", "Job 13.4 released",
+                 "Couldn't find/remove all jobs matching constraint", "Job 14.0 not found"]
+        self.assertEqual(condorManager.parseJobActionOutput(lines), set([(12, 0), (12, 1), (13, 4)]))
+
+
+class TestCondorJobAction(unittest.TestCase):
+
+    def setUp(self):
+        self.jids = [(100, i) for i in range(7)]
+        self.patcher = mock.patch.object(condorManager, 'cached_exe_cmd')
+        self.m_exe = self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_batches(self):
+        self.m_exe.side_effect = lambda cmd, args, *a: job_lines(
+            [tuple(map(int, j.split('.'))) for j in args.split()], "marked for removal")
+        with mock.patch.object(condorManager, 'MAX_JOBS_PER_CMD', 3):
+            done = condorManager.condorRemoveMany(self.jids, 'schedd1')
+        self.assertEqual(done, self.jids)
+        self.assertEqual(self.m_exe.call_count, 3)
+        self.assertEqual(self.m_exe.call_args_list[0][0][:3],
+                         ("condor_rm", "100.0 100.1 100.2 ", 'schedd1'))
+
+    def test_partial_failure(self):
+        self.m_exe.side_effect = ExeError("failed", job_lines(self.jids[:2], "held"))
+        self.assertEqual(condorManager.condorHoldMany(self.jids), self.jids[:2])
+        self.m_exe.side_effect = ExeError("failed")
+        self.assertEqual(condorManager.condorReleaseMany(self.jids), [])
+
+    def test_no_output(self):
+        self.m_exe.return_value = []
+        self.assertEqual(condorManager.condorReleaseMany(self.jids), self.jids)
+
+    def test_forcex(self):
+        self.m_exe.return_value = job_lines(self.jids, "removed")
+        self.assertEqual(condorManager.condorRemoveMany(self.jids, do_forcex=True), self.jids)
+        self.assertTrue(self.m_exe.call_args[0][1].startswith("-forcex 100.0 "))
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""
+Project:
+   glideinWMS
+
+ Description:
+   unit test for the XML parsing and the columnar storage in glideinwms/lib/condorMonitor.py
+
+ Author:
+   glideinWMS team
+"""
+
+
+from __future__ import absolute_import
+import copy
+import pickle
+import xmlrunner
+import mock
+import unittest2 as unittest
+
+from glideinwms.lib import condorMonitor
+from glideinwms.unittests import fake_htcondor
+
+
+XML_DATA = """Some text before the header
+<?xml version="1.0"?>
+<!DOCTYPE classads SYSTEM "classads.dtd">
+<classads>
+<c>
+    <a n="MyType"><s>Job</s></a>
+    <a n="ClusterId"><i>123456789</i></a>
+    <a n="RemoteUserCpu"><r>12.5</r></a>
+    <a n="ExitBySignal"><b v="f"/></a>
+    <a n="OnExitRemove"><b>t</b></a>
+    <a n="TransferOutputRemaps"><un/></a>
+    <a n="Args"><s>a \\"quoted\\" arg</s></a>
+    <a n="Requirements"><e>TARGET.Arch == "X86_64"</e></a>
+</c>
+<c>
+    <a n="MyType"><s>Job</s></a>
+    <a n="ClusterId"><i>123456790</i></a>
+</c>
+</classads>
+"""
+
+EXPECTED = [{'MyType': 'Job', 'ClusterId': 123456789, 'RemoteUserCpu': 12.5, 'ExitBySignal': False,
+             'OnExitRemove': True, 'TransferOutputRemaps': None, 'Args': 'a "quoted" arg',
+             'Requirements': 'TARGET.Arch == "X86_64"'},
+            {'MyType': 'Job', 'ClusterId': 123456790}]
+
+
+def chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestXml2List(unittest.TestCase):
+
+    def test_xml2list(self):
+        self.assertEqual(condorMonitor.xml2list(XML_DATA.splitlines()), EXPECTED)
+
+    def test_xml2list_fixture(self):
+        with open('cq.fixture') as f:
+            lines = f.readlines()
+        classads = condorMonitor.xml2list(lines)
+        self.assertEqual(len(classads), 13)
+        self.assertEqual(list(condorMonitor.xml2iter(lines)), classads)
+
+    def test_xml2iter_chunks(self):
+        # chunks split the header, the numbers and the escaped quotes
+        for size in (1, 2, 3, 7, 64, len(XML_DATA)):
+            self.assertEqual(list(condorMonitor.xml2iter(chunks(XML_DATA, size))), EXPECTED,
+                             "Wrong result with chunks of size %s" % size)
+
+    def test_xml2iter_is_incremental(self):
+        parser = condorMonitor.Xml2ListParser()
+        first_ad_end = XML_DATA.index('</c>') + len('</c>')
+        self.assertEqual(parser.feed(XML_DATA[:first_ad_end]), EXPECTED[:1])
+        self.assertEqual(parser.feed(XML_DATA[first_ad_end:]), EXPECTED[1:])
+        self.assertEqual(parser.close(), [])
+
+    def test_reentrant(self):
+        results = [[], []]
+        iters = [condorMonitor.xml2iter(chunks(XML_DATA, 5)), condorMonitor.xml2iter(chunks(XML_DATA, 11))]
+        for i in range(len(EXPECTED)):
+            for j in range(len(iters)):
+                results[j].append(iters[j].next())
+        self.assertEqual(results, [EXPECTED, EXPECTED])
+
+    def test_interned_names(self):
+        classads = list(condorMonitor.xml2iter(chunks(XML_DATA, 3)))
+        self.assertTrue([k for k in classads[0] if k == 'MyType'][0] is
+                        [k for k in classads[1] if k == 'MyType'][0])
+
+    def test_no_xml(self):
+        self.assertEqual(condorMonitor.xml2list(['no xml here', 'nor here']), [])
+        self.assertEqual(list(condorMonitor.xml2iter(['no xml here\n', 'nor <?xml here'])), [])
+
+    def test_invalid_xml(self):
+        self.assertRaises(RuntimeError, list, condorMonitor.xml2iter(['<?xml version="1.0"?>\n<classads><x/>']))
+
+
+class TestColumnarResult(unittest.TestCase):
+
+    def setUp(self):
+        with open('cq.fixture') as f:
+            self.list_data = condorMonitor.xml2list(f.readlines())
+        self.dict_data = condorMonitor.list2dict(self.list_data, ["ClusterId", "ProcId"])
+        self.columns_data = condorMonitor.list2columns(self.list_data, ["ClusterId", "ProcId"])
+
+    def test_same_as_dict(self):
+        self.assertEqual(len(self.columns_data), len(self.dict_data))
+        self.assertItemsEqual(self.columns_data.keys(), self.dict_data.keys())
+        for key in self.dict_data:
+            self.assertEqual(self.columns_data[key], self.dict_data[key])
+            self.assertEqual(dict(self.columns_data[key]), self.dict_data[key])
+        self.assertEqual(self.columns_data, self.dict_data)
+        self.assertEqual(condorMonitor.ColumnarResult.fromDict(self.dict_data), self.dict_data)
+
+    def test_rows(self):
+        key, job = self.dict_data.items()[0]
+        row = self.columns_data[key]
+        for attr in job:
+            self.assertTrue(attr in row)
+            self.assertTrue(row.has_key(attr))
+            self.assertEqual(row.get(attr), job[attr])
+        self.assertFalse('ClusterId' in row)
+        self.assertRaises(KeyError, lambda: row['NotThere'])
+        self.assertEqual(row.get('NotThere', 'default'), 'default')
+        self.assertEqual(row.copy(), job)
+        self.assertEqual(copy.deepcopy(row), job)
+
+    def test_typed_columns(self):
+        self.assertEqual(self.columns_data.column('JobStatus').typecode, 'l')
+        self.assertTrue(isinstance(self.columns_data.column('Owner'), list))
+
+    def test_missing_values(self):
+        columns_data = condorMonitor.ColumnarResult.fromDict({1: {'a': 1, 'b': 'x'}, 2: {'a': 2}})
+        self.assertEqual(columns_data[2], {'a': 2})
+        self.assertTrue(columns_data.column('b')[1] is condorMonitor.MISSING)
+        self.assertEqual(columns_data.column('c'), [condorMonitor.MISSING] * 2)
+
+    def test_update(self):
+        key = self.dict_data.keys()[0]
+        row = self.columns_data[key]
+        row['RunningOn'] = 'UNKNOWN'
+        row['JobStatus'] = 'not an int'
+        self.assertEqual(self.columns_data[key]['RunningOn'], 'UNKNOWN')
+        self.assertEqual(self.columns_data[key]['JobStatus'], 'not an int')
+        del row['RunningOn']
+        self.assertFalse('RunningOn' in self.columns_data[key])
+        self.assertEqual(len([k for k in self.columns_data if 'RunningOn' in self.columns_data[k]]), 0)
+        # replacing a row
+        self.columns_data.setRow(key, {'JobStatus': 2})
+        self.assertEqual(self.columns_data[key], {'JobStatus': 2})
+
+    def test_add_row_after_compact(self):
+        columns_data = condorMonitor.ColumnarResult.fromDict({(1, 0): {'A': 1, 'B': 1.5}, (1, 1): {'A': 2, 'B': 2.5}})
+        self.assertEqual(columns_data.column('A').typecode, 'l')
+        columns_data.setRow((2, 0), {'A': 3})
+        self.assertEqual(columns_data[(2, 0)], {'A': 3})
+        self.assertEqual(columns_data[(1, 1)], {'A': 2, 'B': 2.5})
+        self.assertTrue(columns_data.column('B')[2] is condorMonitor.MISSING)
+        columns_data.compact()
+        self.assertEqual(columns_data.column('A').typecode, 'l')
+
+    def test_views(self):
+        idle_func = lambda el: el.get('JobStatus') == 1
+        view = condorMonitor.applyConstraint(self.columns_data, idle_func)
+        expected = condorMonitor.applyConstraint(self.dict_data, idle_func)
+        self.assertTrue(isinstance(view, condorMonitor.IndexView))
+        self.assertEqual(view, expected)
+        self.assertItemsEqual(view.keys(), expected.keys())
+
+        # views of views
+        sites_func = lambda el: 'DESIRED_Sites' in el
+        sites_view = condorMonitor.applyConstraint(view, sites_func)
+        self.assertTrue(sites_view.table is self.columns_data)
+        self.assertEqual(sites_view, condorMonitor.applyConstraint(expected, sites_func))
+
+        not_in_view = [k for k in self.dict_data if k not in expected]
+        if not_in_view:
+            self.assertFalse(not_in_view[0] in view)
+            self.assertRaises(KeyError, lambda: view[not_in_view[0]])
+
+    def test_subquery(self):
+        query = condorMonitor.StoredQuery()
+        query.stored_data = self.columns_data
+        sq = condorMonitor.SubQuery(query, lambda el: el.get('JobStatus') == 1)
+        sq.load()
+        self.assertTrue(isinstance(sq.fetchStored(), condorMonitor.IndexView))
+        self.assertEqual(len(sq.fetchStored()), len([1 for el in self.dict_data.values() if el.get('JobStatus') == 1]))
+
+    def test_select_keys(self):
+        keys = [k for k, el in self.dict_data.items() if el.get('JobStatus') == 1]
+        view = condorMonitor.selectKeys(self.dict_data, keys)
+        self.assertTrue(isinstance(view, condorMonitor.KeyView))
+        self.assertEqual(view, condorMonitor.applyConstraint(self.dict_data, lambda el: el.get('JobStatus') == 1))
+        self.assertEqual(view.keys(), keys)
+        self.assertTrue(view[keys[0]] is self.dict_data[keys[0]])
+        self.assertEqual(dict(view.iteritems()), dict(view.items()))
+        not_in_view = [k for k in self.dict_data if k not in keys]
+        if not_in_view:
+            self.assertFalse(not_in_view[0] in view)
+            self.assertRaises(KeyError, lambda: view[not_in_view[0]])
+        # views of views are on the same data
+        self.assertTrue(condorMonitor.selectKeys(view, keys[:1]).data is self.dict_data)
+        loaded = pickle.loads(pickle.dumps(view, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(loaded, view)
+        # columnar storage
+        columns_view = condorMonitor.selectKeys(self.columns_data, keys)
+        self.assertTrue(isinstance(columns_view, condorMonitor.IndexView))
+        self.assertEqual(columns_view, view)
+        self.assertEqual(condorMonitor.selectKeys(columns_view, keys[:1]).keys(), keys[:1])
+
+    def test_pickle(self):
+        views = {'all': self.columns_data,
+                 'idle': self.columns_data.select(lambda el: el.get('JobStatus') == 1),
+                 'running': self.columns_data.select(lambda el: el.get('JobStatus') == 2)}
+        loaded = pickle.loads(pickle.dumps(views, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(loaded['all'], self.dict_data)
+        self.assertTrue(loaded['idle'].table is loaded['all'])
+        self.assertEqual(loaded['idle'], views['idle'])
+        self.assertEqual(loaded['running'], views['running'])
+
+        columns_data = condorMonitor.ColumnarResult.fromDict({1: {'a': 1, 'b': 'x'}, 2: {'a': 2}})
+        loaded = pickle.loads(pickle.dumps(columns_data))
+        self.assertTrue(loaded.column('b')[1] is condorMonitor.MISSING)
+        self.assertEqual(loaded[2], {'a': 2})
+
+    def test_condorq(self):
+        with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv'):
+            cq = condorMonitor.CondorQ(schedd_name='sched1', pool_name='pool1', columnar_storage=True)
+        with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
+            with open('cq.fixture') as f:
+                m_exe_cmd.return_value = f.readlines()
+            cq.load()
+        self.assertTrue(isinstance(cq.fetchStored(), condorMonitor.ColumnarResult))
+        self.assertEqual(cq.fetchStored(), self.dict_data)
+
+
+class TestBindings(unittest.TestCase):
+
+    def setUp(self):
+        with open('cq.fixture') as f:
+            self.list_data = condorMonitor.xml2list(f.readlines())
+        self.dict_data = condorMonitor.list2dict(self.list_data, ["ClusterId", "ProcId"])
+        with mock.patch('glideinwms.lib.condorMonitor.LocalScheddCache.iGetEnv'):
+            self.cq = condorMonitor.CondorQ(schedd_name='sched1', pool_name='pool1')
+
+    def test_bindings2iter(self):
+        ads = [fake_htcondor.ClassAd({'a': 1, 'b': fake_htcondor.ExprTree('1 + 1', 2), 'c': 'Undefined'})]
+        with fake_htcondor.patch_bindings() as bindings:
+            ads.append(fake_htcondor.ClassAd({'a': 2, 'b': bindings.classad.Value.Undefined,
+                                              'c': fake_htcondor.ExprTree('x', bindings.classad.Value.Error)}))
+            self.assertEqual(list(condorMonitor.bindings2iter(ads)), [{'a': 1, 'b': 2, 'c': 'Undefined'}, {'a': 2}])
+
+    def test_same_as_exe(self):
+        with fake_htcondor.patch_bindings(schedd_ads=self.list_data):
+            self.assertEqual(self.cq.fetch(), self.dict_data)
+            self.cq.columnar_storage = True
+            results = self.cq.fetch()
+        self.assertTrue(isinstance(results, condorMonitor.ColumnarResult))
+        self.assertEqual(results, self.dict_data)
+
+    def test_projection(self):
+        with fake_htcondor.patch_bindings(schedd_ads=self.list_data) as bindings:
+            results = self.cq.fetch(format_list=[('JobStatus', 'i')])
+        self.assertEqual(bindings.queries, [(True, ['JobStatus', 'ClusterId', 'ProcId'])])
+        for key in self.dict_data:
+            self.assertEqual(results[key], {'JobStatus': self.dict_data[key]['JobStatus']})
+
+    def test_connection_reuse(self):
+        with fake_htcondor.patch_bindings(schedd_ads=self.list_data,
+                                          collector_ads=[{'Name': 'slot1@wn1', 'State': 'Claimed'}]) as bindings:
+            cq2 = condorMonitor.CondorQ(schedd_name='sched1', pool_name='pool1', schedd_lookup_cache=None)
+            for i in range(3):
+                self.cq.fetch()
+                cq2.fetch()
+                condorMonitor.CondorStatus(pool_name='pool1').fetch()
+            self.assertEqual(bindings.reloads, 1)
+            self.assertEqual(len(bindings.schedds), 1)
+            self.assertEqual(len(bindings.collectors), 1)
+            # The configuration is reloaded if the environment changes
+            with mock.patch.dict('os.environ', {'_CONDOR_SEC_CLIENT_INTEGRITY': 'REQUIRED'}):
+                self.cq.fetch()
+            self.assertEqual(bindings.reloads, 2)
+            self.assertEqual(len(bindings.schedds), 2)
+
+    def test_exe_fallback(self):
+        def failing_query(constraint, attrs):
+            raise RuntimeError("Connection refused")
+        with fake_htcondor.patch_bindings(schedd_ads=self.list_data) as bindings:
+            self.cq.fetch()
+            bindings.schedds[0].query = failing_query
+            with mock.patch('glideinwms.lib.condorExe.exe_cmd_chunks') as m_exe_cmd:
+                with open('cq.fixture') as f:
+                    m_exe_cmd.return_value = f.readlines()
+                with mock.patch.object(condorMonitor.logSupport, 'log') as m_log:
+                    self.assertEqual(self.cq.fetch(), self.dict_data)
+            self.assertEqual(m_exe_cmd.call_count, 1)
+            # The failure of the bindings is not hidden
+            self.assertEqual(m_log.warning.call_count, 1)
+            self.assertTrue('Connection refused' in m_log.warning.call_args[0][0])
+            # The connections are not reused after an error
+            self.cq.fetch()
+            self.assertEqual(len(bindings.schedds), 2)
+
+
+if __name__ == '__main__':
+    unittest.main(testRunner=xmlrunner.XMLTestRunner(output='unittests-reports'))
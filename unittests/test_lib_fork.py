@@ -84,6 +84,14 @@ class TestFetchForkResult(unittest.TestCase):
         self.assertEqual(expected, sleep_arg)
         global_log_cleanup()
 
+    def test_fetch_fork_result_big(self):
+        global_log_setup()
+        # larger than the pipe buffer and than a read
+        big_result = dict([(i, {'JobStatus': 1, 'Owner': 'user%s' % i}) for i in range(100000)])
+        results = fork_in_bg(lambda: big_result)
+        self.assertEqual(fetch_fork_result(results['r'], results['pid']), big_result)
+        global_log_cleanup()
+
 
 class TestFetchForkResultList(unittest.TestCase):
 
@@ -166,6 +174,14 @@ class TestForkManager(unittest.TestCase):
         results = self.fork_manager.fork_and_collect()
         self.assertEqual(expected, results)
 
+    def test_bounded_fork_and_collect_timings(self):
+        expected = self.load_forks(num_forks=10, sleep_val=1)
+        results = self.fork_manager.bounded_fork_and_collect(max_forks=4, log_progress=False, sleep_time=0.1)
+        self.assertEqual(expected, results)
+        # the time of each child is recorded
+        self.assertEqual(sorted(self.fork_manager.timings.keys()), sorted(expected.keys()))
+        self.assertTrue(min(self.fork_manager.timings.values()) >= 1)
+
     def test_fork_and_wait(self):
         expected = self.load_forks()
         results = self.fork_manager.fork_and_wait()
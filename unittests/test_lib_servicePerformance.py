@@ -21,6 +21,8 @@ from glideinwms.lib.servicePerformance import startPerfMetricEvent
 from glideinwms.lib.servicePerformance import endPerfMetricEvent
 from glideinwms.lib.servicePerformance import getPerfMetricEventLifetime
 from glideinwms.lib.servicePerformance import getPerfMetric
+from glideinwms.lib.servicePerformance import setPerfMetricCounter
+from glideinwms.lib.servicePerformance import incrementPerfMetricCounter
 
 # define these globally for convenience
 name = "timing_test"
@@ -95,6 +97,23 @@ class TestGetPerfMetric(unittest.TestCase):
         self.assertEqual(event_end_repr, getPerfMetric(name).__repr__())
 
 
+class TestPerfMetricCounters(unittest.TestCase):
+
+    def test_counters(self):
+        perf_metric = PerfMetric(name)
+        perf_metric.increment_counter('cache_hits')
+        perf_metric.increment_counter('cache_hits', 41)
+        perf_metric.set_counter('cache_misses', 3)
+        self.assertEqual(perf_metric.counters, {'cache_hits': 42, 'cache_misses': 3})
+        # the counters are not part of the events
+        self.assertEqual(expected_repr, perf_metric.__repr__())
+
+    def test_counter_functions(self):
+        setPerfMetricCounter('counters_test', 'cache_hits', 5)
+        incrementPerfMetricCounter('counters_test', 'cache_hits')
+        self.assertEqual(getPerfMetric('counters_test').counters['cache_hits'], 6)
+
+
 if __name__ == '__main__':
     unittest.main(
         testRunner=xmlrunner.XMLTestRunner(